@@ -1,20 +1,100 @@
+"""
+Embeds the messages and clusters them into candidate categories.
+
+Usage:
+    python Categorization/KMeans_category_clustering.py                  # full KMeans, K = 10
+    python Categorization/KMeans_category_clustering.py --minibatch      # streams the memory-mapped store
+    python Categorization/KMeans_category_clustering.py --sweep 5-30     # score K values, then exit
+    python Categorization/KMeans_category_clustering.py --no-dedup       # embed and fit every message
+
+Messages are normalized and exact and near-duplicate copies grouped first (see
+dedup.py); only one representative per group is embedded and clustered, weighted
+by its group size, and its label is copied to every message of the group.
+"""
+import argparse
+import os
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import KMeans
+from cluster_model import MODEL_PATH, SEARCH_BACKENDS, assign_clusters, save_cluster_model
+from clustering import fit_kmeans, fit_minibatch_kmeans, k_sweep
+from dedup import NEAR_THRESHOLD, dedup_report, deduplicate
+from embedding_store import embed_texts, lookup, message_keys, open_store, start_encoder_pool, vectors
+
+DATA_PATH = 'LLM-DataScientist-Task_Data.csv'
+EMBEDDING_STORE = 'embeddings'
+BATCH_SIZE = 256
+WORKERS = os.cpu_count() or 1
+EMBEDDING_DTYPE = 'float32'  # 'float16' halves the store size
+NUM_CLUSTERS = 10
+
+
+def parse_k_range(text):
+    """Parses '5-30' or '5-30:5' (start-stop[:step], inclusive) into a list of K values."""
+    bounds, _, step = text.partition(':')
+    start, _, stop = bounds.partition('-')
+    return list(range(int(start), int(stop or start) + 1, int(step or 1)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clusters', type=int, default=NUM_CLUSTERS)
+    parser.add_argument('--minibatch', action='store_true',
+                        help='fit MiniBatchKMeans batch by batch instead of loading every embedding')
+    parser.add_argument('--sweep', type=parse_k_range, metavar='START-STOP[:STEP]',
+                        help='report inertia and silhouette for each K on a sample and exit')
+    parser.add_argument('--sample-size', type=int, default=50_000, help='rows per K in --sweep')
+    parser.add_argument('--assign-backend', choices=sorted(SEARCH_BACKENDS), default='numpy',
+                        help='nearest-centroid search used to label messages')
+    parser.add_argument('--no-dedup', action='store_true', help='embed and cluster every message separately')
+    parser.add_argument('--near-threshold', type=float, default=NEAR_THRESHOLD,
+                        help='MinHash similarity at which messages count as near duplicates (above 1: exact only)')
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_PATH)
+    texts = df['message'].astype(str).tolist()
+    if args.no_dedup:
+        representatives, group, weights = np.arange(len(texts)), None, None
+    else:
+        dedup = deduplicate(texts, near_threshold=args.near_threshold)
+        representatives, group, weights = dedup['representatives'], dedup['group'], dedup['sizes']
+        print(dedup_report(dedup['stats']))
+    rep_texts = [texts[i] for i in representatives]
 
+    # Embeddings are cached by message hash, so only new messages are encoded
+    store = open_store(EMBEDDING_STORE, dtype=EMBEDDING_DTYPE)
+    keys = message_keys(rep_texts)
+    pool = start_encoder_pool(WORKERS) if (lookup(store, keys) < 0).any() else None
+    try:
+        keys, encoded = embed_texts(store, rep_texts, keys, BATCH_SIZE, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"Embeddings: {encoded} new, {len(rep_texts) - encoded} reused from '{EMBEDDING_STORE}' ({store['count']} stored)")
+    # Work on the memory-mapped store; rows[i] is the store row of representative i
+    embeddings = vectors(store)
+    rows = lookup(store, keys)
 
-df = pd.read_csv('LLM-DataScientist-Task_Data.csv')
-messages = df['message'].tolist()
+    if args.sweep:
+        print(f"{'K':>4} {'inertia':>14} {'silhouette':>11}")
+        for result in k_sweep(embeddings, args.sweep, rows=rows, sample_size=args.sample_size, workers=WORKERS):
+            print(f"{result['k']:>4} {result['inertia']:>14.1f} {result['silhouette']:>11.3f}")
+        raise SystemExit
 
+    #K clustering
+    if args.minibatch:
+        centroids = fit_minibatch_kmeans(embeddings, args.clusters, rows=rows, sample_weight=weights)
+    else:
+        centroids = fit_kmeans(embeddings, args.clusters, rows=rows, sample_weight=weights)
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-embeddings = model.encode(messages, show_progress_bar=True)
+    labels, distances = assign_clusters(embeddings, centroids, rows=rows, backend=args.assign_backend)
+    if group is not None:
+        # Every message gets its representative's cluster
+        labels, distances = labels[group], distances[group]
+    df['cluster'] = labels
 
-#K clustering
-num_clusters = 10
-kmeans = KMeans(n_clusters=num_clusters, random_state=0)
-df['cluster'] = kmeans.fit_predict(embeddings)
+    # Keep the centroids so new messages can be labeled without re-clustering
+    save_cluster_model(centroids, labels, distances, MODEL_PATH)
 
-df.to_csv('clustered_messages.csv', index=False)
+    df.to_csv('clustered_messages.csv', index=False)
 
-print(df[['message', 'cluster']].head())
\ No newline at end of file
+    print(df[['message', 'cluster']].head())
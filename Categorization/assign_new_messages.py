@@ -0,0 +1,64 @@
+"""
+Labels new messages with the existing clusters and appends them to the labeled dataset.
+
+Uses the centroids saved by KMeans_category_clustering.py, so cluster ids and
+cluster_category_mapping.csv stay valid and no interactive naming is needed.
+
+Usage:
+    python Categorization/assign_new_messages.py new_messages.csv [--partial-fit]
+"""
+import argparse
+import os
+import pandas as pd
+from cluster_model import (
+    MODEL_PATH, assign_clusters, drift_report, load_cluster_model, partial_fit, write_cluster_model,
+)
+from embedding_store import embed_csv, vectors_for_keys
+
+MAPPING_PATH = 'cluster_category_mapping.csv'
+OUTPUT_PATH = 'merged_messages_with_categories.csv'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV with id_user, timestamp, source and message columns')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--mapping', default=MAPPING_PATH)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--partial-fit', action='store_true',
+                        help='move the saved centroids towards the new messages')
+    parser.add_argument('--batch-size', type=int, default=65_536)
+    args = parser.parse_args()
+
+    model = load_cluster_model(args.model)
+    df_new = pd.read_csv(args.input)
+
+    store, keys = embed_csv(args.input)
+    embeddings = vectors_for_keys(store, keys)
+
+    labels, distances = assign_clusters(embeddings, model['centroids'], args.batch_size)
+    df_new['cluster'] = labels
+
+    df_mapping = pd.read_csv(args.mapping)
+    df_new = pd.merge(df_new, df_mapping, on='cluster', how='left')
+
+    # Append with the same column order as the existing labeled file
+    if os.path.exists(args.output):
+        columns = pd.read_csv(args.output, nrows=0).columns
+        df_new.reindex(columns=columns).to_csv(args.output, mode='a', header=False, index=False)
+    else:
+        df_new.to_csv(args.output, index=False)
+
+    print(f"Appended {len(df_new)} messages to '{args.output}'")
+    print(df_new['category'].value_counts())
+
+    drift = drift_report(model, distances)
+    print(f"\nDrift: mean distance ratio {drift['distance_ratio']:.2f}, "
+          f"{drift['outlier_share']:.1%} beyond the training 95th percentile")
+    if drift['refit_recommended']:
+        print("New messages fit the current clusters poorly; re-run the full clustering pipeline.")
+
+    if args.partial_fit:
+        partial_fit(model, embeddings, labels)
+        write_cluster_model(model, args.model)
+        print(f"Updated centroids in '{args.model}'")
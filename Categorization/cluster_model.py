@@ -0,0 +1,177 @@
+import numpy as np
+
+MODEL_PATH = 'cluster_model.npz'
+
+# Refit is recommended when new messages sit this much further from their
+# centroid than the training messages did, on average...
+DRIFT_DISTANCE_RATIO = 1.15
+# ...or when this share of them is further away than 95% of the training messages.
+DRIFT_OUTLIER_SHARE = 0.15
+
+
+def _numpy_search(centroids):
+    centroid_sq = (centroids ** 2).sum(axis=1)
+
+    def search(batch):
+        sq = (batch ** 2).sum(axis=1)[:, None] - 2 * batch @ centroids.T + centroid_sq[None, :]
+        nearest = sq.argmin(axis=1)
+        return nearest, sq[np.arange(len(batch)), nearest]
+    return search
+
+
+def _faiss_search(centroids):
+    import faiss
+    index = faiss.IndexFlatL2(centroids.shape[1])
+    index.add(centroids)
+
+    def search(batch):
+        sq, nearest = index.search(np.ascontiguousarray(batch), 1)
+        return nearest[:, 0], sq[:, 0]
+    return search
+
+
+def _hnswlib_search(centroids):
+    import hnswlib
+    index = hnswlib.Index(space='l2', dim=centroids.shape[1])
+    index.init_index(max_elements=len(centroids), ef_construction=200, M=16)
+    index.add_items(centroids, np.arange(len(centroids)))
+    index.set_ef(max(50, len(centroids)))
+
+    def search(batch):
+        nearest, sq = index.knn_query(batch, k=1)
+        return nearest[:, 0], sq[:, 0]
+    return search
+
+
+SEARCH_BACKENDS = {'numpy': _numpy_search, 'faiss': _faiss_search, 'hnswlib': _hnswlib_search}
+
+
+def assign_clusters(embeddings, centroids, batch_size=65_536, rows=None, backend='numpy'):
+    """
+    Assigns each embedding to its nearest centroid in batches.
+
+    The 'numpy' backend computes exact distances to every centroid with one
+    matrix product per batch. 'faiss' (exact, SIMD) and 'hnswlib' (approximate
+    graph search) need their optional packages and pay off when there are
+    thousands of centroids.
+
+    Args:
+        embeddings (np.ndarray): Array of shape (n, dim); may be a memmap.
+        centroids (np.ndarray): Array of shape (k, dim).
+        batch_size (int): Rows per search, bounding memory to batch_size × k.
+        rows (Optional[np.ndarray]): Assign only these rows of `embeddings`, in this
+            order (e.g. store rows from `embedding_store.lookup()`); gathered per batch.
+        backend (str): 'numpy', 'faiss' or 'hnswlib'.
+
+    Returns:
+        tuple: (int32 cluster labels, float32 Euclidean distances to the assigned centroid)
+    """
+    search = SEARCH_BACKENDS[backend](np.ascontiguousarray(centroids, dtype=np.float32))
+    total = len(embeddings) if rows is None else len(rows)
+    labels = np.empty(total, dtype=np.int32)
+    distances = np.empty(total, dtype=np.float32)
+
+    for start in range(0, total, batch_size):
+        end = min(start + batch_size, total)
+        batch = embeddings[start:end] if rows is None else embeddings[rows[start:end]]
+        nearest, sq = search(np.asarray(batch, dtype=np.float32))
+        labels[start:end] = nearest
+        distances[start:end] = np.sqrt(np.maximum(sq, 0))
+    return labels, distances
+
+
+def save_cluster_model(centroids, labels, distances, path=MODEL_PATH):
+    """
+    Persists fitted centroids with the statistics needed for online assignment.
+
+    Args:
+        centroids (np.ndarray): Cluster centers; row i is cluster id i.
+        labels (np.ndarray): Training labels, used for per-cluster counts.
+        distances (np.ndarray): Training distances to the assigned centroid.
+        path (str): Output .npz file.
+    """
+    write_cluster_model({
+        'centroids': np.asarray(centroids, dtype=np.float32),
+        'counts': np.bincount(labels, minlength=len(centroids)).astype(np.int64),
+        'distance_mean': float(distances.mean()),
+        'distance_p95': float(np.percentile(distances, 95)),
+    }, path)
+
+
+def write_cluster_model(model, path=MODEL_PATH):
+    """
+    Writes a model dict (e.g. after `partial_fit()`) back to disk.
+
+    Args:
+        model (dict): Model with 'centroids', 'counts', 'distance_mean' and 'distance_p95'.
+        path (str): Output .npz file.
+    """
+    np.savez(path, **model)
+
+
+def load_cluster_model(path=MODEL_PATH):
+    """
+    Loads a model written by `save_cluster_model()`.
+
+    Args:
+        path (str): The .npz file.
+
+    Returns:
+        dict: 'centroids', 'counts', 'distance_mean' and 'distance_p95'.
+    """
+    with np.load(path) as data:
+        return {
+            'centroids': data['centroids'],
+            'counts': data['counts'],
+            'distance_mean': float(data['distance_mean']),
+            'distance_p95': float(data['distance_p95']),
+        }
+
+
+def partial_fit(model, embeddings, labels):
+    """
+    Moves centroids towards newly assigned messages without changing cluster ids.
+
+    Applies the MiniBatchKMeans center update (a running mean weighted by the
+    number of messages each cluster has absorbed so far). sklearn's own
+    `partial_fit` restarts those counts at zero when seeded with existing
+    centroids, which would let one batch overwrite the fitted model.
+
+    Args:
+        model (dict): Model from `load_cluster_model()`, updated in place.
+        embeddings (np.ndarray): New embeddings.
+        labels (np.ndarray): Their cluster labels from `assign_clusters()`.
+    """
+    k, dim = model['centroids'].shape
+    new_counts = np.bincount(labels, minlength=k)
+    sums = np.zeros((k, dim), dtype=np.float64)
+    np.add.at(sums, labels, np.asarray(embeddings, dtype=np.float64))
+
+    total = model['counts'] + new_counts
+    updated = new_counts > 0
+    model['centroids'][updated] = (
+        (model['centroids'][updated] * model['counts'][updated, None] + sums[updated]) / total[updated, None]
+    ).astype(np.float32)
+    model['counts'] = total
+
+
+def drift_report(model, distances):
+    """
+    Compares how well new messages fit the centroids against the training data.
+
+    Args:
+        model (dict): Model from `load_cluster_model()`.
+        distances (np.ndarray): Distances of new messages to their assigned centroid.
+
+    Returns:
+        dict: 'distance_ratio' (mean new distance / mean training distance),
+            'outlier_share' (share beyond the training 95th percentile) and
+            'refit_recommended'.
+    """
+    ratio = float(distances.mean() / model['distance_mean']) if len(distances) else 1.0
+    outliers = float((distances > model['distance_p95']).mean()) if len(distances) else 0.0
+    return {
+        'distance_ratio': ratio,
+        'outlier_share': outliers,
+        'refit_recommended': ratio > DRIFT_DISTANCE_RATIO or outliers > DRIFT_OUTLIER_SHARE,
+    }
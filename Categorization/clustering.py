@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+_sweep_sample = None
+
+
+def _take(embeddings, rows, positions):
+    """Reads `positions` (a slice or index array) of `embeddings`, or of `embeddings[rows]`, as float32."""
+    selected = positions if rows is None else rows[positions]
+    return np.asarray(embeddings[selected], dtype=np.float32)
+
+
+def fit_kmeans(embeddings, n_clusters, rows=None, random_state=0, sample_weight=None):
+    """
+    Fits full-batch KMeans in memory, as the original pipeline did.
+
+    Args:
+        embeddings (np.ndarray): Array of shape (n, dim); may be a memmap.
+        n_clusters (int): Number of clusters.
+        rows (Optional[np.ndarray]): Fit on these rows of `embeddings` only.
+        random_state (int): Seed.
+        sample_weight (Optional[np.ndarray]): Weight per fitted row, e.g. the group
+            sizes from `dedup.deduplicate()` when fitting on representatives only.
+
+    Returns:
+        np.ndarray: Centroids of shape (n_clusters, dim).
+    """
+    kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
+    kmeans.fit(_take(embeddings, rows, slice(None)), sample_weight=sample_weight)
+    return kmeans.cluster_centers_.astype(np.float32)
+
+
+def fit_minibatch_kmeans(embeddings, n_clusters, rows=None, batch_size=4096, epochs=3,
+                         init_size=None, random_state=0, sample_weight=None):
+    """
+    Fits MiniBatchKMeans by streaming batches from a (memory-mapped) embedding array.
+
+    Only one batch is in memory at a time, so the store can be much larger than RAM.
+    The first call to `partial_fit` runs k-means++ on an initial sample of
+    `init_size` rows; each epoch then visits the batches in a new random order.
+
+    Args:
+        embeddings (np.ndarray): Array of shape (n, dim); may be a memmap.
+        n_clusters (int): Number of clusters.
+        rows (Optional[np.ndarray]): Fit on these rows of `embeddings` only
+            (duplicates count as often as they appear).
+        batch_size (int): Rows per `partial_fit` call.
+        epochs (int): Passes over the data.
+        init_size (Optional[int]): Rows used for initialization; defaults to
+            max(3 × batch_size, 30 × n_clusters).
+        random_state (int): Seed.
+        sample_weight (Optional[np.ndarray]): Weight per fitted row, aligned with `rows`.
+
+    Returns:
+        np.ndarray: Centroids of shape (n_clusters, dim).
+    """
+    rng = np.random.default_rng(random_state)
+    total = len(embeddings) if rows is None else len(rows)
+    init_size = init_size or max(3 * batch_size, 30 * n_clusters)
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state, n_init=3)
+    def weights(positions):
+        return None if sample_weight is None else np.asarray(sample_weight)[positions]
+
+    init_rows = sample_rows(total, init_size, random_state)
+    kmeans.partial_fit(_take(embeddings, rows, init_rows), sample_weight=weights(init_rows))
+
+    starts = np.arange(0, total, batch_size)
+    for _ in range(epochs):
+        for start in rng.permutation(starts):
+            batch = slice(start, start + batch_size)
+            kmeans.partial_fit(_take(embeddings, rows, batch), sample_weight=weights(batch))
+    return kmeans.cluster_centers_.astype(np.float32)
+
+
+def sample_rows(total, sample_size, random_state=0):
+    """Sorted random row positions, so memmap reads stay sequential."""
+    rng = np.random.default_rng(random_state)
+    return np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+
+
+def _init_sweep_worker(sample, blas_threads=None):
+    global _sweep_sample
+    _sweep_sample = sample
+    if blas_threads:
+        # Keep BLAS from spawning a thread per core in every worker process
+        threadpool_limits(blas_threads)
+
+
+def _score_k(args):
+    k, silhouette_size, random_state = args
+    kmeans = MiniBatchKMeans(n_clusters=k, batch_size=4096, random_state=random_state, n_init=3)
+    labels = kmeans.fit_predict(_sweep_sample)
+    silhouette = silhouette_score(_sweep_sample, labels, sample_size=min(silhouette_size, len(_sweep_sample)),
+                                  random_state=random_state)
+    return {'k': k, 'inertia': float(kmeans.inertia_), 'silhouette': float(silhouette)}
+
+
+def k_sweep(embeddings, ks, rows=None, sample_size=50_000, silhouette_size=10_000, workers=None, random_state=0):
+    """
+    Scores candidate cluster counts on a random sample, one K per worker process.
+
+    Inertia always falls as K grows, so look for the elbow; silhouette (in [-1, 1],
+    higher is better) is computed on a smaller sub-sample because it is quadratic.
+
+    Args:
+        embeddings (np.ndarray): Array of shape (n, dim); may be a memmap.
+        ks (Iterable[int]): Cluster counts to try.
+        rows (Optional[np.ndarray]): Sample from these rows of `embeddings` only.
+        sample_size (int): Rows each K is fitted on.
+        silhouette_size (int): Rows the silhouette score is computed on.
+        workers (Optional[int]): Worker processes, one per CPU by default; the sample
+            is sent to each once.
+        random_state (int): Seed.
+
+    Returns:
+        list: One dict per K with 'k', 'inertia' and 'silhouette', in K order.
+    """
+    total = len(embeddings) if rows is None else len(rows)
+    sample = _take(embeddings, rows, sample_rows(total, sample_size, random_state))
+
+    tasks = [(k, silhouette_size, random_state) for k in sorted(ks)]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1:
+        _init_sweep_worker(sample)
+        return [_score_k(task) for task in tasks]
+
+    workers = min(workers, len(tasks))
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                             initargs=(sample, threads)) as pool:
+        return list(pool.map(_score_k, tasks))
@@ -0,0 +1,168 @@
+import re
+import zlib
+import numpy as np
+import pandas as pd
+
+NEAR_THRESHOLD = 0.8
+NUM_PERM = 64
+NUM_BANDS = 8
+# Messages shorter than this (after normalization) are only merged when identical;
+# a couple of changed letters in "hi" or "no" is a different message.
+MIN_NEAR_CHARS = 20
+SHINGLE_SIZE = 3
+
+_MERSENNE_31 = (1 << 31) - 1
+_QUOTES = '"\'“”‘’`'
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_message(text):
+    """
+    Normalizes a message so trivially different copies compare equal.
+
+    Strips wrapping quotes (the CSV stores most messages inside extra quotes), casefolds,
+    replaces digit runs with 0 (ticket numbers, amounts in templated bot phrases),
+    drops punctuation and collapses whitespace. Messages with no letters or digits
+    keep their casefolded text, so "?" and "!!" stay apart.
+
+    Args:
+        text (str): Raw message.
+
+    Returns:
+        str: Normalized text used for duplicate detection only.
+    """
+    text = str(text).strip().strip(_QUOTES).strip().casefold()
+    normalized = _SPACES.sub(' ', _PUNCTUATION.sub(' ', _DIGITS.sub('0', text))).strip()
+    return normalized or _SPACES.sub(' ', text)
+
+
+def _shingle_hashes(text):
+    """crc32 of the character shingles of a normalized message."""
+    padded = f' {text} '
+    shingles = {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+    return [zlib.crc32(s.encode('utf-8')) for s in shingles]
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=0, chunk_shingles=250_000):
+    """
+    Computes MinHash signatures of the character-shingle sets of many texts.
+
+    The fraction of equal signature entries of two texts estimates the Jaccard
+    similarity of their shingle sets. All texts' shingles are hashed in large
+    vectorized chunks; `np.minimum.reduceat` takes the per-text minimum.
+
+    Args:
+        texts (list): Normalized messages.
+        num_perm (int): Signature length.
+        seed (int): Seed of the hash permutations.
+        chunk_shingles (int): Shingles processed per chunk, bounding memory to
+            num_perm × chunk_shingles × 8 bytes.
+
+    Returns:
+        np.ndarray: uint32 array of shape (len(texts), num_perm).
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_31, num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, _MERSENNE_31, num_perm, dtype=np.uint64)[:, None]
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        hashes, offsets = [], []
+        end = start
+        while end < len(texts) and (not hashes or len(hashes) < chunk_shingles):
+            offsets.append(len(hashes))
+            hashes.extend(_shingle_hashes(texts[end]))
+            end += 1
+        # a < 2**31 and a crc32 < 2**32, so a * h + b fits in uint64
+        permuted = (a * np.asarray(hashes, dtype=np.uint64) + b) % np.uint64(_MERSENNE_31)
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def deduplicate(texts, near_threshold=NEAR_THRESHOLD, num_perm=NUM_PERM, num_bands=NUM_BANDS,
+                min_near_chars=MIN_NEAR_CHARS):
+    """
+    Groups exact and near-duplicate messages so only one per group needs embedding.
+
+    Messages are first grouped by their normalized text. Normalized texts of at
+    least `min_near_chars` characters are then merged by MinHash: signatures are
+    split into `num_bands` bands (locality-sensitive hashing), texts sharing a band
+    are candidates, and a candidate joins a group when its estimated Jaccard
+    similarity to the group's representative reaches `near_threshold`. Texts are
+    visited most frequent first, so each group is represented by its most common
+    variant and groups never chain away from it.
+
+    Args:
+        texts (Iterable[str]): Raw messages, one per row.
+        near_threshold (float): Minimum estimated shingle Jaccard similarity; values
+            above 1 disable near-duplicate merging.
+        num_perm (int): MinHash signature length; must be divisible by `num_bands`.
+        num_bands (int): LSH bands.
+        min_near_chars (int): Shorter normalized texts are only merged when equal.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'group': int64 group id per row
+            - 'representatives': Row position of each group's representative message
+            - 'sizes': Rows per group
+            - 'stats': Counts of 'rows', 'unique' raw texts, 'normalized' unique texts,
+              'groups', and the dedup 'ratio' (rows per group)
+    """
+    texts = [str(text) for text in texts]
+    normalized_codes, normalized = pd.factorize(pd.Series([normalize_message(t) for t in texts], dtype=object))
+    counts = np.bincount(normalized_codes, minlength=len(normalized))
+    _, first_rows = np.unique(normalized_codes, return_index=True)
+
+    order = np.argsort(-counts, kind='stable')
+    long_texts = np.array([len(text) >= min_near_chars for text in normalized], dtype=bool)
+    near = near_threshold <= 1 and long_texts.any()
+    if near:
+        candidates = order[long_texts[order]]
+        signatures = np.zeros((len(normalized), num_perm), dtype=np.uint32)
+        signatures[candidates] = minhash_signatures([normalized[i] for i in candidates], num_perm)
+        rows_per_band = num_perm // num_bands
+        buckets = [{} for _ in range(num_bands)]
+
+    group_of = np.empty(len(normalized), dtype=np.int64)
+    leaders = []
+    for code in order:
+        group = None
+        if near and long_texts[code]:
+            bands = [signatures[code, i * rows_per_band:(i + 1) * rows_per_band].tobytes() for i in range(num_bands)]
+            for band, key in zip(buckets, bands):
+                leader = band.get(key)
+                if leader is not None and np.mean(signatures[leader] == signatures[code]) >= near_threshold:
+                    group = group_of[leader]
+                    break
+            if group is None:
+                for band, key in zip(buckets, bands):
+                    band.setdefault(key, code)
+        if group is None:
+            group = len(leaders)
+            leaders.append(code)
+        group_of[code] = group
+
+    group = group_of[normalized_codes]
+    sizes = np.bincount(group, minlength=len(leaders))
+    return {
+        'group': group,
+        'representatives': first_rows[leaders],
+        'sizes': sizes,
+        'stats': {
+            'rows': len(texts),
+            'unique': len(set(texts)),
+            'normalized': len(normalized),
+            'groups': len(leaders),
+            'ratio': len(texts) / max(len(leaders), 1),
+        },
+    }
+
+
+def dedup_report(stats):
+    """Formats the counts from `deduplicate()` as one line."""
+    return (f"Dedup: {stats['rows']:,} messages -> {stats['unique']:,} unique -> {stats['normalized']:,} normalized "
+            f"-> {stats['groups']:,} groups after near-duplicate merging ({stats['ratio']:.2f} rows per group)")
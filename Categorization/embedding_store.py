@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+STORE_DIR = 'embeddings'
+
+_worker_model = None
+
+
+def message_key(text):
+    """
+    Hashes a message into the 64-bit key used to look up its embedding.
+
+    Args:
+        text (str): Message text exactly as stored in the CSV.
+
+    Returns:
+        int: Unsigned 64-bit hash.
+    """
+    return int.from_bytes(hashlib.blake2b(str(text).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def message_keys(texts):
+    """
+    Hashes many messages at once.
+
+    Args:
+        texts (Iterable[str]): Messages.
+
+    Returns:
+        np.ndarray: uint64 key per message.
+    """
+    return np.fromiter((message_key(t) for t in texts), dtype=np.uint64)
+
+
+def _paths(store_dir):
+    return (os.path.join(store_dir, 'meta.json'),
+            os.path.join(store_dir, 'keys.bin'),
+            os.path.join(store_dir, 'vectors.bin'))
+
+
+def open_store(store_dir=STORE_DIR, model_name=MODEL_NAME, dtype='float32'):
+    """
+    Opens an append-only embedding store, creating it if needed.
+
+    Layout: `keys.bin` holds uint64 message keys, `vectors.bin` the matching rows
+    as raw float32/float16, and `meta.json` the committed row count. Rows past the
+    committed count (from an interrupted run) are ignored and overwritten.
+
+    Args:
+        store_dir (str): Directory holding the store.
+        model_name (str): Sentence-transformers model the vectors come from.
+        dtype (str): 'float32' or 'float16' for newly created stores.
+
+    Returns:
+        dict: Store state with 'dir', 'model', 'dtype', 'dim', 'count' and a key index.
+
+    Raises:
+        ValueError: If the existing store was built with a different model.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    meta_path, keys_path, _ = _paths(store_dir)
+    meta = {'model': model_name, 'dtype': dtype, 'dim': None, 'count': 0}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['model'] != model_name:
+            raise ValueError(f"Store in {store_dir} holds '{meta['model']}' embeddings, not '{model_name}'")
+
+    keys = np.fromfile(keys_path, dtype=np.uint64, count=meta['count']) if meta['count'] else np.empty(0, np.uint64)
+    order = np.argsort(keys, kind='stable')
+    return {'dir': store_dir, **meta, 'sorted_keys': keys[order], 'sorted_rows': order}
+
+
+def _write_meta(store):
+    meta_path, _, _ = _paths(store['dir'])
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({k: store[k] for k in ('model', 'dtype', 'dim', 'count')}, f)
+    os.replace(tmp_path, meta_path)
+
+
+def lookup(store, keys):
+    """
+    Finds the store rows for message keys.
+
+    Args:
+        store (dict): Store from `open_store()`.
+        keys (np.ndarray): uint64 message keys.
+
+    Returns:
+        np.ndarray: Row index per key, -1 where the key is not stored.
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    sorted_keys = store['sorted_keys']
+    if not len(sorted_keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[positions] == keys, store['sorted_rows'][positions], -1)
+
+
+def append(store, keys, vectors):
+    """
+    Appends new embeddings and commits them by updating the row count.
+
+    Args:
+        store (dict): Store from `open_store()`.
+        keys (np.ndarray): uint64 keys of the new rows.
+        vectors (np.ndarray): Embeddings, one row per key.
+    """
+    if not len(keys):
+        return
+    _, keys_path, vectors_path = _paths(store['dir'])
+    if store['dim'] is None:
+        store['dim'] = int(vectors.shape[1])
+    row_bytes = store['dim'] * np.dtype(store['dtype']).itemsize
+
+    for path, data, offset in ((keys_path, np.asarray(keys, np.uint64), store['count'] * 8),
+                               (vectors_path, np.asarray(vectors, store['dtype']), store['count'] * row_bytes)):
+        with open(path, 'ab') as f:
+            f.truncate(offset)
+            f.write(np.ascontiguousarray(data).tobytes())
+
+    store['count'] += len(keys)
+    _write_meta(store)
+
+    all_keys = np.concatenate([store['sorted_keys'], keys])
+    all_rows = np.concatenate([store['sorted_rows'], np.arange(store['count'] - len(keys), store['count'])])
+    order = np.argsort(all_keys, kind='stable')
+    store['sorted_keys'], store['sorted_rows'] = all_keys[order], all_rows[order]
+
+
+def vectors(store):
+    """
+    Memory-maps all committed embeddings.
+
+    Args:
+        store (dict): Store from `open_store()`.
+
+    Returns:
+        np.memmap: Read-only array of shape (count, dim).
+    """
+    _, _, vectors_path = _paths(store['dir'])
+    if not store['count']:
+        return np.empty((0, store['dim'] or 0), dtype=store['dtype'])
+    return np.memmap(vectors_path, dtype=store['dtype'], mode='r', shape=(store['count'], store['dim']))
+
+
+def vectors_for_keys(store, keys):
+    """
+    Gathers the embeddings for message keys as a float32 array.
+
+    Args:
+        store (dict): Store from `open_store()`.
+        keys (np.ndarray): uint64 message keys, all present in the store.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(keys), dim).
+
+    Raises:
+        KeyError: If any key has not been embedded yet.
+    """
+    rows = lookup(store, keys)
+    if (rows < 0).any():
+        raise KeyError(f"{int((rows < 0).sum())} messages have not been embedded yet")
+    return np.asarray(vectors(store)[rows], dtype=np.float32)
+
+
+def _init_worker(model_name, num_threads=None):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+
+
+def encode_messages(texts, batch_size=256, pool=None, model_name=MODEL_NAME):
+    """
+    Embeds messages in batches, optionally spread over a CPU process pool.
+
+    Args:
+        texts (list): Messages to embed.
+        batch_size (int): Messages per encode call.
+        pool (Optional[ProcessPoolExecutor]): Pool from `start_encoder_pool()`;
+            encodes in this process when None.
+        model_name (str): Model used when encoding in this process.
+
+    Returns:
+        np.ndarray: float32 embeddings, one row per message, in input order.
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if pool is None:
+        if _worker_model is None:
+            _init_worker(model_name)
+        results = [_encode_batch(batch) for batch in batches]
+    else:
+        results = list(pool.map(_encode_batch, batches))
+    return np.vstack(results).astype(np.float32, copy=False)
+
+
+def start_encoder_pool(workers, model_name=MODEL_NAME):
+    """
+    Starts worker processes that each load the model once. Torch threads are
+    split between the workers so they do not oversubscribe the CPU.
+
+    Args:
+        workers (int): Number of processes; 1 or fewer returns None (encode in-process).
+        model_name (str): Sentence-transformers model name.
+
+    Returns:
+        Optional[ProcessPoolExecutor]: The pool, or None.
+    """
+    if workers <= 1:
+        return None
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name, threads))
+
+
+def embed_texts(store, texts, keys=None, batch_size=256, pool=None, model_name=MODEL_NAME):
+    """
+    Makes sure every text has an embedding in the store, encoding only new ones.
+
+    Args:
+        store (dict): Store from `open_store()`.
+        texts (list): Messages.
+        keys (Optional[np.ndarray]): Their `message_keys()`, if already computed.
+        batch_size (int): Messages per encode call.
+        pool (Optional[ProcessPoolExecutor]): Encoder pool, or None to encode in-process.
+        model_name (str): Sentence-transformers model name.
+
+    Returns:
+        tuple: (np.ndarray of uint64 keys in input order, number of messages encoded)
+    """
+    keys = message_keys(texts) if keys is None else keys
+    missing = lookup(store, keys) < 0
+    if not missing.any():
+        return keys, 0
+    _, first = np.unique(keys[missing], return_index=True)
+    new_positions = np.flatnonzero(missing)[np.sort(first)]
+    new_texts = [texts[i] for i in new_positions]
+    append(store, keys[new_positions], encode_messages(new_texts, batch_size, pool, model_name))
+    return keys, len(new_texts)
+
+
+def embed_csv(csv_path, store_dir=STORE_DIR, column='message', chunk_size=50_000, batch_size=256,
+              workers=None, dtype='float32', model_name=MODEL_NAME):
+    """
+    Streams a CSV and makes sure every message in it has an embedding in the store.
+
+    Only messages whose key is not in the store yet are encoded, so re-runs and
+    other scripts reuse earlier work. Each chunk is committed before the next one
+    is read, so an interrupted run resumes where it stopped.
+
+    Args:
+        csv_path (str): CSV with a text column.
+        store_dir (str): Embedding store directory.
+        column (str): Name of the text column.
+        chunk_size (int): Rows read from the CSV at a time.
+        batch_size (int): Messages per encode call.
+        workers (Optional[int]): Encoder processes, one per CPU by default.
+        dtype (str): 'float32' or 'float16' storage for a new store.
+        model_name (str): Sentence-transformers model name.
+
+    Returns:
+        tuple: (store dict, np.ndarray of uint64 keys for every CSV row in order)
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    store = open_store(store_dir, model_name, dtype)
+    all_keys = []
+    encoded = 0
+    pool = None
+
+    try:
+        for chunk in pd.read_csv(csv_path, usecols=[column], chunksize=chunk_size):
+            texts = chunk[column].astype(str).tolist()
+            keys = message_keys(texts)
+            # The pool is only started once something actually needs encoding
+            if pool is None and (lookup(store, keys) < 0).any():
+                pool = start_encoder_pool(workers, model_name)
+            keys, new = embed_texts(store, texts, keys, batch_size, pool, model_name)
+            all_keys.append(keys)
+            encoded += new
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    total = sum(len(k) for k in all_keys)
+    print(f"Embeddings: {encoded} new, {total - encoded} reused from '{store_dir}' ({store['count']} stored)")
+    return store, np.concatenate(all_keys) if all_keys else np.empty(0, np.uint64)
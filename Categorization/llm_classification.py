@@ -0,0 +1,345 @@
+"""
+Labels messages with an LLM, many messages per request and several requests at
+a time, as an alternative to the clustering pipeline.
+
+Identical messages are classified once. Every finished batch is appended to a
+checkpoint file, so an interrupted run picks up where it stopped. The output has
+the columns `mergeCategories.py` writes (id_user, timestamp, source, message,
+cluster, category), with 'cluster' taken from cluster_category_mapping.csv.
+
+Usage:
+    PYTHONPATH=. python Categorization/llm_classification.py LLM-DataScientist-Task_Data.csv \\
+        --mapping Categorization/cluster_category_mapping.csv --output merged_messages_with_categories.csv
+
+The backend is chosen like the chatbot's (`CHATBOT_LLM_BACKEND`, `CHATBOT_LLM_MODEL`,
+`OPENAI_BASE_URL`), so `python -m Chatbot.stub_llm_server` can stand in for the API.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from embedding_store import message_keys
+
+MAPPING_PATH = 'cluster_category_mapping.csv'
+CHECKPOINT_PATH = 'llm_labels.jsonl'
+BATCH_SIZE = 50
+MAX_BATCH_CHARS = 12_000
+MAX_MESSAGE_CHARS = 500
+MAX_IN_FLIGHT = 8
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 0.1
+
+
+def build_classification_prompt(categories):
+    """
+    Builds the system prompt for batch classification; it is the same for every request.
+
+    Args:
+        categories (list): Category names the messages may be given.
+
+    Returns:
+        str: Prompt for the system role.
+    """
+    return (
+        'You label customer support messages from an online casino with exactly one category each.\n\n'
+        f'Categories: {"; ".join(categories)}\n\n'
+        'The user sends numbered messages, one per line. Reply with ONLY a JSON object mapping every '
+        'message number to the exact name of its category, e.g. {"1": "<category>", "2": "<category>"}.\n'
+    )
+
+
+def pack_batches(texts, batch_size=BATCH_SIZE, max_chars=MAX_BATCH_CHARS):
+    """
+    Splits messages into requests of at most `batch_size` messages and about `max_chars` characters.
+
+    Args:
+        texts (list): Messages to classify.
+        batch_size (int): Maximum messages per request.
+        max_chars (int): Character budget per request; a longer single message still gets its own batch.
+
+    Returns:
+        list: Lists of positions into `texts`.
+    """
+    batches, current, size = [], [], 0
+    for position, text in enumerate(texts):
+        length = min(len(text), MAX_MESSAGE_CHARS) + 8
+        if current and (len(current) >= batch_size or size + length > max_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(position)
+        size += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_messages(prompt, texts):
+    """Chat messages asking for the categories of `texts`, numbered from 1."""
+    lines = (f'{number}. {" ".join(str(text).split())[:MAX_MESSAGE_CHARS]}' for number, text in enumerate(texts, 1))
+    return [
+        {'role': 'system', 'content': prompt},
+        {'role': 'user', 'content': '\n'.join(lines)},
+    ]
+
+
+def parse_labels(content, count, categories):
+    """
+    Reads the category of each numbered message from a reply.
+
+    Args:
+        content (str): Reply text, expected to contain one JSON object.
+        count (int): Number of messages in the request.
+        categories (list): Valid category names; matched case-insensitively.
+
+    Returns:
+        list: Category per message, None where the reply has no valid category.
+    """
+    labels = [None] * count
+    start, end = content.find('{'), content.rfind('}')
+    try:
+        reply = json.loads(content[start:end + 1]) if start >= 0 else {}
+    except json.JSONDecodeError:
+        return labels
+    lookup = {category.lower(): category for category in categories}
+    for number, label in reply.items() if isinstance(reply, dict) else ():
+        if str(number).isdigit() and 1 <= int(number) <= count and isinstance(label, str):
+            labels[int(number) - 1] = lookup.get(label.strip().lower())
+    return labels
+
+
+def new_limiter(max_in_flight=MAX_IN_FLIGHT):
+    """
+    Creates an adaptive concurrency limit for LLM requests.
+
+    The limit is halved when the provider rate-limits a request (and requests
+    pause for its Retry-After), then grows back by one per limit's worth of
+    successful requests, up to `max_in_flight`.
+
+    Args:
+        max_in_flight (int): Upper bound on concurrent requests.
+
+    Returns:
+        dict: Limiter state for `_acquire()` / `_release()`.
+    """
+    return {
+        'condition': threading.Condition(),
+        'limit': float(max_in_flight),
+        'max_in_flight': max_in_flight,
+        'in_flight': 0,
+        'resume_at': 0.0,
+        'throttled': 0,
+    }
+
+
+def _acquire(limiter):
+    with limiter['condition']:
+        while True:
+            wait = limiter['resume_at'] - time.monotonic()
+            if wait <= 0 and limiter['in_flight'] < int(limiter['limit']):
+                limiter['in_flight'] += 1
+                return
+            limiter['condition'].wait(timeout=wait if wait > 0 else None)
+
+
+def _release(limiter, retry_after=None):
+    with limiter['condition']:
+        limiter['in_flight'] -= 1
+        if retry_after is not None:
+            limiter['throttled'] += 1
+            limiter['limit'] = max(1.0, limiter['limit'] / 2)
+            limiter['resume_at'] = max(limiter['resume_at'], time.monotonic() + retry_after)
+        else:
+            limiter['limit'] = min(limiter['max_in_flight'], limiter['limit'] + 1 / limiter['limit'])
+        limiter['condition'].notify_all()
+
+
+def _retry_after(error):
+    """Seconds to wait if `error` is a rate-limit response (HTTP 429), otherwise None."""
+    if getattr(error, 'status_code', None) != 429:
+        return None
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after', 1.0))
+    except ValueError:
+        return 1.0
+
+
+def classify_batch(backend, prompt, texts, categories, limiter, max_attempts=MAX_ATTEMPTS):
+    """
+    Classifies one batch, retrying messages the reply left out or mislabeled.
+
+    Rate-limited requests are retried after the provider's Retry-After and do not
+    count as attempts; other errors and incomplete replies do.
+
+    Args:
+        backend (dict): Backend from `Chatbot.llm_backends`.
+        prompt (str): Prompt from `build_classification_prompt()`.
+        texts (list): Messages of the batch.
+        categories (list): Valid category names.
+        limiter (dict): Limiter from `new_limiter()`.
+        max_attempts (int): Requests per message before giving up on it.
+
+    Returns:
+        tuple: (category per message or None, number of requests sent)
+    """
+    labels = [None] * len(texts)
+    pending = list(range(len(texts)))
+    attempts = requests = 0
+    while pending and attempts < max_attempts:
+        _acquire(limiter)
+        requests += 1
+        try:
+            reply = backend['complete'](batch_messages(prompt, [texts[i] for i in pending]))
+        except Exception as error:
+            retry_after = _retry_after(error)
+            _release(limiter, retry_after)
+            if retry_after is None:
+                attempts += 1
+                time.sleep(min(2 ** attempts, 30) * RETRY_DELAY)
+            continue
+        _release(limiter)
+        attempts += 1
+        for position, label in zip(pending, parse_labels(reply['content'], len(pending), categories)):
+            labels[position] = label
+        pending = [position for position in pending if labels[position] is None]
+    return labels, requests
+
+
+def load_checkpoint(path):
+    """
+    Reads the labels finished by earlier runs.
+
+    Args:
+        path (str): Checkpoint written by `classify_messages()`.
+
+    Returns:
+        dict: Message key (int) -> category. A truncated last line is ignored.
+    """
+    labels = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                labels[int(entry['key'])] = entry['category']
+    return labels
+
+
+def classify_messages(texts, backend, categories, checkpoint_path=None, batch_size=BATCH_SIZE,
+                      max_in_flight=MAX_IN_FLIGHT, max_chars=MAX_BATCH_CHARS):
+    """
+    Classifies messages with batched, concurrent LLM requests.
+
+    Args:
+        texts (Iterable[str]): Messages; duplicates are sent once.
+        backend (dict): Backend from `Chatbot.llm_backends`.
+        categories (list): Valid category names.
+        checkpoint_path (Optional[str]): JSONL file of finished labels, read on start
+            and appended to after every batch; None keeps progress in memory only.
+        batch_size (int): Maximum messages per request.
+        max_in_flight (int): Maximum concurrent requests.
+        max_chars (int): Character budget per request.
+
+    Returns:
+        tuple: (category per message, None where no valid label was returned; stats dict
+            with 'messages', 'unique', 'resumed', 'requests', 'throttled', 'unlabeled', 'seconds')
+    """
+    start = time.perf_counter()
+    texts = [str(text) for text in texts]
+    keys = message_keys(texts).tolist()
+    unique = {}
+    for key, text in zip(keys, texts):
+        unique.setdefault(key, text)
+
+    done = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    resumed = sum(key in done for key in unique)
+    pending_keys = [key for key in unique if key not in done]
+    pending_texts = [unique[key] for key in pending_keys]
+
+    prompt = build_classification_prompt(categories)
+    limiter = new_limiter(max_in_flight)
+    requests = 0
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+    if checkpoint and checkpoint.tell():
+        with open(checkpoint_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                checkpoint.write('\n')  # end a line torn by a crash so it stays the only bad one
+    try:
+        with ThreadPoolExecutor(max_in_flight) as pool:
+            futures = {
+                pool.submit(classify_batch, backend, prompt, [pending_texts[i] for i in batch], categories, limiter): batch
+                for batch in pack_batches(pending_texts, batch_size, max_chars)
+            }
+            for future in as_completed(futures):
+                labels, batch_requests = future.result()
+                requests += batch_requests
+                finished = [(pending_keys[i], label) for i, label in zip(futures[future], labels) if label is not None]
+                done.update(finished)
+                if checkpoint:
+                    checkpoint.write(''.join(json.dumps({'key': str(k), 'category': c}) + '\n' for k, c in finished))
+                    checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    return [done.get(key) for key in keys], {
+        'messages': len(texts),
+        'unique': len(unique),
+        'resumed': resumed,
+        'requests': requests,
+        'throttled': limiter['throttled'],
+        'unlabeled': sum(key not in done for key in unique),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def label_dataframe(df, labels, mapping):
+    """
+    Adds 'cluster' and 'category' columns in the layout `mergeCategories.py` produces.
+
+    Args:
+        df (pd.DataFrame): Messages with id_user, timestamp, source and message.
+        labels (list): Category per row from `classify_messages()`.
+        mapping (pd.DataFrame): cluster_category_mapping.csv contents.
+
+    Returns:
+        pd.DataFrame: A copy of `df` with the two columns appended.
+    """
+    clusters = dict(zip(mapping['category'], mapping['cluster']))
+    labeled = df.copy()
+    labeled['cluster'] = pd.array([clusters.get(label) for label in labels], dtype='Int64')
+    labeled['category'] = labels
+    return labeled
+
+
+if __name__ == '__main__':
+    from Chatbot.llm_backends import load_backend_from_env
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV with id_user, timestamp, source and message columns')
+    parser.add_argument('--mapping', default=MAPPING_PATH, help='cluster,category CSV listing the valid categories')
+    parser.add_argument('--output', default='classified_messages.csv')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='messages per request')
+    parser.add_argument('--max-in-flight', type=int, default=MAX_IN_FLIGHT, help='concurrent requests')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    mapping = pd.read_csv(args.mapping)
+    labels, stats = classify_messages(df['message'], load_backend_from_env(), mapping['category'].tolist(),
+                                      args.checkpoint, args.batch_size, args.max_in_flight)
+    label_dataframe(df, labels, mapping).to_csv(args.output, index=False)
+
+    print(f"Labeled {sum(label is not None for label in labels):,} of {stats['messages']:,} messages "
+          f"({stats['unique']:,} unique, {stats['resumed']:,} from the checkpoint) with {stats['requests']:,} requests "
+          f"in {stats['seconds']:.1f}s; rate-limited {stats['throttled']} times")
+    if stats['unlabeled']:
+        print(f"{stats['unlabeled']} unique messages got no valid label; run again to retry them.")
+    print(f"Wrote '{args.output}'")
+    print(pd.Series(labels).value_counts())
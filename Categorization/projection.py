@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+REDUCER_PATH = 'umap_reducer.joblib'
+PROJECTION_PATH = 'umap_projection.npz'
+UMAP_PARAMS = {'n_neighbors': 15, 'min_dist': 0.1, 'metric': 'cosine', 'random_state': 42}
+
+_transform_state = {}
+
+
+def stratified_sample(labels, sample_size, min_per_label=100, random_state=0):
+    """
+    Samples row positions so every label is represented, small ones included.
+
+    Each label gets a share of `sample_size` proportional to its size, but at
+    least `min_per_label` rows (or all of its rows if it has fewer), so rare
+    clusters keep enough points to get their own region in the projection.
+
+    Args:
+        labels (array-like): Label per row, e.g. the cluster or category column.
+        sample_size (int): Approximate number of rows to return.
+        min_per_label (int): Minimum rows per label.
+        random_state (int): Seed.
+
+    Returns:
+        np.ndarray: Sorted row positions.
+    """
+    codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)[1]
+    counts = np.bincount(codes)
+    if sample_size >= len(codes):
+        return np.arange(len(codes))
+
+    quotas = np.maximum(np.round(counts * sample_size / len(codes)), min_per_label)
+    quotas = np.minimum(quotas, counts).astype(np.int64)
+    rng = np.random.default_rng(random_state)
+    order = np.argsort(codes, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    picked = [rng.choice(order[start:start + count], size=quota, replace=False)
+              for start, count, quota in zip(starts, counts, quotas)]
+    return np.sort(np.concatenate(picked))
+
+
+def reducer_fingerprint(sample_keys, n_components, params=UMAP_PARAMS):
+    """Identifies a reducer by the messages it was fitted on and its parameters."""
+    digest = hashlib.sha1(np.sort(np.asarray(sample_keys, dtype=np.uint64)).tobytes())
+    digest.update(json.dumps({**params, 'n_components': n_components}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def fit_reducer(sample, n_components=2, params=UMAP_PARAMS):
+    """
+    Fits UMAP on a sample of embeddings.
+
+    Args:
+        sample (np.ndarray): float32 array of shape (n, dim).
+        n_components (int): 2 or 3.
+        params (dict): Other `umap.UMAP` arguments.
+
+    Returns:
+        umap.UMAP: The fitted reducer; `reducer.embedding_` holds the sample's coordinates.
+    """
+    import umap
+    return umap.UMAP(n_components=n_components, **params).fit(sample)
+
+
+def save_reducer(reducer, fingerprint, path=REDUCER_PATH):
+    joblib.dump({'fingerprint': fingerprint, 'reducer': reducer}, path)
+
+
+def load_reducer(fingerprint, path=REDUCER_PATH):
+    """
+    Loads a cached reducer.
+
+    Returns:
+        Optional[umap.UMAP]: The reducer, or None when there is none or it was
+            fitted on another sample or with other parameters.
+    """
+    if not os.path.exists(path):
+        return None
+    cached = joblib.load(path)
+    return cached['reducer'] if cached.get('fingerprint') == fingerprint else None
+
+
+def load_projection(fingerprint, path=PROJECTION_PATH):
+    """
+    Loads the coordinates already computed with the reducer identified by `fingerprint`.
+
+    Returns:
+        tuple: (uint64 message keys, float32 coordinates), empty when the cache is
+            missing or belongs to another reducer.
+    """
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            if str(cached['fingerprint']) == fingerprint:
+                return cached['keys'], cached['coords']
+    return np.empty(0, np.uint64), None
+
+
+def save_projection(keys, coords, fingerprint, path=PROJECTION_PATH):
+    """Writes the coordinates of each message key, replacing the previous cache."""
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, fingerprint=fingerprint, keys=np.asarray(keys, np.uint64), coords=coords)
+    os.replace(tmp_path, path)
+
+
+def _source(embeddings):
+    """Describes a memmap by its file so workers can map it instead of receiving a copy."""
+    if isinstance(embeddings, np.memmap) and embeddings.filename:
+        return ('memmap', embeddings.filename, embeddings.dtype.str, embeddings.shape, embeddings.offset)
+    return ('array', embeddings)
+
+
+def _init_transform_worker(reducer, source, threads=None):
+    if source[0] == 'memmap':
+        _, filename, dtype, shape, offset = source
+        embeddings = np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset)
+    else:
+        embeddings = source[1]
+    _transform_state.update(reducer=reducer, embeddings=embeddings)
+    if threads:
+        # One core per worker: keep BLAS and numba from each using every core
+        threadpool_limits(threads)
+        try:
+            import numba
+            numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+        except ImportError:
+            pass
+
+
+def _transform_batch(rows):
+    batch = np.asarray(_transform_state['embeddings'][rows], dtype=np.float32)
+    return np.asarray(_transform_state['reducer'].transform(batch), dtype=np.float32)
+
+
+def transform_rows(reducer, embeddings, rows, batch_size=20_000, workers=None):
+    """
+    Projects embedding rows with a fitted reducer in batches, one batch per worker at a time.
+
+    Workers receive the reducer once and memory-map `embeddings` themselves when it
+    is a memmap (e.g. from `embedding_store.vectors()`), so only row indices and
+    coordinates cross process boundaries.
+
+    Args:
+        reducer: Fitted reducer with a `transform()` method.
+        embeddings (np.ndarray): Array of shape (n, dim); may be a memmap.
+        rows (np.ndarray): Rows of `embeddings` to project.
+        batch_size (int): Rows per `transform()` call.
+        workers (Optional[int]): Worker processes, one per CPU by default; 1 or fewer projects in-process.
+
+    Returns:
+        np.ndarray: float32 coordinates, one row per entry of `rows`.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+    if not batches:
+        return np.empty((0, reducer.n_components), dtype=np.float32)
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    source = _source(embeddings)
+    if workers <= 1 or len(batches) == 1:
+        _init_transform_worker(reducer, source)
+        results = [_transform_batch(batch) for batch in batches]
+    else:
+        workers = min(workers, len(batches))
+        threads = max(1, (os.cpu_count() or workers) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_transform_worker,
+                                 initargs=(reducer, source, threads)) as pool:
+            results = list(pool.map(_transform_batch, batches))
+    _transform_state.clear()
+    return np.vstack(results)
+
+
+def _label_colors(labels):
+    """Maps labels to a categorical palette, cycling when there are more than 20."""
+    import matplotlib
+    names, codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    palette = matplotlib.colormaps['tab20'].colors
+    return names, [palette[i % len(palette)] for i in range(len(names))], codes
+
+
+def plot_png(coords, labels, path, title, show=False):
+    """
+    Draws a 2D or 3D scatter plot colored by label and writes it to `path`.
+
+    Uses the non-interactive Agg backend unless `show` is set, so it runs on
+    machines without a display.
+
+    Args:
+        coords (np.ndarray): Array of shape (n, 2) or (n, 3).
+        labels (array-like): Label per point, e.g. cluster or category.
+        path (str): Image file; the format follows its extension.
+        title (str): Plot title.
+        show (bool): Also open an interactive window.
+    """
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    names, colors, codes = _label_colors(labels)
+    fig = plt.figure(figsize=(12, 9))
+    ax = fig.add_subplot(111, projection='3d' if coords.shape[1] == 3 else None)
+    for code, (name, color) in enumerate(zip(names, colors)):
+        points = coords[codes == code]
+        ax.scatter(*points.T, s=3, alpha=0.6, color=color, label=name)
+    ax.set_title(title)
+    ax.set_xlabel('UMAP-1')
+    ax.set_ylabel('UMAP-2')
+    if coords.shape[1] == 3:
+        ax.set_zlabel('UMAP-3')
+    ax.legend(markerscale=4, fontsize='small', loc='center left', bbox_to_anchor=(1.0, 0.5))
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def plot_html(coords, labels, hover, path, title):
+    """
+    Writes an interactive scatter plot (WebGL for 2D) colored by label.
+
+    Requires plotly.
+
+    Args:
+        coords (np.ndarray): Array of shape (n, 2) or (n, 3).
+        labels (array-like): Label per point.
+        hover (list): Hover text per point, e.g. the message.
+        path (str): HTML file; plotly.js is loaded from its CDN.
+        title (str): Plot title.
+    """
+    import plotly.graph_objects as go
+
+    names, colors, codes = _label_colors(labels)
+    hover = np.asarray(hover, dtype=object)
+    fig = go.Figure()
+    for code, (name, color) in enumerate(zip(names, colors)):
+        mask = codes == code
+        marker = {'size': 3, 'color': 'rgb({}, {}, {})'.format(*(int(c * 255) for c in color))}
+        if coords.shape[1] == 3:
+            fig.add_trace(go.Scatter3d(x=coords[mask, 0], y=coords[mask, 1], z=coords[mask, 2], mode='markers',
+                                       name=name, text=hover[mask], hoverinfo='text+name', marker=marker))
+        else:
+            fig.add_trace(go.Scattergl(x=coords[mask, 0], y=coords[mask, 1], mode='markers',
+                                       name=name, text=hover[mask], hoverinfo='text+name', marker=marker))
+    fig.update_layout(title=title, legend={'itemsizing': 'constant'})
+    fig.write_html(path, include_plotlyjs='cdn')
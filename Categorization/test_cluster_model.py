@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from cluster_model import (
+    DRIFT_DISTANCE_RATIO, DRIFT_OUTLIER_SHARE, SEARCH_BACKENDS, assign_clusters, drift_report, load_cluster_model,
+    partial_fit, save_cluster_model, write_cluster_model,
+)
+
+
+def make_data(n=2_000, k=40, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(k, dim)).astype(np.float32)
+    embeddings = (centroids[rng.integers(0, k, n)] + rng.normal(scale=0.3, size=(n, dim))).astype(np.float32)
+    return embeddings, centroids
+
+
+def brute_force(embeddings, centroids):
+    distances = np.linalg.norm(embeddings[:, None, :] - centroids[None, :, :], axis=2)
+    return distances.argmin(axis=1), distances.min(axis=1)
+
+
+@pytest.mark.parametrize("backend", sorted(SEARCH_BACKENDS))
+def test_backends_match_brute_force(backend):
+    if backend != "numpy":
+        pytest.importorskip(backend)
+    embeddings, centroids = make_data()
+    expected_labels, expected_distances = brute_force(embeddings, centroids)
+
+    labels, distances = assign_clusters(embeddings, centroids, batch_size=300, backend=backend)
+    assert labels.dtype == np.int32 and distances.dtype == np.float32
+    assert (labels == expected_labels).mean() > (0.99 if backend == "hnswlib" else 0.999)
+    assert np.allclose(distances[labels == expected_labels], expected_distances[labels == expected_labels], atol=1e-3)
+
+
+def test_assign_selected_rows_in_their_order():
+    embeddings, centroids = make_data(500)
+    rows = np.array([499, 3, 3, 250, 0])
+    labels, distances = assign_clusters(embeddings, centroids, batch_size=2, rows=rows)
+    expected_labels, expected_distances = brute_force(embeddings[rows], centroids)
+    assert np.array_equal(labels, expected_labels)
+    assert np.allclose(distances, expected_distances, atol=1e-4)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    embeddings, centroids = make_data(1_000)
+    labels, distances = assign_clusters(embeddings, centroids)
+    path = str(tmp_path / "model.npz")
+    save_cluster_model(centroids.astype(np.float64), labels, distances, path)
+
+    model = load_cluster_model(path)
+    assert model["centroids"].dtype == np.float32 and np.array_equal(model["centroids"], centroids)
+    assert np.array_equal(model["counts"], np.bincount(labels, minlength=len(centroids)))
+    assert model["distance_mean"] == pytest.approx(distances.mean())
+    assert model["distance_p95"] == pytest.approx(np.percentile(distances, 95))
+
+    model["counts"][0] += 5
+    write_cluster_model(model, path)
+    assert load_cluster_model(path)["counts"][0] == model["counts"][0]
+
+
+def test_partial_fit_moves_centroids_by_running_mean():
+    centroids = np.array([[0.0, 0.0], [10.0, 10.0], [-5.0, 5.0]], dtype=np.float32)
+    model = {"centroids": centroids.copy(), "counts": np.array([3, 1, 7]), "distance_mean": 1.0, "distance_p95": 2.0}
+    embeddings = np.array([[4.0, 0.0], [12.0, 10.0], [14.0, 10.0]], dtype=np.float32)
+
+    partial_fit(model, embeddings, np.array([0, 1, 1]))
+    # (3 * (0, 0) + (4, 0)) / 4 and (1 * (10, 10) + (12, 10) + (14, 10)) / 3
+    assert np.allclose(model["centroids"], [[1.0, 0.0], [12.0, 10.0], [-5.0, 5.0]])
+    assert model["counts"].tolist() == [4, 3, 7]
+    assert model["centroids"].dtype == np.float32
+
+
+def test_drift_report_thresholds():
+    model = {"distance_mean": 1.0, "distance_p95": 2.0}
+
+    steady = drift_report(model, np.full(100, DRIFT_DISTANCE_RATIO - 0.05))
+    assert steady["outlier_share"] == 0.0 and not steady["refit_recommended"]
+
+    further = drift_report(model, np.full(100, DRIFT_DISTANCE_RATIO + 0.05))
+    assert further["distance_ratio"] == pytest.approx(DRIFT_DISTANCE_RATIO + 0.05)
+    assert further["refit_recommended"]
+
+    # A few far outliers keep the mean down but exceed the share
+    outliers = int(DRIFT_OUTLIER_SHARE * 100) + 1
+    distances = np.concatenate([np.full(outliers, 2.5), np.full(100 - outliers, 0.1)])
+    report = drift_report(model, distances)
+    assert report["distance_ratio"] < DRIFT_DISTANCE_RATIO and report["refit_recommended"]
+    assert report["outlier_share"] == pytest.approx(outliers / 100)
+
+    assert drift_report(model, np.empty(0)) == {"distance_ratio": 1.0, "outlier_share": 0.0, "refit_recommended": False}
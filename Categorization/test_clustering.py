@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import clustering
+from clustering import fit_minibatch_kmeans, k_sweep
+
+
+class RecordingKMeans:
+    """Stands in for MiniBatchKMeans and records what each `partial_fit` call receives."""
+    calls = []
+
+    def __init__(self, n_clusters, **options):
+        self.cluster_centers_ = np.zeros((n_clusters, 2))
+
+    def partial_fit(self, batch, sample_weight=None):
+        RecordingKMeans.calls.append((batch, sample_weight))
+        return self
+
+
+def make_embeddings(n=600, k=3, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=10, size=(k, 8))
+    return (centers[rng.integers(0, k, n)] + rng.normal(size=(n, 8))).astype(np.float32)
+
+
+def test_streamed_batches_keep_rows_and_weights_aligned(monkeypatch):
+    monkeypatch.setattr(clustering, "MiniBatchKMeans", RecordingKMeans)
+    RecordingKMeans.calls = []
+    # Column 0 holds the row number and each row's weight is derived from it
+    embeddings = np.column_stack([np.arange(1_000), np.zeros(1_000)]).astype(np.float32)
+    rows = np.random.default_rng(1).permutation(1_000)[:700]
+    weights = rows * 0.5 + 1
+
+    centroids = fit_minibatch_kmeans(embeddings, 4, rows=rows, batch_size=64, epochs=2, init_size=100,
+                                     sample_weight=weights)
+    assert centroids.shape == (4, 2) and centroids.dtype == np.float32
+
+    init, *batches = RecordingKMeans.calls
+    assert len(init[0]) == 100 and len(batches) == 2 * 11
+    for batch, sample_weight in RecordingKMeans.calls:
+        assert np.array_equal(sample_weight, batch[:, 0] * 0.5 + 1)
+    seen = np.concatenate([batch[:, 0] for batch, _ in batches])
+    assert np.array_equal(np.sort(seen), np.sort(np.tile(rows, 2)))
+
+
+def test_minibatch_kmeans_finds_separated_clusters():
+    embeddings = make_embeddings()
+    centroids = fit_minibatch_kmeans(embeddings, 3, batch_size=128, epochs=2)
+    nearest = ((embeddings[:, None] - centroids[None]) ** 2).sum(axis=2).argmin(axis=1)
+    assert len(np.unique(nearest)) == 3
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_k_sweep_returns_results_in_k_order(workers):
+    results = k_sweep(make_embeddings(), [5, 2, 3], sample_size=400, silhouette_size=200, workers=workers)
+    assert [result["k"] for result in results] == [2, 3, 5]
+    inertias = [result["inertia"] for result in results]
+    assert inertias == sorted(inertias, reverse=True)
+    # The true cluster count separates best
+    assert max(results, key=lambda result: result["silhouette"])["k"] == 3
+
+
+def test_k_sweep_matches_across_worker_counts():
+    embeddings = make_embeddings(seed=2)
+    serial = k_sweep(embeddings, [4, 2], sample_size=300, silhouette_size=150, workers=1)
+    pooled = k_sweep(embeddings, [4, 2], sample_size=300, silhouette_size=150, workers=2)
+    for a, b in zip(serial, pooled):
+        assert a["k"] == b["k"]
+        assert a["inertia"] == pytest.approx(b["inertia"], rel=1e-4)
+        assert a["silhouette"] == pytest.approx(b["silhouette"], rel=1e-4)
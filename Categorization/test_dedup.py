@@ -0,0 +1,53 @@
+import numpy as np
+from clustering import fit_kmeans
+from dedup import deduplicate, normalize_message
+
+
+def test_normalize_message_ignores_quotes_case_digits_and_punctuation():
+    assert normalize_message('"Where is my Deposit of $50?!"') == 'where is my deposit of 0'
+    assert normalize_message("It’s   ticket #1234") == normalize_message("it's ticket #98")
+    assert normalize_message("?") != normalize_message("!!")
+
+
+def test_exact_and_templated_duplicates_share_a_group():
+    texts = (["hi"] * 3 + ['"Hi"', "no"]
+             + [f"Your withdrawal request #{i} has been approved, {name}" for i, name in
+                enumerate(["John", "Maria", "Anna", "Li"])]
+             + ["my game keeps crashing after the last update"])
+
+    result = deduplicate(texts)
+    group = result["group"]
+
+    assert group[0] == group[1] == group[2] == group[3]
+    assert group[4] != group[0]
+    assert len(set(group[5:9])) == 1
+    assert group[9] != group[5]
+    assert result["sizes"].sum() == len(texts)
+    assert result["sizes"][group[0]] == 4
+    # The representative is a row of its own group, and the most common variant
+    assert texts[result["representatives"][group[0]]] == "hi"
+    assert (group[result["representatives"]] == np.arange(len(result["sizes"]))).all()
+    assert result["stats"] == {"rows": 10, "unique": 8, "normalized": 7, "groups": 4, "ratio": 2.5}
+
+
+def test_short_and_distinct_messages_are_not_merged():
+    texts = ["deposit", "withdraw", "yes", "yes!", "I cannot log in to my account since yesterday",
+             "I cannot withdraw money from my account since yesterday"]
+
+    result = deduplicate(texts)
+
+    assert result["stats"]["groups"] == 5
+    assert deduplicate(texts, near_threshold=2)["stats"]["groups"] == 5
+
+
+def test_weighted_fit_matches_fit_on_all_rows():
+    rng = np.random.default_rng(0)
+    unique = np.vstack([rng.normal(loc, 0.05, size=(20, 4)) for loc in (-1, 1)]).astype(np.float32)
+    sizes = rng.integers(1, 5, len(unique))
+    expanded = np.repeat(unique, sizes, axis=0)
+
+    weighted = fit_kmeans(unique, 2, sample_weight=sizes)
+    full = fit_kmeans(expanded, 2)
+
+    order = lambda c: c[np.argsort(c[:, 0])]
+    assert np.allclose(order(weighted), order(full), atol=1e-4)
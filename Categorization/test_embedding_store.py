@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import embedding_store
+from embedding_store import append, embed_csv, embed_texts, lookup, message_keys, open_store, vectors, vectors_for_keys
+
+
+class StubModel:
+    """Stands in for the sentence-transformers model: a fixed vector per text, with every call recorded."""
+
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, **options):
+        self.calls.append(list(texts))
+        return np.stack([self.vector(text) for text in texts])
+
+    def vector(self, text):
+        seed = int(message_keys([text])[0] % 2**32)
+        return np.random.default_rng(seed).normal(size=self.dim).astype(np.float32)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = StubModel()
+    monkeypatch.setattr(embedding_store, "_worker_model", model)
+    return model
+
+
+def test_open_store_ignores_and_overwrites_uncommitted_rows(tmp_path, model):
+    store_dir = str(tmp_path / "store")
+    store = open_store(store_dir)
+    append(store, message_keys(["a", "b", "c"]), model.encode(["a", "b", "c"]))
+
+    # An interrupted run wrote rows but never committed the count
+    for name, data in (("keys.bin", message_keys(["lost"])), ("vectors.bin", model.encode(["lost"]))):
+        with open(os.path.join(store_dir, name), "ab") as f:
+            f.write(data.tobytes())
+
+    resumed = open_store(store_dir)
+    assert resumed["count"] == 3 and resumed["dim"] == 4
+    assert lookup(resumed, message_keys(["lost", "b"])).tolist() == [-1, 1]
+
+    append(resumed, message_keys(["d"]), model.encode(["d"]))
+    assert os.path.getsize(os.path.join(store_dir, "keys.bin")) == 4 * 8
+    assert np.array_equal(vectors(open_store(store_dir))[3], model.vector("d"))
+
+    with pytest.raises(ValueError, match="holds 'all-MiniLM-L6-v2' embeddings"):
+        open_store(store_dir, model_name="other-model")
+
+
+def test_lookup_and_embed_texts_store_each_message_once(tmp_path, model):
+    store = open_store(str(tmp_path), dtype="float16")
+    assert lookup(store, message_keys(["a"])).tolist() == [-1]
+
+    keys, encoded = embed_texts(store, ["a", "b", "a", "c", "b"])
+    assert encoded == 3 and model.calls == [["a", "b", "c"]]
+    assert lookup(store, keys).tolist() == [0, 1, 0, 2, 1]
+
+    keys, encoded = embed_texts(store, ["c", "d", "a"])
+    assert encoded == 1 and model.calls[-1] == ["d"]
+    assert lookup(store, keys).tolist() == [2, 3, 0]
+
+    found = vectors_for_keys(store, keys)
+    assert found.dtype == np.float32
+    assert np.allclose(found[1], model.vector("d"), atol=1e-2)
+    with pytest.raises(KeyError):
+        vectors_for_keys(store, message_keys(["never embedded"]))
+
+
+def test_embed_csv_encodes_only_new_rows(tmp_path, model):
+    csv_path = tmp_path / "messages.csv"
+    store_dir = str(tmp_path / "store")
+    pd.DataFrame({"message": ["hi", "refund", "hi", "bonus"]}).to_csv(csv_path, index=False)
+
+    store, keys = embed_csv(str(csv_path), store_dir, chunk_size=2, workers=1)
+    assert store["count"] == 3 and len(keys) == 4
+    assert sorted(sum(model.calls, [])) == ["bonus", "hi", "refund"]
+
+    pd.DataFrame({"message": ["bonus", "login", "hi", "login"]}).to_csv(csv_path, mode="a", header=False, index=False)
+    model.calls.clear()
+    store, keys = embed_csv(str(csv_path), store_dir, chunk_size=3, workers=1)
+    assert model.calls == [["login"]]
+    assert store["count"] == 4
+    assert np.array_equal(keys, message_keys(["hi", "refund", "hi", "bonus", "bonus", "login", "hi", "login"]))
+    assert np.array_equal(vectors_for_keys(store, keys[5:6])[0], model.vector("login"))
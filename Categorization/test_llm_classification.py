@@ -0,0 +1,107 @@
+import json
+import re
+import threading
+import openai
+import pandas as pd
+import llm_classification
+from llm_classification import (
+    classify_messages, label_dataframe, load_checkpoint, pack_batches, parse_labels,
+)
+from Chatbot.llm_backends import make_openai_backend
+from Chatbot.stub_llm_server import start_stub_server
+
+CATEGORIES = ["deposit issues", "game issues", "not actionable"]
+MAPPING = pd.DataFrame({"cluster": [5, 6, 3], "category": CATEGORIES})
+
+
+def keyword_backend(fail_on=None, drop_first=False):
+    """Labels numbered messages by keyword; optionally fails or leaves one out of the reply."""
+    calls = []
+    lock = threading.Lock()
+
+    def complete(messages):
+        lines = messages[-1]["content"].splitlines()
+        with lock:
+            calls.append(lines)
+        if fail_on and any(fail_on in line for line in lines):
+            raise RuntimeError("backend unavailable")
+        labels = {}
+        for line in lines:
+            number, text = re.match(r"(\d+)\. (.*)", line).groups()
+            labels[number] = ("DEPOSIT ISSUES" if "deposit" in text else
+                              "game issues" if "game" in text else "not actionable")
+        if drop_first and len(calls) == 1:
+            labels.pop("1")
+        return {"content": f"Here you go: {json.dumps(labels)}", "usage": None}
+
+    return {"name": "keywords", "client": None, "complete": complete}, calls
+
+
+def messages(n):
+    kinds = ["my deposit is missing", "game keeps crashing", "hello"]
+    return [f"{kinds[i % 20 % 3]} #{i % 20}" for i in range(n)]
+
+
+def test_pack_batches_respects_count_and_size():
+    texts = ["a" * 10] * 7 + ["b" * 400]
+
+    assert pack_batches(texts, batch_size=3, max_chars=10_000) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert pack_batches(texts, batch_size=50, max_chars=100) == [[0, 1, 2, 3, 4], [5, 6], [7]]
+
+
+def test_parse_labels_keeps_only_valid_categories():
+    content = 'Sure! {"1": "Game Issues", "2": "unknown", "4": "deposit issues", "x": "game issues"}'
+
+    assert parse_labels(content, 3, CATEGORIES) == ["game issues", None, None]
+    assert parse_labels("no json here", 2, CATEGORIES) == [None, None]
+    assert parse_labels('{"1": "game issues"', 1, CATEGORIES) == [None]
+
+
+def test_duplicates_are_classified_once_and_schema_matches_merge():
+    backend, calls = keyword_backend(drop_first=True)
+    texts = messages(120)
+
+    labels, stats = classify_messages(texts, backend, CATEGORIES, batch_size=25, max_in_flight=4)
+
+    assert stats["unique"] == 20 and stats["unlabeled"] == 0
+    assert sum(len(lines) for lines in calls) == 21  # 20 unique messages plus one retried
+    assert labels[:3] == ["deposit issues", "game issues", "not actionable"]
+
+    df = pd.DataFrame({"id_user": range(120), "timestamp": "11/1/2024", "source": "livechat", "message": texts})
+    labeled = label_dataframe(df, labels, MAPPING)
+    assert list(labeled.columns) == ["id_user", "timestamp", "source", "message", "cluster", "category"]
+    assert labeled["cluster"].tolist()[:3] == [5, 6, 3]
+
+
+def test_checkpoint_resumes_unfinished_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_classification, "RETRY_DELAY", 0)
+    checkpoint = str(tmp_path / "labels.jsonl")
+    texts = messages(60)
+    failing, _ = keyword_backend(fail_on="game")
+
+    labels, stats = classify_messages(texts, failing, CATEGORIES, checkpoint, batch_size=1, max_in_flight=2)
+    assert stats["unlabeled"] == 7 and labels[1] is None
+    assert len(load_checkpoint(checkpoint)) == 13
+
+    with open(checkpoint, "a") as f:
+        f.write('{"key": "12')  # torn write from a crash
+    backend, calls = keyword_backend()
+    labels, stats = classify_messages(texts, backend, CATEGORIES, checkpoint, batch_size=1, max_in_flight=2)
+
+    assert stats["resumed"] == 13 and stats["unlabeled"] == 0
+    assert len(calls) == 7 and all("game" in lines[0] for lines in calls)
+    assert labels[1] == "game issues"
+
+
+def test_stub_rate_limit_is_backed_off(tmp_path):
+    backend, _ = keyword_backend()
+    stub = start_stub_server(backend, delay=0.02, max_in_flight=2)
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{stub.server_port}/v1", max_retries=0)
+        labels, stats = classify_messages(messages(200) + [f"game {i}" for i in range(200)],
+                                          make_openai_backend(client), CATEGORIES, batch_size=10, max_in_flight=6)
+    finally:
+        stub.shutdown()
+
+    assert stats["unlabeled"] == 0 and None not in labels
+    assert stats["throttled"] > 0
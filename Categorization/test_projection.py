@@ -0,0 +1,58 @@
+import numpy as np
+from projection import (
+    load_projection, load_reducer, reducer_fingerprint, save_projection, save_reducer, stratified_sample,
+    transform_rows,
+)
+
+
+class LinearReducer:
+    """Stands in for a fitted UMAP: projects onto fixed random directions."""
+    n_components = 2
+
+    def __init__(self, dim):
+        self.weights = np.random.default_rng(0).normal(size=(dim, 2)).astype(np.float32)
+
+    def transform(self, batch):
+        return batch @ self.weights
+
+
+def test_stratified_sample_keeps_small_labels():
+    labels = np.array(["big"] * 9_000 + ["medium"] * 950 + ["tiny"] * 50)
+
+    sample = stratified_sample(labels, 1_000, min_per_label=100)
+    counts = {label: int((labels[sample] == label).sum()) for label in ("big", "medium", "tiny")}
+
+    assert counts == {"big": 900, "medium": 100, "tiny": 50}
+    assert (np.diff(sample) > 0).all()
+    assert len(stratified_sample(labels, 20_000)) == len(labels)
+
+
+def test_parallel_transform_matches_in_process(tmp_path):
+    data = np.random.default_rng(1).normal(size=(1_000, 8)).astype(np.float32)
+    data.tofile(tmp_path / "vectors.bin")
+    embeddings = np.memmap(tmp_path / "vectors.bin", dtype=np.float32, mode="r", shape=data.shape)
+    reducer = LinearReducer(8)
+    rows = np.arange(0, 1_000, 3)
+
+    serial = transform_rows(reducer, embeddings, rows, batch_size=100, workers=1)
+    parallel = transform_rows(reducer, embeddings, rows, batch_size=100, workers=2)
+
+    assert np.allclose(serial, data[rows] @ reducer.weights, atol=1e-5)
+    assert np.array_equal(serial, parallel)
+
+
+def test_caches_are_tied_to_sample_and_parameters(tmp_path):
+    keys = np.arange(10, dtype=np.uint64)
+    fingerprint = reducer_fingerprint(keys, 2)
+    reducer_path, projection_path = str(tmp_path / "reducer.joblib"), str(tmp_path / "projection.npz")
+
+    assert load_reducer(fingerprint, reducer_path) is None
+    save_reducer(LinearReducer(4), fingerprint, reducer_path)
+    save_projection(keys, np.ones((10, 2), np.float32), fingerprint, projection_path)
+
+    assert isinstance(load_reducer(reducer_fingerprint(keys[::-1], 2), reducer_path), LinearReducer)
+    assert load_reducer(reducer_fingerprint(keys, 3), reducer_path) is None
+    assert load_reducer(reducer_fingerprint(keys[1:], 2), reducer_path) is None
+    cached_keys, coords = load_projection(fingerprint, projection_path)
+    assert np.array_equal(cached_keys, keys) and coords.shape == (10, 2)
+    assert load_projection(reducer_fingerprint(keys, 3), projection_path)[1] is None
@@ -1,29 +1,104 @@
+"""
+Projects the message embeddings with UMAP and writes a PNG (and HTML) colored by cluster or category.
+
+Usage:
+    python Categorization/visualize_UMAP.py                                  # umap.png, colored by category
+    python Categorization/visualize_UMAP.py --color-by cluster --format png html
+    python Categorization/visualize_UMAP.py --components 3 --show             # interactive 3D window
+
+UMAP is fitted on a stratified sample (every cluster or category represented)
+and the remaining messages are projected with `transform` in parallel batches.
+Embeddings come from the store written by KMeans_category_clustering.py; only
+messages missing from it are encoded. The fitted reducer and every message's
+coordinates are cached, so re-runs with the same sample only project new messages.
+HTML output needs plotly.
+"""
+import argparse
+import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import umap
-from sentence_transformers import SentenceTransformer
+from embedding_store import embed_texts, lookup, message_keys, open_store, vectors
+from projection import (
+    PROJECTION_PATH, REDUCER_PATH, fit_reducer, load_projection, load_reducer, plot_html, plot_png,
+    reducer_fingerprint, save_projection, save_reducer, stratified_sample, transform_rows,
+)
+
+DATA_PATH = 'merged_messages_with_categories.csv'
+EMBEDDING_STORE = 'embeddings'
+WORKERS = os.cpu_count() or 1
+
 
-# Load data
-df = pd.read_csv('LLM-DataScientist-Task_Data.csv')
-messages = df['message'].tolist()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DATA_PATH, help='CSV with a message column and cluster/category columns')
+    parser.add_argument('--color-by', choices=['category', 'cluster'], default='category')
+    parser.add_argument('--components', type=int, choices=[2, 3], default=2)
+    parser.add_argument('--sample-size', type=int, default=20_000, help='messages UMAP is fitted on')
+    parser.add_argument('--min-per-label', type=int, default=200, help='minimum sampled messages per cluster/category')
+    parser.add_argument('--plot-points', type=int, default=100_000, help='messages drawn (stratified as above)')
+    parser.add_argument('--batch-size', type=int, default=20_000, help='messages per transform call')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes projecting batches')
+    parser.add_argument('--format', nargs='+', choices=['png', 'html'], default=['png'])
+    parser.add_argument('--output', default='umap', help='output path without extension')
+    parser.add_argument('--refit', action='store_true', help='ignore the cached reducer')
+    parser.add_argument('--show', action='store_true', help='also open an interactive window')
+    args = parser.parse_args()
 
-# Get embeddings
-model = SentenceTransformer('all-MiniLM-L6-v2')
-embeddings = model.encode(messages, show_progress_bar=True)
+    df = pd.read_csv(args.input)
+    if args.color_by not in df.columns:
+        parser.error(f"'{args.input}' has no '{args.color_by}' column")
+    texts = df['message'].astype(str).tolist()
+    labels = df[args.color_by].astype(str).to_numpy()
 
-# Reduce dimensions to 2D
-reducer = umap.UMAP(n_components=3,n_neighbors=15, min_dist=0.1, metric='cosine', random_state=42)
-embedding_3d = reducer.fit_transform(embeddings)
+    # Reuse the stored embeddings; only encode messages the store has not seen
+    store = open_store(EMBEDDING_STORE)
+    keys = message_keys(texts)
+    missing = lookup(store, keys) < 0
+    if missing.any():
+        _, encoded = embed_texts(store, [texts[i] for i in np.flatnonzero(missing)], keys[missing])
+        print(f"Embeddings: {encoded} messages were missing from '{EMBEDDING_STORE}' and have been encoded")
+    embeddings = vectors(store)
+    rows = lookup(store, keys)
 
-# Plot
+    sample = stratified_sample(labels, args.sample_size, args.min_per_label)
+    fingerprint = reducer_fingerprint(keys[sample], args.components)
+    reducer = None if args.refit else load_reducer(fingerprint, REDUCER_PATH)
+    if reducer is None:
+        print(f"Fitting UMAP on {len(sample):,} of {len(df):,} messages")
+        reducer = fit_reducer(np.asarray(embeddings[rows[sample]], dtype=np.float32), args.components)
+        save_reducer(reducer, fingerprint, REDUCER_PATH)
+        # The sample's coordinates come with the fit; keep one per distinct message
+        cached_keys, distinct = np.unique(keys[sample], return_index=True)
+        cached_coords = np.asarray(reducer.embedding_, dtype=np.float32)[distinct]
+    else:
+        cached_keys, cached_coords = load_projection(fingerprint, PROJECTION_PATH)
+        print(f"Reusing the UMAP reducer in '{REDUCER_PATH}' ({len(cached_keys):,} messages already projected)")
 
-fig = plt.figure(figsize=(10, 8))
-ax = fig.add_subplot(111, projection='3d')
+    # Project each distinct message without coordinates yet
+    unique_keys, first = np.unique(keys, return_index=True)
+    new = ~np.isin(unique_keys, cached_keys)
+    if new.any():
+        print(f"Projecting {int(new.sum()):,} messages in batches of {args.batch_size:,} on {args.workers} workers")
+        new_coords = transform_rows(reducer, embeddings, rows[first[new]], args.batch_size, args.workers)
+        all_keys = np.concatenate([cached_keys, unique_keys[new]])
+        all_coords = new_coords if cached_coords is None else np.vstack([cached_coords, new_coords])
+        save_projection(all_keys, all_coords, fingerprint, PROJECTION_PATH)
+    else:
+        all_keys, all_coords = cached_keys, cached_coords
 
-ax.scatter(embedding_3d[:, 0], embedding_3d[:, 1], embedding_3d[:, 2], s=5, alpha=0.7)
+    order = np.argsort(all_keys)
+    coords = all_coords[order][np.searchsorted(all_keys[order], keys)]
 
-ax.set_title('3D UMAP Projection of Message Embeddings')
-ax.set_xlabel('UMAP-1')
-ax.set_ylabel('UMAP-2')
-ax.set_zlabel('UMAP-3')
-plt.show()
+    plotted = stratified_sample(labels, args.plot_points, args.min_per_label, random_state=1)
+    title = f'{args.components}D UMAP projection of {len(df):,} messages by {args.color_by}'
+    if len(plotted) < len(df):
+        title += f' ({len(plotted):,} shown)'
+    if 'png' in args.format:
+        plot_png(coords[plotted], labels[plotted], f'{args.output}.png', title, show=args.show)
+        print(f"Wrote {args.output}.png")
+    if 'html' in args.format:
+        try:
+            plot_html(coords[plotted], labels[plotted], [texts[i] for i in plotted], f'{args.output}.html', title)
+            print(f"Wrote {args.output}.html")
+        except ImportError:
+            print("HTML output needs plotly: pip install plotly")
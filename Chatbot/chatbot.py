@@ -1,14 +1,32 @@
-import openai
-import pandas as pd
-import json
-import re
+import argparse
+import cProfile
+import pstats
 import os
+import time
 from dotenv import load_dotenv
 from datetime import datetime
-import dateparser
-from Chatbot.stats import describe_filtered_data
+from Chatbot.daily_counts import build_daily_counts
+from Chatbot.data_cache import cached_source_hash, load_messages
+from Chatbot.fast_path import build_fast_path, extract_filters_with_fallback, fast_path_report, new_fast_path_stats
+from Chatbot.ingest import ingest_report, ingest_spool, load_categorizer, new_ingest_stats, open_spool
+from Chatbot.llm_backends import load_backend_from_env
+from Chatbot.llm_cache import cache_get, cache_put, cache_stats, open_response_cache, response_cache_key
+from Chatbot.prompt import build_prompt, llm_report, new_llm_stats, parse_filter_reply, prompt_messages, record_llm_request
+from Chatbot.results import export_results, fetch_page, new_cursor, update_cursor
+from Chatbot.rollup import ROLLUP_MIN_ROWS, build_rollup, rollup_day_counts
+from Chatbot.semantic_index import INDEX_DIR, load_semantic_index, search
+from Chatbot.sharded_stats import SHARD_MIN_ROWS, start_summary_pool
+from Chatbot.stats import PREVIEW_COLUMNS, describe_filtered_data, summarize_filtered_data, summarize_with_rollup
+from Chatbot.store import build_message_store, category_breakdown, category_counts, select_rows, top_users
+from Chatbot.time_resolution import resolve_time_expr
+from Chatbot.turn_metrics import configure_turn_log, format_metrics_report, metrics_report, new_turn_metrics, span, start_turn
 
 DATA_PATH = "merged_messages_with_categories.csv"
+DATA_CACHE_DIR = ".message_cache"
+LLM_CACHE_PATH = ".llm_cache.sqlite"
+SEMANTIC_INDEX_DIR = INDEX_DIR
+TOP_USERS = 10
+MAX_TOP_USERS = 100
 
 
 def setup_environment():
@@ -16,142 +34,337 @@ def setup_environment():
     Loads environment variables and data, parses timestamps, 
     and prepares LLM client and available filter metadata.
 
+    The data is read through the binary cache in `DATA_CACHE_DIR`, which is
+    rebuilt automatically when `DATA_PATH` changes. The LLM backend is chosen by
+    `load_backend_from_env()`, and parsed replies are cached in `CHATBOT_LLM_CACHE`
+    (defaults to `LLM_CACHE_PATH`; set it to an empty string to disable caching).
+    Semantic search is enabled when `python -m Chatbot.semantic_index` has built an
+    index for the current data in `CHATBOT_SEMANTIC_INDEX` (defaults to `SEMANTIC_INDEX_DIR`).
+    When `CHATBOT_SPOOL` names a JSONL or CSV file, messages appended to it are
+    ingested before each turn (see `Chatbot.ingest`). Unique users are counted
+    exactly, using `CHATBOT_SUMMARY_WORKERS` (defaults to the CPU count) processes
+    for results of at least `SHARD_MIN_ROWS` rows; set `CHATBOT_ESTIMATE_USERS=1` to
+    summarize large results from the rollup with an estimated count instead. Every turn is
+    timed stage by stage (see `Chatbot.turn_metrics`); set `CHATBOT_METRICS_LOG` to a
+    file, or '-' for stderr, to also get one JSON log line per turn.
+
     Returns:
         dict: A dictionary containing:
-            - 'client': OpenAI client instance
-            - 'df': Loaded and parsed DataFrame
+            - 'client': OpenAI client instance, or None for offline backends
+            - 'llm': Filter-extraction backend from `Chatbot.llm_backends`
+            - 'llm_cache': Response cache from `Chatbot.llm_cache`, or None
+            - 'df': Loaded and parsed DataFrame, sorted by timestamp
+            - 'store': Pre-indexed message store built from 'df'
+            - 'daily_counts': Source × category × day counts used for spike baselines
+            - 'rollup': Hourly counts and daily user sketches from `Chatbot.rollup`, or None
+              without 'estimate_users' and for datasets smaller than `ROLLUP_MIN_ROWS`
+            - 'estimate_users': Whether large results get an estimated unique-user count
             - 'current_time': Max timestamp in the data
             - 'categories': List of unique categories
             - 'sources': List of unique sources
+            - 'fast_path': Local filter extractor compiled for those categories and sources
+            - 'fast_path_stats': Fast-path hit and latency counters
+            - 'prompt': Filter-extraction prompt from `Chatbot.prompt.build_prompt()`
+            - 'llm_stats': Per-request LLM token and latency counters
+            - 'turn_metrics': Per-stage timing and memory counters from `Chatbot.turn_metrics`
+            - 'semantic_index': Vector index from `Chatbot.semantic_index`, or None
+            - 'spool': Tailer from `Chatbot.ingest.open_spool()` (only with `CHATBOT_SPOOL`)
+            - 'categorize': Labels spooled messages without a category, or None
+            - 'ingest_stats': Ingestion throughput and lag counters
+            - 'summary_pool': Workers from `Chatbot.sharded_stats`, or None
     """
     load_dotenv()
+    if os.getenv("CHATBOT_METRICS_LOG"):
+        configure_turn_log(os.getenv("CHATBOT_METRICS_LOG"))
 
-    df = pd.read_csv(DATA_PATH)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = load_messages(DATA_PATH, DATA_CACHE_DIR)
 
-    current_time = df['timestamp'].max()
+    llm = load_backend_from_env()
+    cache_path = os.getenv("CHATBOT_LLM_CACHE", LLM_CACHE_PATH)
+    llm_cache = open_response_cache(cache_path) if cache_path else None
+
+    index_dir = os.getenv("CHATBOT_SEMANTIC_INDEX", SEMANTIC_INDEX_DIR)
+    semantic_index = load_semantic_index(index_dir, cached_source_hash(DATA_CACHE_DIR)) if index_dir else None
+    if semantic_index is None and index_dir and os.path.isdir(index_dir):
+        print(f"Semantic index in '{index_dir}' is out of date; rebuild it with `python -m Chatbot.semantic_index`.")
+
+    estimate_users = os.getenv("CHATBOT_ESTIMATE_USERS", "") not in ("", "0")
+    env = build_environment(df, llm, llm_cache, semantic_index, estimate_users)
+
+    workers = int(os.getenv("CHATBOT_SUMMARY_WORKERS") or os.cpu_count() or 1)
+    if not estimate_users and workers > 1 and len(df) >= SHARD_MIN_ROWS:
+        env["summary_pool"] = start_summary_pool(df, workers)
+
+    spool_path = os.getenv("CHATBOT_SPOOL")
+    if spool_path:
+        env["spool"] = open_spool(spool_path)
+        env["categorize"] = load_categorizer()
+        env["ingest_stats"] = new_ingest_stats()
+    return env
+
+def build_environment(df, llm, llm_cache=None, semantic_index=None, estimate_users=False):
+    """
+    Prepares the filter metadata and indexes for an already loaded dataset.
+
+    Args:
+        df (pd.DataFrame): Messages sorted by timestamp.
+        llm (dict): Filter-extraction backend from `Chatbot.llm_backends`.
+        llm_cache (Optional[dict]): Response cache from `Chatbot.llm_cache`.
+        semantic_index (Optional[dict]): Index from `Chatbot.semantic_index` built for `df`.
+        estimate_users (bool): Build the rollup so large results are summarized with an
+            estimated unique-user count instead of an exact one.
+
+    Returns:
+        dict: The environment dictionary described in `setup_environment()`.
+    """
+    store = build_message_store(df)
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = openai.OpenAI(api_key=api_key)
+    current_time = df['timestamp'].max()
 
     categories = df['category'].dropna().unique().tolist()
     sources = df['source'].dropna().unique().tolist()
 
     return {
-        "client": client,
+        "client": llm["client"],
+        "llm": llm,
+        "llm_cache": llm_cache,
         "df": df,
+        "store": store,
+        "daily_counts": build_daily_counts(store),
+        "rollup": build_rollup(store, df['id_user']) if estimate_users and len(df) >= ROLLUP_MIN_ROWS else None,
+        "estimate_users": estimate_users,
         "current_time": current_time,
         "categories": categories,
-        "sources": sources
+        "sources": sources,
+        "fast_path": build_fast_path(categories, sources),
+        "fast_path_stats": new_fast_path_stats(),
+        "prompt": build_prompt(categories, sources, semantic_index is not None, category_counts(store)),
+        "llm_stats": new_llm_stats(),
+        "turn_metrics": new_turn_metrics(),
+        "semantic_index": semantic_index,
+        "summary_pool": None,
     }
 
-def build_system_prompt(env):
+def query_LLM_for_filters(user_query, env, current_filter=None):
     """
-    Constructs the full system prompt to guide the LLM in parsing filter instructions.
+    Sends a user query to the LLM and extracts structured filter instructions.
+
+    The messages come from `Chatbot.prompt.prompt_messages()`: a static prefix built
+    once per vocabulary, then the date, the current filters and (for large
+    vocabularies) the categories relevant to this query. The reply is the change to
+    the current filters, for `update_filter_context()`. Backends that support
+    structured output (`env['llm']['structured']`) are sent the reply's JSON schema,
+    so the reply parses on the first call. Token usage, latency and parse failures
+    are recorded in `env['llm_stats']`. Successfully parsed replies are stored in
+    `env['llm_cache']` (when present), so repeating a query against the same data
+    and filters skips the LLM round trip.
 
     Args:
-        env (dict): Environment dictionary from `setup_environment()`
+        user_query (str): Natural language input from the user.
+        env (dict): Environment dictionary containing the LLM backend and metadata.
+        current_filter (Optional[dict]): The conversation's filter context.
 
     Returns:
-        str: Prompt for the system role in the LLM chat API.
-    """
-    return (
-        "You are a data assistant extracting structured filters from user queries about categorized customer support messages.\n\n"
-        f"Valid categories (exact match only): {env['categories']}\n"
-        f"Valid sources: {env['sources']}\n"
-        f"The current datetime is {env['current_time'].isoformat()}.\n\n"
-        "Return a strict JSON object with these keys:\n"
-        "{\n"
-        "  \"category\": (exact string from valid categories, or null),\n"
-        "  \"source\": (exact string from valid sources, or null),\n"
-        "  \"start_time_expr\": (human-readable date expression or null),\n"
-        "  \"end_time_expr\": (human-readable date expression or null),\n"
-        "  \"reset\": (true if this is a new query and filters should be cleared, otherwise false)\n"
-        "}\n\n"
-        "Time filtering rules:\n"
-        "- Use expressions like \"1 day ago\", \"Monday\", or \"today\".\n"
-        "- Avoid vague terms like \"past week\".\n\n"
-        "Do not use phrases like this Monday. Instead use absolute or relative phrases like Monday, 7 days ago, or today.\n"
-        "If the user does not specify an end time, set \"end_time_expr\": \"now\".\n"
-        "Avoid paraphrasing expressions like \"this week\" into \"7 days ago\". Instead, use \"Monday\" to represent the start of the current week.\n"
-        "If the user says something like \"start a new search\", \"new query\", \"start over\", or \"fresh search\", then:\n"
-        "- Set all filter fields (category, source, time) explicitly\n"
-        "- Set \"reset\": true\n\n"
-        "If the user is refining the current query, using phrases like:\n"
-        "\"make that\", \"change to\", \"now show\", \"just update\", \"let’s look at\", \"actually\", \"how about\", \"switch to\", \"only\", or \"instead\",\n"
-        "- Only update the fields mentioned\n"
-        "- Leave others as null\n"
-        "- Set \"reset\": false\n\n"
-        "Use \"reset\": false by default unless the user explicitly indicates a reset.\n"
-        "Return ONLY the raw JSON object — no commentary.\n"
-)
-
-def query_LLM_for_filters(user_query, env):
+        Optional[dict]: A dictionary with filter fields and a reset flag, or None if parsing fails.
     """
-    Sends a user query to the LLM and extracts structured filter instructions.
+    messages = prompt_messages(env['prompt'], user_query, env['current_time'], current_filter)
+
+    cache = env.get('llm_cache')
+    if cache is not None:
+        with span("llm_cache"):
+            prompt = "\n".join(m["content"] for m in messages[:-1])
+            cache_key = response_cache_key(user_query, prompt, env['llm']['name'])
+            cached = cache_get(cache, cache_key)
+        if cached is not None:
+            return cached
+
+    structured = bool(env['llm'].get('structured'))
+    options = {'response_format': env['prompt']['response_format']} if structured else {}
+    start = time.perf_counter()
+    with span("llm"):
+        response = env['llm']['complete'](messages, **options)
+
+    with span("llm_parse"):
+        filters = parse_filter_reply(response['content'], env['prompt'])
+
+    stats = env.get('llm_stats')
+    if stats is not None:
+        record_llm_request(stats, messages, response, time.perf_counter() - start, structured, filters is not None)
+
+    if filters is not None and cache is not None:
+        cache_put(cache, cache_key, filters)
+    return filters
+
+
+def extract_filters(user_query, env, current_filter=None):
+    """
+    Extracts filters for a user query, resolving simple queries locally and
+    falling back to `query_LLM_for_filters()` when the local match is not confident.
 
     Args:
         user_query (str): Natural language input from the user.
-        env (dict): Environment dictionary containing the LLM client and metadata.
+        env (dict): Environment dictionary from `setup_environment()`.
+        current_filter (Optional[dict]): The conversation's filter context, sent to the LLM.
 
     Returns:
         Optional[dict]: A dictionary with filter fields and a reset flag, or None if parsing fails.
     """
-    prompt = build_system_prompt(env)
-    
-    response = env['client'].chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": user_query}
-        ]
+    return extract_filters_with_fallback(
+        user_query,
+        env['fast_path'],
+        env['fast_path_stats'],
+        lambda query: query_LLM_for_filters(query, env, current_filter),
     )
-    
-    reply_content = response.choices[0].message.content.strip()
-    
-    matches = re.findall(r'\{[\s\S]*?\}', reply_content)
-    if matches:
-        try:
-            return json.loads(matches[-1])
-        except json.JSONDecodeError:
-            return None
-    return None
 
 
-def apply_filters(df, filters, current_time):
+def apply_filters(df, filters, current_time, store=None, semantic_index=None):
     """
     Applies category, source, and time-based filters to the message DataFrame.
 
     Args:
         df (pd.DataFrame): The full message dataset.
-        filters (dict): Dictionary with 'category', 'source', 'start_time_expr', 'end_time_expr'.
+        filters (dict): Dictionary with 'category', 'source', 'start_time_expr', 'end_time_expr'
+            and optionally 'semantic_query'.
         current_time (datetime): Reference time for relative date parsing.
+        store (Optional[dict]): Pre-built index from `build_message_store(df)`.
+            Built on the fly when omitted, so long-lived callers should pass `env['store']`.
+        semantic_index (Optional[dict]): Index from `Chatbot.semantic_index`; without it
+            'semantic_query' is ignored.
 
     Returns:
-        pd.DataFrame: A filtered copy of the original DataFrame.
+        pd.DataFrame: The matching rows of `df` in timestamp order, or with a semantic
+            query, the closest matches (up to `Chatbot.semantic_index.DEFAULT_TOP_K`) most similar first.
     """
+    if store is None:
+        store = build_message_store(df)
 
-    filtered = df.copy()
-    
-    if filters.get("category"):
-        filtered = filtered[filtered["category"].str.lower() == filters["category"].lower()]
-        
-    if filters.get("source"):
-        filtered = filtered[filtered["source"].str.lower() == filters["source"].lower()]
+    rows = select_rows(store, **resolve_filters(filters, current_time))
+    if filters.get("semantic_query") and semantic_index is not None:
+        rows = search(semantic_index, filters["semantic_query"], candidate_rows=rows)
+    return df.iloc[rows]
+
+def resolve_filters(filters, current_time):
+    """
+    Turns a filter context into the arguments of `Chatbot.store.select_rows()`.
+
+    Args:
+        filters (dict): Dictionary with 'category', 'source', 'start_time_expr', 'end_time_expr'
+            and optionally 'user'.
+        current_time (datetime): Reference time for relative date parsing.
+
+    Returns:
+        dict: 'category', 'source', 'start_time', 'end_time' and 'user'.
+    """
+    start_time = parse_expr(filters.get("start_time_expr"), current_time)
+    # Open-ended ranges stop at the dataset's current time, not the wall clock
+    end_time = parse_expr(filters.get("end_time_expr"), current_time) or current_time
+    return {
+        "category": filters.get("category"),
+        "source": filters.get("source"),
+        "start_time": start_time,
+        "end_time": end_time,
+        "user": filters.get("user"),
+    }
+
+def summarize_filters(env, filters):
+    """
+    Summarizes the messages matching a filter context.
 
-    start_time = parse_expr(filters["start_time_expr"], current_time)
-    end_time = parse_expr(filters["end_time_expr"], current_time) or dateparser.parse("now")
+    With `estimate_users`, large results without a semantic query are answered from
+    `env['rollup']`, so their rows are never copied; unique users are then an estimate. Everything
+    else is filtered and summarized row by row. The per-user parts of the summary
+    come from `summarize_users()`.
 
-    if start_time:
-        filtered = filtered[filtered['timestamp'] >= pd.to_datetime(start_time)]
-    if end_time:
-        filtered = filtered[filtered['timestamp'] <= pd.to_datetime(end_time)]
-    return filtered
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        filters (dict): The current filter context.
+
+    Returns:
+        tuple: (summary from `summarize_filtered_data()` or `summarize_with_rollup()`,
+            filtered DataFrame or None, per-day counts for spike detection or None)
+    """
+    store, rollup = env['store'], env.get('rollup')
+    with span("time_parse"):
+        query = resolve_filters(filters, env['current_time'])
+    with span("select"):
+        rows = select_rows(store, **query)
+    num_rows = len(range(len(env['df']))[rows]) if isinstance(rows, slice) else len(rows)
+
+    semantic = filters.get("semantic_query") and env.get('semantic_index') is not None
+    if (rollup is None or semantic or store['order'] is not None or num_rows < ROLLUP_MIN_ROWS
+            or query['user'] is not None):
+        with span("filter"):
+            filtered_df = apply_filters(env['df'], filters, env['current_time'], store=store,
+                                        semantic_index=env.get('semantic_index'))
+        with span("summary"):
+            summary = summarize_filtered_data(filtered_df, pool=env.get('summary_pool'))
+        day_counts = None
+    else:
+        filtered_df = None
+        with span("summary"):
+            summary = summarize_with_rollup(env['df'], store, rollup, rows, query['category'], query['source'])
+            day_counts = None
+            if summary['category'] is not None:
+                day_counts = rollup_day_counts(rollup, store, rows, query['category'], query['source'])
+
+    with span("users"):
+        summary.update(summarize_users(env, filters, query, filtered_df if semantic else None))
+    return summary, filtered_df, day_counts
+
+def _top_users_count(value):
+    """Reads the 'top_users' filter: True means `TOP_USERS`, numbers are capped at `MAX_TOP_USERS`."""
+    if value is True:
+        return TOP_USERS
+    try:
+        return max(0, min(int(value), MAX_TOP_USERS))
+    except (TypeError, ValueError):
+        return 0
+
+def summarize_users(env, filters, query, semantic_df=None):
+    """
+    Computes the per-user parts of a summary from the per-user index.
+
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        filters (dict): The current filter context.
+        query (dict): The same filters resolved by `resolve_filters()`.
+        semantic_df (Optional[pd.DataFrame]): The result of a semantic query, counted
+            directly since its rows are not a store selection.
+
+    Returns:
+        dict: 'user' (the user filter or None), 'user_categories' (messages per category
+            when a user filter is set, else None), and when 'top_users' is set, 'top_users'
+            as a list of (id_user, messages) and 'repeat_users' (users with 2+ messages);
+            both None otherwise.
+    """
+    summary = {"user": query['user'], "user_categories": None, "top_users": None, "repeat_users": None}
+    n = _top_users_count(filters.get("top_users")) if filters.get("top_users") else 0
+
+    if semantic_df is not None:
+        if query['user'] is not None:
+            counts = semantic_df['category'].dropna().str.lower().value_counts()
+            summary["user_categories"] = {name: int(count) for name, count in counts.items()}
+        if n:
+            counts = semantic_df['id_user'].value_counts().sort_index(kind="stable")
+            counts = counts.sort_values(ascending=False, kind="stable")
+            summary["top_users"] = [(user, int(count)) for user, count in counts.head(n).items()]
+            summary["repeat_users"] = int((counts >= 2).sum())
+        return summary
+
+    if query['user'] is not None:
+        summary["user_categories"] = category_breakdown(env['store'], **query)
+    if n:
+        users = top_users(env['store'], n, **query)
+        summary["top_users"], summary["repeat_users"] = users["top"], users["repeat_users"]
+    return summary
 
 def parse_expr(expr: str, base_time: datetime) -> str:
     """
     Parses a human-readable time expression into an ISO-formatted timestamp string.
 
+    Common relative forms are resolved without dateparser and results are
+    memoized; see `Chatbot.time_resolution.resolve_time_expr()`.
+
     Args:
         expr (str): Natural language time expression (e.g., 'yesterday', '7 days ago').
         base_time (datetime): Base time for relative parsing.
@@ -159,12 +372,7 @@ def parse_expr(expr: str, base_time: datetime) -> str:
     Returns:
         Optional[str]: ISO-formatted timestamp string, or None if parsing fails.
     """
-    if not expr:
-        return None
-    dt = dateparser.parse(expr, settings={
-        'RELATIVE_BASE': base_time, 
-        'RETURN_AS_TIMEZONE_AWARE': False
-        })
+    dt = resolve_time_expr(expr, base_time)
     return dt.replace(microsecond=0).isoformat() if dt else None
 
 def new_filter_context():
@@ -172,21 +380,96 @@ def new_filter_context():
     Initializes a fresh filter context dictionary.
 
     Returns:
-        dict: A dictionary with keys 'category', 'source', 'start_time_expr', 'end_time_expr', all set to None.
+        dict: A dictionary with keys 'category', 'source', 'start_time_expr', 'end_time_expr',
+            'semantic_query', 'user' (an 'id_user') and 'top_users' (how many of the most
+            frequent senders to list), all set to None.
+    """
+    return {k: None for k in ["category", "source", "start_time_expr", "end_time_expr", "semantic_query",
+                              "user", "top_users"]}
+
+def update_filter_context(current_filter, new_user_filters):
+    """
+    Merges newly extracted filters into the conversation's filter context.
+
+    Fields listed in the optional "clear" entry are removed before the new values
+    are applied.
+
+    Args:
+        current_filter (dict): Filter context from previous turns.
+        new_user_filters (dict): Filters extracted from the latest query.
+
+    Returns:
+        dict: The updated filter context; `current_filter` is left unchanged.
     """
-    return {k: None for k in ["category", "source", "start_time_expr", "end_time_expr"]}
+    updated = new_filter_context() if new_user_filters.get("reset") else dict(current_filter)
 
-def run_chatbot(env):
+    for key in new_user_filters.get("clear") or ():
+        if key in updated:
+            updated[key] = None
+
+    for key, value in new_user_filters.items():
+        if value is not None and key in updated:
+            updated[key] = value
+    return updated
+
+def page_results(env, current_filter, cursor):
+    """
+    Prints the next page of the messages matching the filter context.
+
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        current_filter (dict): The current filter context.
+        cursor (dict): Cursor from `Chatbot.results.new_cursor()`.
+
+    Returns:
+        dict: The advanced cursor.
+    """
+    with span("page"):
+        page, cursor, info = fetch_page(env, resolve_filters(current_filter, env['current_time']), cursor,
+                                        current_filter.get("semantic_query"))
+    if not len(page):
+        print(f"No more messages ({info['total']} in total). Type 'first' to start over.")
+        return cursor
+    print(f"Messages {info['start']}-{info['end']} of {info['total']}:")
+    print(page[PREVIEW_COLUMNS].to_string(index=False))
+    return cursor
+
+def export_filtered(env, current_filter, path):
+    """
+    Writes every message matching the filter context to a CSV or JSONL file.
+
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        current_filter (dict): The current filter context.
+        path (str): Output file ending in .csv or .jsonl.
+    """
+    try:
+        with span("export"):
+            rows = export_results(env, resolve_filters(current_filter, env['current_time']), path,
+                                  semantic_query=current_filter.get("semantic_query"))
+    except (OSError, ValueError) as e:
+        print(f"Export failed: {e}")
+        return
+    print(f"Wrote {rows} messages to '{path}'.")
+
+def run_chatbot(env, queries=None):
     """
     Runs the chatbot interface in a loop, handling natural language input,
     extracting filters, applying them, and printing results.
 
+    Besides questions, 'more' prints the next page of the full result in timestamp
+    order, 'first' goes back to its start, and 'export <file.csv|file.jsonl>'
+    writes all of it. The page position is kept when a follow-up refines the
+    filters and only rewinds when they are reset.
+
     Args:
         env (dict): Environment dictionary from `setup_environment()`.
+        queries (Optional[Iterable[str]]): Scripted queries to answer instead of
+            reading from stdin; the session exits after the last one.
     """
-    df = env['df']
-    current_time = env['current_time']
     current_filter = new_filter_context()
+    cursor = new_cursor()
+    queries = None if queries is None else iter(queries)
 
     print("Welcome to the message query assistant. Type 'reset' to clear filters or 'exit' to quit.")
     print(f"Valid message categories are: {env['categories']}")
@@ -194,31 +477,111 @@ def run_chatbot(env):
     
 
     while True:
-        user_query = input("Which messages do you want to see? (type 'exit' to quit, type 'reset' to reset all filtering): ")
+        prompt = "Which messages do you want to see? (type 'exit' to quit, type 'reset' to reset all filtering): "
+        if queries is None:
+            user_query = input(prompt)
+        else:
+            user_query = next(queries, 'exit')
+            print(prompt + user_query)
         if user_query.lower() == 'exit':
+            if env.get('llm_cache') is not None:
+                stats = cache_stats(env['llm_cache'])
+                print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+            report = fast_path_report(env['fast_path_stats'])
+            print(f"Fast path: {report['hit_rate']:.0%} of {report['queries']} queries resolved locally, "
+                  f"~{report['seconds_saved']:.1f}s of LLM latency saved")
+            report = llm_report(env['llm_stats'])
+            if report['requests']:
+                print(f"LLM: {report['requests']} requests, {report['prompt_tokens']:.0f} prompt tokens on average "
+                      f"({report['cached_share']:.0%} cached), p50 {report['latency_ms_p50']:.0f} ms")
+            if 'spool' in env:
+                report = ingest_report(env['ingest_stats'])
+                print(f"Ingested {report['rows']} messages in {report['batches']} batches "
+                      f"({report['rows_per_second']:.0f} rows/s while ingesting)")
+            print(format_metrics_report(metrics_report(env['turn_metrics'])))
             break
         elif user_query.lower() == 'reset':
             current_filter = new_filter_context()
+            cursor = new_cursor()
             print("Filter context has been reset.")
             continue
-        
-        new_user_filters = query_LLM_for_filters(user_query, env)
-    
-        if not new_user_filters:
-            print("Sorry, I couldn't understand your request.")
+        elif user_query.lower() in ('more', 'next'):
+            with start_turn(env['turn_metrics']):
+                cursor = page_results(env, current_filter, cursor)
+            continue
+        elif user_query.lower() == 'first':
+            cursor = new_cursor()
+            print("Paging restarts at the first matching message.")
             continue
+        elif user_query.lower().startswith('export '):
+            with start_turn(env['turn_metrics']):
+                export_filtered(env, current_filter, user_query[len('export '):].strip())
+            continue
+        
+        with start_turn(env['turn_metrics']):
+            if 'spool' in env:
+                with span("ingest"):
+                    env = ingest_spool(env, env['spool'], env['ingest_stats'], env['categorize'])
 
-        if new_user_filters.get("reset"):
-            current_filter = new_filter_context()
+            new_user_filters = extract_filters(user_query, env, current_filter)
 
-        for key, value in new_user_filters.items():
-            if value is not None and key in current_filter:
-                current_filter[key] = value
+            if not new_user_filters:
+                print("Sorry, I couldn't understand your request.")
+                continue
 
-        filtered_df = apply_filters(df, current_filter, current_time)
+            current_filter = update_filter_context(current_filter, new_user_filters)
+            cursor = update_cursor(cursor, new_user_filters)
 
-        describe_filtered_data(filtered_df = filtered_df,entire_df=df)
+            summary, filtered_df, day_counts = summarize_filters(env, current_filter)
+
+            with span("describe"):
+                describe_filtered_data(filtered_df = filtered_df,entire_df=env['df'], daily_counts=env['daily_counts'],
+                                       summary=summary, day_counts=day_counts)
+            if summary['num_messages'] > len(summary['preview']):
+                print(f"Type 'more' to page through all {summary['num_messages']} messages, "
+                      "or 'export results.csv' (or .jsonl) to save them.")
+
+def profile_session(env, queries, output, top=25):
+    """
+    Runs a scripted session under cProfile and writes the profile to `output`.
+
+    The file is in the `pstats` format read by `python -m pstats`, snakeviz or
+    gprof2dot. For sampling profiles of the same session, run the script under
+    py-spy instead: `py-spy record -o chatbot.svg -- python -m Chatbot.chatbot --script queries.txt`.
+
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        queries (Iterable[str]): The session's queries.
+        output (str): Path of the profile.
+        top (int): Number of functions printed by cumulative time.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run_chatbot(env, queries)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output)
+    print(f"\nProfile written to '{output}'; top {top} functions by cumulative time:")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive message query assistant.")
+    parser.add_argument("--script", help="answer the queries in this file (one per line) instead of reading stdin")
+    parser.add_argument("--profile", metavar="OUTPUT",
+                        help="run the session under cProfile and write the profile to OUTPUT "
+                             "(without --script, the filter-extraction evaluation queries are replayed)")
+    args = parser.parse_args()
+
+    queries = None
+    if args.script:
+        with open(args.script) as f:
+            queries = [line.strip() for line in f if line.strip()]
     env = setup_environment()
-    run_chatbot(env)
\ No newline at end of file
+    if args.profile:
+        if queries is None:
+            from Chatbot.eval_cases import all_cases
+            queries = [case["query"] for case in all_cases(env['current_time'])]
+        profile_session(env, queries, args.profile)
+    else:
+        run_chatbot(env, queries)
\ No newline at end of file
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+import numpy as np
+import pandas as pd
+from Chatbot.chatbot import build_environment
+from Chatbot.server import start_server
+
+SEMANTIC_VOCAB = ["cashback", "piggy", "withdrawal", "pending", "bonus", "code", "game", "frozen", "login", "password"]
+SEMANTIC_MESSAGES = [
+    "where is my cashback piggy",
+    "withdrawal pending for days",
+    "bonus code not working",
+    "game frozen again",
+    "cannot login password reset",
+    "cashback piggy is empty",
+]
+
+filter_cases = [
+    (None, None, None, None),
+    ("cashout issues", None, None, None),
+    ("Game Issues", "livechat", None, None),
+    (None, "telegram", "2024-12-01T00:00:00", None),
+    ("bonus issue", "livechat", "2024-12-01T00:00:00", "2024-12-15T12:00:00"),
+    (None, None, "2024-12-24T00:00:00", "2024-12-24T00:00:00"),
+    ("nonexistent", None, None, None),
+    (None, "discord", None, None),
+    ("cashout issues", "telegram", "2026-01-01T00:00:00", None),
+]
+
+
+def make_df(n=2000, seed=0, start="2024-11-01", end="2025-01-30", num_users=300, missing_users=0.0,
+            sources=("livechat", "telegram", "LiveChat"),
+            categories=("cashout issues", "game issues", "bonus issue", None),
+            source_weights=None, category_weights=None, sort=True):
+    """
+    Generates random messages in the data's columns for the tests.
+
+    Args:
+        n (int): Number of messages.
+        seed (int): Random seed; also part of each message text, so frames from
+            different seeds never share messages.
+        start (str): Earliest timestamp.
+        end (str): Latest timestamp (exclusive).
+        num_users (int): Number of distinct 'id_user' values.
+        missing_users (float): Share of messages without a user, which makes 'id_user' float.
+        sources (tuple): Values of 'source', drawn with `source_weights`; the default
+            spells one source two ways, as the raw data does.
+        categories (tuple): Values of 'category' (None for uncategorized), drawn with `category_weights`.
+        source_weights (Optional[list]): Probabilities of `sources`, uniform when None.
+        category_weights (Optional[list]): Probabilities of `categories`, uniform when None.
+        sort (bool): Sort the rows by timestamp, as the loaded data is.
+
+    Returns:
+        pd.DataFrame: Columns 'id_user', 'timestamp', 'source', 'message', 'category'.
+    """
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, num_users, n)
+    if missing_users:
+        users = users.astype(float)
+        users[rng.random(n) < missing_users] = np.nan
+    df = pd.DataFrame({
+        "id_user": users,
+        "timestamp": pd.to_datetime(rng.integers(pd.Timestamp(start).value, pd.Timestamp(end).value, n)),
+        "source": rng.choice(np.asarray(sources, dtype=object), n, p=source_weights),
+        "message": [f"message {seed} {i}" for i in range(n)],
+        "category": rng.choice(np.asarray(categories, dtype=object), n, p=category_weights),
+    })
+    if sort:
+        df = df.sort_values("timestamp", kind="stable", ignore_index=True)
+    return df
+
+
+def scan_filter(df, category, source, start_time, end_time):
+    """Reference implementation: the full-scan filter the store replaces."""
+    filtered = df.copy()
+    if category:
+        filtered = filtered[filtered["category"].str.lower() == category.lower()]
+    if source:
+        filtered = filtered[filtered["source"].str.lower() == source.lower()]
+    if start_time:
+        filtered = filtered[filtered["timestamp"] >= pd.to_datetime(start_time)]
+    if end_time:
+        filtered = filtered[filtered["timestamp"] <= pd.to_datetime(end_time)]
+    return filtered
+
+
+def make_env(llm_delay=0.0):
+    """A small environment whose LLM always answers "game issues" and records its peak concurrency."""
+    df = make_df(500, start="2025-01-01", end="2025-01-30", num_users=50, sources=("livechat", "telegram"),
+                 categories=("cashout issues", "game issues"))
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def complete(messages):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(llm_delay)
+        with lock:
+            in_flight["now"] -= 1
+        return {"content": '{"category": "game issues", "source": null, "reset": false}', "usage": None}
+
+    return build_environment(df, {"name": "fake", "client": None, "complete": complete}), in_flight
+
+
+async def post(port, payload, path="/query"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def run_against_server(state, scenario):
+    async def main():
+        server = await start_server(state, port=0)
+        try:
+            return await scenario(server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+def bag_of_words(texts):
+    """Deterministic stand-in for the sentence encoder: word counts over SEMANTIC_VOCAB plus a bias."""
+    vectors = np.zeros((len(texts), len(SEMANTIC_VOCAB) + 1), dtype=np.float32)
+    for i, text in enumerate(texts):
+        words = text.lower().split()
+        vectors[i, :-1] = [words.count(w) for w in SEMANTIC_VOCAB]
+        vectors[i, -1] = 0.1
+    return vectors
+
+
+def make_semantic_df():
+    """60 hourly messages cycling through SEMANTIC_MESSAGES, so searches have known answers."""
+    rows = [SEMANTIC_MESSAGES[i % len(SEMANTIC_MESSAGES)] for i in range(60)]
+    return pd.DataFrame({
+        "id_user": np.arange(60) % 7,
+        "timestamp": pd.date_range("2025-01-01", periods=60, freq="h"),
+        "source": ["livechat", "telegram"] * 30,
+        "message": rows,
+        "category": ["bonus issue" if "piggy" in m or "bonus" in m else "other" for m in rows],
+    })
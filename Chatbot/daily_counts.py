@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+DAY_NS = 86_400 * 10**9
+
+
+def build_daily_counts(store):
+    """
+    Builds a source × category × day message-count cube from the message store.
+
+    Source slot 0 holds messages without a source and slot `code + 1` holds each
+    source. Rows without a category are not counted, matching the per-category
+    groupby it replaces.
+
+    Args:
+        store (dict): Store from `Chatbot.store.build_message_store()`.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'counts': int64 array of shape (1 + num_sources, num_categories, num_days)
+            - 'first_day': Day number (days since the epoch) of the first column
+            - 'category_index' / 'source_index': lowercased name -> code, as in the store
+    """
+    daily_counts = {
+        "counts": np.zeros((len(store["source_index"]) + 1, len(store["category_index"]), 0), dtype=np.int64),
+        "first_day": 0,
+        "category_index": dict(store["category_index"]),
+        "source_index": dict(store["source_index"]),
+    }
+    add_to_daily_counts(daily_counts, store["timestamps"], store["category_codes"], store["source_codes"])
+    return daily_counts
+
+
+def add_to_daily_counts(daily_counts, timestamps, category_codes, source_codes):
+    """
+    Adds new messages to the count cube in place, growing it for new days,
+    categories and sources.
+
+    Codes must come from the same vocabulary as `daily_counts['category_index']`
+    and `daily_counts['source_index']`; extend those dicts when new values appear.
+
+    Args:
+        daily_counts (dict): Counts from `build_daily_counts()`.
+        timestamps (np.ndarray): int64 nanosecond timestamps of the new messages.
+        category_codes (np.ndarray): Category code per message, -1 if missing.
+        source_codes (np.ndarray): Source code per message, -1 if missing.
+    """
+    keep = category_codes >= 0
+    if not keep.any():
+        return
+    days = timestamps[keep] // DAY_NS
+    categories = category_codes[keep]
+    source_slots = source_codes[keep] + 1
+
+    counts = daily_counts["counts"]
+    first_day = daily_counts["first_day"] if counts.shape[2] else int(days.min())
+    last_day = first_day + max(counts.shape[2], 1) - 1
+    new_first_day = min(first_day, int(days.min()))
+    new_last_day = max(last_day, int(days.max()))
+
+    shape = (
+        max(len(daily_counts["source_index"]) + 1, int(source_slots.max()) + 1, counts.shape[0]),
+        max(len(daily_counts["category_index"]), int(categories.max()) + 1, counts.shape[1]),
+        new_last_day - new_first_day + 1,
+    )
+    if counts.shape != shape:
+        grown = np.zeros(shape, dtype=np.int64)
+        offset = first_day - new_first_day
+        grown[:counts.shape[0], :counts.shape[1], offset:offset + counts.shape[2]] = counts
+        counts = grown
+
+    num_categories, num_days = shape[1], shape[2]
+    flat = (source_slots * num_categories + categories) * num_days + (days - new_first_day)
+    counts += np.bincount(flat, minlength=counts.size).reshape(shape)
+
+    daily_counts["counts"] = counts
+    daily_counts["first_day"] = new_first_day
+
+
+def daily_series(daily_counts, category, source=None):
+    """
+    Returns the per-day message counts for a category, optionally for one source.
+
+    Args:
+        daily_counts (dict): Counts from `build_daily_counts()`.
+        category (str): Category name (case-insensitive).
+        source (Optional[str]): Source name (case-insensitive), or None for all sources.
+
+    Returns:
+        np.ndarray: Counts per day starting at `daily_counts['first_day']`
+            (all zeros for unknown names).
+    """
+    counts = daily_counts["counts"]
+    category_code = daily_counts["category_index"].get(category.lower())
+    if category_code is None:
+        return np.zeros(counts.shape[2], dtype=np.int64)
+    if source is None:
+        return counts[:, category_code, :].sum(axis=0)
+    source_code = daily_counts["source_index"].get(source.lower())
+    if source_code is None:
+        return np.zeros(counts.shape[2], dtype=np.int64)
+    return counts[source_code + 1, category_code, :]
+
+
+def _active_day_stats(series):
+    """Mean and sample std over days with at least one message, NaN when undefined."""
+    active = series[series > 0].astype(np.float64)
+    mean = active.mean() if len(active) else np.nan
+    std = active.std(ddof=1) if len(active) > 1 else np.nan
+    return mean, std
+
+
+def category_baseline(daily_counts, category, source=None):
+    """
+    Computes the mean and standard deviation of a category's daily count.
+
+    Like the groupby it replaces, only days with at least one message count
+    towards the baseline.
+
+    Args:
+        daily_counts (dict): Counts from `build_daily_counts()`.
+        category (str): Category name.
+        source (Optional[str]): Restrict the baseline to one source.
+
+    Returns:
+        tuple: (mean, std)
+    """
+    return _active_day_stats(daily_series(daily_counts, category, source))
+
+
+def rolling_baseline(daily_counts, category, window_days=28, source=None):
+    """
+    Computes a trailing baseline for every day from the `window_days` days before it.
+
+    Uses cumulative sums, so the cost is O(days) regardless of the window size.
+    As with `category_baseline()`, only days with messages count.
+
+    Args:
+        daily_counts (dict): Counts from `build_daily_counts()`.
+        category (str): Category name.
+        window_days (int): Length of the trailing window, excluding the day itself.
+        source (Optional[str]): Restrict the baseline to one source.
+
+    Returns:
+        tuple: (mean, std) arrays aligned with `daily_series()`, NaN where undefined.
+    """
+    series = daily_series(daily_counts, category, source).astype(np.float64)
+    active = (series > 0).astype(np.float64)
+
+    def trailing_sum(values):
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        end = np.arange(len(values))
+        start = np.maximum(end - window_days, 0)
+        return cumulative[end] - cumulative[start]
+
+    n = trailing_sum(active)
+    total = trailing_sum(series)
+    total_sq = trailing_sum(series ** 2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, total / n, np.nan)
+        variance = np.where(n > 1, (total_sq - n * mean ** 2) / (n - 1), np.nan)
+    return mean, np.sqrt(np.maximum(variance, 0))
+
+
+def count_by_day(df):
+    """
+    Counts messages per calendar day without copying the DataFrame.
+
+    Args:
+        df (pd.DataFrame): Messages with a 'timestamp' column.
+
+    Returns:
+        tuple: (day numbers since the epoch, counts), both sorted by day.
+    """
+    timestamps = df['timestamp'].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return np.unique(timestamps // DAY_NS, return_counts=True)
+
+
+def day_to_timestamp(day):
+    """Converts a day number since the epoch back into a midnight pd.Timestamp."""
+    return pd.Timestamp(int(day) * DAY_NS)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+CACHE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CATEGORICAL_COLUMNS = ("category", "source")
+
+
+def _fingerprint(csv_path):
+    """
+    Returns the cheap-to-check identity of the source file.
+
+    Args:
+        csv_path (str): Path to the source CSV.
+
+    Returns:
+        dict: {'mtime_ns': int, 'size': int}
+    """
+    stat = os.stat(csv_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 of a file without loading it into memory.
+
+    Args:
+        path (str): File to hash.
+        chunk_size (int): Bytes read per iteration.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    """
+    Writes a cache file under a temporary name and renames it into place, so
+    processes that already mapped the previous version keep a valid file.
+
+    Args:
+        path (str): Final file path.
+        write (Callable[[file], None]): Writes the content to an open binary file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _save_array(cache_dir, name, array):
+    _write_atomic(os.path.join(cache_dir, f"{name}.npy"), lambda f: np.save(f, np.ascontiguousarray(array)))
+
+
+def _load_array(cache_dir, name):
+    return np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == CACHE_VERSION else None
+
+
+def _write_manifest(cache_dir, manifest):
+    payload = json.dumps(manifest, indent=2).encode("utf-8")
+    _write_atomic(os.path.join(cache_dir, MANIFEST_NAME), lambda f: f.write(payload))
+
+
+def cached_source_hash(cache_dir):
+    """
+    Returns the SHA-256 of the CSV the cache was built from, identifying the data
+    version for derived artifacts such as the semantic index.
+
+    Args:
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        Optional[str]: Hex digest, or None when there is no valid cache.
+    """
+    manifest = _read_manifest(cache_dir)
+    return manifest["source_sha256"] if manifest else None
+
+
+def read_messages_csv(csv_path):
+    """
+    Reads the labeled message CSV and parses it the way the chatbot expects.
+
+    Args:
+        csv_path (str): Path to the labeled CSV.
+
+    Returns:
+        pd.DataFrame: Messages sorted by timestamp with a RangeIndex.
+    """
+    df = pd.read_csv(csv_path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def build_cache(csv_path, cache_dir):
+    """
+    Parses the CSV once and writes each column as a NumPy file that can be
+    memory-mapped by `load_messages()`.
+
+    Layout:
+        - timestamps as int64 nanoseconds
+        - 'category' / 'source' as integer codes plus a vocabulary in the manifest
+        - other text columns as one UTF-8 blob plus int64 offsets
+        - numeric columns as-is
+
+    Args:
+        csv_path (str): Path to the labeled CSV.
+        cache_dir (str): Directory to write the cache into.
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    fingerprint = _fingerprint(csv_path)
+    df = read_messages_csv(csv_path)
+
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if name == "timestamp":
+            _save_array(cache_dir, name, values.to_numpy(dtype="datetime64[ns]").view(np.int64))
+            columns.append({"name": name, "kind": "timestamp"})
+        elif name in CATEGORICAL_COLUMNS:
+            categorical = pd.Categorical(values)
+            _save_array(cache_dir, name, categorical.codes)
+            columns.append({"name": name, "kind": "categorical", "categories": categorical.categories.tolist()})
+        elif pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            _save_array(cache_dir, name, values.to_numpy())
+            columns.append({"name": name, "kind": "numeric"})
+        else:
+            missing = values.isna().to_numpy()
+            encoded = [b"" if is_missing else str(value).encode("utf-8")
+                       for value, is_missing in zip(values.tolist(), missing)]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            _save_array(cache_dir, f"{name}.offsets", offsets)
+            _save_array(cache_dir, f"{name}.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            _save_array(cache_dir, f"{name}.missing", missing)
+            columns.append({"name": name, "kind": "text"})
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(csv_path),
+        "source_fingerprint": fingerprint,
+        "source_sha256": _file_hash(csv_path),
+        "num_rows": len(df),
+        "columns": columns,
+    }
+    _write_manifest(cache_dir, manifest)
+    return manifest
+
+
+def _load_text_column(cache_dir, name):
+    """
+    Loads a text column. With pyarrow installed the strings stay in the mapped
+    blob; otherwise they are decoded into Python objects.
+    """
+    offsets = _load_array(cache_dir, f"{name}.offsets")
+    data = _load_array(cache_dir, f"{name}.data")
+    missing = np.asarray(_load_array(cache_dir, f"{name}.missing"))
+
+    if pa is not None:
+        arrow_array = pa.LargeStringArray.from_buffers(
+            len(offsets) - 1,
+            pa.py_buffer(offsets),
+            pa.py_buffer(data),
+            pa.py_buffer(np.packbits(~missing, bitorder="little")) if missing.any() else None,
+        )
+        return pd.Series(pd.arrays.ArrowStringArray(arrow_array), copy=False)
+
+    blob = data.tobytes()
+    values = [None if is_missing else blob[start:end].decode("utf-8")
+              for start, end, is_missing in zip(offsets[:-1].tolist(), offsets[1:].tolist(), missing.tolist())]
+    return pd.Series(values, dtype=object)
+
+
+def _load_cache(cache_dir, manifest):
+    """
+    Assembles a DataFrame whose numeric, timestamp and categorical columns are
+    read-only views of memory-mapped cache files.
+    """
+    columns = {}
+    for column in manifest["columns"]:
+        name, kind = column["name"], column["kind"]
+        if kind == "timestamp":
+            columns[name] = pd.Series(_load_array(cache_dir, name).view("datetime64[ns]"), copy=False)
+        elif kind == "categorical":
+            codes = _load_array(cache_dir, name)
+            categorical = pd.Categorical.from_codes(codes, categories=column["categories"])
+            columns[name] = pd.Series(categorical, copy=False)
+        elif kind == "numeric":
+            columns[name] = pd.Series(_load_array(cache_dir, name), copy=False)
+        else:
+            columns[name] = _load_text_column(cache_dir, name)
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_messages(csv_path, cache_dir):
+    """
+    Loads the labeled dataset through a binary cache next to the CSV.
+
+    The cache is reused while the CSV's mtime and size match the manifest. If they
+    changed, the CSV is hashed and the cache is rebuilt only when the content differs.
+    Cached columns are memory-mapped, so processes on the same host share pages.
+
+    Args:
+        csv_path (str): Path to the labeled CSV.
+        cache_dir (str): Directory holding the cache files.
+
+    Returns:
+        pd.DataFrame: Messages sorted by timestamp, with categorical 'category' and 'source'.
+    """
+    manifest = _read_manifest(cache_dir)
+    fingerprint = _fingerprint(csv_path)
+
+    if manifest is not None and manifest["source_fingerprint"] != fingerprint:
+        if manifest["source_sha256"] == _file_hash(csv_path):
+            manifest["source_fingerprint"] = fingerprint
+            _write_manifest(cache_dir, manifest)
+        else:
+            manifest = None
+
+    if manifest is None:
+        manifest = build_cache(csv_path, cache_dir)
+
+    return _load_cache(cache_dir, manifest)
@@ -0,0 +1,161 @@
+from datetime import timedelta
+from Chatbot.chatbot import parse_expr
+
+# Filter-extraction cases shared by `test_chatbot.py` and `benchmarks/bench_llm_accuracy.py`.
+
+FILTER_CASES = [
+    # Full filters: category + source
+    {"query": "Show me cashout issues on livechat", "expected_category": "cashout issues", "expected_source": "livechat"},
+    {"query": "Show me account issues on telegram", "expected_category": "account issues", "expected_source": "telegram"},
+    {"query": "List time delays from telegram users", "expected_category": "time delays", "expected_source": "telegram"},
+    {"query": "Any bonus issue messages on livechat?", "expected_category": "bonus issue", "expected_source": "livechat"},
+    {"query": "General inquiry complaints from telegram", "expected_category": "general inquiry", "expected_source": "telegram"},
+    {"query": "Are there any withdrawal issue reports on livechat?", "expected_category": "withdrawal issue", "expected_source": "livechat"},
+    {"query": "Deposit issues reported on telegram", "expected_category": "deposit issues", "expected_source": "telegram"},
+    {"query": "Game issues on livechat", "expected_category": "game issues", "expected_source": "livechat"},
+    {"query": "Any freespin issues via telegram?", "expected_category": "freespin issues", "expected_source": "telegram"},
+    {"query": "Not actionable messages from livechat", "expected_category": "not actionable", "expected_source": "livechat"},
+
+    # Category only (no source specified)
+    {"query": "Show me all cashout issues", "expected_category": "cashout issues", "expected_source": None},
+    {"query": "What are the game issues?", "expected_category": "game issues", "expected_source": None},
+
+    # Source only (no category specified)
+    {"query": "All messages from telegram", "expected_category": None, "expected_source": "telegram"},
+    {"query": "Show me livechat messages", "expected_category": None, "expected_source": "livechat"},
+
+    # No filters
+    {"query": "Show me all messages", "expected_category": None, "expected_source": None},
+    {"query": "Anything new?", "expected_category": None, "expected_source": None}
+]
+
+RESET_CASES = [
+    # CLEAR resets
+    {"query": "new query: show me deposit issues", "expected_reset": True},
+    {"query": "start over: show me cashout issues", "expected_reset": True},
+    {"query": "reset filters and show me all messages", "expected_reset": True},
+    {"query": "fresh search: give me freespin issues from telegram", "expected_reset": True},
+
+    # FOLLOW-UPS
+    {"query": "make that telegram only", "expected_reset": False},
+    {"query": "change the source to livechat", "expected_reset": False},
+    {"query": "now show only bonus issues", "expected_reset": False},
+    {"query": "just change it to game issues", "expected_reset": False},
+
+    # AMBIGUOUS / EDGE CASES
+    {"query": "how about livechat instead", "expected_reset": False},         # implies context
+    {"query": "actually, show freespin issues", "expected_reset": False},     # soft change in category
+    {"query": "okay, now find account issues", "expected_reset": False},      # arguably new intent
+    {"query": "find me messages again from yesterday", "expected_reset": False},  # new time, unclear whether reset
+    {"query": "go back to withdrawal issues", "expected_reset": False},       # reverting state, but continuing
+    {"query": "let's look at livechat only", "expected_reset": False},        # sounds like refinement
+]
+
+
+# Multi-turn conversations: each turn lists the filter context expected after it,
+# so follow-ups are scored on how they change the filters they were sent with.
+CONVERSATION_CASES = [
+    [
+        {"query": "Show me cashout issues on livechat",
+         "expected": {"category": "cashout issues", "source": "livechat", "start_time_expr": None}},
+        {"query": "make that telegram only",
+         "expected": {"category": "cashout issues", "source": "telegram", "start_time_expr": None}},
+        {"query": "find me messages again from yesterday",
+         "expected": {"category": "cashout issues", "source": "telegram", "start_time_expr": "yesterday"}},
+    ],
+    [
+        {"query": "Game issues on livechat", "expected": {"category": "game issues", "source": "livechat"}},
+        {"query": "now show only bonus issues", "expected": {"category": "bonus issue", "source": "livechat"}},
+        {"query": "show all sources", "expected": {"category": "bonus issue", "source": None}},
+        {"query": "start over: show me cashout issues", "expected": {"category": "cashout issues", "source": None}},
+    ],
+    [
+        {"query": "Deposit issues reported on telegram",
+         "expected": {"category": "deposit issues", "source": "telegram", "top_users": None}},
+        {"query": "which of those users contacted us most?",
+         "expected": {"category": "deposit issues", "source": "telegram", "top_users": 10}},
+        {"query": "drop the category", "expected": {"category": None, "source": "telegram", "top_users": 10}},
+    ],
+]
+
+
+def build_time_filter_cases(current_time):
+    """
+    Builds the time-range cases, whose expected bounds depend on the data's current time.
+
+    Args:
+        current_time (datetime): Reference time the expressions are resolved against.
+
+    Returns:
+        list: Cases with 'query', 'expected_start' and 'expected_end' as ISO strings.
+    """
+    now = current_time.replace(microsecond=0).isoformat()
+    midnight = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        {"query": "Show me all messages from the last day",
+         "expected_start": (current_time - timedelta(days=1)).replace(microsecond=0).isoformat(), "expected_end": now},
+        {"query": "Show me issues reported in the past week",
+         "expected_start": (current_time - timedelta(weeks=1)).replace(microsecond=0).isoformat(), "expected_end": now},
+        {"query": "Anything in the last hour?",
+         "expected_start": (current_time - timedelta(hours=1)).replace(microsecond=0).isoformat(), "expected_end": now},
+        {"query": "Messages from the last minute",
+         "expected_start": (current_time - timedelta(minutes=1)).replace(microsecond=0).isoformat(), "expected_end": now},
+        {"query": "What was reported today?",
+         "expected_start": midnight.isoformat(), "expected_end": now},
+        {"query": "Show me this week's messages",
+         "expected_start": (midnight - timedelta(days=current_time.weekday())).isoformat(), "expected_end": now},
+    ]
+
+
+def all_cases(current_time):
+    """Returns every filter, time-range and reset case, in that order."""
+    return FILTER_CASES + build_time_filter_cases(current_time) + RESET_CASES
+
+
+def score_reply(case, result, current_time):
+    """
+    Compares parsed filters with a case's expectations, field by field.
+
+    Only the fields the case defines are scored: 'category' and 'source' for filter
+    cases, 'start' and 'end' (resolved with `parse_expr()`) for time-range cases,
+    and 'reset' for reset cases. A reply that could not be parsed fails every field.
+
+    Args:
+        case (dict): One case from `all_cases()`.
+        result (Optional[dict]): Filters returned by `query_LLM_for_filters()`.
+        current_time (datetime): Reference time the case was built with.
+
+    Returns:
+        dict: Field name -> (correct, actual value).
+    """
+    result = result if isinstance(result, dict) else {}
+    scores = {}
+    for field in ("category", "source"):
+        if f"expected_{field}" in case:
+            expected, actual = case[f"expected_{field}"], result.get(field)
+            correct = actual in (None, "null") if expected is None else actual == expected
+            scores[field] = (correct and bool(result), actual)
+    for field in ("start", "end"):
+        if f"expected_{field}" in case:
+            actual = parse_expr(result.get(f"{field}_time_expr"), current_time)
+            scores[field] = (actual == case[f"expected_{field}"], actual)
+    if "expected_reset" in case:
+        scores["reset"] = (result.get("reset") == case["expected_reset"], result.get("reset"))
+    return scores
+
+
+def score_context(turn, context):
+    """
+    Compares the filter context after a conversation turn with the turn's expectations.
+
+    Args:
+        turn (dict): One turn of a `CONVERSATION_CASES` conversation.
+        context (Optional[dict]): Filter context after the turn, or None if the reply
+            could not be parsed.
+
+    Returns:
+        dict: Field name -> (correct, actual value).
+    """
+    context = context or {}
+    return {field: (bool(context) and context.get(field) == expected, context.get(field))
+            for field, expected in turn["expected"].items()}
@@ -0,0 +1,292 @@
+import difflib
+import re
+import threading
+import time
+from Chatbot.turn_metrics import span
+
+# Cue phrases shared with `Chatbot.prompt.build_prompt()`, so the prompt and the local
+# extractor always agree on what counts as a reset or a refinement.
+RESET_PHRASES = ["start a new search", "new query", "start over", "fresh search"]
+REFINEMENT_PHRASES = [
+    "make that", "change to", "now show", "just update", "let’s look at",
+    "actually", "how about", "switch to", "only", "instead",
+]
+# Extra reset wording recognized locally on top of the prompt's examples.
+EXTRA_RESET_PHRASES = ["new search", "reset filters", "reset"]
+
+# Spellings that should be read as another word before matching.
+SYNONYMS = {
+    "free spins": "freespins",
+    "free spin": "freespin",
+    "cash out": "cashout",
+    "cash outs": "cashouts",
+    "live chat": "livechat",
+    "withdrawals": "withdrawal",
+    "withdraw": "withdrawal",
+}
+
+# Words that carry no filter information in typical queries.
+FILLER_WORDS = {
+    "a", "about", "again", "all", "an", "and", "any", "anything", "are", "at", "back", "by", "category",
+    "change", "complaint", "complaints", "display", "every", "everything", "filter", "filters", "find",
+    "for", "from", "get", "give", "go", "how", "i", "in", "is", "issue", "issues", "it", "just", "let’s",
+    "list", "look", "make", "me", "message", "messages", "now", "of", "ok", "okay", "on", "only", "please",
+    "problem", "problems", "report", "reported", "reports", "see", "sent", "show", "so", "source", "switch",
+    "that", "the", "there", "those", "to", "update", "user", "users", "via", "was", "were", "what", "which",
+    "with", "you", "actually", "instead", "set", "use", "through", "over",
+}
+
+# Words dropped from category names to get their short form ("cashout issues" -> "cashout").
+GENERIC_SUFFIXES = {"issue", "issues", "problem", "problems"}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "fourteen": 14, "thirty": 30,
+}
+TIME_UNITS = ["minute", "hour", "day", "week", "month"]
+PEOPLE = r"(?:users|customers|players|contacters|senders)"
+CONTACTED = r"(?:contacted|messaged|wrote to|written to|reached out to)"
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def _plural_variants(phrase):
+    """Returns the phrase with its last word in both singular and plural form."""
+    words = phrase.split()
+    last = words[-1]
+    forms = {last, last[:-1] if last.endswith("s") else last + "s"}
+    return {" ".join(words[:-1] + [form]) for form in forms}
+
+
+def _vocabulary_variants(value):
+    """Returns every spelling that should resolve to a category or source value."""
+    name = value.lower()
+    variants = _plural_variants(name)
+    words = name.split()
+    if len(words) > 1 and words[-1] in GENERIC_SUFFIXES:
+        variants |= _plural_variants(" ".join(words[:-1]))
+    return variants
+
+
+def _phrase_pattern(phrases):
+    alternatives = sorted((re.escape(p) for p in phrases), key=len, reverse=True)
+    return re.compile(r"(?<![\w’'])(?:" + "|".join(alternatives) + r")(?![\w’'])")
+
+
+def build_fast_path(categories, sources):
+    """
+    Precompiles the local filter extractor for a category/source vocabulary.
+
+    Args:
+        categories (list): Valid category names.
+        sources (list): Valid source names.
+
+    Returns:
+        dict: Compiled matchers used by `extract_filters_locally()`.
+    """
+    def lookup(values):
+        variants = {}
+        for value in values:
+            for variant in _vocabulary_variants(value):
+                variants.setdefault(variant, value)
+        return variants
+
+    category_variants = lookup(categories)
+    source_variants = lookup(sources)
+
+    number = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+    unit = r"(" + "|".join(TIME_UNITS) + r")s?"
+    return {
+        "categories": category_variants,
+        "sources": source_variants,
+        "category_pattern": _phrase_pattern(category_variants),
+        "source_pattern": _phrase_pattern(source_variants),
+        "synonym_pattern": _phrase_pattern(SYNONYMS),
+        "reset_pattern": _phrase_pattern(RESET_PHRASES + EXTRA_RESET_PHRASES),
+        "refinement_pattern": _phrase_pattern(REFINEMENT_PHRASES),
+        "user_pattern": re.compile(r"\b(?:user|player|customer|id_user)(?: id)? ?(?:#|no\. ?|number )?(\d+)\b"),
+        # Requests for the most frequent senders; True asks for the default number of users
+        "top_user_patterns": [
+            (re.compile(rf"\b(?:which |what |the )?{PEOPLE} (?:have |has |who |that )?{CONTACTED} us (?:the )?most(?: often)?\b"),
+             lambda m: True),
+            (re.compile(rf"\bwho (?:has )?{CONTACTED} us (?:the )?most(?: often)?\b"),
+             lambda m: True),
+            (re.compile(rf"\btop {number} {PEOPLE}\b"),
+             lambda m: int(m.group(1)) if m.group(1).isdigit() else NUMBER_WORDS[m.group(1)]),
+            (re.compile(rf"\b(?:top|most active|repeat|repeated|frequent) {PEOPLE}\b"),
+             lambda m: True),
+        ],
+        "time_patterns": [
+            (re.compile(rf"\b(?:in |during |over |from |within )?(?:the )?(?:last|past|previous) {number} {unit}\b"),
+             lambda m: _relative_expr(m.group(1), m.group(2))),
+            (re.compile(rf"\b(?:in |during |over |from |within )?(?:the )?(?:last|past|previous) {unit}\b"),
+             lambda m: _relative_expr("1", m.group(1))),
+            (re.compile(rf"\b{number} {unit} ago\b"),
+             lambda m: _relative_expr(m.group(1), m.group(2))),
+            (re.compile(r"\b(?:from |since |in |during )?this week(?:’s|'s)?\b"),
+             lambda m: "Monday"),
+            (re.compile(r"\b(?:from |since |on )?(today|yesterday)\b"),
+             lambda m: m.group(1)),
+            (re.compile(r"\b(?:from |since |on )?(" + "|".join(WEEKDAYS) + r")\b"),
+             lambda m: m.group(1).capitalize()),
+        ],
+        "fuzzy_words": sorted({w for v in category_variants for w in v.split() if w not in GENERIC_SUFFIXES}),
+    }
+
+
+def _relative_expr(count, unit):
+    """Formats a relative time as dateparser-friendly text, e.g. '7 days ago'."""
+    n = int(count) if count.isdigit() else NUMBER_WORDS[count]
+    if unit == "week":
+        n, unit = n * 7, "day"
+    return f"{n} {unit}{'s' if n != 1 else ''} ago"
+
+
+def extract_filters_locally(user_query, fast_path, fuzzy_cutoff=0.85):
+    """
+    Extracts filters from simple queries without an LLM.
+
+    Every word of the query has to be explained by a category, a source, a time
+    phrase, a reset/refinement cue or a filler word. The confidence is the share of
+    content words that were explained, with fuzzy (typo) matches counting 0.8.
+
+    Args:
+        user_query (str): Natural language input from the user.
+        fast_path (dict): Matchers from `build_fast_path()`.
+        fuzzy_cutoff (float): Minimum difflib similarity for typo matches.
+
+    Returns:
+        tuple: (filters dict in the `query_LLM_for_filters()` format, confidence in [0, 1])
+    """
+    text = " ".join(user_query.lower().replace("'", "’").split())
+    text = fast_path["synonym_pattern"].sub(lambda m: SYNONYMS[m.group(0)], text)
+
+    filters = {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None,
+               "user": None, "top_users": None, "reset": False}
+    explained = 0.0
+    ambiguous = False
+
+    def take(pattern, text):
+        found = [m.group(0) for m in pattern.finditer(text)]
+        return found, pattern.sub(" ", text)
+
+    resets, text = take(fast_path["reset_pattern"], text)
+    _, text = take(fast_path["refinement_pattern"], text)
+    filters["reset"] = bool(resets)
+
+    users, text = take(fast_path["user_pattern"], text)
+    ambiguous |= len(users) > 1
+    if users:
+        filters["user"] = int(fast_path["user_pattern"].match(users[0]).group(1))
+        explained += 1
+    for pattern, to_count in fast_path["top_user_patterns"]:
+        match = pattern.search(text)
+        if match:
+            filters["top_users"] = to_count(match)
+            text = text[:match.start()] + " " + text[match.end():]
+            explained += 1
+            break
+
+    categories, text = take(fast_path["category_pattern"], text)
+    sources, text = take(fast_path["source_pattern"], text)
+    matched_categories = {fast_path["categories"][c] for c in categories}
+    matched_sources = {fast_path["sources"][s] for s in sources}
+    ambiguous |= len(matched_categories) > 1 or len(matched_sources) > 1
+    if matched_categories:
+        filters["category"] = matched_categories.pop()
+    if matched_sources:
+        filters["source"] = matched_sources.pop()
+    explained += len(categories) + len(sources)
+
+    for pattern, to_expr in fast_path["time_patterns"]:
+        match = pattern.search(text)
+        if match:
+            ambiguous |= filters["start_time_expr"] is not None
+            filters["start_time_expr"] = to_expr(match)
+            filters["end_time_expr"] = "now"
+            text = text[:match.start()] + " " + text[match.end():]
+            explained += 1
+
+    leftover = [w for w in re.findall(r"[\w’']+", text) if w not in FILLER_WORDS]
+    for word in list(leftover):
+        close = difflib.get_close_matches(word, fast_path["fuzzy_words"], n=1, cutoff=fuzzy_cutoff)
+        if close and filters["category"] is None:
+            candidates = {v for k, v in fast_path["categories"].items() if close[0] in k.split()}
+            if len(candidates) == 1:
+                filters["category"] = candidates.pop()
+                leftover.remove(word)
+                explained += 0.8
+
+    content = explained + len(leftover)
+    if ambiguous:
+        return filters, 0.0
+    return filters, (explained / content) if content else 1.0
+
+
+def new_fast_path_stats():
+    """
+    Initializes counters for fast-path usage.
+
+    Returns:
+        dict: 'hits', 'fallbacks', 'local_seconds', 'llm_seconds', and the 'lock'
+            that guards them across server threads.
+    """
+    return {"lock": threading.Lock(), "hits": 0, "fallbacks": 0, "local_seconds": 0.0, "llm_seconds": 0.0}
+
+
+def extract_filters_with_fallback(user_query, fast_path, stats, llm_extract, min_confidence=0.9):
+    """
+    Resolves a query locally when possible and calls the LLM only for low-confidence cases.
+
+    Args:
+        user_query (str): Natural language input from the user.
+        fast_path (dict): Matchers from `build_fast_path()`.
+        stats (dict): Counters from `new_fast_path_stats()`, updated in place.
+        llm_extract (Callable[[str], Optional[dict]]): LLM-based extractor used as fallback.
+        min_confidence (float): Confidence needed to skip the LLM.
+
+    Returns:
+        Optional[dict]: Filters in the `query_LLM_for_filters()` format, or None if parsing fails.
+    """
+    start = time.perf_counter()
+    with span("fast_path"):
+        filters, confidence = extract_filters_locally(user_query, fast_path)
+    local_seconds = time.perf_counter() - start
+
+    if confidence >= min_confidence:
+        with stats["lock"]:
+            stats["local_seconds"] += local_seconds
+            stats["hits"] += 1
+        return filters
+
+    start = time.perf_counter()
+    filters = llm_extract(user_query)
+    with stats["lock"]:
+        stats["local_seconds"] += local_seconds
+        stats["llm_seconds"] += time.perf_counter() - start
+        stats["fallbacks"] += 1
+    return filters
+
+
+def fast_path_report(stats):
+    """
+    Summarizes how often the fast path avoided the LLM and the latency that saved.
+
+    The saving is estimated as the average measured LLM latency times the number
+    of fast-path hits, minus the time spent in the local extractor.
+
+    Args:
+        stats (dict): Counters from `new_fast_path_stats()`.
+
+    Returns:
+        dict: 'queries', 'hit_rate', 'avg_llm_seconds' and 'seconds_saved'.
+    """
+    with stats["lock"]:
+        stats = dict(stats)
+    queries = stats["hits"] + stats["fallbacks"]
+    avg_llm = stats["llm_seconds"] / stats["fallbacks"] if stats["fallbacks"] else 0.0
+    return {
+        "queries": queries,
+        "hit_rate": stats["hits"] / queries if queries else 0.0,
+        "avg_llm_seconds": avg_llm,
+        "seconds_saved": max(0.0, stats["hits"] * avg_llm - stats["local_seconds"]),
+    }
@@ -0,0 +1,457 @@
+import collections
+import csv
+import io
+import json
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from Chatbot.daily_counts import add_to_daily_counts, build_daily_counts
+from Chatbot.fast_path import build_fast_path
+from Chatbot.prompt import build_prompt
+from Chatbot.rollup import ROLLUP_MIN_ROWS, add_to_rollup, build_rollup, copy_rollup
+from Chatbot.semantic_index import remap_rows
+from Chatbot.store import build_message_store, category_counts, extend_message_store
+
+# The categorization scripts run from, and write their outputs to, Categorization/
+CATEGORIZATION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Categorization")
+CLUSTER_MODEL_PATH = os.path.join(CATEGORIZATION_DIR, "cluster_model.npz")
+CLUSTER_MAPPING_PATH = os.path.join(CATEGORIZATION_DIR, "cluster_category_mapping.csv")
+MAX_READ_BYTES = 16 << 20
+# Polls a failing spool batch is retried for before its bad lines are set aside
+MAX_SPOOL_RETRIES = 3
+
+logger = logging.getLogger("Chatbot.ingest")
+
+
+def open_spool(path, from_start=False):
+    """
+    Starts tailing a spool file that producers append messages to.
+
+    JSONL spools hold one JSON object per line; CSV spools (`.csv`) start with a
+    header line. Either way the fields are 'id_user', 'timestamp', 'source',
+    'message' and optionally 'category'.
+
+    Args:
+        path (str): Spool file; it does not need to exist yet.
+        from_start (bool): Also ingest lines written before the chatbot started.
+
+    Returns:
+        dict: Tailer state for `read_spool()`. Messages that cannot be ingested are
+            written to its 'dead_letter' file, `path` + '.rejected'.
+    """
+    offset = 0
+    if not from_start and os.path.exists(path):
+        offset = os.path.getsize(path)
+    return {
+        "path": path,
+        "format": "csv" if path.lower().endswith(".csv") else "jsonl",
+        "offset": offset,
+        "header": None,
+        "bad_lines": 0,
+        "retries": 0,
+        "dead_letter": path + ".rejected",
+    }
+
+
+def _read_csv_header(tailer):
+    with open(tailer["path"], newline="", encoding="utf-8") as f:
+        line = f.readline()
+    return next(csv.reader([line])) if line.endswith("\n") else None
+
+
+def read_spool(tailer, max_bytes=MAX_READ_BYTES):
+    """
+    Reads the complete lines appended since the last call.
+
+    A trailing line without a newline is left for the next call, so a producer
+    caught mid-write is never parsed. If the file shrank (rotated or truncated),
+    reading restarts from its beginning.
+
+    Args:
+        tailer (dict): State from `open_spool()`, updated in place.
+        max_bytes (int): Upper bound on bytes read per call.
+
+    Returns:
+        list: One dict per new message.
+    """
+    path = tailer["path"]
+    if not os.path.exists(path):
+        return []
+    if os.path.getsize(path) < tailer["offset"]:
+        tailer["offset"], tailer["header"] = 0, None
+
+    if tailer["format"] == "csv" and tailer["header"] is None:
+        tailer["header"] = _read_csv_header(tailer)
+        if tailer["header"] is None:
+            return []
+
+    with open(path, "rb") as f:
+        f.seek(tailer["offset"])
+        data = f.read(max_bytes)
+    complete = data[:data.rfind(b"\n") + 1]
+    start_offset = tailer["offset"]
+    tailer["offset"] += len(complete)
+    text = complete.decode("utf-8", errors="replace")
+
+    if tailer["format"] == "csv":
+        if start_offset == 0:
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+        return [dict(zip(tailer["header"], row)) for row in csv.reader(io.StringIO(text)) if row]
+
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            tailer["bad_lines"] += 1
+    return records
+
+
+def load_categorizer(model_path=CLUSTER_MODEL_PATH, mapping_path=CLUSTER_MAPPING_PATH):
+    """
+    Builds a categorizer from the saved cluster centroids and their names, if present.
+
+    Args:
+        model_path (str): Centroids saved by `Categorization/KMeans_category_clustering.py`.
+        mapping_path (str): Cluster -> category names from `name_categories.py`.
+
+    Returns:
+        Optional[Callable[[list], list]]: Maps messages to category names, or None
+            when the categorization outputs are missing.
+    """
+    if not (os.path.exists(model_path) and os.path.exists(mapping_path)):
+        return None
+    from Categorization.cluster_model import assign_clusters, load_cluster_model
+    from Categorization.embedding_store import encode_messages
+
+    centroids = load_cluster_model(model_path)["centroids"]
+    mapping = pd.read_csv(mapping_path).set_index("cluster")["category"]
+    names = np.array([mapping.get(cluster) for cluster in range(len(centroids))], dtype=object)
+
+    def categorize(messages):
+        labels, _ = assign_clusters(encode_messages(list(messages)), centroids)
+        return names[labels].tolist()
+    return categorize
+
+
+def _parse_timestamps(values, dtype=None):
+    """
+    Parses timestamps given in any mix of formats and UTC offsets.
+
+    Values with an offset ("...Z", "+01:00") are converted to UTC and values without
+    one are taken as UTC, so the result matches `dtype`'s timezone (naive by default).
+    Unparseable values become NaT.
+    """
+    parsed = pd.to_datetime(pd.Series(values), errors="coerce", format="mixed", utc=True)
+    return parsed.dt.tz_convert(getattr(dtype, "tz", None))
+
+
+def _coerce_column(values, dtype):
+    """
+    Casts raw values (e.g. the strings of a CSV spool) to a column's dtype.
+
+    Returns:
+        tuple: (cast values, boolean mask of values that were given but could not be cast)
+    """
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        cast = _parse_timestamps(values, dtype)
+    elif pd.api.types.is_numeric_dtype(dtype):
+        cast = pd.to_numeric(values, errors="coerce")
+        if not cast.isna().any():
+            cast = cast.astype(dtype)
+    else:
+        cast = values.where(values.isna(), values.astype(str))
+    return cast, cast.isna().to_numpy() & values.notna().to_numpy()
+
+
+def _prepare_batch(df, records, categorize):
+    """
+    Turns raw records into rows shaped like `df`, categorized and sorted by time.
+
+    Values are cast to the dtypes of `df`, and empty strings count as missing.
+    Rows without a valid timestamp or a message, or whose other values cannot be
+    cast (e.g. a non-numeric 'id_user'), are dropped.
+    """
+    batch = pd.DataFrame.from_records(records)
+    for column in df.columns:
+        if column not in batch.columns:
+            batch[column] = None
+    batch = batch[list(df.columns)].replace("", None)
+
+    bad = np.zeros(len(batch), dtype=bool)
+    for column in df.columns:
+        batch[column], invalid = _coerce_column(batch[column], df[column].dtype)
+        bad |= invalid
+    batch = batch[~bad & batch["timestamp"].notna().to_numpy() & batch["message"].notna().to_numpy()]
+
+    uncategorized = batch["category"].isna().to_numpy()
+    if categorize is not None and uncategorized.any():
+        batch.loc[uncategorized, "category"] = categorize(batch.loc[uncategorized, "message"].astype(str).tolist())
+    return batch.sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def _concat_rows(df, batch):
+    """Appends `batch` to `df`, widening categorical columns instead of falling back to object."""
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            unseen = pd.Index(batch[column].dropna().unique()).difference(dtype.categories)
+            if len(unseen):
+                df = df.assign(**{column: df[column].cat.add_categories(unseen)})
+            batch[column] = pd.Categorical(batch[column], categories=df[column].cat.categories)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            batch[column] = batch[column].astype(dtype)
+    return pd.concat([df, batch], ignore_index=True)
+
+
+def _extend_vocabulary(values, new_values):
+    seen = set(values)
+    return values + [value for value in pd.unique(new_values.dropna()) if value not in seen]
+
+
+def append_messages(env, records, categorize=None, stats=None):
+    """
+    Returns a new environment that also contains `records`.
+
+    The previous environment is not modified, so a server can swap the new one in
+    while turns that already started keep using the old snapshot. That copy is the
+    cost of each call: the DataFrame and the store's per-row arrays are copied, so a
+    batch costs O(rows already loaded) however small it is (about 45 ms at 2M rows).
+    Append messages in batches rather than one at a time; the server's spool loop
+    polls less often as this cost grows. Rows newer than
+    the data (the normal case) extend the indexes incrementally; late rows trigger
+    a full re-sort and rebuild, which also detaches the summary worker pool since
+    its row positions no longer apply, and moves the semantic index onto the new
+    row order.
+
+    Args:
+        env (dict): Environment from `setup_environment()`.
+        records (list): Message dicts with 'id_user', 'timestamp', 'source', 'message'
+            and optionally 'category'.
+        categorize (Optional[Callable[[list], list]]): Labels messages that arrive
+            without a category, e.g. from `load_categorizer()`.
+        stats (Optional[dict]): Counters from `new_ingest_stats()`; full rebuilds are counted.
+
+    Returns:
+        dict: The updated environment, or `env` itself if no valid rows were given.
+    """
+    df = env["df"]
+    batch = _prepare_batch(df, records, categorize)
+    if not len(batch):
+        return env
+
+    combined = _concat_rows(df, batch)
+    rollup, summary_pool, semantic_index = env.get("rollup"), env.get("summary_pool"), env.get("semantic_index")
+    try:
+        store = extend_message_store(env["store"], batch)
+        daily_counts = {**env["daily_counts"], "counts": env["daily_counts"]["counts"].copy(),
+                        "category_index": dict(store["category_index"]),
+                        "source_index": dict(store["source_index"])}
+        offset = len(df)
+        new_rows = (store["timestamps"][offset:], store["category_codes"][offset:], store["source_codes"][offset:])
+        add_to_daily_counts(daily_counts, *new_rows)
+        if rollup is not None:
+            rollup = copy_rollup(rollup)
+            add_to_rollup(rollup, *new_rows, batch["id_user"])
+    except ValueError:
+        order = np.argsort(combined["timestamp"].to_numpy(), kind="stable")
+        combined = combined.iloc[order].reset_index(drop=True)
+        if semantic_index is not None:
+            positions = np.empty(len(order), dtype=np.int64)
+            positions[order] = np.arange(len(order))
+            semantic_index = remap_rows(semantic_index, positions[:len(semantic_index["row_message"])], len(combined))
+        store = build_message_store(combined)
+        daily_counts = build_daily_counts(store)
+        rollup = summary_pool = None
+        if stats is not None:
+            stats["rebuilds"] += 1
+    if rollup is None and env.get("estimate_users") and len(combined) >= ROLLUP_MIN_ROWS:
+        rollup = build_rollup(store, combined["id_user"])
+
+    categories = _extend_vocabulary(env["categories"], batch["category"])
+    sources = _extend_vocabulary(env["sources"], batch["source"])
+    vocabulary_changed = len(categories) != len(env["categories"]) or len(sources) != len(env["sources"])
+
+    return {
+        **env,
+        "df": combined,
+        "store": store,
+        "daily_counts": daily_counts,
+        "rollup": rollup,
+        "summary_pool": summary_pool,
+        "semantic_index": semantic_index,
+        "current_time": max(env["current_time"], batch["timestamp"].max()),
+        "categories": categories,
+        "sources": sources,
+        "fast_path": build_fast_path(categories, sources) if vocabulary_changed else env["fast_path"],
+        "prompt": build_prompt(categories, sources, env["semantic_index"] is not None, category_counts(store))
+        if vocabulary_changed else env["prompt"],
+    }
+
+
+def new_ingest_stats(window=10_000):
+    """
+    Creates counters for ingestion throughput and lag.
+
+    Args:
+        window (int): Number of recent batches kept for percentiles.
+
+    Returns:
+        dict: Counters updated by `ingest_records()`.
+    """
+    return {
+        "rows": 0,
+        "batches": 0,
+        "rebuilds": 0,
+        "failed_batches": 0,
+        "rejected_rows": 0,
+        "last_error": None,
+        "busy_seconds": 0.0,
+        "batch_ms": collections.deque(maxlen=window),
+        "lag_seconds": collections.deque(maxlen=window),
+    }
+
+
+def _record_failure(stats, error, what):
+    logger.error("%s failed", what, exc_info=error)
+    stats["failed_batches"] += 1
+    stats["last_error"] = f"{type(error).__name__}: {error}"
+
+
+def ingest_records(env, records, stats, categorize=None):
+    """
+    Appends one micro-batch and records how long it took and how stale it was.
+
+    Lag is the time from the oldest message's own timestamp to the moment the batch
+    became queryable, so it is meaningful for live feeds with wall-clock timestamps.
+    A batch that cannot be appended is logged and counted in 'failed_batches'
+    before the error is raised.
+
+    Args:
+        env (dict): Current environment.
+        records (list): New message dicts.
+        stats (dict): Counters from `new_ingest_stats()`.
+        categorize (Optional[Callable[[list], list]]): See `append_messages()`.
+
+    Returns:
+        dict: The updated environment.
+    """
+    if not records:
+        return env
+    start = time.perf_counter()
+    try:
+        new_env = append_messages(env, records, categorize, stats)
+    except Exception as e:
+        _record_failure(stats, e, f"Ingesting {len(records)} messages")
+        raise
+    elapsed = time.perf_counter() - start
+
+    added = len(new_env["df"]) - len(env["df"])
+    if added:
+        timestamps = _parse_timestamps([r.get("timestamp") for r in records])
+        # Parsed timestamps are naive UTC, so the clock must be too
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        stats["lag_seconds"].append((now - timestamps.min()).total_seconds())
+    stats["rows"] += added
+    stats["batches"] += 1
+    stats["busy_seconds"] += elapsed
+    stats["batch_ms"].append(elapsed * 1000)
+    return new_env
+
+
+def _ingest_isolating_failures(env, records, stats, categorize, rejected):
+    """Ingests `records` in halves until only the messages that fail on their own are left, in `rejected`."""
+    try:
+        return ingest_records(env, records, stats, categorize)
+    except Exception:
+        if len(records) == 1:
+            rejected.extend(records)
+            return env
+    middle = len(records) // 2
+    env = _ingest_isolating_failures(env, records[:middle], stats, categorize, rejected)
+    return _ingest_isolating_failures(env, records[middle:], stats, categorize, rejected)
+
+
+def _write_dead_letter(tailer, records):
+    with open(tailer["dead_letter"], "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(record, default=str) + "\n" for record in records)
+
+
+def ingest_spool(env, tailer, stats, categorize=None, max_bytes=MAX_READ_BYTES):
+    """
+    Reads whatever was appended to the spool and ingests it as one micro-batch.
+
+    The spool position only moves past the lines once they were appended. A batch
+    that fails is logged and counted (see `ingest_records()`), `env` is returned
+    unchanged and the same lines are read again on the next call. After
+    `MAX_SPOOL_RETRIES` failed polls the batch is split until the messages that
+    fail on their own are found; those are appended to the tailer's 'dead_letter'
+    file and counted in 'rejected_rows', and the rest are ingested, so one bad line
+    cannot hold up the spool.
+
+    Args:
+        env (dict): Current environment.
+        tailer (dict): Spool state from `open_spool()`.
+        stats (dict): Counters from `new_ingest_stats()`.
+        categorize (Optional[Callable[[list], list]]): See `append_messages()`.
+        max_bytes (int): Upper bound on bytes read per batch.
+
+    Returns:
+        dict: The updated environment.
+    """
+    position = dict(tailer)
+    try:
+        records = read_spool(tailer, max_bytes)
+    except OSError as e:
+        _record_failure(stats, e, f"Reading '{tailer['path']}'")
+        return env
+    try:
+        new_env = ingest_records(env, records, stats, categorize)
+    except Exception:
+        if position["retries"] + 1 < MAX_SPOOL_RETRIES:
+            tailer.update(position, retries=position["retries"] + 1)
+            return env
+        rejected = []
+        new_env = _ingest_isolating_failures(env, records, stats, categorize, rejected)
+        if rejected:
+            _write_dead_letter(tailer, rejected)
+            stats["rejected_rows"] += len(rejected)
+            logger.error("Set aside %d messages from '%s' in '%s'", len(rejected), tailer["path"],
+                         tailer["dead_letter"])
+    tailer["retries"] = 0
+    return new_env
+
+
+def ingest_report(stats):
+    """
+    Summarizes ingestion counters.
+
+    Args:
+        stats (dict): Counters from `new_ingest_stats()`.
+
+    Returns:
+        dict: 'rows', 'batches', 'rebuilds' (batches with late rows), 'failed_batches'
+            and the 'last_error', 'rejected_rows' (spooled messages set aside after
+            repeated failures), 'rows_per_second' (while busy), 'batch_ms_p50' /
+            'batch_ms_p95' and 'lag_seconds_p50' / 'lag_seconds_p95' (None when unmeasured).
+    """
+    def percentile(values, q):
+        return float(np.percentile(values, q)) if values else None
+
+    return {
+        "rows": stats["rows"],
+        "batches": stats["batches"],
+        "rebuilds": stats["rebuilds"],
+        "failed_batches": stats["failed_batches"],
+        "rejected_rows": stats["rejected_rows"],
+        "last_error": stats["last_error"],
+        "rows_per_second": stats["rows"] / stats["busy_seconds"] if stats["busy_seconds"] else 0.0,
+        "batch_ms_p50": percentile(stats["batch_ms"], 50),
+        "batch_ms_p95": percentile(stats["batch_ms"], 95),
+        "lag_seconds_p50": percentile(stats["lag_seconds"], 50),
+        "lag_seconds_p95": percentile(stats["lag_seconds"], 95),
+    }
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import openai
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "llm_replies.json")
+
+
+def normalize_query(text):
+    """
+    Normalizes user text so trivially different phrasings share cache and fixture entries.
+
+    Lowercases, collapses whitespace and strips surrounding punctuation.
+
+    Args:
+        text (str): Raw user query.
+
+    Returns:
+        str: Normalized query.
+    """
+    return " ".join(text.lower().split()).strip(" ?!.")
+
+
+def _last_user_message(messages):
+    return next(m["content"] for m in reversed(messages) if m["role"] == "user")
+
+
+def _structured_output_unsupported(error):
+    """Whether a 400 says the model cannot take a JSON schema response format, rather than the request being bad."""
+    text = f"{error.param or ''} {error.message}".lower()
+    return (("response_format" in text or "json_schema" in text)
+            and any(phrase in text for phrase in ("not supported", "unsupported", "does not support")))
+
+
+def make_openai_backend(client, model=DEFAULT_MODEL, structured=True):
+    """
+    Creates a backend that sends chat requests to the OpenAI API (or any
+    OpenAI-compatible server configured through `OPENAI_BASE_URL`).
+
+    With `structured`, a 'response_format' passed to 'complete' is forwarded so the
+    reply follows its JSON schema. If the model answers that it does not support
+    that, the request is repeated without it and later requests stop sending it;
+    other rejected requests raise `openai.BadRequestError` as usual.
+
+    Args:
+        client (openai.OpenAI): Configured client.
+        model (str): Chat model name.
+        structured (bool): Send response schemas (structured output).
+
+    Returns:
+        dict: Backend with 'name', 'client', 'complete' and 'structured'.
+    """
+    state = {"structured": structured}
+
+    def complete(messages, response_format=None):
+        if response_format is not None and state["structured"]:
+            try:
+                response = client.chat.completions.create(model=model, messages=messages,
+                                                          response_format=response_format)
+            except openai.BadRequestError as e:
+                if not _structured_output_unsupported(e):
+                    raise
+                state["structured"] = False
+                response = client.chat.completions.create(model=model, messages=messages)
+        else:
+            response = client.chat.completions.create(model=model, messages=messages)
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            } if usage else None,
+        }
+
+    return {"name": f"openai:{model}", "client": client, "complete": complete, "structured": structured}
+
+
+def load_fixture(path):
+    """
+    Loads recorded replies keyed by normalized user query.
+
+    Args:
+        path (str): JSON file mapping query text to the raw reply content.
+
+    Returns:
+        dict: Normalized query -> reply content.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {normalize_query(query): reply for query, reply in json.load(f).items()}
+
+
+def make_fixture_backend(path=DEFAULT_FIXTURE_PATH):
+    """
+    Creates an offline backend that answers from recorded replies.
+
+    Args:
+        path (str): Fixture file written by `make_recording_backend()` or by hand.
+
+    Returns:
+        dict: Backend with 'name', 'client' (None) and 'complete'. Recorded replies are
+            already well-formed, so it ignores response schemas.
+
+    Raises:
+        KeyError: From 'complete' when the query has no recorded reply.
+    """
+    replies = load_fixture(path)
+
+    def complete(messages, response_format=None):
+        query = _last_user_message(messages)
+        key = normalize_query(query)
+        if key not in replies:
+            raise KeyError(f"No recorded LLM reply for query: {query!r}")
+        return {"content": replies[key], "usage": None}
+
+    return {"name": f"fixture:{os.path.basename(path)}", "client": None, "complete": complete}
+
+
+def make_recording_backend(inner, path=DEFAULT_FIXTURE_PATH):
+    """
+    Wraps a backend and records every reply into a fixture file, so a live run
+    can later be replayed offline with `make_fixture_backend()`.
+
+    Args:
+        inner (dict): Backend to forward requests to.
+        path (str): Fixture file to update.
+
+    Returns:
+        dict: Backend with the same interface as `inner`.
+    """
+    lock = threading.Lock()
+
+    def complete(messages, **options):
+        reply = inner["complete"](messages, **options)
+        with lock:
+            recorded = {}
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    recorded = json.load(f)
+            recorded[_last_user_message(messages)] = reply["content"]
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(recorded, f, indent=2, ensure_ascii=False)
+        return reply
+
+    return {"name": inner["name"], "client": inner.get("client"), "complete": complete,
+            "structured": inner.get("structured", False)}
+
+
+def load_backend_from_env():
+    """
+    Chooses the filter-extraction backend from environment variables.
+
+    - `CHATBOT_LLM_BACKEND`: 'openai' (default), 'fixture' or 'record'
+    - `CHATBOT_LLM_FIXTURE`: fixture file for 'fixture' and 'record'
+    - `CHATBOT_LLM_MODEL`: model name for 'openai' and 'record'
+    - `CHATBOT_LLM_STRUCTURED`: '0' to stop sending response schemas, for models or
+      servers without structured output
+    - `OPENAI_API_KEY` / `OPENAI_BASE_URL`: passed to the OpenAI client, so a local
+      stub server (`python -m Chatbot.stub_llm_server`) can stand in for the API
+
+    Returns:
+        dict: Backend with 'name', 'client' and 'complete'.
+    """
+    kind = os.getenv("CHATBOT_LLM_BACKEND", "openai").lower()
+    fixture_path = os.getenv("CHATBOT_LLM_FIXTURE", DEFAULT_FIXTURE_PATH)
+
+    if kind == "fixture":
+        return make_fixture_backend(fixture_path)
+
+    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    backend = make_openai_backend(client, os.getenv("CHATBOT_LLM_MODEL", DEFAULT_MODEL),
+                                  structured=os.getenv("CHATBOT_LLM_STRUCTURED", "1") != "0")
+    if kind == "record":
+        return make_recording_backend(backend, fixture_path)
+    if kind != "openai":
+        raise ValueError(f"Unknown CHATBOT_LLM_BACKEND: {kind!r}")
+    return backend
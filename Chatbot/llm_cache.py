@@ -0,0 +1,125 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from Chatbot.llm_backends import normalize_query
+
+
+def open_response_cache(path, max_entries=10_000, ttl_seconds=24 * 3600):
+    """
+    Opens (or creates) a persistent LRU/TTL cache for parsed LLM filter responses.
+
+    Args:
+        path (str): SQLite file to store entries in, or ':memory:'.
+        max_entries (int): Least recently used entries beyond this are evicted.
+        ttl_seconds (float): Entries older than this are treated as misses.
+
+    Returns:
+        dict: Cache state with the connection, limits and 'hits'/'misses' counters.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+    conn.commit()
+    return {
+        "conn": conn,
+        "lock": threading.Lock(),
+        "max_entries": max_entries,
+        "ttl_seconds": ttl_seconds,
+        "hits": 0,
+        "misses": 0,
+    }
+
+
+def response_cache_key(user_query, system_prompt, backend_name):
+    """
+    Builds the cache key for a filter-extraction request.
+
+    The system messages already embed the category/source vocabulary and the
+    reference date, so hashing them covers both and any prompt wording change.
+
+    Args:
+        user_query (str): Raw user query; normalized before hashing.
+        system_prompt (str): Text of the system messages sent with the query.
+        backend_name (str): Backend identifier, e.g. 'openai:gpt-4'.
+
+    Returns:
+        str: Hex digest.
+    """
+    payload = json.dumps([backend_name, normalize_query(user_query), system_prompt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_get(cache, key):
+    """
+    Looks up a cached response and refreshes its LRU position.
+
+    Args:
+        cache (dict): Cache from `open_response_cache()`.
+        key (str): Key from `response_cache_key()`.
+
+    Returns:
+        Optional[dict]: The cached filters, or None on a miss or expired entry.
+    """
+    now = time.time()
+    with cache["lock"]:
+        row = cache["conn"].execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > cache["ttl_seconds"]:
+            if row is not None:
+                cache["conn"].execute("DELETE FROM responses WHERE key = ?", (key,))
+                cache["conn"].commit()
+            cache["misses"] += 1
+            return None
+        cache["conn"].execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        cache["conn"].commit()
+        cache["hits"] += 1
+        return json.loads(row[0])
+
+
+def cache_put(cache, key, value):
+    """
+    Stores a response and evicts the least recently used entries over the limit.
+
+    Args:
+        cache (dict): Cache from `open_response_cache()`.
+        key (str): Key from `response_cache_key()`.
+        value (dict): JSON-serializable filters.
+    """
+    now = time.time()
+    with cache["lock"]:
+        conn = cache["conn"]
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        )
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (cache["max_entries"],),
+        )
+        conn.commit()
+
+
+def cache_stats(cache):
+    """
+    Summarizes cache effectiveness.
+
+    Args:
+        cache (dict): Cache from `open_response_cache()`.
+
+    Returns:
+        dict: 'hits', 'misses', 'hit_rate' and current 'entries'.
+    """
+    with cache["lock"]:
+        entries = cache["conn"].execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    lookups = cache["hits"] + cache["misses"]
+    return {
+        "hits": cache["hits"],
+        "misses": cache["misses"],
+        "hit_rate": cache["hits"] / lookups if lookups else 0.0,
+        "entries": entries,
+    }
@@ -0,0 +1,380 @@
+import difflib
+import json
+import re
+import threading
+from collections import deque
+import numpy as np
+from Chatbot.fast_path import FILLER_WORDS, GENERIC_SUFFIXES, REFINEMENT_PHRASES, RESET_PHRASES, SYNONYMS
+
+# Filters a reply can remove through "clear".
+CLEARABLE_FIELDS = ("category", "source", "start_time_expr", "end_time_expr", "semantic_query", "user", "top_users")
+
+# Vocabularies up to this size are listed in the static prompt; larger ones are
+# narrowed to the RETRIEVED_CATEGORIES most relevant categories per request.
+PROMPT_CATEGORY_LIMIT = 50
+RETRIEVED_CATEGORIES = 15
+
+_WORD = re.compile(r"[\w’']+")
+
+
+def _valid_reply_value(key, value):
+    """Whether a reply value has its field's type; anything else is treated as not given."""
+    if key == "clear":
+        return isinstance(value, list) and all(item in CLEARABLE_FIELDS for item in value)
+    if key == "reset":
+        return isinstance(value, bool)
+    if key in ("user", "top_users"):
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _query_words(text):
+    """Lowercased, synonym-normalized and singularized content words of a query."""
+    text = text.lower()
+    for phrase, replacement in SYNONYMS.items():
+        text = text.replace(phrase, replacement)
+    return {_stem(word) for word in _WORD.findall(text) if word not in FILLER_WORDS}
+
+
+def _vocabulary_list(values):
+    return "; ".join(values)
+
+
+def _nullable(schema):
+    if "enum" in schema:
+        return {**schema, "type": [schema["type"], "null"], "enum": schema["enum"] + [None]}
+    return {**schema, "type": [schema["type"], "null"]}
+
+
+def filter_schema(categories, sources, semantic=False):
+    """
+    Builds the JSON schema of a filter-extraction reply for strict structured output.
+
+    Every field is required (null when unchanged) and no other keys are allowed,
+    as strict mode demands. Categories are an enum unless the vocabulary is too
+    large to list in the prompt.
+
+    Args:
+        categories (list): Valid category names.
+        sources (list): Valid source names.
+        semantic (bool): Include "semantic_query".
+
+    Returns:
+        dict: JSON schema of the reply object.
+    """
+    category = {"type": "string"}
+    if len(categories) <= PROMPT_CATEGORY_LIMIT:
+        category["enum"] = list(categories)
+    properties = {
+        "category": _nullable(category),
+        "source": _nullable({"type": "string", "enum": list(sources)}),
+        "start_time_expr": _nullable({"type": "string"}),
+        "end_time_expr": _nullable({"type": "string"}),
+        "semantic_query": _nullable({"type": "string"}),
+        "user": _nullable({"type": "integer"}),
+        "top_users": _nullable({"type": "integer"}),
+        "clear": {"type": "array", "items": {"type": "string", "enum": list(CLEARABLE_FIELDS)}},
+        "reset": {"type": "boolean"},
+    }
+    if not semantic:
+        del properties["semantic_query"]
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def build_prompt(categories, sources, semantic=False, category_counts=None):
+    """
+    Builds the filter-extraction prompt once for a vocabulary.
+
+    The returned 'prefix' is the system message sent unchanged with every request,
+    so provider-side prefix caching can reuse it. Anything that varies per request
+    (the date, the current filters and, for large vocabularies, the candidate
+    categories) goes in a second message built by `prompt_messages()`. Replies are
+    changes to the current filters; 'response_format' asks backends with structured
+    output for exactly the fields of `filter_schema()`.
+
+    Args:
+        categories (list): Valid category names.
+        sources (list): Valid source names.
+        semantic (bool): Describe the "semantic_query" field (a semantic index is loaded).
+        category_counts (Optional[dict]): Messages per lowercase category name, from
+            `Chatbot.store.category_counts()`; ranks candidates that match no query word.
+
+    Returns:
+        dict: 'prefix' (str), 'response_format' and 'fields' (the reply's keys), plus
+            the category retrieval index; 'category_words' is None when every category
+            is listed in the prefix.
+    """
+    def quoted(phrases):
+        return ", ".join(f"\"{p}\"" for p in phrases[:-1]) + f", or \"{phrases[-1]}\""
+
+    retrieve = len(categories) > PROMPT_CATEGORY_LIMIT
+    vocabulary = (
+        "Valid categories (exact match only) are listed with each request.\n" if retrieve
+        else f"Valid categories (exact match only): {_vocabulary_list(categories)}\n"
+    )
+
+    semantic_field = semantic_rules = ""
+    if semantic:
+        semantic_field = "  \"semantic_query\": (short description of the message content the user asks about, or null),\n"
+        semantic_rules = (
+            "Use \"semantic_query\" only for topics that are not a valid category, e.g. \"messages about the cashback piggy\" -> \"cashback piggy\".\n"
+            "Set it to null when the category already describes the request.\n\n"
+        )
+
+    prefix = (
+        "You are a data assistant extracting structured filters from user queries about categorized customer support messages.\n\n"
+        f"{vocabulary}"
+        f"Valid sources: {_vocabulary_list(sources)}\n\n"
+        "Each request lists the filters currently applied (\"Current filters\"). Return only the changes the user asks for, "
+        "as a strict JSON object with these keys:\n"
+        "{\n"
+        "  \"category\": (exact string from valid categories, or null),\n"
+        "  \"source\": (exact string from valid sources, or null),\n"
+        "  \"start_time_expr\": (human-readable date expression or null),\n"
+        "  \"end_time_expr\": (human-readable date expression or null),\n"
+        f"{semantic_field}"
+        "  \"user\": (numeric id_user when the query is about one user, e.g. \"user 4844\" -> 4844, or null),\n"
+        "  \"top_users\": (how many of the users with the most messages to list when the user asks who contacted them most or about repeat contacters, 10 if no number is given, or null),\n"
+        f"  \"clear\": (current filters to remove, from {', '.join(CLEARABLE_FIELDS)}; e.g. \"all sources\" -> [\"source\"]; otherwise []),\n"
+        "  \"reset\": (true if this is a new query and filters should be cleared, otherwise false)\n"
+        "}\n\n"
+        "A null field keeps the current value. Do not repeat current filters the user did not mention.\n\n"
+        f"{semantic_rules}"
+        "Time filtering rules:\n"
+        "- Use expressions like \"1 day ago\", \"Monday\", or \"today\".\n"
+        "- Avoid vague terms like \"past week\".\n\n"
+        "Do not use phrases like this Monday. Instead use absolute or relative phrases like Monday, 7 days ago, or today.\n"
+        "If the user does not specify an end time, set \"end_time_expr\": \"now\".\n"
+        "Avoid paraphrasing expressions like \"this week\" into \"7 days ago\". Instead, use \"Monday\" to represent the start of the current week.\n"
+        f"If the user says something like {quoted(RESET_PHRASES)}, then:\n"
+        "- Set all filter fields (category, source, time) explicitly\n"
+        "- Set \"reset\": true\n\n"
+        "If the user is refining the current query, using phrases like:\n"
+        f"{quoted(REFINEMENT_PHRASES)},\n"
+        "- Only update the fields mentioned\n"
+        "- Leave others as null\n"
+        "- Set \"reset\": false\n\n"
+        "Use \"reset\": false by default unless the user explicitly indicates a reset.\n"
+        "Return ONLY the raw JSON object — no commentary.\n"
+    )
+
+    category_words = similar_words = None
+    if retrieve:
+        category_words, similar_words = {}, {}
+        for position, category in enumerate(categories):
+            for word in {_stem(w) for w in _WORD.findall(category.lower())} - GENERIC_SUFFIXES:
+                category_words.setdefault(word, []).append(position)
+        # Close spellings are only looked up among words with the same first letter
+        for word in sorted(category_words):
+            similar_words.setdefault(word[0], []).append(word)
+    counts = category_counts or {}
+    schema = filter_schema(categories, sources, semantic)
+    return {
+        "prefix": prefix,
+        "response_format": {"type": "json_schema", "json_schema": {"name": "filter_changes", "strict": True, "schema": schema}},
+        "fields": tuple(schema["properties"]),
+        "categories": list(categories),
+        "category_words": category_words,
+        "similar_words": similar_words,
+        "popular": sorted(range(len(categories)), key=lambda i: -counts.get(categories[i].lower(), 0)),
+    }
+
+
+def relevant_categories(prompt, user_query, limit=RETRIEVED_CATEGORIES, fuzzy_cutoff=0.85):
+    """
+    Picks the categories most likely meant by a query.
+
+    Categories score one point per distinctive word (generic words like "issues"
+    are ignored) found in the query, 0.8 for a close spelling with the same first
+    letter. Remaining slots are
+    filled with the categories that have the most messages.
+
+    Args:
+        prompt (dict): Prompt from `build_prompt()` for a large vocabulary.
+        user_query (str): Natural language input from the user.
+        limit (int): Number of categories to return.
+        fuzzy_cutoff (float): Minimum difflib similarity for close spellings.
+
+    Returns:
+        list: Category names, best first.
+    """
+    scores = {}
+    for word in _query_words(user_query):
+        if word in prompt["category_words"]:
+            matches = [(word, 1.0)]
+        else:
+            candidates = prompt["similar_words"].get(word[0], [])
+            matches = [(w, 0.8) for w in difflib.get_close_matches(word, candidates, n=3, cutoff=fuzzy_cutoff)]
+        for match, weight in matches:
+            for position in prompt["category_words"][match]:
+                scores[position] = scores.get(position, 0.0) + weight
+
+    ranked = sorted(scores, key=lambda position: -scores[position])[:limit]
+    chosen = set(ranked)
+    for position in prompt["popular"]:
+        if len(ranked) >= limit:
+            break
+        if position not in chosen:
+            ranked.append(position)
+    return [prompt["categories"][position] for position in ranked]
+
+
+def compact_filters(current_filter):
+    """Serializes the set fields of a filter context as short JSON, or 'none' when nothing is set."""
+    current = {key: value for key, value in (current_filter or {}).items() if value is not None}
+    return json.dumps(current, separators=(",", ":"), ensure_ascii=False, default=str) if current else "none"
+
+
+def prompt_messages(prompt, user_query, current_time, current_filter=None):
+    """
+    Builds the chat messages for one filter-extraction request.
+
+    Only the date is given, not the time of day: replies are relative expressions
+    resolved locally against the exact current time, so the messages (and the
+    response cache key) stay the same while new messages are ingested during a day.
+
+    Args:
+        prompt (dict): Prompt from `build_prompt()`.
+        user_query (str): Natural language input from the user.
+        current_time (datetime): Reference time of the data.
+        current_filter (Optional[dict]): The conversation's filter context, sent so the
+            reply can be a change to it; omitted when None.
+
+    Returns:
+        list: Chat messages: the static prefix, the per-request context and the query.
+    """
+    context = f"Today is {current_time:%A, %Y-%m-%d}."
+    if current_filter is not None:
+        context += f"\nCurrent filters: {compact_filters(current_filter)}"
+    if prompt["category_words"] is not None:
+        context += f"\nValid categories for this request: {_vocabulary_list(relevant_categories(prompt, user_query))}"
+    return [
+        {"role": "system", "content": prompt["prefix"]},
+        {"role": "system", "content": context},
+        {"role": "user", "content": user_query},
+    ]
+
+
+def parse_filter_reply(content, prompt):
+    """
+    Reads the filter changes from an LLM reply.
+
+    Structured-output replies are the JSON object itself. Replies from backends
+    without it may wrap the object in prose or a code fence, so the first JSON
+    object in the text is decoded instead.
+
+    Args:
+        content (str): Reply text.
+        prompt (dict): Prompt from `build_prompt()`; keys outside its 'fields' are dropped.
+
+    Returns:
+        Optional[dict]: The reply's fields, or None when it holds no JSON object. Values
+            of the wrong type (a number for "category", say) are dropped, leaving that
+            filter unchanged.
+    """
+    text = content.strip()
+    try:
+        reply = json.loads(text)
+    except json.JSONDecodeError:
+        start = text.find("{")
+        try:
+            reply = json.JSONDecoder().raw_decode(text[start:])[0] if start >= 0 else None
+        except json.JSONDecodeError:
+            reply = None
+    if not isinstance(reply, dict):
+        return None
+    return {key: value for key, value in reply.items()
+            if key in prompt["fields"] and (value is None or _valid_reply_value(key, value))}
+
+
+def new_llm_stats(window=10_000):
+    """
+    Creates per-request token and latency counters for the filter-extraction LLM.
+
+    Args:
+        window (int): Number of recent requests kept for averages and percentiles.
+
+    Returns:
+        dict: Counters updated by `record_llm_request()`, including 'structured'
+            (requests sent with a response schema) and 'parse_failures' (replies
+            without filters), and the 'lock' that guards them across server threads.
+    """
+    return {
+        "lock": threading.Lock(),
+        "requests": 0,
+        "estimated": 0,
+        "structured": 0,
+        "parse_failures": 0,
+        "prompt_tokens": deque(maxlen=window),
+        "cached_tokens": deque(maxlen=window),
+        "completion_tokens": deque(maxlen=window),
+        "latency_ms": deque(maxlen=window),
+    }
+
+
+def record_llm_request(stats, messages, reply, seconds, structured=False, parsed=True):
+    """
+    Records the token usage, latency and outcome of one LLM request.
+
+    Backends that report no usage (the fixture backend) are estimated at four
+    characters per token and counted in 'estimated'.
+
+    Args:
+        stats (dict): Counters from `new_llm_stats()`.
+        messages (list): Chat messages that were sent.
+        reply (dict): Reply from the backend's 'complete'.
+        seconds (float): Request latency.
+        structured (bool): Whether the request carried a response schema.
+        parsed (bool): Whether filters could be read from the reply.
+    """
+    usage = reply.get("usage")
+    estimated = not usage
+    if estimated:
+        usage = {
+            "prompt_tokens": sum(len(m["content"]) for m in messages) // 4,
+            "completion_tokens": len(reply["content"]) // 4,
+        }
+    with stats["lock"]:
+        stats["requests"] += 1
+        stats["estimated"] += estimated
+        stats["structured"] += structured
+        stats["parse_failures"] += not parsed
+        stats["prompt_tokens"].append(usage["prompt_tokens"])
+        stats["cached_tokens"].append(usage.get("cached_tokens") or 0)
+        stats["completion_tokens"].append(usage["completion_tokens"])
+        stats["latency_ms"].append(seconds * 1000)
+
+
+def llm_report(stats):
+    """
+    Summarizes token usage and latency of recent LLM requests.
+
+    Args:
+        stats (dict): Counters from `new_llm_stats()`.
+
+    Returns:
+        dict: 'requests', 'estimated', average 'prompt_tokens' / 'completion_tokens',
+            'cached_share' (share of prompt tokens served from the provider's prefix
+            cache), 'latency_ms_p50' / 'latency_ms_p95', 'structured_share' and
+            'parse_failure_rate'.
+    """
+    with stats["lock"]:
+        stats = {**stats, **{key: list(stats[key]) for key in
+                             ("prompt_tokens", "cached_tokens", "completion_tokens", "latency_ms")}}
+    prompt_tokens = np.array(stats["prompt_tokens"], dtype=float)
+    latency = np.array(stats["latency_ms"], dtype=float)
+    return {
+        "requests": stats["requests"],
+        "estimated": stats["estimated"],
+        "prompt_tokens": float(prompt_tokens.mean()) if len(prompt_tokens) else 0.0,
+        "completion_tokens": float(np.mean(stats["completion_tokens"])) if len(latency) else 0.0,
+        "cached_share": float(sum(stats["cached_tokens"]) / prompt_tokens.sum()) if prompt_tokens.sum() else 0.0,
+        "latency_ms_p50": float(np.percentile(latency, 50)) if len(latency) else 0.0,
+        "latency_ms_p95": float(np.percentile(latency, 95)) if len(latency) else 0.0,
+        "structured_share": stats["structured"] / stats["requests"] if stats["requests"] else 0.0,
+        "parse_failure_rate": stats["parse_failures"] / stats["requests"] if stats["requests"] else 0.0,
+    }
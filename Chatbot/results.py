@@ -0,0 +1,199 @@
+"""
+Cursor-style access to the full result of a filter context.
+
+A cursor remembers where in timestamp order the last page ended, not which
+filters produced it, so a session can page through "cashout issues", refine to
+"only telegram" and keep reading from the same point in time. Pages and exports
+read the rows they return straight from the store's posting lists; the matching
+rows are never collected into one DataFrame.
+
+All functions take filters already resolved by `Chatbot.chatbot.resolve_filters()`.
+"""
+import os
+import numpy as np
+from Chatbot.semantic_index import search
+from Chatbot.store import select_page, select_rows
+
+PAGE_SIZE = 50
+EXPORT_CHUNK_ROWS = 10_000
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def new_cursor(page_size=PAGE_SIZE):
+    """
+    Creates a cursor positioned before the first matching row.
+
+    Args:
+        page_size (int): Rows per page.
+
+    Returns:
+        dict: 'page_size', the sorted position and timestamp of the last row returned
+            ('after', 'timestamp'), and for semantic queries, the 'offset' into the
+            ranked matches of 'semantic_query'.
+    """
+    return {"page_size": page_size, "after": -1, "timestamp": None, "offset": 0, "semantic_query": None}
+
+
+def update_cursor(cursor, new_user_filters):
+    """
+    Keeps the cursor across refinements and rewinds it when the filters are reset.
+
+    Args:
+        cursor (dict): Cursor from `new_cursor()`.
+        new_user_filters (dict): Filters extracted from the latest query.
+
+    Returns:
+        dict: The cursor to use for the next page.
+    """
+    return new_cursor(cursor["page_size"]) if new_user_filters.get("reset") else cursor
+
+
+def _resume_position(store, cursor):
+    """
+    Returns the cursor's sorted position in `store`.
+
+    Appending newer rows keeps positions; a rebuild after late rows shifts them,
+    in which case the position is found again from the timestamp.
+    """
+    after, timestamp = cursor["after"], cursor["timestamp"]
+    timestamps = store["timestamps"]
+    if timestamp is None or (after < len(timestamps) and timestamps[after] == timestamp):
+        return after
+    return int(np.searchsorted(timestamps, timestamp, side="right")) - 1
+
+
+def fetch_page(env, query, cursor, semantic_query=None):
+    """
+    Returns the next page of rows matching a filter context.
+
+    Only the page is read: its start is found with binary searches over the store's
+    indexes, so the first page of a result with millions of rows costs the same as
+    one of a small result. Semantic queries page through their ranked matches instead.
+
+    Args:
+        env (dict): Environment dictionary from `Chatbot.chatbot.setup_environment()`.
+        query (dict): Resolved filters from `Chatbot.chatbot.resolve_filters()`.
+        cursor (dict): Cursor from `new_cursor()`; not modified.
+        semantic_query (Optional[str]): The context's semantic query; ignored
+            without `env['semantic_index']`.
+
+    Returns:
+        tuple: (page as a DataFrame, advanced cursor, info dict with 'total' matching
+            rows and 'start' / 'end', the 1-based row numbers of the page within them)
+    """
+    df, store = env["df"], env["store"]
+    cursor = dict(cursor)
+
+    if semantic_query and env.get("semantic_index") is not None:
+        if cursor["semantic_query"] != semantic_query:
+            cursor.update(offset=0, semantic_query=semantic_query)
+        rows = search(env["semantic_index"], semantic_query, candidate_rows=select_rows(store, **query))
+        skipped = cursor["offset"]
+        page_rows = np.asarray(rows[skipped:skipped + cursor["page_size"]])
+        cursor["offset"] = skipped + len(page_rows)
+        total = len(rows)
+    else:
+        positions, total, skipped = select_page(store, after=_resume_position(store, cursor),
+                                                limit=cursor["page_size"], **query)
+        if len(positions):
+            cursor.update(after=int(positions[-1]), timestamp=int(store["timestamps"][positions[-1]]))
+        page_rows = positions if store["order"] is None else store["order"][positions]
+
+    info = {"total": total, "start": skipped + 1 if len(page_rows) else skipped, "end": skipped + len(page_rows)}
+    return df.iloc[page_rows], cursor, info
+
+
+def iter_result_rows(env, query, semantic_query=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yields every row matching a filter context as DataFrames of at most `chunk_rows` rows.
+
+    Args:
+        env (dict): Environment dictionary from `Chatbot.chatbot.setup_environment()`.
+        query (dict): Resolved filters from `Chatbot.chatbot.resolve_filters()`.
+        semantic_query (Optional[str]): The context's semantic query.
+        chunk_rows (int): Rows per chunk.
+
+    Yields:
+        pd.DataFrame: Consecutive rows in timestamp order (similarity order for semantic queries).
+    """
+    cursor = new_cursor(chunk_rows)
+    while True:
+        chunk, cursor, info = fetch_page(env, query, cursor, semantic_query)
+        if not len(chunk):
+            return
+        yield chunk
+        if info["end"] >= info["total"]:
+            return
+
+
+def _serialize(chunk, fmt, header):
+    if fmt == "csv":
+        return chunk.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S")
+    text = chunk.to_json(orient="records", lines=True, date_format="iso")
+    # Older pandas versions leave out the final newline
+    return text if text.endswith("\n") else text + "\n"
+
+
+def iter_export(env, query, fmt="csv", semantic_query=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Serializes the rows matching a filter context chunk by chunk.
+
+    Args:
+        env (dict): Environment dictionary from `Chatbot.chatbot.setup_environment()`.
+        query (dict): Resolved filters from `Chatbot.chatbot.resolve_filters()`.
+        fmt (str): 'csv' (with a header line) or 'jsonl' (one JSON object per message).
+        semantic_query (Optional[str]): The context's semantic query.
+        chunk_rows (int): Rows serialized at a time.
+
+    Yields:
+        str: Consecutive pieces of the file.
+
+    Raises:
+        ValueError: If `fmt` is not one of `EXPORT_FORMATS`.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {EXPORT_FORMATS}")
+
+    header = fmt == "csv"
+    for chunk in iter_result_rows(env, query, semantic_query, chunk_rows):
+        yield _serialize(chunk, fmt, header)
+        header = False
+    if header:
+        # Empty result: still a valid CSV file
+        yield _serialize(env["df"].iloc[:0], fmt, header)
+
+
+def export_results(env, query, path, fmt=None, semantic_query=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Writes every row matching a filter context to a CSV or JSONL file.
+
+    Memory use is bounded by one chunk, whatever the size of the result.
+
+    Args:
+        env (dict): Environment dictionary from `Chatbot.chatbot.setup_environment()`.
+        query (dict): Resolved filters from `Chatbot.chatbot.resolve_filters()`.
+        path (str): Output file.
+        fmt (Optional[str]): 'csv' or 'jsonl'; taken from the file extension when omitted.
+        semantic_query (Optional[str]): The context's semantic query.
+        chunk_rows (int): Rows serialized at a time.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ValueError: If the format is not one of `EXPORT_FORMATS`.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {EXPORT_FORMATS}")
+
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        header = fmt == "csv"
+        for chunk in iter_result_rows(env, query, semantic_query, chunk_rows):
+            f.write(_serialize(chunk, fmt, header))
+            header = False
+            rows += len(chunk)
+        if header:
+            f.write(_serialize(env["df"].iloc[:0], fmt, header))
+    return rows
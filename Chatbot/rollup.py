@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+from Chatbot.daily_counts import DAY_NS
+
+HOUR_NS = 3_600 * 10**9
+HLL_PRECISION = 11
+ROLLUP_MIN_ROWS = 100_000
+
+
+def user_hashes(values):
+    """
+    Hashes user ids to 64 bits, treating 7 and 7.0 as the same user.
+
+    Args:
+        values (pd.Series | np.ndarray): User ids; missing ids are skipped.
+
+    Returns:
+        np.ndarray: uint64 hashes of the non-missing ids.
+    """
+    values = pd.Series(values).dropna()
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.util.hash_array(values.to_numpy(dtype=np.float64))
+    return pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+
+
+def _hll_update(registers, buckets, hashes):
+    """
+    Folds hashes into HyperLogLog registers in place.
+
+    Args:
+        registers (np.ndarray): uint8 array of shape (num_buckets, 2 ** HLL_PRECISION).
+        buckets (np.ndarray): Bucket of each hash.
+        hashes (np.ndarray): uint64 hashes.
+    """
+    suffix_bits = 64 - HLL_PRECISION
+    prefix = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+    suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+    # Rank = position of the leftmost 1-bit in the suffix, counting from 1
+    _, bit_length = np.frexp(suffix.astype(np.float64))
+    rank = np.where(suffix == 0, suffix_bits + 1, suffix_bits - bit_length + 1).astype(np.uint8)
+    np.maximum.at(registers, (buckets, prefix), rank)
+
+
+def hll_estimate(registers):
+    """
+    Estimates the number of distinct values folded into one set of HyperLogLog registers.
+
+    Args:
+        registers (np.ndarray): uint8 registers of length 2 ** HLL_PRECISION.
+
+    Returns:
+        float: Estimated distinct count (linear counting for small cardinalities).
+    """
+    m = len(registers)
+    zeros = int(np.count_nonzero(registers == 0))
+    raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    if raw <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return raw
+
+
+def build_rollup(store, user_ids):
+    """
+    Pre-aggregates messages into source × category × time buckets.
+
+    Slot 0 of the source and category axes holds messages without a source or
+    category and slot `code + 1` holds each value, so any filter combination is a
+    slice of the arrays.
+
+    Only (source, category, day) cells with messages get a 2 KiB user sketch; the
+    other cells point at the empty sketch in row 0. Memory is 192 bytes of hourly
+    counts plus 4 bytes of sketch index per (source slot, category slot, day),
+    plus 2 KiB per occupied cell, so the sketches never outgrow 2 KiB per row. A
+    year of 5 sources and 500 categories takes about 215 MB before the sketches,
+    where a sketch in every cell would take 2.2 GB.
+
+    Args:
+        store (dict): Store from `Chatbot.store.build_message_store()`.
+        user_ids (pd.Series | np.ndarray): 'id_user' of the same rows.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'hour_counts': int64 message counts of shape (source slots, category slots, hours)
+            - 'first_hour': Hour number (hours since the epoch) of the first column
+            - 'day_cells': int32 row of 'day_sketches' per cell, 0 for cells without
+              users, shape (source slots, category slots, days)
+            - 'day_sketches': uint8 HyperLogLog registers of the users, shape
+              (occupied cells + 1, 2 ** HLL_PRECISION)
+            - 'first_day': Day number (days since the epoch) of the first day
+    """
+    shape = (len(store["source_index"]) + 1, len(store["category_index"]) + 1, 0)
+    rollup = {
+        "hour_counts": np.zeros(shape, dtype=np.int64),
+        "first_hour": 0,
+        "day_cells": np.zeros(shape, dtype=np.int32),
+        "day_sketches": np.zeros((1, 1 << HLL_PRECISION), dtype=np.uint8),
+        "first_day": 0,
+    }
+    add_to_rollup(rollup, store["timestamps"], store["category_codes"], store["source_codes"], user_ids)
+    return rollup
+
+
+def _grow(array, first, buckets, num_sources, num_categories):
+    """
+    Zero-pads `array` so its time axis covers `buckets` and the first two axes fit the vocabularies.
+
+    Returns:
+        tuple: (grown array, new first bucket)
+    """
+    new_first = min(first, int(buckets.min())) if array.shape[2] else int(buckets.min())
+    last = first + array.shape[2] - 1 if array.shape[2] else new_first
+    new_last = max(last, int(buckets.max()))
+    shape = (max(num_sources, array.shape[0]), max(num_categories, array.shape[1]),
+             new_last - new_first + 1)
+    if array.shape == shape:
+        return array, new_first
+    grown = np.zeros(shape, dtype=array.dtype)
+    offset = first - new_first if array.shape[2] else 0
+    grown[:array.shape[0], :array.shape[1], offset:offset + array.shape[2]] = array
+    return grown, new_first
+
+
+def add_to_rollup(rollup, timestamps, category_codes, source_codes, user_ids):
+    """
+    Adds new messages to the rollup in place, growing it for new hours, days,
+    categories and sources and adding a sketch for each new occupied cell.
+
+    Args:
+        rollup (dict): Rollup from `build_rollup()`.
+        timestamps (np.ndarray): int64 nanosecond timestamps of the new messages.
+        category_codes (np.ndarray): Category code per message, -1 if missing.
+        source_codes (np.ndarray): Source code per message, -1 if missing.
+        user_ids (pd.Series | np.ndarray): 'id_user' per message.
+    """
+    if not len(timestamps):
+        return
+    source_slots = source_codes + 1
+    category_slots = category_codes + 1
+    num_sources, num_categories = int(source_slots.max()) + 1, int(category_slots.max()) + 1
+
+    hours = timestamps // HOUR_NS
+    counts, first_hour = _grow(rollup["hour_counts"], rollup["first_hour"], hours, num_sources, num_categories)
+    flat = np.ravel_multi_index((source_slots, category_slots, hours - first_hour), counts.shape)
+    counts += np.bincount(flat, minlength=counts.size).reshape(counts.shape)
+    rollup["hour_counts"], rollup["first_hour"] = counts, first_hour
+
+    days = timestamps // DAY_NS
+    cells, first_day = _grow(rollup["day_cells"], rollup["first_day"], days, num_sources, num_categories)
+    has_user = pd.notna(np.asarray(user_ids))
+    flat = np.ravel_multi_index(
+        (source_slots[has_user], category_slots[has_user], days[has_user] - first_day), cells.shape
+    )
+    sketches = rollup["day_sketches"]
+    new_cells = np.unique(flat[cells.flat[flat] == 0])
+    if len(new_cells):
+        cells.flat[new_cells] = np.arange(len(sketches), len(sketches) + len(new_cells))
+        sketches = np.concatenate([sketches, np.zeros((len(new_cells), sketches.shape[1]), dtype=np.uint8)])
+    _hll_update(sketches, cells.flat[flat], user_hashes(np.asarray(user_ids)[has_user]))
+    rollup["day_cells"], rollup["day_sketches"], rollup["first_day"] = cells, sketches, first_day
+
+
+def copy_rollup(rollup):
+    """Returns a copy that `add_to_rollup()` can grow without changing `rollup`."""
+    return {**rollup, "hour_counts": rollup["hour_counts"].copy(), "day_cells": rollup["day_cells"].copy(),
+            "day_sketches": rollup["day_sketches"].copy()}
+
+
+def _slots(store, category, source):
+    """Rollup slots selected by the filters, as index lists or slices over all slots."""
+    source_slots = [store["source_index"][source.lower()] + 1] if source else slice(None)
+    category_slots = [store["category_index"][category.lower()] + 1] if category else slice(None)
+    return source_slots, category_slots
+
+
+def _bounds(rows):
+    """First and last sorted position of a non-empty selection."""
+    if isinstance(rows, slice):
+        return rows.start, rows.stop - 1
+    return int(rows[0]), int(rows[-1])
+
+
+def _rows_between(rows, lo, hi):
+    """Selected positions in [lo, hi)."""
+    if isinstance(rows, slice):
+        return np.arange(max(lo, rows.start), min(hi, rows.stop))
+    return rows[np.searchsorted(rows, lo, side="left"):np.searchsorted(rows, hi, side="left")]
+
+
+def _position(store, timestamp_ns):
+    return int(np.searchsorted(store["timestamps"], timestamp_ns, side="left"))
+
+
+def rollup_users(rollup, store, user_ids, rows, category=None, source=None):
+    """
+    Estimates the distinct users among the selected rows.
+
+    Days entirely inside the selection's time range come from the day sketches;
+    only the rows of the first and last (partial) day are read.
+
+    Args:
+        rollup (dict): Rollup from `build_rollup()` over `store`.
+        store (dict): Time-sorted store the rows were selected from.
+        user_ids (pd.Series): 'id_user' column of the indexed DataFrame.
+        rows (slice | np.ndarray): Non-empty result of `select_rows()` for these filters.
+        category (Optional[str]): Category filter of the selection.
+        source (Optional[str]): Source filter of the selection.
+
+    Returns:
+        int: Estimated number of distinct users (about 2% standard error).
+    """
+    first, last = _bounds(rows)
+    timestamps = store["timestamps"]
+    first_full_day = -(-int(timestamps[first]) // DAY_NS)
+    end_full_day = (int(timestamps[last]) + 1) // DAY_NS
+
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    if end_full_day > first_full_day:
+        source_slots, category_slots = _slots(store, category, source)
+        days = slice(first_full_day - rollup["first_day"], end_full_day - rollup["first_day"])
+        cells = rollup["day_cells"][source_slots][:, category_slots][:, :, days]
+        registers = rollup["day_sketches"][cells[cells > 0]].max(axis=0, initial=0)
+        edge_rows = np.concatenate([
+            _rows_between(rows, first, _position(store, first_full_day * DAY_NS)),
+            _rows_between(rows, _position(store, end_full_day * DAY_NS), last + 1),
+        ])
+    else:
+        edge_rows = _rows_between(rows, first, last + 1)
+
+    hashes = user_hashes(user_ids.iloc[edge_rows])
+    _hll_update(registers.reshape(1, -1), np.zeros(len(hashes), dtype=np.int64), hashes)
+    return int(round(hll_estimate(registers)))
+
+
+def rollup_day_counts(rollup, store, rows, category=None, source=None):
+    """
+    Counts the selected rows per calendar day from the hourly buckets.
+
+    Whole hours are read from the rollup; the first and last (partial) hour of the
+    selection are counted from the store's sorted positions.
+
+    Args:
+        rollup (dict): Rollup from `build_rollup()` over `store`.
+        store (dict): Time-sorted store the rows were selected from.
+        rows (slice | np.ndarray): Non-empty result of `select_rows()` for these filters.
+        category (Optional[str]): Category filter of the selection.
+        source (Optional[str]): Source filter of the selection.
+
+    Returns:
+        tuple: (day numbers since the epoch, counts) for days with messages, as
+            `Chatbot.daily_counts.count_by_day()` returns for the selected rows.
+    """
+    first, last = _bounds(rows)
+    timestamps = store["timestamps"]
+    first_hour = int(timestamps[first]) // HOUR_NS
+    last_hour = int(timestamps[last]) // HOUR_NS
+
+    source_slots, category_slots = _slots(store, category, source)
+    hours = slice(first_hour - rollup["first_hour"], last_hour - rollup["first_hour"] + 1)
+    hourly = rollup["hour_counts"][source_slots][:, category_slots][:, :, hours].sum(axis=(0, 1))
+    for hour in {first_hour, last_hour}:
+        lo = max(first, _position(store, hour * HOUR_NS))
+        hi = min(last + 1, _position(store, (hour + 1) * HOUR_NS))
+        hourly[hour - first_hour] = len(_rows_between(rows, lo, hi))
+
+    first_day = first_hour * HOUR_NS // DAY_NS
+    day_of_hour = np.arange(first_hour, last_hour + 1) * HOUR_NS // DAY_NS - first_day
+    counts = np.bincount(day_of_hour, weights=hourly).astype(np.int64)
+    days = np.arange(first_day, first_day + len(counts))
+    return days[counts > 0], counts[counts > 0]
@@ -0,0 +1,375 @@
+"""
+Persistent vector index for semantic message search.
+
+Usage:
+    python -m Chatbot.semantic_index                          # build or refresh the index
+    python -m Chatbot.semantic_index --query "cashback piggy" # build, then time a search
+
+Each distinct message text is embedded once with the model used in
+`Categorization/` (reusing its `embeddings/` store) and added to an ANN index:
+hnswlib or faiss when installed, otherwise an exact NumPy scan.
+The chatbot loads the index when it matches the current data.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from Categorization.embedding_store import (
+    MODEL_NAME, STORE_DIR, embed_texts, encode_messages, message_keys, open_store, start_encoder_pool,
+    vectors_for_keys,
+)
+
+INDEX_DIR = ".semantic_index"
+INDEX_VERSION = 1
+META_NAME = "meta.json"
+DEFAULT_TOP_K = 50
+# Filtered candidate sets up to this many distinct messages are scored exactly
+EXACT_SEARCH_LIMIT = 20_000
+BACKENDS = ("hnswlib", "faiss", "numpy")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _default_backend():
+    for backend in BACKENDS[:-1]:
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            pass
+    return "numpy"
+
+
+def _store_encoder(store_dir, workers, model_name):
+    """Encodes texts through the shared embedding store, so messages embedded once are never re-encoded."""
+    store = open_store(store_dir, model_name)
+    pool = start_encoder_pool(workers, model_name)
+
+    def encode(texts):
+        keys, _ = embed_texts(store, texts, pool=pool, model_name=model_name)
+        return vectors_for_keys(store, keys)
+
+    return encode, pool
+
+
+def _query_encoder(model_name):
+    return lambda texts: encode_messages(list(texts), model_name=model_name)
+
+
+def _new_ann(backend, dim, count):
+    if backend == "hnswlib":
+        import hnswlib
+        ann = hnswlib.Index(space="ip", dim=dim)
+        ann.init_index(max_elements=max(count, 1), ef_construction=100, M=16)
+        return ann
+    if backend == "faiss":
+        import faiss
+        return faiss.IndexHNSWFlat(dim, 16, faiss.METRIC_INNER_PRODUCT)
+    return None
+
+
+def _add_to_ann(backend, ann, vectors, start):
+    if backend == "hnswlib":
+        ann.add_items(vectors, np.arange(start, start + len(vectors)))
+    elif backend == "faiss":
+        ann.add(vectors)
+
+
+def _ann_path(index_dir, backend):
+    return os.path.join(index_dir, f"ann.{backend}")
+
+
+def build_semantic_index(df, index_dir=INDEX_DIR, data_version=None, backend=None, encode=None,
+                         store_dir=STORE_DIR, workers=None, chunk_size=50_000,
+                         model_name=MODEL_NAME):
+    """
+    Embeds every distinct message and writes the vector index to disk.
+
+    Vectors are L2-normalized, so inner product equals cosine similarity. They are
+    written chunk by chunk to a memory-mapped file, so memory use does not grow with
+    the dataset apart from the ANN graph itself.
+
+    Args:
+        df (pd.DataFrame): Messages in the order the chatbot holds them.
+        index_dir (str): Output directory.
+        data_version (Optional[str]): Identity of the data (e.g. from
+            `Chatbot.data_cache.cached_source_hash()`), checked when loading.
+        backend (Optional[str]): 'hnswlib', 'faiss' or 'numpy'; the first installed by default.
+        encode (Optional[Callable[[list], np.ndarray]]): Text encoder; defaults to the
+            MiniLM model through the embedding store in `store_dir`.
+        store_dir (str): Embedding store shared with `Categorization/`.
+        workers (Optional[int]): Encoder processes for the default encoder, one per CPU by default.
+        chunk_size (int): Messages embedded and indexed at a time.
+        model_name (str): Sentence-transformers model name.
+
+    Returns:
+        dict: The loaded index, as from `load_semantic_index()`.
+    """
+    backend = backend or _default_backend()
+    os.makedirs(index_dir, exist_ok=True)
+    meta_path = os.path.join(index_dir, META_NAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    # Group rows by message text: row_message[i] is the distinct message of row i
+    texts = df["message"].astype(str)
+    keys = message_keys(texts)
+    _, first, row_message = np.unique(keys, return_index=True, return_inverse=True)
+    # Number distinct messages by first appearance so the index follows the data order
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    row_message = rank[row_message.ravel()]
+    message_first_row = np.sort(first)
+    message_rows = np.argsort(row_message, kind="stable")
+    message_offsets = np.zeros(len(first) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_message, minlength=len(first)), out=message_offsets[1:])
+
+    own_encoder = encode is None
+    pool = None
+    if own_encoder:
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        encode, pool = _store_encoder(store_dir, workers, model_name)
+
+    count = len(message_first_row)
+    vectors_file = ann = None
+    try:
+        for start in range(0, count, chunk_size):
+            chunk_texts = texts.iloc[message_first_row[start:start + chunk_size]].tolist()
+            chunk = _normalize(encode(chunk_texts))
+            if vectors_file is None:
+                dim = chunk.shape[1]
+                vectors_file = np.lib.format.open_memmap(
+                    os.path.join(index_dir, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dim))
+                ann = _new_ann(backend, dim, count)
+            vectors_file[start:start + len(chunk)] = chunk
+            _add_to_ann(backend, ann, chunk, start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if vectors_file is None:
+        dim = 0
+        np.save(os.path.join(index_dir, "vectors.npy"), np.empty((0, 0), dtype=np.float32))
+    else:
+        vectors_file.flush()
+        del vectors_file
+    if backend == "hnswlib" and count:
+        ann.save_index(_ann_path(index_dir, backend))
+    elif backend == "faiss" and count:
+        import faiss
+        faiss.write_index(ann, _ann_path(index_dir, backend))
+
+    np.save(os.path.join(index_dir, "row_message.npy"), row_message.astype(np.int64))
+    np.save(os.path.join(index_dir, "message_rows.npy"), message_rows.astype(np.int64))
+    np.save(os.path.join(index_dir, "message_offsets.npy"), message_offsets)
+
+    # The metadata is written last, so an interrupted build is never loaded
+    meta = {"version": INDEX_VERSION, "backend": backend if count else "numpy", "model": model_name,
+            "dim": int(dim), "num_messages": int(count), "num_rows": len(df), "data_version": data_version}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    return load_semantic_index(index_dir, data_version, None if own_encoder else encode)
+
+
+def load_semantic_index(index_dir=INDEX_DIR, data_version=None, encode=None):
+    """
+    Loads an index written by `build_semantic_index()`.
+
+    Args:
+        index_dir (str): Index directory.
+        data_version (Optional[str]): Expected data identity; a mismatch means the
+            index was built for other data.
+        encode (Optional[Callable[[list], np.ndarray]]): Query encoder; defaults to
+            the model the index was built with, loaded on first use.
+
+    Returns:
+        Optional[dict]: The index, or None when it is missing, incomplete or stale.
+    """
+    try:
+        with open(os.path.join(index_dir, META_NAME)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != INDEX_VERSION or meta.get("data_version") != data_version:
+        return None
+
+    def load(name):
+        return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+    backend = meta["backend"]
+    ann = None
+    if backend == "hnswlib":
+        import hnswlib
+        ann = hnswlib.Index(space="ip", dim=meta["dim"])
+        ann.load_index(_ann_path(index_dir, backend), max_elements=meta["num_messages"])
+    elif backend == "faiss":
+        import faiss
+        ann = faiss.read_index(_ann_path(index_dir, backend))
+
+    return {
+        **meta,
+        "ann": ann,
+        "vectors": load("vectors"),
+        "row_message": load("row_message"),
+        "message_rows": load("message_rows"),
+        "message_offsets": load("message_offsets"),
+        "encode": encode or _query_encoder(meta["model"]),
+    }
+
+
+def remap_rows(index, positions, num_rows):
+    """
+    Moves an index onto re-ordered data, e.g. after late rows were merged in time order.
+
+    The vectors and ANN graph are shared with `index`; only the row mappings are
+    rebuilt in memory. Rows the index was not built with map to no message.
+
+    Args:
+        index (dict): Index from `load_semantic_index()`.
+        positions (np.ndarray): New position of each row the index was built with, in
+            increasing order (a stable re-sort keeps existing rows in order).
+        num_rows (int): Rows in the re-ordered data.
+
+    Returns:
+        dict: The remapped index; `index` is left unchanged.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    row_message = np.full(num_rows, -1, dtype=np.int64)
+    row_message[positions] = index["row_message"]
+    return {**index, "num_rows": num_rows, "row_message": row_message,
+            "message_rows": positions[np.asarray(index["message_rows"])]}
+
+
+def _ann_search(index, query, k):
+    """Returns (message ids, similarities) of the k nearest messages, best first."""
+    backend = index["backend"]
+    k = min(k, index["num_messages"])
+    if backend == "hnswlib":
+        index["ann"].set_ef(max(2 * k, 128))
+        ids, distances = index["ann"].knn_query(query[None, :], k=k)
+        return ids[0].astype(np.int64), 1 - distances[0]
+    if backend == "faiss":
+        index["ann"].hnsw.efSearch = max(2 * k, 128)
+        scores, ids = index["ann"].search(query[None, :], k)
+        return ids[0].astype(np.int64), scores[0]
+    return _exact_search(index, query, None, k)
+
+
+def _exact_search(index, query, messages, k, chunk_size=65_536):
+    """Scores `messages` (all when None) against the query and returns the best k, best first."""
+    total = index["num_messages"] if messages is None else len(messages)
+    best_ids = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float32)
+    for start in range(0, total, chunk_size):
+        ids = np.arange(start, min(start + chunk_size, total)) if messages is None else messages[start:start + chunk_size]
+        scores = np.asarray(index["vectors"][ids]) @ query
+        best_ids = np.concatenate([best_ids, ids])
+        best_scores = np.concatenate([best_scores, scores])
+        if len(best_ids) > k:
+            keep = np.argpartition(-best_scores, k)[:k]
+            best_ids, best_scores = best_ids[keep], best_scores[keep]
+    order = np.argsort(-best_scores, kind="stable")
+    return best_ids[order], best_scores[order]
+
+
+def _rows_of(index, message_ids):
+    """Expands message ids into DataFrame rows, keeping the ids' order."""
+    offsets = index["message_offsets"]
+    starts = offsets[message_ids]
+    lengths = offsets[message_ids + 1] - starts
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.asarray(index["message_rows"][shifts + np.arange(lengths.sum())])
+
+
+def search(index, query, candidate_rows=None, top_k=DEFAULT_TOP_K):
+    """
+    Finds the rows whose message is most similar to the query.
+
+    When the other filters leave few rows, their messages are scored exactly.
+    Otherwise the ANN index is asked for a growing number of neighbours until
+    `top_k` of them pass the filters.
+
+    Args:
+        index (dict): Index from `load_semantic_index()`.
+        query (str): Free-text description of the messages to find.
+        candidate_rows (Optional[slice | np.ndarray]): Rows allowed by the other filters,
+            as returned by `Chatbot.store.select_rows()`; None allows every row. Rows
+            appended after the index was built (see `Chatbot.ingest`) are not searched.
+        top_k (int): Maximum number of rows to return.
+
+    Returns:
+        np.ndarray: Row positions, most similar first (rows sharing a message keep
+            their data order).
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if not index["num_messages"]:
+        return empty
+
+    allowed = None
+    if candidate_rows is not None:
+        allowed = np.zeros(len(index["row_message"]), dtype=bool)
+        if not isinstance(candidate_rows, slice):
+            candidate_rows = np.asarray(candidate_rows)
+            candidate_rows = candidate_rows[candidate_rows < len(allowed)]
+        allowed[candidate_rows] = True
+        num_candidates = int(allowed.sum())
+        if not num_candidates:
+            return empty
+        if num_candidates == len(allowed):
+            allowed = None
+
+    query_vector = _normalize(index["encode"]([query]))[0]
+
+    if allowed is not None and num_candidates <= EXACT_SEARCH_LIMIT:
+        messages = np.unique(index["row_message"][candidate_rows])
+        messages = messages[messages >= 0]
+        ids, _ = _exact_search(index, query_vector, messages, top_k)
+        rows = _rows_of(index, ids)
+        return rows[allowed[rows]][:top_k]
+
+    k = top_k
+    while True:
+        ids, _ = _ann_search(index, query_vector, k)
+        rows = _rows_of(index, ids)
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        if len(rows) >= top_k or k >= index["num_messages"]:
+            return rows[:top_k]
+        k *= 4
+
+
+if __name__ == "__main__":
+    from Chatbot.chatbot import DATA_CACHE_DIR, DATA_PATH
+    from Chatbot.data_cache import cached_source_hash, load_messages
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default=os.getenv("CHATBOT_SEMANTIC_INDEX") or INDEX_DIR)
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--query", help="run one search after building and print timing")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    df = load_messages(DATA_PATH, DATA_CACHE_DIR)
+    version = cached_source_hash(DATA_CACHE_DIR)
+    index = load_semantic_index(args.index_dir, version)
+    if index is None:
+        start = time.perf_counter()
+        index = build_semantic_index(df, args.index_dir, version, args.backend, workers=args.workers)
+        print(f"Indexed {index['num_messages']} distinct messages ({index['backend']}) "
+              f"in {time.perf_counter() - start:.1f}s")
+    else:
+        print(f"Index in '{args.index_dir}' is up to date ({index['num_messages']} messages, {index['backend']})")
+
+    if args.query:
+        index["encode"]([args.query])  # load the model before timing
+        start = time.perf_counter()
+        rows = search(index, args.query, top_k=args.top_k)
+        print(f"{len(rows)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print(df.iloc[rows][["timestamp", "source", "category", "message"]].to_string(index=False))
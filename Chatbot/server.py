@@ -0,0 +1,544 @@
+"""
+Asyncio HTTP server that lets several analysts query one loaded dataset.
+
+Usage:
+    python -m Chatbot.server --port 8080 --max-in-flight 8 [--spool new_messages.jsonl] [--metrics]
+
+Endpoints:
+    POST /query   {"session_id": "...", "query": "..."}  -> filters and summary for the turn
+    POST /page    {"session_id": "...", "page_size": 50}   -> next rows of the session's full result, in time order
+    POST /export  {"session_id": "...", "format": "jsonl"} -> every matching row, streamed as CSV or JSONL
+    POST /ingest  {"messages": [{...}, ...]}               -> appends messages to the live data
+    GET  /health                                           -> {"status": "ok", "sessions": N, "rows": N, "ingest": {...}, "llm": {...}, "turns": {...}}
+    GET  /metrics                                          -> per-stage turn latencies in Prometheus text format (with --metrics)
+
+Each session keeps its own filter context and result cursor, exactly like one
+`run_chatbot` loop; `/page` with "rewind": true starts the cursor over.
+The DataFrame and indexes in `env` are shared read-only by all sessions. New
+messages (posted, or tailed from `--spool`) are appended to a copy that then
+replaces `env`, so turns already running finish on the snapshot they started with.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from Chatbot.chatbot import (
+    new_filter_context, query_LLM_for_filters, resolve_filters, setup_environment, summarize_filters,
+    update_filter_context,
+)
+from Chatbot.fast_path import extract_filters_with_fallback
+from Chatbot.ingest import ingest_records, ingest_report, ingest_spool, load_categorizer, new_ingest_stats, open_spool
+from Chatbot.prompt import llm_report
+from Chatbot.results import EXPORT_FORMATS, PAGE_SIZE, fetch_page, iter_export, new_cursor
+from Chatbot.stats import detect_spikes
+from Chatbot.turn_metrics import metrics_report, prometheus_text, span, start_turn
+
+MAX_BODY_BYTES = 1 << 20
+MAX_PAGE_SIZE = 1000
+# Share of wall-clock time the spool loop may spend appending batches
+MAX_INGEST_SHARE = 0.1
+EXPORT_CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+logger = logging.getLogger("Chatbot.server")
+
+
+def new_server_state(env, max_in_flight=8, max_workers=32, min_confidence=0.9, categorize=None,
+                     expose_metrics=False):
+    """
+    Creates the shared state for a server instance.
+
+    Args:
+        env (dict): Environment dictionary from `setup_environment()`.
+        max_in_flight (int): Maximum number of concurrent LLM requests.
+        max_workers (int): Threads available for filter extraction and filtering.
+        min_confidence (float): Fast-path confidence needed to skip the LLM;
+            values above 1 send every query to the LLM.
+        categorize (Optional[Callable[[list], list]]): Labels ingested messages
+            that arrive without a category, e.g. from `Chatbot.ingest.load_categorizer()`.
+        expose_metrics (bool): Serve `GET /metrics` for Prometheus scrapers.
+
+    Returns:
+        dict: Server state with the environment, sessions and concurrency limits.
+    """
+    return {
+        "env": env,
+        "sessions": {},
+        "llm_slots": threading.BoundedSemaphore(max_in_flight),
+        "executor": ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chatbot-turn"),
+        "min_confidence": min_confidence,
+        "categorize": categorize,
+        "ingest_lock": threading.Lock(),
+        "ingest_stats": new_ingest_stats(),
+        "expose_metrics": expose_metrics,
+    }
+
+
+def _summary_to_json(summary, spikes):
+    """Converts a summary from `summarize_filtered_data()` into JSON-friendly values."""
+    preview = json.loads(summary["preview"].to_json(orient="records", date_format="iso"))
+    return {
+        "num_messages": int(summary["num_messages"]),
+        "num_users": int(summary["num_users"]),
+        "num_users_estimated": bool(summary.get("num_users_estimated", False)),
+        "start_time": None if pd.isna(summary["start_time"]) else str(summary["start_time"]),
+        "end_time": None if pd.isna(summary["end_time"]) else str(summary["end_time"]),
+        "category": summary["category"],
+        "user": summary.get("user"),
+        "user_categories": summary.get("user_categories"),
+        "top_users": None if summary.get("top_users") is None else [
+            {"id_user": user.item() if hasattr(user, "item") else user, "messages": int(count)}
+            for user, count in summary["top_users"]
+        ],
+        "repeat_users": summary.get("repeat_users"),
+        "spikes": None if spikes is None else {
+            "mean": float(spikes["mean"]),
+            "std": float(spikes["std"]),
+            "days": [{"day": str(day.date()), "z": float(z), "count": int(count)} for day, z, count in spikes["spikes"]],
+        },
+        "preview": preview,
+    }
+
+
+def run_turn(state, current_filter, user_query, session_id=None):
+    """
+    Runs one chatbot turn synchronously: extract filters, merge, filter and summarize.
+
+    LLM fallbacks wait for a slot in `state['llm_slots']`, which bounds the number
+    of requests in flight across all sessions. Stage timings go to `env['turn_metrics']`.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        current_filter (dict): The session's filter context.
+        user_query (str): Natural language input from the user.
+        session_id (Optional[str]): Session the turn belongs to, for the turn log.
+
+    Returns:
+        tuple: (updated filter context, response dict). The response's 'reset' tells
+            whether the filter context was started over.
+    """
+    env = state["env"]
+
+    if user_query.strip().lower() == "reset":
+        return new_filter_context(), {"filters": new_filter_context(), "reset": True,
+                                      "message": "Filter context has been reset."}
+
+    with start_turn(env["turn_metrics"], session=session_id):
+        return _run_turn(state, env, current_filter, user_query)
+
+
+def _run_turn(state, env, current_filter, user_query):
+    """The body of `run_turn()`, run inside its turn so every stage is timed."""
+    def limited_llm(query):
+        with span("llm_wait"):
+            state["llm_slots"].acquire()
+        try:
+            return query_LLM_for_filters(query, env, current_filter)
+        finally:
+            state["llm_slots"].release()
+
+    new_user_filters = extract_filters_with_fallback(
+        user_query, env["fast_path"], env["fast_path_stats"], limited_llm, min_confidence=state["min_confidence"]
+    )
+    if not new_user_filters:
+        return current_filter, {"filters": current_filter, "reset": False,
+                                "message": "Sorry, I couldn't understand your request."}
+
+    current_filter = update_filter_context(current_filter, new_user_filters)
+    summary, filtered_df, day_counts = summarize_filters(env, current_filter)
+    spikes = None
+    if summary["category"] is not None and summary.get("user") is None:
+        with span("spikes"):
+            spikes = detect_spikes(filtered_df, summary["category"], env["df"], daily_counts=env["daily_counts"],
+                                   day_counts=day_counts)
+
+    return current_filter, {"filters": current_filter, "reset": bool(new_user_filters.get("reset")),
+                            "summary": _summary_to_json(summary, spikes)}
+
+
+def _session(state, session_id):
+    return state["sessions"].setdefault(
+        session_id, {"filter": new_filter_context(), "cursor": new_cursor(), "lock": asyncio.Lock()}
+    )
+
+
+async def handle_query(state, payload):
+    """
+    Handles a POST /query request for one session.
+
+    Turns of the same session are serialized; different sessions run concurrently.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        payload (dict): Request body with 'session_id' and 'query'.
+
+    Returns:
+        tuple: (HTTP status, response dict)
+    """
+    session_id = payload.get("session_id")
+    user_query = payload.get("query")
+    if not isinstance(session_id, str) or not isinstance(user_query, str) or not user_query.strip():
+        return 400, {"error": "Expected JSON body with string fields 'session_id' and 'query'."}
+
+    session = _session(state, session_id)
+    async with session["lock"]:
+        loop = asyncio.get_running_loop()
+        session["filter"], response = await loop.run_in_executor(
+            state["executor"], run_turn, state, session["filter"], user_query, session_id
+        )
+        # Refinements keep the session's place in the result; a reset rewinds it
+        if response["reset"]:
+            session["cursor"] = new_cursor(session["cursor"]["page_size"])
+    return 200, response
+
+
+def next_page(state, current_filter, cursor):
+    """
+    Reads the next page of a session's result synchronously.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        current_filter (dict): The session's filter context.
+        cursor (dict): The session's cursor from `Chatbot.results.new_cursor()`.
+
+    Returns:
+        tuple: (advanced cursor, response dict)
+    """
+    env = state["env"]
+    with start_turn(env["turn_metrics"]):
+        with span("page"):
+            page, cursor, info = fetch_page(env, resolve_filters(current_filter, env["current_time"]), cursor,
+                                            current_filter.get("semantic_query"))
+            rows = json.loads(page.to_json(orient="records", date_format="iso"))
+    return cursor, {"filters": current_filter, **info, "done": info["end"] >= info["total"], "rows": rows}
+
+
+async def handle_page(state, payload):
+    """
+    Handles a POST /page request: the next rows of the session's result in timestamp order.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        payload (dict): Request body with 'session_id' and optionally 'page_size'
+            (up to `MAX_PAGE_SIZE`) and 'rewind' to start from the first row.
+
+    Returns:
+        tuple: (HTTP status, response dict)
+    """
+    session_id = payload.get("session_id")
+    page_size = payload.get("page_size", PAGE_SIZE)
+    if (not isinstance(session_id, str) or isinstance(page_size, bool) or not isinstance(page_size, int)
+            or not 0 < page_size <= MAX_PAGE_SIZE):
+        return 400, {"error": f"Expected JSON body with a string 'session_id' and a 'page_size' of 1-{MAX_PAGE_SIZE}."}
+
+    session = _session(state, session_id)
+    async with session["lock"]:
+        cursor = new_cursor() if payload.get("rewind") else session["cursor"]
+        cursor = {**cursor, "page_size": page_size}
+        loop = asyncio.get_running_loop()
+        session["cursor"], response = await loop.run_in_executor(
+            state["executor"], next_page, state, session["filter"], cursor
+        )
+    return 200, response
+
+
+async def stream_export(state, payload, writer):
+    """
+    Handles a POST /export request by streaming every row of the session's result.
+
+    The body is sent with chunked transfer encoding, one chunk of rows at a time,
+    and the next chunk is only serialized once the client has taken the previous
+    one, so memory stays bounded however large the result.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        payload (dict): Request body with 'session_id' and optionally 'format' ('csv' or 'jsonl').
+        writer (asyncio.StreamWriter): Connection output.
+
+    Returns:
+        Optional[tuple]: (HTTP status, error dict) when the request is invalid; None once streamed.
+    """
+    session_id = payload.get("session_id")
+    fmt = payload.get("format", "jsonl")
+    if not isinstance(session_id, str) or not isinstance(fmt, str) or fmt not in EXPORT_FORMATS:
+        return 400, {"error": f"Expected JSON body with a string 'session_id' and a 'format' in {list(EXPORT_FORMATS)}."}
+
+    session = _session(state, session_id)
+    async with session["lock"]:
+        current_filter = dict(session["filter"])
+    env = state["env"]
+    pieces = iter_export(env, resolve_filters(current_filter, env["current_time"]), fmt,
+                         current_filter.get("semantic_query"))
+
+    writer.write(
+        "HTTP/1.1 200 OK\r\n"
+        f"Content-Type: {EXPORT_CONTENT_TYPES[fmt]}\r\n"
+        "Transfer-Encoding: chunked\r\n"
+        "Connection: close\r\n\r\n".encode("latin-1")
+    )
+    loop = asyncio.get_running_loop()
+    while (piece := await loop.run_in_executor(state["executor"], next, pieces, None)) is not None:
+        data = piece.encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+    return None
+
+
+def ingest_batch(state, records):
+    """
+    Appends messages to the live data and swaps in the updated environment.
+
+    Batches are applied one at a time; queries keep running against the previous
+    environment until the swap.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        records (list): Message dicts, see `Chatbot.ingest.append_messages()`.
+
+    Returns:
+        int: Number of rows added.
+    """
+    with state["ingest_lock"]:
+        env = state["env"]
+        new_env = ingest_records(env, records, state["ingest_stats"], state["categorize"])
+        state["env"] = new_env
+    return len(new_env["df"]) - len(env["df"])
+
+
+async def handle_ingest(state, payload):
+    """
+    Handles a POST /ingest request.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        payload (dict): Request body with a 'messages' list.
+
+    Returns:
+        tuple: (HTTP status, response dict)
+    """
+    records = payload.get("messages")
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return 400, {"error": "Expected JSON body with a list of message objects in 'messages'."}
+
+    loop = asyncio.get_running_loop()
+    added = await loop.run_in_executor(state["executor"], ingest_batch, state, records)
+    return 200, {"ingested": added, "rejected": len(records) - added, "rows": len(state["env"]["df"])}
+
+
+def ingest_spool_batch(state, tailer):
+    """
+    Ingests what was appended to the spool and swaps in the updated environment.
+
+    Failed batches are counted in `state['ingest_stats']` and read again on the
+    next call (see `Chatbot.ingest.ingest_spool()`).
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        tailer (dict): Spool state from `Chatbot.ingest.open_spool()`.
+    """
+    with state["ingest_lock"]:
+        state["env"] = ingest_spool(state["env"], tailer, state["ingest_stats"], state["categorize"])
+
+
+def ingest_poll_delay(interval, busy_seconds, max_share=MAX_INGEST_SHARE):
+    """
+    Returns the seconds to wait before the next spool poll.
+
+    Every append copies the loaded data (see `Chatbot.ingest.append_messages()`),
+    so its cost grows with the dataset rather than the batch. Waiting in proportion
+    to the last append lets more messages collect into the next batch and keeps
+    ingestion below `max_share` of the time.
+
+    Args:
+        interval (float): Minimum seconds between polls.
+        busy_seconds (float): Time the last poll spent reading and appending.
+        max_share (float): Largest share of time spent ingesting.
+
+    Returns:
+        float: Seconds to sleep.
+    """
+    return max(interval, busy_seconds * (1 - max_share) / max_share)
+
+
+async def ingest_loop(state, tailer, interval=1.0):
+    """
+    Tails a spool file and ingests what producers append to it, at most once per
+    `interval` seconds; see `ingest_poll_delay()` for larger datasets.
+
+    Errors are logged and the loop keeps polling.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        tailer (dict): Spool state from `Chatbot.ingest.open_spool()`.
+        interval (float): Seconds between polls.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        try:
+            await loop.run_in_executor(state["executor"], ingest_spool_batch, state, tailer)
+        except Exception:
+            logger.exception("Spool ingestion failed")
+        await asyncio.sleep(ingest_poll_delay(interval, loop.time() - start))
+
+
+def _log_task_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s stopped", task.get_name(), exc_info=task.exception())
+
+
+async def _read_request(reader):
+    """
+    Reads one HTTP/1.1 request.
+
+    Returns:
+        Optional[tuple]: (method, path, headers, body), or None when the client closed the connection.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _write_response(writer, status, payload, keep_alive):
+    # Strings are sent as plain text (the Prometheus exposition format), everything else as JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload, default=str).encode("utf-8"), "application/json"
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}.get(status, "OK")
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+async def handle_connection(state, reader, writer):
+    """
+    Serves HTTP requests on one connection until the client closes it.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        reader (asyncio.StreamReader): Connection input.
+        writer (asyncio.StreamWriter): Connection output.
+    """
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError):
+                _write_response(writer, 400, {"error": "Malformed request"}, keep_alive=False)
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+
+            if method == "GET" and path == "/health":
+                status, response = 200, {"status": "ok", "sessions": len(state["sessions"]),
+                                         "rows": len(state["env"]["df"]),
+                                         "ingest": ingest_report(state["ingest_stats"]),
+                                         "llm": llm_report(state["env"]["llm_stats"]),
+                                         "turns": metrics_report(state["env"]["turn_metrics"])}
+            elif method == "GET" and path == "/metrics" and state["expose_metrics"]:
+                status, response = 200, prometheus_text(state["env"]["turn_metrics"], {
+                    "chatbot_sessions": len(state["sessions"]),
+                    "chatbot_rows": len(state["env"]["df"]),
+                }, {"chatbot_llm_requests_total": state["env"]["llm_stats"]["requests"]})
+            elif method == "POST" and path in ("/query", "/page", "/ingest", "/export"):
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    payload = None
+                if not isinstance(payload, dict):
+                    status, response = 400, {"error": "Body is not a JSON object"}
+                elif path == "/export":
+                    error = await stream_export(state, payload, writer)
+                    if error is None:
+                        break
+                    status, response = error
+                else:
+                    handler = {"/query": handle_query, "/page": handle_page, "/ingest": handle_ingest}[path]
+                    try:
+                        status, response = await handler(state, payload)
+                    except Exception as e:
+                        status, response = 500, {"error": f"{type(e).__name__}: {e}"}
+            else:
+                status, response = 404, {"error": f"No route for {method} {path}"}
+
+            _write_response(writer, status, response, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(state, host="127.0.0.1", port=8080):
+    """
+    Starts listening for HTTP connections.
+
+    Args:
+        state (dict): Server state from `new_server_state()`.
+        host (str): Interface to bind.
+        port (int): Port to bind, 0 for any free port.
+
+    Returns:
+        asyncio.Server: The listening server.
+    """
+    return await asyncio.start_server(lambda r, w: handle_connection(state, r, w), host, port)
+
+
+async def serve(env, host, port, max_in_flight, spool=None, ingest_interval=1.0, expose_metrics=False):
+    # As in the CLI, uncategorized messages are only labeled when tailing a spool
+    state = new_server_state(env, max_in_flight=max_in_flight, categorize=load_categorizer() if spool else None,
+                             expose_metrics=expose_metrics)
+    server = await start_server(state, host, port)
+    print(f"Chatbot server listening on http://{host}:{port} (max {max_in_flight} LLM requests in flight)")
+    if spool:
+        state["ingest_task"] = asyncio.create_task(ingest_loop(state, open_spool(spool), ingest_interval),
+                                                   name="ingest_loop")
+        state["ingest_task"].add_done_callback(_log_task_failure)
+        print(f"Ingesting new messages appended to '{spool}' every {ingest_interval:g}s")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-in-flight", type=int, default=8, help="maximum concurrent LLM requests")
+    parser.add_argument("--spool", help="JSONL or CSV file to tail for new messages")
+    parser.add_argument("--ingest-interval", type=float, default=1.0, help="seconds between spool polls")
+    parser.add_argument("--metrics", action="store_true", help="serve per-stage turn metrics on GET /metrics")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(setup_environment(), args.host, args.port, args.max_in_flight,
+                          args.spool, args.ingest_interval, args.metrics))
+    except KeyboardInterrupt:
+        pass
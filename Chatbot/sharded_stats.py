@@ -0,0 +1,205 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+SHARD_MIN_ROWS = 1_000_000
+NAT = np.iinfo(np.int64).min
+
+_COLUMNS = None
+
+
+def summary_columns(df):
+    """
+    Encodes the columns the summary needs as flat arrays that shards can slice.
+
+    Users and categories become dense codes, so the set of users (or categories)
+    seen by a shard is a bitset that merges with a bitwise OR.
+
+    Args:
+        df (pd.DataFrame): Messages with a RangeIndex, as in `env['df']`.
+
+    Returns:
+        dict: 'user' / 'category' codes (-1 for missing), 'timestamp' as int64
+            nanoseconds, and the 'user_index' / 'category_names' vocabularies.
+    """
+    user_codes, user_index = pd.factorize(df["id_user"])
+    category_codes, category_names = pd.factorize(df["category"])
+    return {
+        "user": user_codes.astype(np.int32 if len(user_index) < np.iinfo(np.int32).max else np.int64),
+        "category": category_codes.astype(np.int32),
+        "timestamp": df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        "user_index": pd.Index(user_index),
+        "category_names": list(category_names),
+    }
+
+
+def _init_worker(columns):
+    global _COLUMNS
+    _COLUMNS = columns
+
+
+def _bitset(codes, size):
+    seen = np.zeros(size, dtype=bool)
+    seen[codes[codes >= 0]] = True
+    return seen
+
+
+def partial_summary(columns, rows):
+    """
+    Aggregates one shard into a partial that `merge_partials()` can combine.
+
+    Args:
+        columns (dict): Arrays from `summary_columns()`.
+        rows (tuple | np.ndarray): (start, stop) bounds or row positions of the shard.
+
+    Returns:
+        dict: 'count', 'min' / 'max' timestamps in ns (None when the shard has none),
+            and packed 'users' / 'categories' bitsets.
+    """
+    rows = slice(*rows) if isinstance(rows, tuple) else rows
+    timestamps = columns["timestamp"][rows]
+    timestamps = timestamps[timestamps != NAT]
+    return {
+        "count": len(columns["user"][rows]),
+        "min": int(timestamps.min()) if len(timestamps) else None,
+        "max": int(timestamps.max()) if len(timestamps) else None,
+        "users": np.packbits(_bitset(columns["user"][rows], len(columns["user_index"]))),
+        "categories": np.packbits(_bitset(columns["category"][rows], len(columns["category_names"]))),
+    }
+
+
+def _worker_partial(rows):
+    return partial_summary(_COLUMNS, rows)
+
+
+def merge_partials(partials):
+    """
+    Combines shard partials: counts add, min/max take the extremes, bitsets OR.
+
+    Args:
+        partials (list): Partials from `partial_summary()`.
+
+    Returns:
+        dict: A partial covering all the shards.
+    """
+    mins = [p["min"] for p in partials if p["min"] is not None]
+    maxs = [p["max"] for p in partials if p["max"] is not None]
+    return {
+        "count": sum(p["count"] for p in partials),
+        "min": min(mins) if mins else None,
+        "max": max(maxs) if maxs else None,
+        "users": np.bitwise_or.reduce([p["users"] for p in partials]),
+        "categories": np.bitwise_or.reduce([p["categories"] for p in partials]),
+    }
+
+
+def start_summary_pool(df, workers=None):
+    """
+    Starts worker processes that hold the summary columns of `df`.
+
+    On platforms with `fork` the workers inherit the arrays instead of receiving a
+    pickled copy, so only shard bounds travel per query.
+
+    Args:
+        df (pd.DataFrame): Messages with a RangeIndex, as in `env['df']`.
+        workers (Optional[int]): Number of processes, defaults to the CPU count.
+
+    Returns:
+        dict: Pool state for `summarize_sharded()`.
+    """
+    workers = workers or os.cpu_count() or 1
+    columns = summary_columns(df)
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    executor = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(columns,))
+    return {
+        "executor": executor,
+        "workers": workers,
+        "num_rows": len(df),
+        "user_index": columns["user_index"],
+        "category_names": columns["category_names"],
+    }
+
+
+def stop_summary_pool(pool):
+    """Shuts down the worker processes of a pool from `start_summary_pool()`."""
+    pool["executor"].shutdown(cancel_futures=True)
+
+
+def _empty_partial(pool):
+    return {
+        "count": 0,
+        "min": None,
+        "max": None,
+        "users": np.packbits(np.zeros(len(pool["user_index"]), dtype=bool)),
+        "categories": np.packbits(np.zeros(len(pool["category_names"]), dtype=bool)),
+    }
+
+
+def _shards(rows, num_shards):
+    """Splits rows into contiguous shards, as (start, stop) bounds when they are a range."""
+    if isinstance(rows, range):
+        edges = np.linspace(rows.start, rows.stop, num_shards + 1).astype(np.int64).tolist()
+        return [(start, stop) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+    return [shard for shard in np.array_split(rows, num_shards) if len(shard)]
+
+
+def _row_positions(filtered_df, num_rows):
+    """Returns the filtered rows that the pool's workers hold, and whether later rows remain."""
+    index = filtered_df.index
+    if isinstance(index, pd.RangeIndex) and index.step == 1:
+        held = range(min(index.start, num_rows), min(index.stop, num_rows))
+        return held, len(held) < len(index)
+    positions = index.to_numpy()
+    held = positions[positions < num_rows]
+    return held, len(held) < len(positions)
+
+
+def summarize_sharded(pool, filtered_df):
+    """
+    Computes the message count, unique users, time range and single category of a
+    filtered result with the pool's worker processes.
+
+    The rows are split into contiguous (time-ordered) shards, one per worker. Rows
+    appended after the pool was started (see `Chatbot.ingest`) are aggregated
+    here and merged in, so the result always matches a direct computation.
+
+    Args:
+        pool (dict): Pool state from `start_summary_pool()` for the DataFrame that
+            `filtered_df` was selected from.
+        filtered_df (pd.DataFrame): Rows of that DataFrame, keeping its index.
+
+    Returns:
+        dict: 'num_messages', 'num_users', 'start_time', 'end_time' and 'category', as in
+            `Chatbot.stats.summarize_filtered_data()`.
+    """
+    held, has_tail = _row_positions(filtered_df, pool["num_rows"])
+    shards = _shards(held, pool["workers"])
+    merged = merge_partials(list(pool["executor"].map(_worker_partial, shards)) or [_empty_partial(pool)])
+
+    users = np.unpackbits(merged["users"], count=len(pool["user_index"])).astype(bool)
+    categories = set(np.asarray(pool["category_names"], dtype=object)[
+        np.unpackbits(merged["categories"], count=len(pool["category_names"])).astype(bool)].tolist())
+    num_users_beyond = 0
+    start, end = merged["min"], merged["max"]
+
+    if has_tail:
+        tail = filtered_df[filtered_df.index >= pool["num_rows"]]
+        tail_users = tail["id_user"].dropna()
+        codes = pool["user_index"].get_indexer(tail_users)
+        users[codes[codes >= 0]] = True
+        num_users_beyond = tail_users[codes < 0].nunique()
+        categories.update(tail["category"].dropna().unique().tolist())
+        tail_times = tail["timestamp"].dropna().to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if len(tail_times):
+            start = int(tail_times.min()) if start is None else min(start, int(tail_times.min()))
+            end = int(tail_times.max()) if end is None else max(end, int(tail_times.max()))
+
+    return {
+        "num_messages": len(filtered_df),
+        "num_users": int(users.sum()) + int(num_users_beyond),
+        "start_time": pd.NaT if start is None else pd.Timestamp(start),
+        "end_time": pd.NaT if end is None else pd.Timestamp(end),
+        "category": next(iter(categories)) if len(categories) == 1 else None,
+    }
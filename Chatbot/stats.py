@@ -1,73 +1,256 @@
-def handle_single_category(df, category, whole_df, z_threshold=2.0):
+import numpy as np
+import pandas as pd
+from Chatbot.daily_counts import (
+    build_daily_counts, category_baseline, count_by_day, day_to_timestamp, rolling_baseline,
+)
+from Chatbot.rollup import rollup_users
+from Chatbot.sharded_stats import SHARD_MIN_ROWS, summarize_sharded
+from Chatbot.store import build_message_store
+
+PREVIEW_COLUMNS = ['timestamp', 'id_user', 'source', 'category', 'message']
+
+
+def detect_spikes(df, category, whole_df, z_threshold=2.0, daily_counts=None, window_days=None, source=None,
+                  day_counts=None):
     """
-    Detect and prints spikes in category activity using z-score analysis.
+    Detects spikes in category activity using z-score analysis.
+
+    The baseline comes from the precomputed daily-count cube, so only the
+    filtered rows are scanned, or none when their per-day counts are given.
 
     Args:
         df (pd.DataFrame): Filtered DataFrame for the category and time window.
         category (str): The unique category.
         whole_df (pd.DataFrame): The entire dataset (unfiltered).
         z_threshold (float): Threshold for z-score spike detection.
-    """
-    print(f"Analyzing category: {category}")
-
-    # 1. Full time series from all data
-    full_cat_df = whole_df[whole_df['category'] == category].copy()
-    full_cat_df['day'] = full_cat_df['timestamp'].dt.floor('D')
-    full_daily_counts = full_cat_df.groupby('day').size()
+        daily_counts (Optional[dict]): Counts from `build_daily_counts()`; built from
+            `whole_df` when omitted.
+        window_days (Optional[int]): Score each day against the trailing window of this
+            many days instead of the whole history.
+        source (Optional[str]): Take the baseline from this source only.
+        day_counts (Optional[tuple]): (days, counts) of the filtered rows, e.g. from
+            `Chatbot.rollup.rollup_day_counts()`; counted from `df` when omitted.
 
-    # Compute global mean and std
-    mean = full_daily_counts.mean()
-    std = full_daily_counts.std()
+    Returns:
+        dict: 'mean' and 'std' of the category's daily counts over the whole dataset,
+            'window_days', and 'spikes' as a list of (day, z-score, count) tuples.
+    """
+    if daily_counts is None:
+        daily_counts = build_daily_counts(build_message_store(whole_df))
 
-    print(f"Global stats — Mean: {mean:.2f}, Std Dev: {std:.2f}")
+    # 1. Baseline from the precomputed daily counts
+    mean, std = category_baseline(daily_counts, category, source)
 
     # 2. Daily counts in filtered time frame
-    filtered_df = df.copy()
-    filtered_df['day'] = filtered_df['timestamp'].dt.floor('D')
-    filtered_counts = filtered_df.groupby('day').size()
+    days, filtered_counts = count_by_day(df) if day_counts is None else day_counts
 
     # 3. Compute z-scores
-    z_scores = (filtered_counts - mean) / std
-    spike_days = z_scores[abs(z_scores) >= z_threshold]
+    if window_days:
+        rolling_mean, rolling_std = rolling_baseline(daily_counts, category, window_days, source)
+        positions = days - daily_counts["first_day"]
+        inside = (positions >= 0) & (positions < len(rolling_mean))
+        day_mean = np.full(len(days), np.nan)
+        day_std = np.full(len(days), np.nan)
+        day_mean[inside] = rolling_mean[positions[inside]]
+        day_std[inside] = rolling_std[positions[inside]]
+    else:
+        day_mean, day_std = mean, std
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_scores = (filtered_counts - day_mean) / day_std
+    spike_mask = np.abs(z_scores) >= z_threshold
+
+    return {
+        "mean": mean,
+        "std": std,
+        "window_days": window_days,
+        "spikes": [(day_to_timestamp(day), z, int(count))
+                   for day, z, count in zip(days[spike_mask], z_scores[spike_mask], filtered_counts[spike_mask])],
+    }
+
+def handle_single_category(df, category, whole_df, z_threshold=2.0, daily_counts=None, window_days=None,
+                           day_counts=None):
+    """
+    Detect and prints spikes in category activity using z-score analysis.
+
+    Args:
+        df (pd.DataFrame): Filtered DataFrame for the category and time window.
+        category (str): The unique category.
+        whole_df (pd.DataFrame): The entire dataset (unfiltered).
+        z_threshold (float): Threshold for z-score spike detection.
+        daily_counts (Optional[dict]): Counts from `build_daily_counts()`.
+        window_days (Optional[int]): Use a trailing baseline of this many days.
+        day_counts (Optional[tuple]): Per-day counts of the filtered rows, see `detect_spikes()`.
+    """
+    print(f"Analyzing category: {category}")
+
+    result = detect_spikes(df, category, whole_df, z_threshold, daily_counts, window_days, day_counts=day_counts)
+
+    print(f"Global stats — Mean: {result['mean']:.2f}, Std Dev: {result['std']:.2f}")
+    if window_days:
+        print(f"Scoring each day against the trailing {window_days}-day baseline.")
 
     # Output results
-    if not spike_days.empty:
+    if result['spikes']:
         print(f"\nSpike Detection (z ≥ {z_threshold}):")
-        for date, z in spike_days.items():
-            print(f"- {date.date()}: z = {z:.2f}, count = {filtered_counts[date]}")
+        for date, z, count in result['spikes']:
+            print(f"- {date.date()}: z = {z:.2f}, count = {count}")
     else:
         print("No significant spikes detected.")
 
-def describe_filtered_data(filtered_df, entire_df):
+def summarize_filtered_data(filtered_df, preview_rows=10, pool=None):
+    """
+    Computes the summary shown for a filtered result set.
+
+    Large results are aggregated in shards by `pool` when one is given; the
+    numbers are the same either way.
+
+    Args:
+        filtered_df (pd.DataFrame): A filtered DataFrame containing at least 'id_user' and 'message' columns.
+        preview_rows (int): Number of rows to include in the preview.
+        pool (Optional[dict]): Worker pool from `Chatbot.sharded_stats.start_summary_pool()`
+            for the DataFrame `filtered_df` was selected from.
+
+    Returns:
+        dict: 'num_messages', 'num_users', 'start_time' / 'end_time' (None when there is
+            no 'timestamp' column), 'category' (the only category present, else None)
+            and 'preview' (DataFrame of the first rows).
+    """
+    if pool is not None and len(filtered_df) >= SHARD_MIN_ROWS:
+        summary = summarize_sharded(pool, filtered_df)
+        summary["preview"] = filtered_df[PREVIEW_COLUMNS].head(preview_rows)
+        return summary
+
+    summary = {
+        "num_messages": len(filtered_df),
+        "num_users": filtered_df['id_user'].nunique(),
+        "start_time": None,
+        "end_time": None,
+        "category": None,
+    }
+    if 'timestamp' in filtered_df.columns:
+        summary["start_time"] = filtered_df['timestamp'].min()
+        summary["end_time"] = filtered_df['timestamp'].max()
+
+    unique_categories = filtered_df['category'].dropna().unique()
+    if len(unique_categories) == 1:
+        summary["category"] = unique_categories[0]
+
+    summary["preview"] = filtered_df[PREVIEW_COLUMNS].head(preview_rows)
+    return summary
+
+def summarize_with_rollup(df, store, rollup, rows, category=None, source=None, preview_rows=10):
+    """
+    Computes the summary of `summarize_filtered_data()` without materializing the rows.
+
+    Counts, the time range and the category come from the store's sorted positions
+    and posting lists; unique users are estimated from the rollup's sketches. Only
+    the preview rows are read from `df`.
+
+    Args:
+        df (pd.DataFrame): The full message dataset.
+        store (dict): Time-sorted store over `df`.
+        rollup (dict): Rollup from `Chatbot.rollup.build_rollup()` over `store`.
+        rows (slice | np.ndarray): Result of `select_rows()` for the filters below.
+        category (Optional[str]): Category filter of the selection.
+        source (Optional[str]): Source filter of the selection.
+        preview_rows (int): Number of rows to include in the preview.
+
+    Returns:
+        dict: The keys of `summarize_filtered_data()`, plus 'num_users_estimated'.
+    """
+    positions = range(len(df))[rows] if isinstance(rows, slice) else rows
+    summary = {
+        "num_messages": len(positions),
+        "num_users": 0,
+        "num_users_estimated": True,
+        "start_time": pd.NaT,
+        "end_time": pd.NaT,
+        "category": None,
+        "preview": df.iloc[list(positions[:preview_rows])][PREVIEW_COLUMNS],
+    }
+    if not len(positions):
+        return summary
+
+    first, last = int(positions[0]), int(positions[-1])
+    summary["num_users"] = rollup_users(rollup, store, df["id_user"], rows, category, source)
+    summary["start_time"] = pd.Timestamp(int(store["timestamps"][first]))
+    summary["end_time"] = pd.Timestamp(int(store["timestamps"][last]))
+
+    # Categories present: count each category's postings inside [first, last]
+    num_sources = max(len(store["source_index"]), 1)
+    source_code = store["source_index"][source.lower()] if source else None
+    present = []
+    for code in ([store["category_index"][category.lower()]] if category else store["category_index"].values()):
+        if source_code is None:
+            posting = store["postings"]["category"].get(code)
+        else:
+            posting = store["postings"]["pair"].get(code * num_sources + source_code)
+        if posting is not None:
+            start = np.searchsorted(posting, first, side="left")
+            if start < len(posting) and posting[start] <= last:
+                present.append(int(posting[start]))
+    if len(present) == 1:
+        summary["category"] = df["category"].iat[present[0]]
+    return summary
+
+def describe_users(summary):
+    """
+    Prints the per-user parts of a summary, see `Chatbot.chatbot.summarize_users()`.
+
+    Args:
+        summary (dict): Summary with optional 'user', 'user_categories', 'top_users' and 'repeat_users'.
+    """
+    if summary.get("user") is not None:
+        print(f"- User:           {summary['user']}")
+        if summary.get("user_categories"):
+            breakdown = ", ".join(f"{name} {count}" for name, count in summary["user_categories"].items())
+            print(f"- By category:    {breakdown}")
+
+    if summary.get("top_users") is not None:
+        print(f"- Repeat users:   {summary['repeat_users']} sent 2 or more messages")
+        if summary["top_users"]:
+            print(f"\nTop {len(summary['top_users'])} users by messages:")
+            for user, count in summary["top_users"]:
+                print(f"  {user:>10}  {count}")
+
+def describe_filtered_data(filtered_df, entire_df, daily_counts=None, pool=None, summary=None, day_counts=None):
     """
     Prints the number of messages and unique users in the filtered DataFrame.
 
     Args:
         df (pd.DataFrame): A filtered DataFrame containing at least 'id_user' and 'message' columns.
+        daily_counts (Optional[dict]): Precomputed counts from `build_daily_counts()`
+            used as the spike-detection baseline.
+        pool (Optional[dict]): Worker pool for large results, see `summarize_filtered_data()`.
+        summary (Optional[dict]): Precomputed summary, e.g. from `summarize_with_rollup()`;
+            `filtered_df` may then be None.
+        day_counts (Optional[tuple]): Per-day counts of the filtered rows for spike detection.
 
     Returns:
         tuple: (number of messages, number of unique users)
     """
-    num_messages = len(filtered_df)
-    num_users = filtered_df['id_user'].nunique()
-    
-    print(f"Summary:")
-    if 'timestamp' in filtered_df.columns:
-        start_time = filtered_df['timestamp'].min()
-        end_time = filtered_df['timestamp'].max()
+    if summary is None:
+        summary = summarize_filtered_data(filtered_df, pool=pool)
 
+    print(f"Summary:")
+    # Empty results have no time range (None, or NaT from an empty column)
+    if not pd.isna(summary["start_time"]):
         fmt = "%b %d, %Y at %H:%M"
-        print(f"- Time range:     {start_time.strftime(fmt)} → {end_time.strftime(fmt)}")
+        print(f"- Time range:     {summary['start_time'].strftime(fmt)} → {summary['end_time'].strftime(fmt)}")
 
 
-    print(f"- Total messages: {num_messages}")
-    print(f"- Unique users:   {num_users}")
-    
-    unique_categories = filtered_df['category'].dropna().unique()
-    if len(unique_categories) == 1:
-        category = unique_categories[0]
-        handle_single_category(filtered_df, category, entire_df) 
+    print(f"- Total messages: {summary['num_messages']}")
+    if summary.get("num_users_estimated"):
+        print(f"- Unique users:   ~{summary['num_users']} (estimate, about 2% error)")
+    else:
+        print(f"- Unique users:   {summary['num_users']}")
+    describe_users(summary)
+
+    # A single user's daily counts say nothing about category-wide spikes
+    if summary["category"] is not None and summary.get("user") is None:
+        handle_single_category(filtered_df, summary["category"], entire_df, daily_counts=daily_counts,
+                               day_counts=day_counts)
 
     print("\nFirst few entries:")
-    preview = filtered_df[['timestamp', 'id_user', 'source', 'category', 'message']].head(10)
-    print(preview.to_string(index=False))
+    print(summary["preview"].to_string(index=False))
@@ -0,0 +1,548 @@
+import numpy as np
+import pandas as pd
+
+
+def _timestamp_ns(value):
+    """
+    Converts a timestamp-like value into integer nanoseconds since the epoch.
+
+    Args:
+        value: ISO string, datetime or pd.Timestamp.
+
+    Returns:
+        int: Nanoseconds since the epoch.
+    """
+    return pd.Timestamp(value).as_unit("ns").value
+
+
+def _encode_column(values):
+    """
+    Encodes a string column as integer codes over its lowercased values.
+
+    Args:
+        values (pd.Series): Column to encode; missing values get code -1.
+
+    Returns:
+        tuple: (np.ndarray of int32 codes, dict mapping lowercased value -> code)
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        lowered = pd.Series(values.cat.categories).str.lower()
+        categorical = pd.Categorical(lowered)
+        remap = np.append(categorical.codes, -1).astype(np.int32)
+        return remap[values.cat.codes.to_numpy()], {value: code for code, value in enumerate(categorical.categories)}
+
+    categorical = pd.Categorical(values.str.lower())
+    codes = categorical.codes.astype(np.int32)
+    index = {value: code for code, value in enumerate(categorical.categories)}
+    return codes, index
+
+
+def _encode_with_index(values, index):
+    """
+    Encodes a string column with an existing vocabulary, giving unseen lowercased
+    values the next free codes.
+
+    Args:
+        values (pd.Series): Column to encode; missing values get code -1.
+        index (dict): Lowercased value -> code; not modified.
+
+    Returns:
+        tuple: (np.ndarray of int32 codes, extended copy of `index`)
+    """
+    lowered = values.astype(object).str.lower()
+    index = dict(index)
+    for value in pd.unique(lowered.dropna()):
+        index.setdefault(value, len(index))
+    codes = lowered.map(index).fillna(-1).to_numpy(dtype=np.int32)
+    return codes, index
+
+
+def _build_postings(codes, index_dtype):
+    """
+    Groups row positions by code, keeping each group in ascending (time) order.
+
+    Args:
+        codes (np.ndarray): Integer code per row, -1 for missing.
+        index_dtype: Integer dtype used for row positions.
+
+    Returns:
+        dict: code -> np.ndarray of row positions.
+    """
+    order = np.argsort(codes, kind="stable").astype(index_dtype)
+    counts = np.bincount(codes[codes >= 0], minlength=codes.max(initial=-1) + 1)
+    start = int(np.count_nonzero(codes < 0))
+    postings = {}
+    for code, count in enumerate(counts):
+        postings[code] = order[start:start + count]
+        start += count
+    return postings
+
+
+def _build_user_index(user_codes, num_users, index_dtype):
+    """
+    Groups row positions by user in compressed sparse row form.
+
+    Args:
+        user_codes (np.ndarray): User code per sorted row, -1 for missing.
+        num_users (int): Number of user codes.
+        index_dtype: Integer dtype used for row positions.
+
+    Returns:
+        tuple: (offsets, rows): the rows of user `code` are `rows[offsets[code]:offsets[code + 1]]`,
+            in ascending (time) order.
+    """
+    order = np.argsort(user_codes, kind="stable").astype(index_dtype)
+    counts = np.bincount(user_codes[user_codes >= 0], minlength=num_users)
+    offsets = np.zeros(num_users + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, order[len(user_codes) - int(offsets[-1]):]
+
+
+def _encode_users(values, user_ids, user_lookup):
+    """
+    Encodes user ids with an existing vocabulary, giving unseen ids the next free codes.
+
+    Args:
+        values (pd.Series): 'id_user' column; missing values get code -1.
+        user_ids (np.ndarray): User id per existing code.
+        user_lookup (np.ndarray): Codes ordering `user_ids` ascending.
+
+    Returns:
+        tuple: (np.ndarray of int32 codes, extended `user_ids`)
+    """
+    value_codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques)
+    unique_codes = np.full(len(uniques), -1, dtype=np.int64)
+    if len(user_ids):
+        sorted_ids = user_ids[user_lookup]
+        found = np.searchsorted(sorted_ids, uniques).clip(max=len(sorted_ids) - 1)
+        known = sorted_ids[found] == uniques
+        unique_codes[known] = user_lookup[found[known]]
+    unseen = unique_codes < 0
+    unique_codes[unseen] = len(user_ids) + np.arange(int(unseen.sum()))
+
+    codes = np.full(len(value_codes), -1, dtype=np.int32)
+    valid = value_codes >= 0
+    codes[valid] = unique_codes[value_codes[valid]]
+    return codes, np.concatenate([user_ids, uniques[unseen]])
+
+
+def build_message_store(df):
+    """
+    Builds a read-only, pre-indexed view of the message DataFrame so filters
+    can be answered with binary searches and code lookups instead of scans.
+
+    Rows are addressed by their position in time order. When `df` is already
+    sorted by timestamp (as `setup_environment()` guarantees) positions map
+    directly onto `df` rows and no reordering array is kept.
+
+    Args:
+        df (pd.DataFrame): Message data with 'timestamp', 'category' and 'source' columns.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'timestamps': int64 nanoseconds in ascending order
+            - 'order': positions into `df` for each sorted row, or None if `df` is sorted
+            - 'category_codes' / 'source_codes': int32 code per sorted row
+            - 'category_index' / 'source_index': lowercased value -> code
+            - 'postings': rows per category, per source and per (category, source) pair
+            - 'user_ids': 'id_user' per user code, 'user_lookup': codes ordering them ascending
+            - 'user_codes': int32 user code per sorted row
+            - 'user_offsets' / 'user_rows': the rows of each user, see `user_rows()`
+    """
+    timestamps = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    index_dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+
+    order = None
+    if len(timestamps) and not bool(np.all(timestamps[1:] >= timestamps[:-1])):
+        order = np.argsort(timestamps, kind="stable").astype(index_dtype)
+        timestamps = timestamps[order]
+
+    category_codes, category_index = _encode_column(df["category"])
+    source_codes, source_index = _encode_column(df["source"])
+    if order is not None:
+        category_codes = category_codes[order]
+        source_codes = source_codes[order]
+
+    pair_codes = np.where(
+        (category_codes >= 0) & (source_codes >= 0),
+        category_codes * max(len(source_index), 1) + source_codes,
+        -1,
+    ).astype(np.int32)
+
+    # Sorted ids, so codes order them and the lookup is the identity
+    user_codes, user_ids = pd.factorize(df["id_user"], sort=True)
+    user_ids = np.asarray(user_ids)
+    user_codes = user_codes.astype(np.int32)
+    if order is not None:
+        user_codes = user_codes[order]
+    user_offsets, user_rows = _build_user_index(user_codes, len(user_ids), index_dtype)
+
+    return {
+        "timestamps": timestamps,
+        "order": order,
+        "category_codes": category_codes,
+        "source_codes": source_codes,
+        "category_index": category_index,
+        "source_index": source_index,
+        "postings": {
+            "category": _build_postings(category_codes, index_dtype),
+            "source": _build_postings(source_codes, index_dtype),
+            "pair": _build_postings(pair_codes, index_dtype),
+        },
+        "user_ids": user_ids,
+        "user_lookup": np.arange(len(user_ids)),
+        "user_codes": user_codes,
+        "user_offsets": user_offsets,
+        "user_rows": user_rows,
+    }
+
+
+def _extend_postings(postings, codes, positions):
+    """
+    Appends new row positions to posting lists, copying only the lists that grow.
+
+    Args:
+        postings (dict): code -> row positions; not modified.
+        codes (np.ndarray): Code per new row, -1 for missing.
+        positions (np.ndarray): Row position of each new row, ascending.
+
+    Returns:
+        dict: The extended posting lists.
+    """
+    extended = dict(postings)
+    valid = codes >= 0
+    order = np.argsort(codes[valid], kind="stable")
+    sorted_codes = codes[valid][order]
+    sorted_positions = positions[valid][order]
+    unique_codes, starts = np.unique(sorted_codes, return_index=True)
+    for code, group in zip(unique_codes.tolist(), np.split(sorted_positions, starts[1:])):
+        existing = extended.get(code)
+        extended[code] = group if existing is None else np.concatenate([existing, group])
+    return extended
+
+
+def _extend_user_index(offsets, rows, codes, positions, num_users):
+    """
+    Adds new rows to the per-user index by inserting them after each user's last row.
+
+    Args:
+        offsets (np.ndarray), rows (np.ndarray): Index from `_build_user_index()`; not modified.
+        codes (np.ndarray): User code per new row, -1 for missing.
+        positions (np.ndarray): Row position of each new row, all after the indexed rows.
+        num_users (int): Number of user codes including new users.
+
+    Returns:
+        tuple: The extended (offsets, rows).
+    """
+    valid = codes >= 0
+    order = np.argsort(codes[valid], kind="stable")
+    sorted_codes = codes[valid][order]
+    # New users have codes past the old offsets and go to the end, in code order
+    insert_at = offsets[np.minimum(sorted_codes + 1, len(offsets) - 1)]
+    counts = np.bincount(sorted_codes, minlength=num_users)
+    counts[:len(offsets) - 1] += np.diff(offsets)
+    new_offsets = np.zeros(num_users + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    return new_offsets, np.insert(rows.astype(positions.dtype), insert_at, positions[valid][order])
+
+
+def extend_message_store(store, df_new):
+    """
+    Returns a store that also covers rows appended after the ones it was built from.
+
+    The original store is left untouched, so readers holding it keep a consistent
+    snapshot. Only the touched posting lists are copied; a new source changes the
+    pair codes, so the pair postings are rebuilt in that case.
+
+    Args:
+        store (dict): Store from `build_message_store()` over a time-sorted DataFrame.
+        df_new (pd.DataFrame): Rows appended to that DataFrame, sorted by timestamp and
+            no older than its last row.
+
+    Returns:
+        dict: Store over the concatenated rows.
+
+    Raises:
+        ValueError: If the store is not time-sorted or `df_new` would break the order.
+    """
+    if not len(df_new):
+        return store
+    new_timestamps = df_new["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    old_timestamps = store["timestamps"]
+    if store["order"] is not None or np.any(np.diff(new_timestamps) < 0) or (
+            len(old_timestamps) and new_timestamps[0] < old_timestamps[-1]):
+        raise ValueError("Only rows newer than the last stored row can be appended to a time-sorted store")
+
+    offset = len(old_timestamps)
+    total = offset + len(df_new)
+    index_dtype = np.int32 if total < np.iinfo(np.int32).max else np.int64
+    positions = np.arange(offset, total, dtype=index_dtype)
+
+    new_category_codes, category_index = _encode_with_index(df_new["category"], store["category_index"])
+    new_source_codes, source_index = _encode_with_index(df_new["source"], store["source_index"])
+    category_codes = np.concatenate([store["category_codes"], new_category_codes])
+    source_codes = np.concatenate([store["source_codes"], new_source_codes])
+
+    def pair_codes(categories, sources):
+        return np.where(
+            (categories >= 0) & (sources >= 0),
+            categories * max(len(source_index), 1) + sources,
+            -1,
+        ).astype(np.int32)
+
+    new_user_codes, user_ids = _encode_users(df_new["id_user"], store["user_ids"], store["user_lookup"])
+    user_offsets, user_rows = _extend_user_index(store["user_offsets"], store["user_rows"], new_user_codes,
+                                                 positions, len(user_ids))
+
+    postings = store["postings"]
+    if len(source_index) == len(store["source_index"]):
+        pair_postings = _extend_postings(postings["pair"], pair_codes(new_category_codes, new_source_codes), positions)
+    else:
+        pair_postings = _build_postings(pair_codes(category_codes, source_codes), index_dtype)
+
+    return {
+        "timestamps": np.concatenate([old_timestamps, new_timestamps]),
+        "order": None,
+        "category_codes": category_codes,
+        "source_codes": source_codes,
+        "category_index": category_index,
+        "source_index": source_index,
+        "postings": {
+            "category": _extend_postings(postings["category"], new_category_codes, positions),
+            "source": _extend_postings(postings["source"], new_source_codes, positions),
+            "pair": pair_postings,
+        },
+        "user_ids": user_ids,
+        "user_lookup": store["user_lookup"] if len(user_ids) == len(store["user_ids"])
+        else np.argsort(user_ids, kind="stable"),
+        "user_codes": np.concatenate([store["user_codes"], new_user_codes]),
+        "user_offsets": user_offsets,
+        "user_rows": user_rows,
+    }
+
+
+def category_counts(store):
+    """Returns the number of messages per category, keyed by lowercase category name."""
+    postings = store["postings"]["category"]
+    return {name: len(postings.get(code, ())) for name, code in store["category_index"].items()}
+
+
+def _time_bounds(store, start_time, end_time):
+    """
+    Finds the half-open range of sorted positions inside [start_time, end_time].
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        start_time: Inclusive lower bound, or None.
+        end_time: Inclusive upper bound, or None.
+
+    Returns:
+        tuple: (lo, hi) sorted positions.
+    """
+    timestamps = store["timestamps"]
+    lo = 0 if start_time is None else int(np.searchsorted(timestamps, _timestamp_ns(start_time), side="left"))
+    hi = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, _timestamp_ns(end_time), side="right"))
+    return lo, max(lo, hi)
+
+
+def _user_code(store, user):
+    """Returns the code of a user id (e.g. 4844 or "4844"), or -1 for an unknown user."""
+    user_ids = store["user_ids"]
+    if not len(user_ids):
+        return -1
+    try:
+        user = user_ids.dtype.type(user) if user_ids.dtype.kind in "iuf" else user
+        sorted_ids = user_ids[store["user_lookup"]]
+        found = int(np.searchsorted(sorted_ids, user))
+    except (TypeError, ValueError, OverflowError):
+        return -1
+    if found < len(sorted_ids) and sorted_ids[found] == user:
+        return int(store["user_lookup"][found])
+    return -1
+
+
+def user_rows(store, user):
+    """
+    Returns the sorted positions of every message of one user.
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        user: 'id_user' value; numeric ids may be given as strings.
+
+    Returns:
+        np.ndarray: Ascending sorted positions (a view into the store), empty for an unknown user.
+    """
+    code = _user_code(store, user)
+    if code < 0:
+        return np.empty(0, dtype=np.int64)
+    return store["user_rows"][store["user_offsets"][code]:store["user_offsets"][code + 1]]
+
+
+def _filter_postings(store, category, source, user=None):
+    """
+    Finds the posting list for a category, source and/or user filter.
+
+    Returns:
+        Optional[np.ndarray]: Ascending sorted positions of the matching rows, or None
+            when no filter is set (every row matches).
+    """
+    if not (category or source or user is not None):
+        return None
+    postings = store["postings"]
+    category_code = store["category_index"].get(category.lower(), -1) if category else None
+    source_code = store["source_index"].get(source.lower(), -1) if source else None
+
+    if category_code == -1 or source_code == -1:
+        return np.empty(0, dtype=np.int64)
+    if user is not None:
+        # A user has few rows: narrow them down by code instead of intersecting postings
+        rows = user_rows(store, user)
+        if category_code is not None:
+            rows = rows[store["category_codes"][rows] == category_code]
+        if source_code is not None:
+            rows = rows[store["source_codes"][rows] == source_code]
+        return rows
+    if category_code is not None and source_code is not None:
+        pair_code = category_code * max(len(store["source_index"]), 1) + source_code
+        rows = postings["pair"].get(pair_code)
+    elif category_code is not None:
+        rows = postings["category"].get(category_code)
+    else:
+        rows = postings["source"].get(source_code)
+    return np.empty(0, dtype=np.int64) if rows is None else rows
+
+
+def _sorted_positions(store, category, source, start_time, end_time, user):
+    """
+    Finds the sorted positions matching the filters.
+
+    Returns:
+        slice | np.ndarray: A slice when only the time window applies.
+    """
+    lo, hi = _time_bounds(store, start_time, end_time)
+    rows = _filter_postings(store, category, source, user)
+    if rows is None:
+        return slice(lo, hi)
+    return rows[np.searchsorted(rows, lo, side="left"):np.searchsorted(rows, hi, side="left")]
+
+
+def select_rows(store, category=None, source=None, start_time=None, end_time=None, user=None):
+    """
+    Selects the rows matching the given filters without touching the DataFrame.
+
+    Category and source are matched case-insensitively. The time window is inclusive
+    on both ends.
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        category (Optional[str]): Category to keep.
+        source (Optional[str]): Source to keep.
+        start_time: Earliest timestamp to keep, or None.
+        end_time: Latest timestamp to keep, or None.
+        user: Keep only this 'id_user', or None.
+
+    Returns:
+        slice | np.ndarray: Row positions into the original DataFrame in timestamp order.
+            A slice is returned when no reordering or code lookup was needed; arrays are
+            views into the store's posting lists where possible.
+    """
+    rows = _sorted_positions(store, category, source, start_time, end_time, user)
+    order = store["order"]
+    return rows if order is None else order[rows]
+
+
+def select_page(store, category=None, source=None, start_time=None, end_time=None, after=-1, limit=None,
+                user=None):
+    """
+    Selects the next rows matching the filters after a position, without computing the rest.
+
+    The cost is two binary searches plus the page itself, however many rows match,
+    so the first page of a huge result is as cheap as any other.
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        category, source, start_time, end_time: Filters, as in `select_rows()`.
+        after (int): Sorted position of the last row already returned; -1 to start at the beginning.
+        limit (Optional[int]): Maximum rows to return; None for all remaining rows.
+        user: 'id_user' filter, as in `select_rows()`.
+
+    Returns:
+        tuple: (sorted positions of the page as np.ndarray, number of matching rows,
+            number of matching rows at or before `after`). Map sorted positions to
+            DataFrame rows with `store['order']` when it is not None.
+    """
+    lo, hi = _time_bounds(store, start_time, end_time)
+    rows = _filter_postings(store, category, source, user)
+    if rows is None:
+        first, last = lo, hi
+        start = min(max(lo, after + 1), hi)
+    else:
+        first, last = np.searchsorted(rows, lo, side="left"), np.searchsorted(rows, hi, side="left")
+        start = min(max(first, int(np.searchsorted(rows, after, side="right"))), last)
+    stop = last if limit is None else min(last, start + limit)
+
+    if rows is None:
+        page = np.arange(start, stop, dtype=np.int64)
+    else:
+        page = rows[start:stop]
+    return page, int(last - first), int(start - first)
+
+
+def _python_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def top_users(store, n=10, category=None, source=None, start_time=None, end_time=None, user=None):
+    """
+    Counts messages per user among the rows matching the filters.
+
+    Without filters the counts are read off the per-user index; otherwise only the
+    user codes of the matching rows are counted, so the cost follows the size of
+    the result, not of the dataset.
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        n (int): Number of users to return.
+        category, source, start_time, end_time, user: Filters, as in `select_rows()`.
+
+    Returns:
+        dict: 'top' as a list of (id_user, messages) for the `n` most frequent senders,
+            most messages first (ties by id), 'users' with at least one message and
+            'repeat_users' with two or more.
+    """
+    rows = _sorted_positions(store, category, source, start_time, end_time, user)
+    if isinstance(rows, slice) and rows == slice(0, len(store["timestamps"])):
+        counts = np.diff(store["user_offsets"])
+    else:
+        codes = store["user_codes"][rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(store["user_ids"]))
+
+    top = np.empty(0, dtype=np.int64)
+    if n > 0 and len(counts):
+        # Everyone tied with the n-th largest count is a candidate, so ties resolve by id
+        kth = counts[np.argpartition(-counts, min(n, len(counts)) - 1)[min(n, len(counts)) - 1]]
+        top = np.flatnonzero(counts >= max(kth, 1))
+        top = top[np.lexsort((store["user_ids"][top], -counts[top]))][:n]
+    return {
+        "top": [(_python_value(store["user_ids"][code]), int(counts[code])) for code in top],
+        "users": int(np.count_nonzero(counts)),
+        "repeat_users": int(np.count_nonzero(counts >= 2)),
+    }
+
+
+def category_breakdown(store, category=None, source=None, start_time=None, end_time=None, user=None):
+    """
+    Counts the rows matching the filters per category, e.g. everything one user sent.
+
+    Args:
+        store (dict): Store from `build_message_store()`.
+        category, source, start_time, end_time, user: Filters, as in `select_rows()`.
+
+    Returns:
+        dict: Lowercase category name -> messages, largest first; uncategorized rows are left out.
+    """
+    codes = store["category_codes"][_sorted_positions(store, category, source, start_time, end_time, user)]
+    counts = np.bincount(codes[codes >= 0], minlength=len(store["category_index"]))
+    names = {code: name for name, code in store["category_index"].items()}
+    return {names[code]: int(counts[code]) for code in np.argsort(-counts, kind="stable") if counts[code]}
@@ -0,0 +1,176 @@
+"""
+Local OpenAI-compatible stub server that answers chat completions from a fixture file.
+
+Usage:
+    python -m Chatbot.stub_llm_server --port 8001 --fixture Chatbot/fixtures/llm_replies.json
+
+Then point the chatbot or the tests at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python -m Chatbot.chatbot
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Chatbot.llm_backends import DEFAULT_FIXTURE_PATH, make_fixture_backend
+
+
+def malform(content, rng):
+    """
+    Mangles a JSON reply the way free-text model output goes wrong: wrapped in prose
+    and a code fence (still readable), cut off, or written with Python quoting.
+
+    Args:
+        content (str): Well-formed reply.
+        rng (random.Random): Chooses the kind of damage.
+
+    Returns:
+        str: The mangled reply.
+    """
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"Here are the filters:\n```json\n{content}\n```"
+    if kind == 1:
+        return content[:len(content) // 2]
+    return content.replace('"', "'").replace("null", "None")
+
+
+def make_handler(backend, delay=0.0, max_in_flight=None, malformed_rate=0.0, seed=0, structured_output=True):
+    """
+    Builds a request handler class that serves `/v1/chat/completions` from a backend.
+
+    Args:
+        backend (dict): Backend from `Chatbot.llm_backends`, usually a fixture backend.
+        delay (float): Seconds to sleep before answering, to simulate model latency.
+        max_in_flight (Optional[int]): Answer 429 with a Retry-After header while this
+            many requests are already being served, like a provider's rate limit.
+        malformed_rate (float): Share of replies passed through `malform()` when the
+            request has no JSON schema 'response_format'; schema requests always get
+            well-formed replies, as with structured output.
+        seed (int): Seed for choosing the malformed replies.
+        structured_output (bool): When False, answer 400 to requests with a JSON schema
+            'response_format', like a model without structured output.
+
+    Returns:
+        type: A `BaseHTTPRequestHandler` subclass.
+    """
+    lock = threading.Lock()
+    in_flight = [0]
+    rng = random.Random(seed)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload, headers=()):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            schema = (request.get("response_format") or {}).get("type") == "json_schema"
+            if schema and not structured_output:
+                self._send_json(400, {"error": {"message": "response_format 'json_schema' is not supported",
+                                                "type": "invalid_request_error", "param": "response_format"}})
+                return
+            with lock:
+                throttled = max_in_flight is not None and in_flight[0] >= max_in_flight
+                in_flight[0] += not throttled
+            if throttled:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                headers=[("Retry-After", f"{max(delay, 0.01):g}")])
+                return
+            try:
+                if delay:
+                    time.sleep(delay)
+                reply = backend["complete"](request["messages"])
+            except KeyError as e:
+                self._send_json(404, {"error": {"message": str(e), "type": "not_found"}})
+                return
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+            content = reply["content"]
+            if malformed_rate and not schema:
+                with lock:
+                    if rng.random() < malformed_rate:
+                        content = malform(content, rng)
+
+            prompt_chars = sum(len(m["content"]) for m in request["messages"])
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (prompt_chars + len(content)) // 4,
+                },
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(backend, host="127.0.0.1", port=0, delay=0.0, max_in_flight=None, malformed_rate=0.0,
+                      structured_output=True):
+    """
+    Starts the stub server on a background thread.
+
+    Args:
+        backend (dict): Backend that produces the replies.
+        host (str): Interface to bind.
+        port (int): Port to bind, 0 for any free port.
+        delay (float): Simulated latency per request in seconds.
+        max_in_flight (Optional[int]): Concurrent requests served before answering 429.
+        malformed_rate (float): Share of replies to requests without a schema that are mangled.
+        structured_output (bool): Accept JSON schema response formats.
+
+    Returns:
+        ThreadingHTTPServer: The running server; its base URL is
+            `f"http://{host}:{server.server_port}/v1"`. Call `shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(backend, delay, max_in_flight, malformed_rate,
+                                                         structured_output=structured_output))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE_PATH)
+    parser.add_argument("--delay", type=float, default=0.0, help="simulated latency per request in seconds")
+    parser.add_argument("--max-in-flight", type=int, help="answer 429 above this many concurrent requests")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="share of replies to mangle when the request has no JSON schema")
+    parser.add_argument("--no-structured-output", dest="structured_output", action="store_false",
+                        help="reject JSON schema response formats with 400")
+    args = parser.parse_args()
+
+    handler = make_handler(make_fixture_backend(args.fixture), args.delay, args.max_in_flight, args.malformed_rate,
+                           structured_output=args.structured_output)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,10 +1,17 @@
+import os
 import pytest
 import pandas as pd
 from datetime import timedelta
 from Chatbot.chatbot import query_LLM_for_filters, parse_expr, setup_environment
+from Chatbot.eval_cases import FILTER_CASES, RESET_CASES, build_time_filter_cases
 import dateparser
 from datetime import timedelta
 
+# Runs against the live API by default. Set CHATBOT_LLM_BACKEND=fixture (or point
+# OPENAI_BASE_URL at `python -m Chatbot.stub_llm_server`) to run offline.
+# The response cache is disabled so every case exercises the backend. The cases live in
+# Chatbot/eval_cases.py; `python -m benchmarks.bench_llm_accuracy` replays them concurrently.
+os.environ.setdefault("CHATBOT_LLM_CACHE", "")
 env = setup_environment()
 
 client = env["client"]
@@ -14,64 +21,8 @@ categories = env["categories"]
 sources = env["sources"]
 
 
-test_cases = [
-    # Full filters: category + source
-    {"query": "Show me cashout issues on livechat", "expected_category": "cashout issues", "expected_source": "livechat"},
-    {"query": "Show me account issues on telegram", "expected_category": "account issues", "expected_source": "telegram"},
-    {"query": "List time delays from telegram users", "expected_category": "time delays", "expected_source": "telegram"},
-    {"query": "Any bonus issue messages on livechat?", "expected_category": "bonus issue", "expected_source": "livechat"},
-    {"query": "General inquiry complaints from telegram", "expected_category": "general inquiry", "expected_source": "telegram"},
-    {"query": "Are there any withdrawal issue reports on livechat?", "expected_category": "withdrawal issue", "expected_source": "livechat"},
-    {"query": "Deposit issues reported on telegram", "expected_category": "deposit issues", "expected_source": "telegram"},
-    {"query": "Game issues on livechat", "expected_category": "game issues", "expected_source": "livechat"},
-    {"query": "Any freespin issues via telegram?", "expected_category": "freespin issues", "expected_source": "telegram"},
-    {"query": "Not actionable messages from livechat", "expected_category": "not actionable", "expected_source": "livechat"},
-
-    # Category only (no source specified)
-    {"query": "Show me all cashout issues", "expected_category": "cashout issues", "expected_source": None},
-    {"query": "What are the game issues?", "expected_category": "game issues", "expected_source": None},
-
-    # Source only (no category specified)
-    {"query": "All messages from telegram", "expected_category": None, "expected_source": "telegram"},
-    {"query": "Show me livechat messages", "expected_category": None, "expected_source": "livechat"},
-
-    # No filters
-    {"query": "Show me all messages", "expected_category": None, "expected_source": None},
-    {"query": "Anything new?", "expected_category": None, "expected_source": None}
-]
-
-time_filter_cases = [
-    {
-        "query": "Show me all messages from the last day",
-        "expected_start": (current_time - timedelta(days=1)).replace(microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    },
-    {
-        "query": "Show me issues reported in the past week",
-        "expected_start": (current_time - timedelta(weeks=1)).replace(microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    },
-    {
-        "query": "Anything in the last hour?",
-        "expected_start": (current_time - timedelta(hours=1)).replace(microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    },
-    {
-        "query": "Messages from the last minute",
-        "expected_start": (current_time - timedelta(minutes=1)).replace(microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    },
-    {
-        "query": "What was reported today?",
-        "expected_start": current_time.replace(hour=0, minute=0, second=0, microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    },
-    {
-        "query": "Show me this week's messages",
-        "expected_start": (current_time - timedelta(days=current_time.weekday())).replace(hour=0, minute=0, second=0, microsecond=0).isoformat(),
-        "expected_end": current_time.replace(microsecond=0).isoformat()
-    }
-]
+test_cases = FILTER_CASES
+time_filter_cases = build_time_filter_cases(current_time)
 
 def check_llm_field(field_name: str, actual, expected, query: str):
     """
@@ -156,28 +107,7 @@ def test_parse_expr(expr, expected_dt):
     print(f"🧪 Expression: '{expr}' → {parsed} (expected: {expected_dt})")
     assert parsed == expected_dt, f"Failed parsing '{expr}': got {parsed}, expected {expected_dt}"
 
-@pytest.mark.parametrize("query, expected_reset", [
-    # CLEAR resets
-    ("new query: show me deposit issues", True),
-    ("start over: show me cashout issues", True),
-    ("reset filters and show me all messages", True),
-    ("fresh search: give me freespin issues from telegram", True),
-
-    # FOLLOW-UPS
-    ("make that telegram only", False),
-    ("change the source to livechat", False),
-    ("now show only bonus issues", False),
-    ("just change it to game issues", False),
-
-    # AMBIGUOUS / EDGE CASES
-    ("how about livechat instead", False),         # implies context
-    ("actually, show freespin issues", False),     # soft change in category
-    ("okay, now find account issues", False),       # arguably new intent
-    ("find me messages again from yesterday", False),  # new time, unclear whether reset
-    ("go back to withdrawal issues", False),       # reverting state, but continuing
-    ("let's look at livechat only", False),        # sounds like refinement 
-])
-
+@pytest.mark.parametrize("query, expected_reset", [(case["query"], case["expected_reset"]) for case in RESET_CASES])
 def test_llm_reset_flag_detection(query, expected_reset):
     result = query_LLM_for_filters(query, env)
 
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot.conftest import make_df as make_messages_df
+from Chatbot.daily_counts import (
+    add_to_daily_counts, build_daily_counts, category_baseline, daily_series, rolling_baseline,
+)
+from Chatbot.stats import detect_spikes
+from Chatbot.store import build_message_store
+
+
+def make_df(n=3000, seed=1):
+    df = make_messages_df(n - 200, seed, sources=("livechat", "telegram"),
+                          categories=("cashout issues", "game issues", None))
+    # Make one category bursty so spikes exist.
+    burst = make_messages_df(200, seed + 1, start="2024-12-24", end="2024-12-25", sources=("livechat", "telegram"),
+                             categories=("game issues",))
+    return pd.concat([df, burst]).sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def scan_spikes(df, category, whole_df, z_threshold=2.0):
+    """Reference implementation: the groupby-based detection the cube replaces."""
+    full_cat_df = whole_df[whole_df['category'] == category].copy()
+    full_cat_df['day'] = full_cat_df['timestamp'].dt.floor('D')
+    full_daily_counts = full_cat_df.groupby('day').size()
+    mean, std = full_daily_counts.mean(), full_daily_counts.std()
+
+    filtered_df = df.copy()
+    filtered_df['day'] = filtered_df['timestamp'].dt.floor('D')
+    filtered_counts = filtered_df.groupby('day').size()
+    z_scores = (filtered_counts - mean) / std
+    spike_days = z_scores[abs(z_scores) >= z_threshold]
+    return mean, std, [(date, z, filtered_counts[date]) for date, z in spike_days.items()]
+
+
+@pytest.mark.parametrize("category", ["cashout issues", "game issues"])
+@pytest.mark.parametrize("source", [None, "telegram"])
+def test_detect_spikes_matches_groupby(category, source):
+    whole_df = make_df()
+    daily_counts = build_daily_counts(build_message_store(whole_df))
+    filtered = whole_df[whole_df["category"] == category]
+    if source:
+        filtered = filtered[filtered["source"] == source]
+
+    result = detect_spikes(filtered, category, whole_df, daily_counts=daily_counts)
+    mean, std, spikes = scan_spikes(filtered, category, whole_df)
+
+    assert result["mean"] == pytest.approx(mean)
+    assert result["std"] == pytest.approx(std)
+    assert [(d, c) for d, _, c in result["spikes"]] == [(d, c) for d, _, c in spikes]
+    assert [z for _, z, _ in result["spikes"]] == pytest.approx([z for _, z, _ in spikes])
+
+
+def test_incremental_updates_match_full_build():
+    df = make_df()
+    full = build_daily_counts(build_message_store(df))
+
+    head = df.iloc[:1000]
+    tail = df.iloc[1000:]
+    daily_counts = build_daily_counts(build_message_store(head))
+    tail_store = build_message_store(tail)
+    add_to_daily_counts(daily_counts, tail_store["timestamps"], tail_store["category_codes"], tail_store["source_codes"])
+
+    assert daily_counts["first_day"] == full["first_day"]
+    np.testing.assert_array_equal(daily_counts["counts"], full["counts"])
+
+
+def test_incremental_update_grows_vocabulary_and_days():
+    df = make_df()
+    daily_counts = build_daily_counts(build_message_store(df))
+    daily_counts["category_index"]["bonus issue"] = 2
+    daily_counts["source_index"]["discord"] = 2
+
+    add_to_daily_counts(
+        daily_counts,
+        np.array([pd.Timestamp("2025-02-10").value]),
+        np.array([2]),
+        np.array([2]),
+    )
+
+    series = daily_series(daily_counts, "bonus issue", "discord")
+    assert series.sum() == 1
+    assert series[-1] == 1
+    assert daily_series(daily_counts, "cashout issues").sum() == (df["category"] == "cashout issues").sum()
+
+
+def test_source_baseline():
+    df = make_df()
+    daily_counts = build_daily_counts(build_message_store(df))
+    telegram = df[(df["category"] == "game issues") & (df["source"] == "telegram")]
+    per_day = telegram.groupby(telegram["timestamp"].dt.floor("D")).size()
+
+    mean, std = category_baseline(daily_counts, "game issues", "telegram")
+    assert mean == pytest.approx(per_day.mean())
+    assert std == pytest.approx(per_day.std())
+
+
+def test_rolling_baseline_matches_naive_window():
+    df = make_df()
+    daily_counts = build_daily_counts(build_message_store(df))
+    series = daily_series(daily_counts, "game issues")
+
+    mean, std = rolling_baseline(daily_counts, "game issues", window_days=7)
+
+    for day in [0, 1, 5, 30, len(series) - 1]:
+        window = series[max(0, day - 7):day]
+        active = pd.Series(window[window > 0])
+        if len(active):
+            assert mean[day] == pytest.approx(active.mean())
+        else:
+            assert np.isnan(mean[day])
+        if len(active) > 1:
+            assert std[day] == pytest.approx(active.std())
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot import data_cache
+from Chatbot.data_cache import load_messages, read_messages_csv
+
+CSV_TEXT = (
+    "id_user,timestamp,source,message,cluster,category\n"
+    "4844,11/2/2024,livechat,\"\"\"What time is it where u are\"\"\",3,not actionable\n"
+    "3985,11/1/2024,livechat,\"\"\"What happened to the Cashback piggy?\"\"\",1,cashout issues\n"
+    "17,11/3/2024,telegram,,0,\n"
+    "3985,11/1/2024,telegram,ünïcödé message,1,cashout issues\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "messages.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    return str(path)
+
+
+def as_lists(df):
+    return {c: df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns}
+
+
+@pytest.mark.parametrize("use_arrow", [True, False])
+def test_cache_round_trip(csv_path, tmp_path, monkeypatch, use_arrow):
+    if not use_arrow:
+        monkeypatch.setattr(data_cache, "pa", None)
+    cache_dir = str(tmp_path / "cache")
+
+    built = load_messages(csv_path, cache_dir)
+    loaded = load_messages(csv_path, cache_dir)
+    expected = read_messages_csv(csv_path)
+
+    assert as_lists(built) == as_lists(expected)
+    assert as_lists(loaded) == as_lists(expected)
+    assert isinstance(loaded["category"].dtype, pd.CategoricalDtype)
+    assert loaded["timestamp"].dtype == "datetime64[ns]"
+
+
+def is_memory_mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = getattr(array, "base", None)
+    return array is not None
+
+
+def test_cache_is_memory_mapped(csv_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    load_messages(csv_path, cache_dir)
+    df = load_messages(csv_path, cache_dir)
+
+    assert is_memory_mapped(df["id_user"].to_numpy())
+    assert is_memory_mapped(df["timestamp"].to_numpy())
+
+
+def test_cache_rebuilds_when_content_changes(csv_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert len(load_messages(csv_path, cache_dir)) == 4
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("5,11/4/2024,telegram,new message,2,game issues\n")
+
+    df = load_messages(csv_path, cache_dir)
+    assert len(df) == 5
+    assert df["message"].iloc[-1] == "new message"
+
+
+def test_cache_survives_touch_without_content_change(csv_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    load_messages(csv_path, cache_dir)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def fail_rebuild(*args, **kwargs):
+        raise AssertionError("cache should not be rebuilt")
+
+    monkeypatch.setattr(data_cache, "build_cache", fail_rebuild)
+    assert len(load_messages(csv_path, cache_dir)) == 4
@@ -0,0 +1,44 @@
+import pandas as pd
+from Chatbot.chatbot import build_environment, query_LLM_for_filters
+from Chatbot.eval_cases import FILTER_CASES, RESET_CASES, all_cases, build_time_filter_cases, score_reply
+from Chatbot.llm_backends import make_fixture_backend
+from benchmarks.synthetic import make_messages
+
+CURRENT_TIME = pd.Timestamp("2025-01-30 15:45:10.250").to_pydatetime()
+
+
+def test_time_cases_resolve_against_current_time():
+    cases = {case["query"]: case for case in build_time_filter_cases(CURRENT_TIME)}
+
+    assert cases["Anything in the last hour?"]["expected_start"] == "2025-01-30T14:45:10"
+    assert cases["What was reported today?"]["expected_start"] == "2025-01-30T00:00:00"
+    assert cases["Show me this week's messages"]["expected_start"] == "2025-01-27T00:00:00"
+    assert all(case["expected_end"] == "2025-01-30T15:45:10" for case in cases.values())
+
+
+def test_score_reply_scores_only_the_case_fields():
+    case = FILTER_CASES[0]
+    reply = {"category": case["expected_category"], "source": "telegram", "reset": True}
+
+    scores = score_reply(case, reply, CURRENT_TIME)
+
+    assert scores == {"category": (True, case["expected_category"]), "source": (False, "telegram")}
+
+
+def test_score_reply_fails_every_field_of_an_unparsed_reply():
+    time_case = build_time_filter_cases(CURRENT_TIME)[0]
+
+    assert score_reply({"query": "x", "expected_category": None, "expected_source": None}, None, CURRENT_TIME) == {
+        "category": (False, None), "source": (False, None),
+    }
+    assert score_reply(time_case, None, CURRENT_TIME) == {"start": (False, None), "end": (False, None)}
+    assert score_reply(RESET_CASES[-1], None, CURRENT_TIME)["reset"] == (False, None)
+
+
+def test_fixture_replies_pass_every_case():
+    env = build_environment(make_messages(1_000), make_fixture_backend())
+    current_time = env["current_time"].to_pydatetime()
+
+    for case in all_cases(current_time):
+        result = query_LLM_for_filters(case["query"], env)
+        assert all(ok for ok, _ in score_reply(case, result, current_time).values()), case["query"]
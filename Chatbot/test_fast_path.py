@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+from Chatbot.chatbot import parse_expr
+from Chatbot.fast_path import (
+    build_fast_path, extract_filters_locally, extract_filters_with_fallback, fast_path_report, new_fast_path_stats,
+)
+
+CATEGORIES = [
+    "not actionable", "cashout issues", "account issues", "time delays", "bonus issue",
+    "general inquiry", "withdrawal issue", "deposit issues", "game issues", "freespin issues",
+]
+SOURCES = ["livechat", "telegram"]
+CURRENT_TIME = pd.Timestamp("2025-01-30")
+
+fast_path = build_fast_path(CATEGORIES, SOURCES)
+
+
+@pytest.mark.parametrize("query, category, source", [
+    ("Show me cashout issues on livechat", "cashout issues", "livechat"),
+    ("List time delays from telegram users", "time delays", "telegram"),
+    ("Any bonus issue messages on livechat?", "bonus issue", "livechat"),
+    ("General inquiry complaints from telegram", "general inquiry", "telegram"),
+    ("Any freespin issues via telegram?", "freespin issues", "telegram"),
+    ("Not actionable messages from livechat", "not actionable", "livechat"),
+    ("Show me all cashout issues", "cashout issues", None),
+    ("What are the game issues?", "game issues", None),
+    ("Show me livechat messages", None, "livechat"),
+    ("Show me all messages", None, None),
+    ("free spins on live chat", "freespin issues", "livechat"),
+    ("withdrawals via Telegram", "withdrawal issue", "telegram"),
+    ("show me cashot issues", "cashout issues", None),
+])
+def test_confident_category_and_source(query, category, source):
+    filters, confidence = extract_filters_locally(query, fast_path)
+    assert confidence >= 0.8
+    assert filters["category"] == category
+    assert filters["source"] == source
+    assert filters["reset"] is False
+
+
+@pytest.mark.parametrize("query, expected_start", [
+    ("Show me all messages from the last day", CURRENT_TIME - pd.Timedelta(days=1)),
+    ("Show me issues reported in the past week", CURRENT_TIME - pd.Timedelta(weeks=1)),
+    ("Anything in the last hour?", CURRENT_TIME - pd.Timedelta(hours=1)),
+    ("Messages from the last minute", CURRENT_TIME - pd.Timedelta(minutes=1)),
+    ("telegram messages from the last 3 days", CURRENT_TIME - pd.Timedelta(days=3)),
+    ("What was reported today?", CURRENT_TIME.normalize()),
+    ("Show me this week's messages", CURRENT_TIME.normalize() - pd.Timedelta(days=CURRENT_TIME.weekday())),
+])
+def test_time_phrases(query, expected_start):
+    filters, confidence = extract_filters_locally(query, fast_path)
+    assert confidence == 1.0
+    assert filters["end_time_expr"] == "now"
+    assert parse_expr(filters["start_time_expr"], CURRENT_TIME) == expected_start.isoformat()
+
+
+@pytest.mark.parametrize("query, expected_reset", [
+    ("new query: show me deposit issues", True),
+    ("start over: show me cashout issues", True),
+    ("reset filters and show me all messages", True),
+    ("fresh search: give me freespin issues from telegram", True),
+    ("make that telegram only", False),
+    ("change the source to livechat", False),
+    ("now show only bonus issues", False),
+    ("how about livechat instead", False),
+    ("let's look at livechat only", False),
+])
+def test_reset_cues(query, expected_reset):
+    filters, confidence = extract_filters_locally(query, fast_path)
+    assert confidence == 1.0
+    assert filters["reset"] is expected_reset
+
+
+@pytest.mark.parametrize("query", [
+    "Anything new?",
+    "messages about the cashback piggy",
+    "compare telegram and livechat deposit issues",
+    "game issues or bonus issues from yesterday",
+])
+def test_unclear_queries_have_low_confidence(query):
+    _, confidence = extract_filters_locally(query, fast_path)
+    assert confidence < 0.9
+
+
+def test_fallback_and_report():
+    stats = new_fast_path_stats()
+    llm_calls = []
+
+    def llm_extract(query):
+        llm_calls.append(query)
+        return {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None, "reset": False}
+
+    extract_filters_with_fallback("Game issues on livechat", fast_path, stats, llm_extract)
+    extract_filters_with_fallback("Anything new?", fast_path, stats, llm_extract)
+
+    assert llm_calls == ["Anything new?"]
+    report = fast_path_report(stats)
+    assert report["queries"] == 2
+    assert report["hit_rate"] == 0.5
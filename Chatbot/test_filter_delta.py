@@ -0,0 +1,202 @@
+import openai
+import pandas as pd
+import pytest
+from Chatbot.chatbot import build_environment, new_filter_context, query_LLM_for_filters, update_filter_context
+from Chatbot.conftest import make_env, post, run_against_server
+from Chatbot.eval_cases import CONVERSATION_CASES, score_context
+from Chatbot.llm_backends import make_fixture_backend, make_openai_backend
+from Chatbot.prompt import (
+    PROMPT_CATEGORY_LIMIT, build_prompt, filter_schema, llm_report, new_llm_stats, parse_filter_reply, prompt_messages,
+)
+from Chatbot.server import new_server_state
+from Chatbot.stub_llm_server import start_stub_server
+from benchmarks.synthetic import make_messages
+
+CATEGORIES = ["cashout issues", "game issues"]
+SOURCES = ["livechat", "telegram"]
+NOW = pd.Timestamp("2025-01-30 15:00")
+
+
+def recording_backend(reply, structured=False):
+    calls = []
+
+    def complete(messages, **options):
+        calls.append((messages, options))
+        return {"content": reply, "usage": None}
+
+    return {"name": "recording", "client": None, "complete": complete, "structured": structured}, calls
+
+
+def delta_env(backend):
+    return {"llm": backend, "llm_stats": new_llm_stats(), "prompt": build_prompt(CATEGORIES, SOURCES),
+            "current_time": NOW}
+
+
+def test_context_message_carries_only_set_filters():
+    prompt = build_prompt(CATEGORIES, SOURCES)
+    current = {**new_filter_context(), "category": "game issues", "top_users": 10}
+
+    _, context, query = prompt_messages(prompt, "make that telegram", NOW, current)
+    assert context["content"] == 'Today is Thursday, 2025-01-30.\nCurrent filters: {"category":"game issues","top_users":10}'
+    assert query["content"] == "make that telegram"
+
+    _, fresh, _ = prompt_messages(prompt, "game issues", NOW, new_filter_context())
+    assert fresh["content"].endswith("Current filters: none")
+    # The prefix does not depend on the filters, so it stays cacheable
+    assert prompt_messages(prompt, "x", NOW, current)[0] == prompt_messages(prompt, "x", NOW)[0]
+
+
+def test_schema_is_strict_and_lists_small_vocabularies():
+    schema = filter_schema(CATEGORIES, SOURCES)
+    assert schema["required"] == list(schema["properties"]) and schema["additionalProperties"] is False
+    assert schema["properties"]["category"]["enum"] == CATEGORIES + [None]
+    assert schema["properties"]["source"]["type"] == ["string", "null"]
+    assert "semantic_query" not in schema["properties"]
+    assert "semantic_query" in filter_schema(CATEGORIES, SOURCES, semantic=True)["properties"]
+
+    many = [f"category {i}" for i in range(PROMPT_CATEGORY_LIMIT + 1)]
+    assert "enum" not in filter_schema(many, SOURCES)["properties"]["category"]
+
+    prompt = build_prompt(CATEGORIES, SOURCES)
+    assert prompt["response_format"]["json_schema"]["schema"] == schema
+    assert set(prompt["fields"]) == set(schema["properties"])
+
+
+@pytest.mark.parametrize("content, expected", [
+    ('{"category": "game issues", "reset": false}', {"category": "game issues", "reset": False}),
+    ('Here you go:\n```json\n{"source": "telegram", "clear": ["category"]}\n```',
+     {"source": "telegram", "clear": ["category"]}),
+    ('{"category": "game issues", "notes": {"confidence": "high"}}', {"category": "game issues"}),
+    ('{"category": "game iss', None),
+    ("{'category': 'game issues'}", None),
+    ('["game issues"]', None),
+    ("I don't know", None),
+    ('{"category": 3, "source": ["telegram"], "start_time_expr": {"days": 2}, "end_time_expr": null}',
+     {"end_time_expr": None}),
+    ('{"user": "42", "top_users": true, "clear": "category", "reset": "yes"}', {}),
+    ('{"user": 42, "top_users": 5, "clear": ["source", "bogus"], "reset": false}',
+     {"user": 42, "top_users": 5, "reset": False}),
+])
+def test_parse_filter_reply(content, expected):
+    assert parse_filter_reply(content, build_prompt(CATEGORIES, SOURCES)) == expected
+
+
+def test_clear_removes_filters_and_null_keeps_them():
+    current = {**new_filter_context(), "category": "game issues", "source": "telegram", "top_users": 10}
+
+    updated = update_filter_context(current, {"category": None, "source": None, "clear": ["source"], "reset": False})
+    assert updated == {**current, "source": None}
+
+    updated = update_filter_context(current, {"category": None, "clear": ["category", "top_users"],
+                                              "source": "livechat", "reset": False})
+    assert updated == {**new_filter_context(), "source": "livechat"}
+
+
+def test_schema_sent_only_to_structured_backends():
+    current = {**new_filter_context(), "category": "game issues"}
+    for structured in (True, False):
+        backend, calls = recording_backend('{"source": "telegram", "reset": false}', structured)
+        env = delta_env(backend)
+
+        assert query_LLM_for_filters("only telegram", env, current) == {"source": "telegram", "reset": False}
+        messages, options = calls[0]
+        assert "Current filters" in messages[1]["content"]
+        assert ("response_format" in options) == structured
+        assert env["llm_stats"]["structured"] == int(structured)
+
+
+def test_parse_failures_are_counted():
+    backend, calls = recording_backend("Sorry, which category?")
+    env = delta_env(backend)
+
+    assert query_LLM_for_filters("hmm", env) is None
+    assert len(calls) == 1
+    report = llm_report(env["llm_stats"])
+    assert report["requests"] == 1 and report["parse_failure_rate"] == 1.0
+
+
+def test_openai_backend_falls_back_when_schema_is_rejected(monkeypatch):
+    server = start_stub_server(make_fixture_backend(), structured_output=False)
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+        create, sent = client.chat.completions.create, []
+        monkeypatch.setattr(client.chat.completions, "create",
+                            lambda **request: sent.append("response_format" in request) or create(**request))
+        env = delta_env(make_openai_backend(client))
+        first = query_LLM_for_filters("Show me cashout issues on livechat", env)
+        second = query_LLM_for_filters("Game issues on livechat", env)
+    finally:
+        server.shutdown()
+
+    assert first["category"] == "cashout issues" and second["category"] == "game issues"
+    # Rejected once, repeated without the schema, then never sent again
+    assert sent == [True, False, False]
+
+
+def test_openai_backend_keeps_schema_after_other_bad_requests(monkeypatch):
+    server = start_stub_server(make_fixture_backend(), structured_output=False)
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+        create, sent = client.chat.completions.create, []
+
+        def too_long(**request):
+            sent.append("response_format" in request)
+            try:
+                return create(**request)
+            except openai.BadRequestError as e:
+                raise openai.BadRequestError("This model's maximum context length is 128000 tokens",
+                                             response=e.response, body={"param": "messages"}) from None
+
+        monkeypatch.setattr(client.chat.completions, "create", too_long)
+        env = delta_env(make_openai_backend(client))
+        with pytest.raises(openai.BadRequestError, match="maximum context length"):
+            query_LLM_for_filters("Show me cashout issues on livechat", env)
+        with pytest.raises(openai.BadRequestError):
+            query_LLM_for_filters("Game issues on livechat", env)
+    finally:
+        server.shutdown()
+
+    # Not retried, and the next request still carries the schema
+    assert sent == [True, True]
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_stub_mangles_only_unstructured_replies(structured):
+    server = start_stub_server(make_fixture_backend(), malformed_rate=1.0)
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+        env = delta_env(make_openai_backend(client, structured=structured))
+        # Truncated and Python-quoted replies cannot be read; prose-wrapped ones can
+        for query in ("Show me cashout issues on livechat", "Game issues on livechat", "Show me all cashout issues"):
+            query_LLM_for_filters(query, env)
+    finally:
+        server.shutdown()
+
+    assert (env["llm_stats"]["parse_failures"] > 0) == (not structured)
+
+
+def test_fixture_conversations_build_the_expected_context():
+    env = build_environment(make_messages(1_000), make_fixture_backend())
+
+    for conversation in CONVERSATION_CASES:
+        context = new_filter_context()
+        for turn in conversation:
+            context = update_filter_context(context, query_LLM_for_filters(turn["query"], env, context))
+            assert all(ok for ok, _ in score_context(turn, context).values()), turn["query"]
+    assert score_context(CONVERSATION_CASES[0][0], None)["category"] == (False, None)
+
+
+def test_server_sends_session_filters_to_the_llm():
+    env, _ = make_env()
+    sent = []
+    complete = env["llm"]["complete"]
+    env["llm"] = {**env["llm"], "complete": lambda messages: sent.append(messages[1]["content"]) or complete(messages)}
+    state = new_server_state(env)
+
+    async def scenario(port):
+        await post(port, {"session_id": "a", "query": "anything odd lately?"})
+        await post(port, {"session_id": "a", "query": "and what else?"})
+
+    run_against_server(state, scenario)
+    assert sent[0].endswith("Current filters: none")
+    assert sent[1].endswith('Current filters: {"category":"game issues"}')
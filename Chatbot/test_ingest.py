@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot.chatbot import apply_filters, build_environment
+from Chatbot.conftest import bag_of_words, make_df, make_env, make_semantic_df, post, run_against_server
+from Chatbot.daily_counts import build_daily_counts
+from Chatbot.ingest import (
+    CLUSTER_MAPPING_PATH, CLUSTER_MODEL_PATH, MAX_SPOOL_RETRIES, append_messages, ingest_records, ingest_report,
+    ingest_spool, new_ingest_stats, open_spool, read_spool,
+)
+from Chatbot.semantic_index import build_semantic_index, search
+from Chatbot.server import ingest_loop, ingest_poll_delay, new_server_state
+from Chatbot.store import build_message_store, extend_message_store, select_rows
+
+FILTERS = [
+    {},
+    {"category": "cashout issues"},
+    {"source": "telegram"},
+    {"category": "game issues", "source": "livechat"},
+    {"category": "login issues"},
+    {"source": "whatsapp"},
+    {"category": "login issues", "source": "whatsapp"},
+    {"start_time": pd.Timestamp("2025-01-29"), "end_time": pd.Timestamp("2025-02-02")},
+]
+
+
+def to_records(df):
+    return json.loads(df.to_json(orient="records", date_format="iso", date_unit="ns"))
+
+
+def test_extended_store_matches_a_full_build():
+    old = make_df(300, start="2025-01-01", end="2025-01-30")
+    new = make_df(120, start="2025-01-30", end="2025-02-03", seed=1, categories=("game issues", "login issues"),
+                  sources=("telegram", "whatsapp"))
+    combined = pd.concat([old, new], ignore_index=True)
+
+    store = build_message_store(old)
+    extended = extend_message_store(store, new)
+    rebuilt = build_message_store(combined)
+    for filters in FILTERS:
+        assert np.array_equal(np.arange(len(combined))[select_rows(extended, **filters)],
+                              np.arange(len(combined))[select_rows(rebuilt, **filters)]), filters
+    # The original snapshot is untouched
+    assert len(store["timestamps"]) == 300 and "login issues" not in store["category_index"]
+
+
+def test_extend_rejects_rows_older_than_the_store():
+    old = make_df(100, start="2025-01-10", end="2025-01-20")
+    with pytest.raises(ValueError):
+        extend_message_store(build_message_store(old), make_df(10, start="2025-01-01", end="2025-01-05", seed=1))
+
+
+def test_append_updates_data_vocabulary_and_counts():
+    env = make_env()[0]
+    new = make_df(50, start="2025-01-30", end="2025-02-01", seed=1, categories=("login issues",), sources=("whatsapp",))
+    updated = append_messages(env, to_records(new))
+
+    assert len(env["df"]) == 500 and "login issues" not in env["categories"]
+    assert len(updated["df"]) == 550
+    assert updated["current_time"] == new["timestamp"].max()
+    assert updated["categories"][-1] == "login issues" and updated["sources"][-1] == "whatsapp"
+    assert updated["fast_path"] is not env["fast_path"]
+    assert isinstance(updated["df"]["timestamp"].dtype, type(env["df"]["timestamp"].dtype))
+
+    filters = {"category": "login issues", "source": "whatsapp", "start_time_expr": "2 days ago", "end_time_expr": None}
+    result = apply_filters(updated["df"], filters, updated["current_time"], store=updated["store"])
+    assert len(result) == 50
+
+    expected = build_daily_counts(build_message_store(updated["df"]))
+    for name in ("cashout issues", "login issues"):
+        cat = updated["daily_counts"]["category_index"][name]
+        assert updated["daily_counts"]["counts"][:, cat].sum() == expected["counts"][:, expected["category_index"][name]].sum()
+
+
+def test_late_rows_are_merged_in_time_order():
+    env = make_env()[0]
+    late = make_df(20, start="2025-01-05", end="2025-01-06", seed=2)
+    updated = append_messages(env, to_records(late))
+
+    assert updated["df"]["timestamp"].is_monotonic_increasing
+    assert updated["current_time"] == env["current_time"]
+    window = {"start_time": pd.Timestamp("2025-01-05"), "end_time": pd.Timestamp("2025-01-06")}
+    before = len(env["df"].iloc[select_rows(env["store"], **window)])
+    assert len(updated["df"].iloc[select_rows(updated["store"], **window)]) == before + 20
+
+
+def test_append_categorizes_and_skips_invalid_rows():
+    env = make_env()[0]
+    records = [
+        {"id_user": 1, "timestamp": "2025-01-31T10:00:00", "source": "telegram", "message": "where is my cashout"},
+        {"id_user": 2, "timestamp": "not a time", "source": "telegram", "message": "broken"},
+    ]
+    updated = append_messages(env, records, categorize=lambda messages: ["cashout issues"] * len(messages))
+    assert len(updated["df"]) == 501
+    assert updated["df"]["category"].iloc[-1] == "cashout issues"
+    assert append_messages(env, records[1:]) is env
+
+
+def test_spool_reads_only_complete_lines(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    path.write_text('{"message": "old"}\n')
+    tailer = open_spool(str(path))
+    assert read_spool(tailer) == []
+
+    with open(path, "a") as f:
+        f.write('{"message": "a"}\nnot json\n{"message": "b"')
+    assert read_spool(tailer) == [{"message": "a"}]
+    assert tailer["bad_lines"] == 1
+
+    with open(path, "a") as f:
+        f.write('}\n')
+    assert read_spool(tailer) == [{"message": "b"}]
+
+
+def test_csv_spool_uses_header(tmp_path):
+    path = tmp_path / "spool.csv"
+    path.write_text("id_user,timestamp,source,message\n1,2025-01-31 10:00:00,telegram,\"hi, there\"\n")
+    tailer = open_spool(str(path), from_start=True)
+    assert read_spool(tailer) == [{"id_user": "1", "timestamp": "2025-01-31 10:00:00", "source": "telegram",
+                                   "message": "hi, there"}]
+    with open(path, "a") as f:
+        f.write("2,2025-01-31 11:00:00,livechat,second\n")
+    assert read_spool(tailer)[0]["message"] == "second"
+
+
+def test_csv_spool_values_take_the_data_types(tmp_path):
+    path = tmp_path / "spool.csv"
+    path.write_text("id_user,timestamp,source,message,category\n")
+    tailer = open_spool(str(path))
+    with open(path, "a") as f:
+        f.write("1,2025-01-31 13:00,livechat,hello,cashout issues\n"
+                "x7,2025-01-31 13:05,livechat,not a user id,cashout issues\n"
+                ",2025-01-31 13:10,telegram,no user given,\n")
+
+    stats, env = new_ingest_stats(), make_env()[0]
+    updated = ingest_spool(env, tailer, stats, lambda messages: ["game issues"] * len(messages))
+    assert ingest_report(stats)["failed_batches"] == 0 and ingest_report(stats)["rows"] == 2
+    added = updated["df"].iloc[500:]
+    assert added["message"].tolist() == ["hello", "no user given"]
+    assert added["id_user"].iloc[0] == 1 and pd.isna(added["id_user"].iloc[1])
+    assert added["category"].tolist() == ["cashout issues", "game issues"]
+    rows = select_rows(updated["store"], user=1)
+    assert "hello" in updated["df"]["message"].iloc[rows].tolist()
+
+
+def test_ingest_spool_reports_throughput(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    tailer = open_spool(str(path))
+    new = make_df(30, start="2025-01-30", end="2025-01-31", seed=3)
+    path.write_text("".join(json.dumps(r) + "\n" for r in to_records(new)))
+
+    stats = new_ingest_stats()
+    env = ingest_spool(make_env()[0], tailer, stats)
+    report = ingest_report(stats)
+    assert len(env["df"]) == 530
+    assert report["rows"] == 30 and report["batches"] == 1
+    assert report["lag_seconds_p50"] > 0
+
+
+def test_server_ingest_endpoint_makes_messages_queryable():
+    state = new_server_state(make_env()[0])
+    new = make_df(25, start="2025-01-30", end="2025-01-31", seed=4, categories=("login issues",))
+
+    async def scenario(port):
+        ingested = await post(port, {"messages": to_records(new)}, path="/ingest")
+        bad = await post(port, {"messages": "nope"}, path="/ingest")
+        return ingested, bad
+
+    (status, response), (bad_status, _) = run_against_server(state, scenario)
+    assert status == 200 and response == {"ingested": 25, "rejected": 0, "rows": 525}
+    assert bad_status == 400
+    assert "login issues" in state["env"]["categories"]
+
+
+def test_semantic_search_after_late_rows(tmp_path):
+    df = make_semantic_df()
+    index = build_semantic_index(df, str(tmp_path), "v1", "numpy", encode=bag_of_words)
+    llm = {"name": "fake", "client": None, "complete": lambda messages: {"content": "{}", "usage": None}}
+    env = build_environment(df, llm, semantic_index=index)
+
+    late = [{"id_user": 1, "timestamp": "2024-12-31T10:00:00", "source": "telegram", "message": "late message",
+             "category": "other"}]
+    updated = append_messages(env, late)
+    assert updated["df"]["message"].iloc[0] == "late message"
+
+    for candidate_rows in (None, select_rows(updated["store"], source="telegram")):
+        rows = search(updated["semantic_index"], "cashback piggy", candidate_rows=candidate_rows, top_k=10)
+        assert len(rows) == 10
+        assert all("cashback piggy" in m for m in updated["df"]["message"].iloc[rows])
+    # The original snapshot keeps its own row mapping
+    assert all("cashback piggy" in m for m in df["message"].iloc[search(index, "cashback piggy", top_k=10)])
+
+
+def test_append_accepts_utc_offsets():
+    env = make_env()[0]
+    records = [
+        {"id_user": 1, "timestamp": "2025-01-31T10:00:00Z", "source": "telegram", "message": "a"},
+        {"id_user": 2, "timestamp": "2025-01-31T12:00:00+01:00", "source": "telegram", "message": "b"},
+        {"id_user": 3, "timestamp": "2025-01-31T12:30:00", "source": "livechat", "message": "c"},
+    ]
+    stats = new_ingest_stats()
+    updated = ingest_records(env, records, stats)
+
+    assert updated["df"]["timestamp"].dtype == env["df"]["timestamp"].dtype
+    assert updated["df"]["timestamp"].iloc[-3:].tolist() == [
+        pd.Timestamp("2025-01-31 10:00"), pd.Timestamp("2025-01-31 11:00"), pd.Timestamp("2025-01-31 12:30"),
+    ]
+    assert updated["current_time"] == pd.Timestamp("2025-01-31 12:30")
+    assert ingest_report(stats)["rows"] == 3
+
+
+def test_lag_is_measured_in_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        stats = new_ingest_stats()
+        record = {"id_user": 1, "timestamp": pd.Timestamp.now(tz="UTC").isoformat(), "source": "telegram",
+                  "message": "just now", "category": "game issues"}
+        ingest_records(make_env()[0], [record], stats)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert 0 <= stats["lag_seconds"][0] < 60
+
+
+def test_failed_spool_batch_is_counted_and_read_again(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    tailer = open_spool(str(path))
+    new = make_df(10, start="2025-01-30", end="2025-01-31", seed=5).drop(columns="category")
+    path.write_text("".join(json.dumps(r) + "\n" for r in to_records(new)))
+
+    def broken(messages):
+        raise RuntimeError("model unavailable")
+
+    stats, env = new_ingest_stats(), make_env()[0]
+    assert ingest_spool(env, tailer, stats, broken) is env
+    report = ingest_report(stats)
+    assert report["failed_batches"] == 1 and report["last_error"] == "RuntimeError: model unavailable"
+    assert tailer["offset"] == 0
+
+    updated = ingest_spool(env, tailer, stats, lambda messages: ["game issues"] * len(messages))
+    assert len(updated["df"]) == 510 and ingest_report(stats)["rows"] == 10
+    assert tailer["offset"] == path.stat().st_size
+
+
+def test_spool_sets_aside_lines_that_keep_failing(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    tailer = open_spool(str(path))
+    new = make_df(6, start="2025-01-30", end="2025-01-31", seed=7).drop(columns="category")
+    new.loc[2, "message"] = "poison"
+    path.write_text("".join(json.dumps(r) + "\n" for r in to_records(new)))
+
+    def categorize(messages):
+        if "poison" in messages:
+            raise ValueError("cannot embed")
+        return ["game issues"] * len(messages)
+
+    stats, env = new_ingest_stats(), make_env()[0]
+    for _ in range(MAX_SPOOL_RETRIES - 1):
+        assert ingest_spool(env, tailer, stats, categorize) is env
+        assert tailer["offset"] == 0
+    updated = ingest_spool(env, tailer, stats, categorize)
+
+    assert len(updated["df"]) == 505 and "poison" not in updated["df"]["message"].tolist()
+    assert tailer["offset"] == path.stat().st_size and tailer["retries"] == 0
+    assert ingest_report(stats)["rejected_rows"] == 1
+    with open(tailer["dead_letter"]) as f:
+        assert [json.loads(line)["message"] for line in f] == ["poison"]
+
+    with open(path, "a") as f:
+        f.write(json.dumps({**to_records(new)[0], "message": "after the poison"}) + "\n")
+    assert "after the poison" in ingest_spool(updated, tailer, stats, categorize)["df"]["message"].tolist()
+
+
+def test_ingest_loop_survives_failed_batches(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    calls = []
+
+    def flaky(messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("first batch fails")
+        return ["game issues"] * len(messages)
+
+    state = new_server_state(make_env()[0], categorize=flaky)
+    new = make_df(5, start="2025-01-30", end="2025-01-31", seed=6).drop(columns="category")
+
+    async def scenario():
+        task = asyncio.create_task(ingest_loop(state, open_spool(str(path)), interval=0.01))
+        path.write_text("".join(json.dumps(r) + "\n" for r in to_records(new)))
+        for _ in range(200):
+            if len(state["env"]["df"]) == 505:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert len(state["env"]["df"]) == 505
+    assert state["ingest_stats"]["failed_batches"] == 1 and calls == [5, 5]
+
+
+def test_categorizer_paths_point_at_the_categorization_outputs():
+    assert os.path.exists(CLUSTER_MAPPING_PATH)
+    assert os.path.dirname(CLUSTER_MODEL_PATH) == os.path.dirname(CLUSTER_MAPPING_PATH)
+
+
+def test_spool_polls_slow_down_with_append_cost():
+    assert ingest_poll_delay(1.0, 0.01) == 1.0
+    assert ingest_poll_delay(1.0, 0.5) == pytest.approx(4.5)
+    assert ingest_poll_delay(1.0, 0.5, max_share=0.5) == 1.0
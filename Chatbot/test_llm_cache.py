@@ -0,0 +1,114 @@
+import time
+import openai
+import pandas as pd
+import pytest
+from Chatbot.chatbot import query_LLM_for_filters
+from Chatbot.llm_backends import make_fixture_backend, make_openai_backend, make_recording_backend
+from Chatbot.prompt import build_prompt
+from Chatbot.llm_cache import cache_get, cache_put, cache_stats, open_response_cache, response_cache_key
+from Chatbot.stub_llm_server import start_stub_server
+
+
+def counting_backend(reply):
+    calls = []
+
+    def complete(messages):
+        calls.append(messages)
+        return {"content": reply, "usage": None}
+
+    return {"name": "counting", "client": None, "complete": complete}, calls
+
+
+def make_env(backend, cache=None):
+    return {
+        "llm": backend,
+        "llm_cache": cache,
+        "prompt": build_prompt(["cashout issues", "game issues"], ["livechat", "telegram"]),
+        "current_time": pd.Timestamp("2025-01-30"),
+    }
+
+
+def test_cache_lru_eviction():
+    cache = open_response_cache(":memory:", max_entries=2)
+    cache_put(cache, "a", {"v": 1})
+    cache_put(cache, "b", {"v": 2})
+    time.sleep(0.01)
+    assert cache_get(cache, "a") == {"v": 1}
+    cache_put(cache, "c", {"v": 3})
+
+    assert cache_get(cache, "b") is None
+    assert cache_get(cache, "a") == {"v": 1}
+    assert cache_get(cache, "c") == {"v": 3}
+    assert cache_stats(cache)["entries"] == 2
+
+
+def test_cache_ttl_expiry():
+    cache = open_response_cache(":memory:", ttl_seconds=0)
+    cache_put(cache, "a", {"v": 1})
+    time.sleep(0.01)
+    assert cache_get(cache, "a") is None
+    assert cache_stats(cache)["entries"] == 0
+
+
+def test_cache_key_depends_on_query_and_prompt():
+    base = response_cache_key("Show me cashout issues", "prompt", "openai:gpt-4")
+    assert base == response_cache_key("  show me CASHOUT issues? ", "prompt", "openai:gpt-4")
+    assert base != response_cache_key("Show me game issues", "prompt", "openai:gpt-4")
+    assert base != response_cache_key("Show me cashout issues", "other prompt", "openai:gpt-4")
+    assert base != response_cache_key("Show me cashout issues", "prompt", "fixture")
+
+
+def test_query_llm_uses_cache():
+    backend, calls = counting_backend('Sure: {"category": "cashout issues", "source": null, "reset": false}')
+    cache = open_response_cache(":memory:")
+    env = make_env(backend, cache)
+
+    first = query_LLM_for_filters("Show me cashout issues", env)
+    second = query_LLM_for_filters("show me cashout issues?", env)
+
+    assert first == second == {"category": "cashout issues", "source": None, "reset": False}
+    assert len(calls) == 1
+    assert cache_stats(cache)["hits"] == 1
+    assert cache_stats(cache)["misses"] == 1
+
+    env["current_time"] = pd.Timestamp("2025-01-30 18:00")
+    query_LLM_for_filters("Show me cashout issues", env)
+    assert len(calls) == 1
+
+    env["current_time"] = pd.Timestamp("2025-01-31")
+    query_LLM_for_filters("Show me cashout issues", env)
+    assert len(calls) == 2
+
+
+def test_unparseable_reply_is_not_cached():
+    backend, calls = counting_backend("I don't know")
+    cache = open_response_cache(":memory:")
+    env = make_env(backend, cache)
+
+    assert query_LLM_for_filters("gibberish", env) is None
+    assert query_LLM_for_filters("gibberish", env) is None
+    assert len(calls) == 2
+
+
+def test_recording_and_fixture_backends(tmp_path):
+    fixture = str(tmp_path / "replies.json")
+    live, _ = counting_backend('{"category": "game issues", "source": "telegram", "reset": false}')
+    query_LLM_for_filters("Game issues on telegram", make_env(make_recording_backend(live, fixture)))
+
+    replay = make_env(make_fixture_backend(fixture))
+    assert query_LLM_for_filters("game issues on Telegram", replay)["source"] == "telegram"
+    with pytest.raises(KeyError):
+        query_LLM_for_filters("Something never recorded", replay)
+
+
+def test_stub_server_speaks_openai_protocol():
+    server = start_stub_server(make_fixture_backend())
+    try:
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        env = make_env(make_openai_backend(client))
+        result = query_LLM_for_filters("Show me cashout issues on livechat", env)
+    finally:
+        server.shutdown()
+
+    assert result["category"] == "cashout issues"
+    assert result["source"] == "livechat"
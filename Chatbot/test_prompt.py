@@ -0,0 +1,98 @@
+import pandas as pd
+from Chatbot.chatbot import (
+    build_environment, new_filter_context, query_LLM_for_filters, summarize_filters, update_filter_context,
+)
+from Chatbot.ingest import append_messages
+from Chatbot.prompt import (
+    PROMPT_CATEGORY_LIMIT, RETRIEVED_CATEGORIES, build_prompt, llm_report, new_llm_stats, prompt_messages,
+    relevant_categories,
+)
+from benchmarks.synthetic import CATEGORIES, SOURCES, make_messages
+
+MANY_CATEGORIES = CATEGORIES + [f"topic {i} issues" for i in range(PROMPT_CATEGORY_LIMIT)]
+
+
+def recording_backend(reply='{"category": null, "source": null, "reset": false}', usage=None):
+    calls = []
+
+    def complete(messages):
+        calls.append(messages)
+        return {"content": reply, "usage": usage}
+
+    return {"name": "recording", "client": None, "complete": complete}, calls
+
+
+def test_prefix_is_identical_across_queries_and_times():
+    prompt = build_prompt(CATEGORIES, SOURCES)
+    first = prompt_messages(prompt, "Show me cashout issues", pd.Timestamp("2025-01-30 10:00"))
+    second = prompt_messages(prompt, "Anything new?", pd.Timestamp("2025-02-03 23:59"))
+
+    assert first[0] == second[0]
+    assert first[0]["content"] is prompt["prefix"]
+    assert all(category in prompt["prefix"] for category in CATEGORIES)
+    assert first[1]["content"] == "Today is Thursday, 2025-01-30."
+    assert [m["role"] for m in first] == ["system", "system", "user"]
+
+
+def test_large_vocabulary_is_retrieved_per_request():
+    counts = {category: i for i, category in enumerate(MANY_CATEGORIES)}
+    prompt = build_prompt(MANY_CATEGORIES, SOURCES, category_counts=counts)
+
+    assert "topic 7 issues" not in prompt["prefix"]
+    messages = prompt_messages(prompt, "Any withdrawals via telegram?", pd.Timestamp("2025-01-30"))
+    assert "withdrawal issue" in messages[1]["content"]
+
+    candidates = relevant_categories(prompt, "show me cashout problems and freespin isues")
+    assert len(candidates) == RETRIEVED_CATEGORIES
+    assert set(candidates[:2]) == {"cashout issues", "freespin issues"}
+    assert candidates[2] == MANY_CATEGORIES[-1]  # filled by message count
+
+    assert relevant_categories(prompt, "topic 12 ishues")[0] == "topic 12 issues"
+
+
+def test_query_records_tokens_and_latency():
+    backend, calls = recording_backend(usage={"prompt_tokens": 400, "completion_tokens": 20, "cached_tokens": 300})
+    env = build_environment(make_messages(1_000), backend)
+
+    query_LLM_for_filters("Show me cashout issues", env)
+    report = llm_report(env["llm_stats"])
+
+    assert len(calls) == 1 and calls[0][0]["content"] is env["prompt"]["prefix"]
+    assert report["requests"] == 1 and report["estimated"] == 0
+    assert report["prompt_tokens"] == 400 and report["cached_share"] == 0.75
+
+
+def test_missing_usage_is_estimated():
+    backend, _ = recording_backend()
+    env = build_environment(make_messages(1_000), backend)
+
+    query_LLM_for_filters("Show me cashout issues", env)
+    report = llm_report(env["llm_stats"])
+
+    assert report["estimated"] == 1
+    assert report["prompt_tokens"] > 100
+    assert llm_report(new_llm_stats())["requests"] == 0
+
+
+def test_wrong_typed_reply_fields_leave_filters_unchanged():
+    backend, _ = recording_backend('{"category": 7, "source": ["telegram"], "start_time_expr": 3, "reset": false}')
+    env = build_environment(make_messages(1_000), backend)
+    current = {**new_filter_context(), "source": "livechat"}
+
+    filters = query_LLM_for_filters("Show me cashout issues", env)
+    updated = update_filter_context(current, filters)
+    assert updated == current
+    assert summarize_filters(env, updated)[0]["num_messages"] > 0
+
+
+def test_prompt_is_rebuilt_only_when_the_vocabulary_grows():
+    backend, _ = recording_backend()
+    env = build_environment(make_messages(1_000), backend)
+    later = env["current_time"] + pd.Timedelta(minutes=1)
+    record = {"id_user": 1, "timestamp": later, "source": "livechat", "message": "hi", "category": "game issues"}
+
+    same = append_messages(env, [record])
+    grown = append_messages(same, [{**record, "category": "loyalty issues"}])
+
+    assert same["prompt"] is env["prompt"]
+    assert "loyalty issues" in grown["prompt"]["prefix"]
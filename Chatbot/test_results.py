@@ -0,0 +1,176 @@
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot.chatbot import build_environment, resolve_filters
+from Chatbot.conftest import filter_cases, make_df, make_env, post, run_against_server
+from Chatbot.results import export_results, fetch_page, iter_export, new_cursor, update_cursor
+from Chatbot.server import new_server_state
+from Chatbot.store import build_message_store, select_page, select_rows
+
+
+def make_results_env(sort=True):
+    return build_environment(make_df(sort=sort), {"name": "fake", "client": None, "complete": None})
+
+
+def query(env, **filters):
+    return resolve_filters({"category": None, "source": None, "start_time_expr": None, "end_time_expr": None,
+                            **filters}, env["current_time"])
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("category, source, start_time, end_time", filter_cases)
+def test_select_page_matches_select_rows(sort, category, source, start_time, end_time):
+    store = build_message_store(make_df(sort=sort))
+    expected = np.arange(len(store["timestamps"]))[select_rows(store, category, source, start_time, end_time)]
+    if store["order"] is not None:
+        # select_rows returns DataFrame rows; map them back to sorted positions
+        expected = np.sort(np.argsort(store["order"])[expected])
+
+    pages, after, seen = [], -1, 0
+    while True:
+        page, total, skipped = select_page(store, category, source, start_time, end_time, after=after, limit=7)
+        assert total == len(expected) and skipped == seen
+        if not len(page):
+            break
+        pages.append(page)
+        after, seen = int(page[-1]), seen + len(page)
+
+    assert np.array_equal(np.concatenate(pages) if pages else np.empty(0, np.int64), expected)
+
+
+@pytest.mark.parametrize("sort", [True, False])
+def test_pages_cover_result_in_time_order(sort):
+    env = make_results_env(sort)
+    resolved = query(env, category="game issues")
+    cursor, seen = new_cursor(25), []
+    while True:
+        page, cursor, info = fetch_page(env, resolved, cursor)
+        if not len(page):
+            break
+        assert info["start"] == len(seen) + 1 and info["end"] == len(seen) + len(page)
+        seen.extend(page.index)
+
+    expected = env["df"][env["df"]["category"] == "game issues"]
+    assert sorted(seen) == sorted(expected.index)
+    assert env["df"].loc[seen, "timestamp"].is_monotonic_increasing
+    assert info["total"] == len(expected)
+
+
+def test_cursor_kept_across_refinement_and_rewound_on_reset():
+    env = make_results_env()
+    df = env["df"]
+    page, cursor, _ = fetch_page(env, query(env, category="game issues"), new_cursor(10))
+    last_seen = page["timestamp"].iloc[-1]
+
+    cursor = update_cursor(cursor, {"source": "telegram", "reset": False})
+    page, cursor, info = fetch_page(env, query(env, category="game issues", source="telegram"), cursor)
+    refined = df[(df["category"] == "game issues") & (df["source"] == "telegram")]
+    assert (page["timestamp"] >= last_seen).all()
+    assert page.index[0] == refined[refined["timestamp"] > last_seen].index[0]
+    assert info["start"] == int((refined["timestamp"] <= page["timestamp"].iloc[0]).sum())
+
+    cursor = update_cursor(cursor, {"category": "bonus issue", "reset": True})
+    page, _, info = fetch_page(env, query(env, category="bonus issue"), cursor)
+    assert info["start"] == 1
+    assert page.index[0] == df[df["category"] == "bonus issue"].index[0]
+
+
+def test_cursor_survives_late_rows():
+    env = make_results_env()
+    resolved = query(env, source="telegram")
+    page, cursor, _ = fetch_page(env, resolved, new_cursor(10))
+    last_seen = page["timestamp"].iloc[-1]
+
+    # An older row forces a rebuild that shifts every sorted position
+    late = env["df"].iloc[:1].assign(timestamp=env["df"]["timestamp"].min() - pd.Timedelta(days=1),
+                                     source="telegram", message="late")
+    env["df"] = pd.concat([late, env["df"]], ignore_index=True)
+    env["store"] = build_message_store(env["df"])
+
+    page, _, info = fetch_page(env, resolved, cursor)
+    assert page["timestamp"].iloc[0] > last_seen
+    # The 10 rows already read and the late one are behind the cursor
+    assert info["start"] == 12
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_round_trip(tmp_path, fmt):
+    env = make_results_env(sort=False)
+    path = tmp_path / f"out.{fmt}"
+    rows = export_results(env, query(env, category="cashout issues"), str(path), chunk_rows=100)
+
+    expected = env["df"][env["df"]["category"] == "cashout issues"].sort_values("timestamp", kind="stable")
+    written = pd.read_csv(path) if fmt == "csv" else pd.read_json(path, lines=True)
+    assert rows == len(expected) == len(written)
+    assert written["message"].tolist() == expected["message"].tolist()
+
+
+def test_export_of_empty_result_and_bad_format(tmp_path):
+    env = make_results_env()
+    path = tmp_path / "empty.csv"
+    assert export_results(env, query(env, category="nonexistent"), str(path)) == 0
+    assert path.read_text().strip() == ",".join(env["df"].columns)
+    assert "".join(iter_export(env, query(env, category="nonexistent"), "jsonl")) == ""
+
+    with pytest.raises(ValueError):
+        export_results(env, query(env), str(tmp_path / "out.txt"))
+    assert not (tmp_path / "out.txt").exists()
+
+
+async def post_raw(port, payload, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    return head.decode(), body
+
+
+def dechunk(body):
+    data = b""
+    while True:
+        size, _, rest = body.partition(b"\r\n")
+        size = int(size, 16)
+        if size == 0:
+            return data
+        data, body = data + rest[:size], rest[size + 2:]
+
+
+def test_server_pages_and_exports_session_result():
+    env, _ = make_env()
+    state = new_server_state(env)
+
+    async def scenario(port):
+        await post(port, {"session_id": "a", "query": "game issues"})
+        first = await post(port, {"session_id": "a", "page_size": 100}, path="/page")
+        second = await post(port, {"session_id": "a", "page_size": 100}, path="/page")
+        rewound = await post(port, {"session_id": "a", "page_size": 5, "rewind": True}, path="/page")
+        bad = await post(port, {"session_id": "a", "page_size": 0}, path="/page")
+        await post(port, {"session_id": "a", "page_size": 5}, path="/page")
+        await post(port, {"session_id": "a", "query": "reset"})
+        after_reset = await post(port, {"session_id": "a", "page_size": 5}, path="/page")
+        await post(port, {"session_id": "b", "query": "game issues"})
+        exported = await post_raw(port, {"session_id": "b", "format": "jsonl"}, "/export")
+        bad_format = await post(port, {"session_id": "b", "format": "xml"}, path="/export")
+        return first, second, rewound, bad, after_reset, exported, bad_format
+
+    first, second, rewound, bad, after_reset, exported, bad_format = run_against_server(state, scenario)
+    expected = env["df"][env["df"]["category"] == "game issues"]
+
+    assert first[0] == 200 and first[1]["start"] == 1 and first[1]["end"] == 100
+    assert first[1]["total"] == len(expected) and not first[1]["done"]
+    assert [row["message"] for row in first[1]["rows"]] == expected["message"].iloc[:100].tolist()
+    assert second[1]["start"] == 101 and second[1]["rows"][0]["message"] == expected["message"].iloc[100]
+    assert rewound[1]["start"] == 1 and len(rewound[1]["rows"]) == 5
+    assert bad[0] == 400
+    assert after_reset[1]["start"] == 1 and after_reset[1]["total"] == len(env["df"])
+
+    head, body = exported
+    assert "Transfer-Encoding: chunked" in head
+    lines = dechunk(body).decode().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == expected["message"].tolist()
+    assert bad_format[0] == 400
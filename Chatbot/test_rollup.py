@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot import chatbot
+from Chatbot.chatbot import apply_filters, build_environment, summarize_filters
+from Chatbot.conftest import make_df as make_messages_df
+from Chatbot.daily_counts import count_by_day
+from Chatbot.ingest import append_messages
+from Chatbot.rollup import build_rollup, hll_estimate, rollup_day_counts, rollup_users, _hll_update, user_hashes
+from Chatbot.stats import summarize_filtered_data, summarize_with_rollup
+from Chatbot.store import build_message_store, select_rows
+
+QUERIES = [
+    {},
+    {"category": "game issues"},
+    {"source": "Telegram"},
+    {"category": "cashout issues", "source": "livechat"},
+    {"start_time": pd.Timestamp("2025-01-03 05:30"), "end_time": pd.Timestamp("2025-01-20 17:12")},
+    {"category": "game issues", "start_time": pd.Timestamp("2025-01-10 10:15"), "end_time": pd.Timestamp("2025-01-10 10:50")},
+    {"category": "Cashout Issues", "source": "telegram", "start_time": pd.Timestamp("2025-01-28")},
+]
+
+
+def make_df(n=20_000, seed=0):
+    return make_messages_df(n, seed, start="2025-01-01", end="2025-01-30", num_users=6000, missing_users=0.01,
+                            sources=("livechat", "telegram", None), source_weights=[0.6, 0.35, 0.05],
+                            categories=("cashout issues", "game issues", None), category_weights=[0.45, 0.45, 0.1])
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = make_df()
+    store = build_message_store(df)
+    return df, store, build_rollup(store, df["id_user"])
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rollup_summary_matches_row_summary(data, query):
+    df, store, rollup = data
+    rows = select_rows(store, **query)
+    expected = summarize_filtered_data(df.iloc[rows])
+    actual = summarize_with_rollup(df, store, rollup, rows, query.get("category"), query.get("source"))
+
+    for key in ("num_messages", "start_time", "end_time", "category"):
+        assert actual[key] == expected[key], key
+    assert actual["num_users"] == pytest.approx(expected["num_users"], rel=0.05)
+    assert actual["num_users_estimated"]
+    pd.testing.assert_frame_equal(actual["preview"], expected["preview"])
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rollup_day_counts_match_raw_rows(data, query):
+    df, store, rollup = data
+    rows = select_rows(store, **query)
+    days, counts = rollup_day_counts(rollup, store, rows, query.get("category"), query.get("source"))
+    expected_days, expected_counts = count_by_day(df.iloc[rows])
+    assert np.array_equal(days, expected_days)
+    assert np.array_equal(counts, expected_counts)
+
+
+def test_hll_estimate_tracks_distinct_counts():
+    for n in (10, 1000, 100_000):
+        registers = np.zeros((1, 1 << 11), dtype=np.uint8)
+        hashes = np.tile(user_hashes(np.arange(n)), 2)
+        _hll_update(registers, np.zeros(len(hashes), dtype=np.int64), hashes)
+        assert hll_estimate(registers[0]) == pytest.approx(n, rel=0.05)
+    # Integer and float ids of the same user hash alike
+    assert np.array_equal(user_hashes(pd.Series([7, 8])), user_hashes(pd.Series([7.0, 8.0])))
+
+
+def test_sketches_only_for_occupied_cells():
+    df = make_df(2_000)
+    df["category"] = [f"category {i}" for i in range(len(df))]
+    store = build_message_store(df)
+    rollup = build_rollup(store, df["id_user"])
+
+    # One sketch per user-bearing message here, as every message has its own category
+    assert len(rollup["day_sketches"]) == df["id_user"].notna().sum() + 1
+    assert rollup["day_sketches"].nbytes < 5 * 2**20 < rollup["day_cells"].size * (1 << 11)
+    assert rollup_users(rollup, store, df["id_user"], slice(0, len(df))) == pytest.approx(df["id_user"].nunique(), rel=0.05)
+
+
+def test_summarize_filters_uses_rollup_for_large_results(monkeypatch):
+    monkeypatch.setattr(chatbot, "ROLLUP_MIN_ROWS", 1000)
+    env = build_environment(make_df(), {"name": "fake", "client": None, "complete": None}, estimate_users=True)
+    filters = {"category": "game issues", "source": None, "start_time_expr": None, "end_time_expr": None}
+
+    summary, filtered_df, day_counts = summarize_filters(env, filters)
+    assert filtered_df is None and summary["num_users_estimated"]
+    expected = apply_filters(env["df"], filters, env["current_time"], store=env["store"])
+    assert summary["num_messages"] == len(expected)
+    assert np.array_equal(day_counts[1], count_by_day(expected)[1])
+
+    narrow = {**filters, "start_time_expr": "1 hour ago"}
+    summary, filtered_df, day_counts = summarize_filters(env, narrow)
+    assert filtered_df is not None and day_counts is None and "num_users_estimated" not in summary
+
+    # Exact counts are the default
+    exact = build_environment(make_df(), env["llm"])
+    assert exact["rollup"] is None
+    assert summarize_filters(exact, filters)[1] is not None
+
+
+def test_ingest_keeps_rollup_in_sync(monkeypatch):
+    monkeypatch.setattr(chatbot, "ROLLUP_MIN_ROWS", 1000)
+    env = build_environment(make_df(), {"name": "fake", "client": None, "complete": None}, estimate_users=True)
+    new = make_df(500, seed=1)
+    new["timestamp"] = new["timestamp"] + pd.Timedelta(days=30)
+    new.loc[:20, "category"] = "login issues"
+    updated = append_messages(env, new.to_dict("records"))
+
+    rebuilt = build_rollup(updated["store"], updated["df"]["id_user"])
+    assert np.array_equal(updated["rollup"]["hour_counts"], rebuilt["hour_counts"])
+    # Sketch rows are numbered in order of appearance, so compare them per cell
+    for rollup in (updated["rollup"], rebuilt):
+        rollup["day_users"] = rollup["day_sketches"][rollup["day_cells"]]
+    assert np.array_equal(updated["rollup"]["day_users"], rebuilt["day_users"])
+    assert len(rebuilt["day_sketches"]) - 1 == np.count_nonzero(rebuilt["day_cells"]) < rebuilt["day_cells"].size
+    assert env["rollup"]["hour_counts"].sum() == 20_000
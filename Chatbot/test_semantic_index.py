@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from Chatbot import semantic_index
+from Chatbot.chatbot import apply_filters
+from Chatbot.conftest import bag_of_words, make_semantic_df
+from Chatbot.semantic_index import build_semantic_index, load_semantic_index, search
+from Chatbot.store import build_message_store
+
+
+BACKENDS = ["numpy", pytest.param("hnswlib", marks=pytest.mark.skipif(
+    not semantic_index._default_backend() == "hnswlib", reason="hnswlib not installed"))]
+
+
+@pytest.fixture
+def df():
+    return make_semantic_df()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_search_ranks_matching_messages_first(tmp_path, df, backend):
+    index = build_semantic_index(df, str(tmp_path), "v1", backend, encode=bag_of_words)
+    assert index["num_messages"] == 6
+
+    rows = search(index, "cashback piggy", top_k=20)
+    assert len(rows) == 20
+    assert all("cashback piggy" in m for m in df["message"].iloc[rows])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("exact_limit", [0, 20_000])
+def test_search_respects_candidate_rows(tmp_path, df, backend, exact_limit, monkeypatch):
+    monkeypatch.setattr(semantic_index, "EXACT_SEARCH_LIMIT", exact_limit)
+    index = build_semantic_index(df, str(tmp_path), "v1", backend, encode=bag_of_words)
+
+    candidates = np.flatnonzero(df["source"].to_numpy() == "telegram")
+    rows = search(index, "withdrawal pending", candidate_rows=candidates, top_k=5)
+    assert len(rows) == 5
+    assert set(rows) <= set(candidates)
+    assert (df["message"].iloc[rows] == "withdrawal pending for days").all()
+
+    assert len(search(index, "withdrawal pending", candidate_rows=slice(10, 10))) == 0
+
+
+def test_fewer_matches_than_top_k_returns_all_allowed_rows(tmp_path, df):
+    index = build_semantic_index(df, str(tmp_path), "v1", "numpy", encode=bag_of_words)
+    rows = search(index, "game frozen", candidate_rows=slice(0, 4), top_k=50)
+    assert sorted(rows) == [0, 1, 2, 3]
+    assert df["message"].iloc[rows[0]] == "game frozen again"
+
+
+def test_stale_or_missing_index_is_not_loaded(tmp_path, df):
+    build_semantic_index(df, str(tmp_path), "v1", "numpy", encode=bag_of_words)
+    assert load_semantic_index(str(tmp_path), "v1", encode=bag_of_words) is not None
+    assert load_semantic_index(str(tmp_path), "v2", encode=bag_of_words) is None
+    assert load_semantic_index(str(tmp_path / "missing"), "v1") is None
+
+
+def test_apply_filters_combines_semantic_query_with_other_filters(tmp_path, df):
+    index = build_semantic_index(df, str(tmp_path), "v1", "numpy", encode=bag_of_words)
+    store = build_message_store(df)
+    filters = {"category": "bonus issue", "source": "livechat", "start_time_expr": None,
+               "end_time_expr": None, "semantic_query": "cashback piggy"}
+    current_time = df["timestamp"].max()
+
+    result = apply_filters(df, filters, current_time, store=store, semantic_index=index)
+    assert len(result) > 0
+    assert (result["source"] == "livechat").all()
+    assert (result["category"] == "bonus issue").all()
+    # Most similar first: every piggy message comes before the other bonus messages
+    is_piggy = result["message"].str.contains("cashback piggy").to_numpy()
+    assert is_piggy.any() and not is_piggy[np.argmin(is_piggy):].any()
+
+    # Without an index the semantic query is ignored and rows stay in time order
+    unfiltered = apply_filters(df, filters, current_time, store=store)
+    assert set(unfiltered.index) == set(result.index)
+    assert unfiltered["timestamp"].is_monotonic_increasing
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from Chatbot.chatbot import new_filter_context
+from Chatbot.conftest import make_env, post, run_against_server
+from Chatbot.fast_path import fast_path_report
+from Chatbot.prompt import llm_report
+from Chatbot.server import _summary_to_json, new_server_state, run_turn
+from Chatbot.stats import summarize_filtered_data
+
+
+def test_sessions_keep_separate_filter_context():
+    env, _ = make_env()
+    state = new_server_state(env)
+
+    async def scenario(port):
+        await post(port, {"session_id": "a", "query": "cashout issues on telegram"})
+        await post(port, {"session_id": "b", "query": "game issues"})
+        return await post(port, {"session_id": "a", "query": "make that livechat only"})
+
+    status, response = run_against_server(state, scenario)
+
+    assert status == 200
+    assert response["filters"]["category"] == "cashout issues"
+    assert response["filters"]["source"] == "livechat"
+    assert state["sessions"]["b"]["filter"]["category"] == "game issues"
+
+    expected = env["df"][(env["df"]["category"] == "cashout issues") & (env["df"]["source"] == "livechat")]
+    assert response["summary"]["num_messages"] == len(expected)
+    assert response["summary"]["num_users"] == expected["id_user"].nunique()
+
+
+def test_llm_calls_respect_in_flight_limit():
+    env, in_flight = make_env(llm_delay=0.05)
+    state = new_server_state(env, max_in_flight=2, min_confidence=1.1)
+
+    async def scenario(port):
+        return await asyncio.gather(*(post(port, {"session_id": f"s{i}", "query": "anything?"}) for i in range(8)))
+
+    results = run_against_server(state, scenario)
+
+    assert all(status == 200 for status, _ in results)
+    assert in_flight["max"] == 2
+
+
+def test_bad_request():
+    env, _ = make_env()
+    state = new_server_state(env)
+
+    status, response = run_against_server(state, lambda port: post(port, {"query": "no session"}))
+    assert status == 400
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/query", b"{not json"),
+    ("/query", b"\xff"),
+    ("/query", ["a", "b"]),
+    ("/query", {"session_id": "a", "query": "  "}),
+    ("/page", {"session_id": "a", "page_size": True}),
+    ("/export", b"{not json"),
+    ("/export", "a"),
+    ("/export", {"session_id": "a", "format": ["csv"]}),
+    ("/export", {"session_id": 7}),
+])
+def test_invalid_bodies_are_rejected(path, payload):
+    state = new_server_state(make_env()[0])
+
+    status, response = run_against_server(state, lambda port: post(port, payload, path))
+    assert status == 400 and "error" in response
+    assert not state["sessions"]
+
+
+def test_empty_results_have_no_time_range():
+    env, _ = make_env()
+    summary = _summary_to_json(summarize_filtered_data(env["df"].iloc[:0]), None)
+    assert summary["start_time"] is None and summary["end_time"] is None
+    assert json.loads(json.dumps(summary))["num_messages"] == 0
+
+
+def test_stats_stay_exact_under_concurrent_turns():
+    env, _ = make_env()
+    state = new_server_state(env, min_confidence=0.5)
+    queries = ["game issues on telegram", "anything odd lately?"] * 200
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda query: run_turn(state, new_filter_context(), query), queries))
+
+    fast_path = fast_path_report(env["fast_path_stats"])
+    assert fast_path["queries"] == len(queries)
+    assert llm_report(env["llm_stats"])["requests"] == env["fast_path_stats"]["fallbacks"] >= 200
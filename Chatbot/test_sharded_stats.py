@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot import stats
+from Chatbot.chatbot import apply_filters, build_environment
+from Chatbot.conftest import make_df as make_messages_df
+from Chatbot.ingest import append_messages
+from Chatbot.sharded_stats import merge_partials, partial_summary, start_summary_pool, stop_summary_pool, summary_columns
+from Chatbot.stats import summarize_filtered_data
+
+FILTERS = [
+    {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None},
+    {"category": "game issues", "source": None, "start_time_expr": None, "end_time_expr": None},
+    {"category": "cashout issues", "source": "telegram", "start_time_expr": "5 days ago", "end_time_expr": None},
+    {"category": None, "source": None, "start_time_expr": "3 days ago", "end_time_expr": "1 day ago"},
+    {"category": "game issues", "source": None, "start_time_expr": "2 hours ago", "end_time_expr": "1 hour ago"},
+]
+SUMMARY_KEYS = ["num_messages", "num_users", "start_time", "end_time", "category"]
+
+
+def make_df(n=3000, seed=0):
+    return make_messages_df(n, seed, start="2025-01-01", end="2025-01-30", num_users=400, missing_users=0.01,
+                            sources=("livechat", "telegram"), categories=("cashout issues", "game issues", None),
+                            category_weights=[0.45, 0.45, 0.1])
+
+
+@pytest.fixture(scope="module")
+def env():
+    env = build_environment(make_df(), {"name": "fake", "client": None, "complete": None})
+    env["summary_pool"] = start_summary_pool(env["df"], workers=3)
+    yield env
+    stop_summary_pool(env["summary_pool"])
+
+
+def assert_same_summary(expected, actual):
+    for key in SUMMARY_KEYS:
+        assert (pd.isna(expected[key]) and pd.isna(actual[key])) or actual[key] == expected[key], key
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_sharded_summary_matches_pandas(env, filters, monkeypatch):
+    filtered = apply_filters(env["df"], filters, env["current_time"], store=env["store"])
+    expected = summarize_filtered_data(filtered)
+
+    monkeypatch.setattr(stats, "SHARD_MIN_ROWS", 0)
+    actual = summarize_filtered_data(filtered, pool=env["summary_pool"])
+    assert_same_summary(expected, actual)
+    pd.testing.assert_frame_equal(expected["preview"], actual["preview"])
+
+
+def test_rows_appended_after_the_pool_started_are_included(env, monkeypatch):
+    new = make_df(200, seed=1)
+    new["timestamp"] = new["timestamp"] + pd.Timedelta(days=40)
+    new.loc[:50, "id_user"] = 10_000 + np.arange(51)
+    new.loc[:10, "category"] = "login issues"
+    updated = append_messages(env, new.to_dict("records"))
+    monkeypatch.setattr(stats, "SHARD_MIN_ROWS", 0)
+
+    for filters in FILTERS[:2] + [{**FILTERS[0], "category": "login issues"}]:
+        filtered = apply_filters(updated["df"], filters, updated["current_time"], store=updated["store"])
+        assert_same_summary(summarize_filtered_data(filtered), summarize_filtered_data(filtered, pool=updated["summary_pool"]))
+
+
+def test_partials_merge_like_one_pass():
+    columns = summary_columns(make_df())
+    whole = partial_summary(columns, (0, 3000))
+    merged = merge_partials([partial_summary(columns, (0, 1000)), partial_summary(columns, np.arange(1000, 3000))])
+    assert merged["count"] == whole["count"] == 3000
+    assert (merged["min"], merged["max"]) == (whole["min"], whole["max"])
+    assert np.array_equal(merged["users"], whole["users"])
+    assert np.array_equal(merged["categories"], whole["categories"])
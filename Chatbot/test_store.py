@@ -0,0 +1,39 @@
+import pytest
+from Chatbot.chatbot import apply_filters
+from Chatbot.conftest import filter_cases, make_df, scan_filter
+from Chatbot.store import build_message_store, select_rows
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("category, source, start_time, end_time", filter_cases)
+def test_select_rows_matches_scan(sort, category, source, start_time, end_time):
+    df = make_df(sort=sort)
+    store = build_message_store(df)
+
+    rows = select_rows(store, category, source, start_time, end_time)
+    expected = scan_filter(df, category, source, start_time, end_time)
+
+    selected = df.iloc[rows]
+    assert sorted(selected.index) == sorted(expected.index)
+    assert selected["timestamp"].is_monotonic_increasing
+
+
+def test_select_rows_returns_views_for_sorted_data():
+    df = make_df()
+    store = build_message_store(df)
+
+    assert isinstance(select_rows(store, start_time="2024-12-01T00:00:00"), slice)
+
+    rows = select_rows(store, category="cashout issues", start_time="2024-12-01T00:00:00")
+    assert rows.base is not None
+
+
+def test_apply_filters_uses_store():
+    df = make_df()
+    store = build_message_store(df)
+    filters = {"category": "game issues", "source": "telegram", "start_time_expr": None, "end_time_expr": None}
+
+    filtered = apply_filters(df, filters, df["timestamp"].max(), store=store)
+    expected = scan_filter(df, "game issues", "telegram", None, None)
+
+    assert filtered.index.tolist() == expected.index.tolist()
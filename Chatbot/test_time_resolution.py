@@ -0,0 +1,87 @@
+from datetime import datetime
+import dateparser
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot import time_resolution
+from Chatbot.chatbot import apply_filters, parse_expr
+from Chatbot.time_resolution import resolve_time_expr, resolve_time_exprs, time_resolution_stats
+
+BASES = [datetime(2025, 1, 30), datetime(2025, 1, 30, 15, 42, 17), datetime(2025, 1, 27, 9, 5), datetime(2024, 3, 31, 23, 59)]
+
+
+def dateparser_reference(expr, base_time):
+    return dateparser.parse(expr, settings={'RELATIVE_BASE': base_time, 'RETURN_AS_TIMEZONE_AWARE': False})
+
+
+@pytest.mark.parametrize("base_time", BASES)
+@pytest.mark.parametrize("expr", [
+    "now", "1 day ago", "3 days ago", "2 hours ago", "1 minute ago", "10 seconds ago", "1 week ago",
+    "2 weeks ago", "1 month ago", "1 year ago", "an hour ago", "two days ago", "30 days ago",
+    "Monday", "thursday", "Friday", "sunday", "2025-01-15", "2025-01-15 10:30",
+])
+def test_fast_path_matches_dateparser(expr, base_time):
+    assert time_resolution._resolve_fast(expr.lower(), base_time) is not None
+    assert resolve_time_expr(expr, base_time) == dateparser_reference(expr, base_time)
+
+
+@pytest.mark.parametrize("base_time", BASES)
+def test_today_and_yesterday_start_at_midnight(base_time):
+    midnight = base_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    assert resolve_time_expr("today", base_time) == midnight
+    assert resolve_time_expr("Yesterday", base_time) == midnight - pd.Timedelta(days=1)
+
+
+@pytest.mark.parametrize("expr", ["January 15", "in 2 days", "today 10:00", "Jan 1 2025 10:00"])
+def test_unusual_phrasing_falls_back_to_dateparser(expr):
+    base_time = BASES[1]
+    assert time_resolution._resolve_fast(expr.lower(), base_time) is None
+    assert resolve_time_expr(expr, base_time) == dateparser_reference(expr, base_time)
+
+
+def test_unparseable_and_empty_expressions():
+    assert resolve_time_expr("whenever you like", BASES[0]) is None
+    assert resolve_time_expr(None, BASES[0]) is None
+    assert parse_expr("", BASES[0]) is None
+
+
+@pytest.mark.parametrize("expr", ["2025-02-30", "2025-13-01", "2025-01-15 25:00"])
+def test_invalid_iso_dates_fall_back_to_dateparser(expr):
+    # dateparser rejects "2025-02-30" but reads "2025-13-01" as 13 January
+    expected = dateparser_reference(expr, BASES[0])
+    assert parse_expr(expr, BASES[0]) == (None if expected is None else expected.isoformat())
+    assert parse_expr("2025-02-30", BASES[0]) is None
+
+
+def test_results_are_memoized_per_reference_time():
+    before = time_resolution_stats()
+    base_time = pd.Timestamp("2031-05-05 12:00:00")
+    for _ in range(3):
+        assert parse_expr("7 days ago", base_time) == "2031-04-28T12:00:00"
+    after = time_resolution_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+
+    assert parse_expr("7 days ago", base_time + pd.Timedelta(days=1)) == "2031-04-29T12:00:00"
+
+
+def test_batch_resolution():
+    base_time = BASES[1]
+    result = resolve_time_exprs(["now", "1 hour ago", None, "now", "gibberish words"], base_time)
+    assert result.dtype == np.dtype("datetime64[ns]")
+    assert result[0] == result[3] == np.datetime64(base_time)
+    assert result[1] == np.datetime64(base_time - pd.Timedelta(hours=1))
+    assert np.isnat(result[2]) and np.isnat(result[4])
+
+
+def test_open_end_uses_dataset_time_not_wall_clock():
+    df = pd.DataFrame({
+        "id_user": [1, 2, 3],
+        "timestamp": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"]),
+        "source": ["livechat"] * 3,
+        "message": ["a", "b", "c"],
+        "category": ["bonus issue"] * 3,
+    })
+    filters = {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None}
+    # current_time before the last message: the open end must stop there
+    assert len(apply_filters(df, filters, pd.Timestamp("2020-01-02"))) == 2
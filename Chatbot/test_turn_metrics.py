@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+import types
+from Chatbot import turn_metrics
+from Chatbot.chatbot import run_chatbot
+from Chatbot.conftest import make_env, post, run_against_server
+from Chatbot.server import new_server_state
+from Chatbot.turn_metrics import (
+    configure_turn_log, metrics_report, new_turn_metrics, prometheus_text, rss_bytes, span, start_turn,
+)
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), head.decode(), body.decode()
+
+
+def test_spans_are_added_up_per_turn_and_ignored_outside_turns():
+    metrics = new_turn_metrics()
+    with span("llm"):
+        pass
+
+    with start_turn(metrics) as turn:
+        for _ in range(2):
+            with span("llm"):
+                time.sleep(0.01)
+        with span("custom"):
+            pass
+        with span("fast_path"):
+            pass
+
+    assert turn["spans"]["llm"]["ms"] >= 20
+    report = metrics_report(metrics)
+    assert report["turns"] == 1
+    assert list(report["stages"]) == ["fast_path", "llm", "custom"]
+    assert report["stages"]["llm"]["count"] == 1
+    assert report["stages"]["llm"]["seconds"] >= 0.02
+
+
+def test_rss_without_proc_or_resource(monkeypatch):
+    def no_proc(*args):
+        raise OSError("no /proc")
+
+    monkeypatch.setattr(turn_metrics.os, "open", no_proc)
+    monkeypatch.setitem(turn_metrics._statm, "pid", None)
+    assert rss_bytes() > 0
+
+    # As on Windows: no `resource` module, with and without psutil
+    monkeypatch.setitem(sys.modules, "resource", None)
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    assert rss_bytes() == 0
+    process = types.SimpleNamespace(memory_info=lambda: types.SimpleNamespace(rss=123))
+    monkeypatch.setitem(sys.modules, "psutil", types.SimpleNamespace(Process=lambda: process))
+    assert rss_bytes() == 123
+
+
+def test_turn_log_and_prometheus_text(tmp_path):
+    metrics = new_turn_metrics()
+    log_path = tmp_path / "turns.jsonl"
+    configure_turn_log(str(log_path))
+    try:
+        with start_turn(metrics, session="a"):
+            with span("select"):
+                pass
+    finally:
+        for handler in list(turn_metrics.logger.handlers):
+            turn_metrics.logger.removeHandler(handler)
+            handler.close()
+        turn_metrics.logger.setLevel(logging.NOTSET)
+
+    line = json.loads(log_path.read_text().splitlines()[0])
+    assert line["event"] == "turn" and line["session"] == "a"
+    assert set(line["stages"]["select"]) >= {"ms", "rss_delta"}
+
+    text = prometheus_text(metrics, {"chatbot_rows": 5}, {"chatbot_llm_requests_total": 2})
+    assert 'chatbot_stage_seconds_count{stage="select"} 1' in text
+    assert "chatbot_turns_total 1" in text
+    assert "chatbot_rows 5" in text
+    # Only counters end in _total; the RSS deltas can go down, so they are gauges
+    kinds = dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+    counters = [name for name, kind in kinds.items() if kind == "counter"]
+    assert counters == ["chatbot_turns_total", "chatbot_llm_requests_total"]
+    assert kinds["chatbot_stage_rss_delta_bytes"] == "gauge"
+
+
+def test_scripted_session_times_every_stage(capsys):
+    env, _ = make_env()
+
+    run_chatbot(env, ["cashout issues on telegram", "anything?", "reset"])
+
+    stages = metrics_report(env["turn_metrics"])["stages"]
+    assert metrics_report(env["turn_metrics"])["turns"] == 2
+    for stage in ("fast_path", "time_parse", "select", "filter", "summary", "describe"):
+        assert stage in stages, stage
+    assert "describe" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_server_metrics_endpoint_is_optional():
+    env, _ = make_env()
+
+    async def scenario(port):
+        await post(port, {"session_id": "a", "query": "game issues"})
+        return await get(port, "/metrics")
+
+    state = new_server_state(env, min_confidence=1.1, expose_metrics=True)
+    status, head, body = run_against_server(state, scenario)
+    assert status == 200 and "text/plain" in head
+    for stage in ("llm_wait", "llm", "llm_parse", "spikes"):
+        assert f'chatbot_stage_seconds_count{{stage="{stage}"}} 1' in body
+    assert "chatbot_sessions 1" in body
+
+    status, _, _ = run_against_server(new_server_state(env), lambda port: get(port, "/metrics"))
+    assert status == 404
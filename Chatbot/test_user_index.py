@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Chatbot.chatbot import build_environment, new_filter_context, summarize_filters, update_filter_context
+from Chatbot.conftest import filter_cases, make_df, make_env, post, run_against_server, scan_filter
+from Chatbot.fast_path import build_fast_path, extract_filters_locally
+from Chatbot.server import new_server_state
+from Chatbot.store import (
+    build_message_store, category_breakdown, extend_message_store, select_rows, top_users, user_rows,
+)
+from benchmarks.synthetic import CATEGORIES, SOURCES
+
+fast_path = build_fast_path(CATEGORIES, SOURCES)
+
+
+def expected_top(df, n):
+    """Reference: message counts per user, most first, ties by id."""
+    counts = df["id_user"].value_counts().sort_index().sort_values(ascending=False, kind="stable")
+    return [(user, count) for user, count in counts.head(n).items()]
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("category, source, start_time, end_time", filter_cases)
+def test_user_filter_and_top_users_match_scan(sort, category, source, start_time, end_time):
+    df = make_df(sort=sort)
+    store = build_message_store(df)
+    expected = scan_filter(df, category, source, start_time, end_time)
+
+    for user in (4, "17", 9999):
+        rows = select_rows(store, category, source, start_time, end_time, user=user)
+        selected = df.iloc[rows]
+        assert sorted(selected.index) == sorted(expected[expected["id_user"] == int(user)].index)
+        assert selected["timestamp"].is_monotonic_increasing
+
+    users = top_users(store, 5, category, source, start_time, end_time)
+    assert users["top"] == expected_top(expected, 5)
+    assert users["users"] == expected["id_user"].nunique()
+    assert users["repeat_users"] == int((expected["id_user"].value_counts() >= 2).sum())
+
+
+def test_user_rows_and_category_breakdown():
+    df = make_df()
+    store = build_message_store(df)
+    user = int(df["id_user"].iloc[0])
+
+    assert np.array_equal(user_rows(store, user), np.flatnonzero(df["id_user"] == user))
+    assert len(user_rows(store, "not a user")) == 0
+
+    expected = df[df["id_user"] == user]["category"].dropna().value_counts()
+    breakdown = category_breakdown(store, user=user)
+    assert breakdown == {name: int(count) for name, count in expected.items()}
+    assert list(breakdown.values()) == sorted(breakdown.values(), reverse=True)
+
+
+def test_extended_user_index_matches_rebuild():
+    df = make_df(3000)
+    old, new = df.iloc[:2000], df.iloc[2000:].copy()
+    # New users, a returning user and a message without a user
+    new.loc[new.index[:4], "id_user"] = [1000, 1001, 1000, 3]
+    new.loc[new.index[5], "id_user"] = np.nan
+    extended = extend_message_store(build_message_store(old), new)
+    rebuilt = build_message_store(pd.concat([old, new], ignore_index=True))
+
+    for user in (3, 1000, 1001, 17):
+        assert np.array_equal(user_rows(extended, user), user_rows(rebuilt, user)), user
+    assert top_users(extended, 10) == top_users(rebuilt, 10)
+    assert top_users(extended, 10, category="game issues") == top_users(rebuilt, 10, category="game issues")
+
+
+@pytest.mark.parametrize("query, user, top", [
+    ("show everything user 4844 sent", 4844, None),
+    ("user #12 game issues on telegram", 12, None),
+    ("which users contacted us most about withdrawal issues this week", None, True),
+    ("top 5 users with cashout issues", None, 5),
+    ("repeat contacters on livechat", None, True),
+])
+def test_fast_path_extracts_user_filters(query, user, top):
+    filters, confidence = extract_filters_locally(query, fast_path)
+    assert confidence == 1.0
+    assert filters["user"] == user
+    assert filters["top_users"] == top
+
+
+def test_summary_lists_top_users_and_user_categories():
+    df = make_df()
+    env = build_environment(df, {"name": "fake", "client": None, "complete": None})
+
+    context = update_filter_context(new_filter_context(), {"category": "game issues", "top_users": True})
+    summary, _, _ = summarize_filters(env, context)
+    assert summary["top_users"] == expected_top(df[df["category"] == "game issues"], 10)
+    assert summary["user"] is None and summary["user_categories"] is None
+
+    # Refinements keep the request for top users
+    context = update_filter_context(context, {"source": "telegram", "top_users": 3})
+    summary, _, _ = summarize_filters(env, context)
+    assert len(summary["top_users"]) == 3
+
+    user = int(df["id_user"].iloc[0])
+    summary, _, _ = summarize_filters(env, update_filter_context(new_filter_context(), {"user": str(user)}))
+    assert summary["num_messages"] == int((df["id_user"] == user).sum())
+    assert sum(summary["user_categories"].values()) == int(df[df["id_user"] == user]["category"].notna().sum())
+
+
+def test_server_returns_user_summaries():
+    env, _ = make_env()
+    state = new_server_state(env)
+    user = int(env["df"]["id_user"].iloc[0])
+
+    async def scenario(port):
+        top = await post(port, {"session_id": "a", "query": "top 3 users on telegram"})
+        one = await post(port, {"session_id": "b", "query": f"show everything user {user} sent"})
+        return top, one
+
+    (_, top), (_, one) = run_against_server(state, scenario)
+    telegram = env["df"][env["df"]["source"] == "telegram"]
+    assert [(row["id_user"], row["messages"]) for row in top["summary"]["top_users"]] == expected_top(telegram, 3)
+    assert one["summary"]["user"] == user and one["summary"]["spikes"] is None
+    assert one["summary"]["num_messages"] == int((env["df"]["id_user"] == user).sum())
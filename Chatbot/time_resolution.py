@@ -0,0 +1,127 @@
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+import dateparser
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from Chatbot.fast_path import NUMBER_WORDS, WEEKDAYS
+
+DATEPARSER_SETTINGS = {'RETURN_AS_TIMEZONE_AWARE': False}
+CACHE_SIZE = 4096
+
+_UNIT_DELTAS = {
+    "second": lambda n: timedelta(seconds=n),
+    "minute": lambda n: timedelta(minutes=n),
+    "hour": lambda n: timedelta(hours=n),
+    "day": lambda n: timedelta(days=n),
+    "week": lambda n: timedelta(weeks=n),
+    "month": lambda n: relativedelta(months=n),
+    "year": lambda n: relativedelta(years=n),
+}
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+_RELATIVE = re.compile(rf"^{_NUMBER} ({'|'.join(_UNIT_DELTAS)})s? ago$")
+_WEEKDAY = re.compile(r"^(" + "|".join(WEEKDAYS) + r")$")
+_ISO = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ t]\d{2}:\d{2}(?::\d{2})?)?$")
+
+
+def _midnight(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _resolve_fast(expr, base_time):
+    """
+    Resolves the phrasings the LLM prompt and the fast path produce.
+
+    Matches dateparser, except that "today" and "yesterday" mean the start of the
+    day (dateparser keeps the reference time of day), which is what the prompt and
+    the tests intend.
+
+    Returns:
+        Optional[datetime]: The resolved time, or None when `expr` needs dateparser.
+    """
+    if expr in ("now", "right now"):
+        return base_time
+    if expr == "today":
+        return _midnight(base_time)
+    if expr == "yesterday":
+        return _midnight(base_time) - timedelta(days=1)
+
+    match = _RELATIVE.match(expr)
+    if match:
+        count, unit = match.groups()
+        n = int(count) if count.isdigit() else NUMBER_WORDS[count]
+        return base_time - _UNIT_DELTAS[unit](n)
+
+    match = _WEEKDAY.match(expr)
+    if match:
+        # The most recent such day, today included, as dateparser does
+        days_back = (base_time.weekday() - WEEKDAYS.index(match.group(1))) % 7
+        return _midnight(base_time) - timedelta(days=days_back)
+
+    if _ISO.match(expr):
+        try:
+            return datetime.fromisoformat(expr.upper())
+        except ValueError:
+            # Date-shaped but invalid ("2025-02-30"): leave it to dateparser, as before
+            return None
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _resolve_cached(expr, base_time):
+    resolved = _resolve_fast(expr, base_time)
+    if resolved is None:
+        resolved = dateparser.parse(expr, settings={**DATEPARSER_SETTINGS, 'RELATIVE_BASE': base_time})
+    return resolved
+
+
+def resolve_time_expr(expr, base_time):
+    """
+    Turns a human-readable time expression into a datetime relative to `base_time`.
+
+    Common relative forms ("N days/hours ago", weekday names, "today", "yesterday",
+    "now", ISO dates) are computed directly; anything else goes to dateparser.
+    Results are memoized on (expression, reference time), so repeated turns and
+    sessions against the same data do not parse twice.
+
+    Args:
+        expr (Optional[str]): Natural language time expression.
+        base_time (datetime): Reference time, usually the dataset's `current_time`.
+
+    Returns:
+        Optional[datetime]: Naive datetime, or None if the expression cannot be parsed.
+    """
+    if not expr:
+        return None
+    if isinstance(base_time, pd.Timestamp):
+        base_time = base_time.to_pydatetime(warn=False)
+    return _resolve_cached(" ".join(expr.lower().split()), base_time)
+
+
+def resolve_time_exprs(exprs, base_time):
+    """
+    Resolves many expressions against one reference time, parsing each distinct
+    expression once.
+
+    Args:
+        exprs (Iterable[Optional[str]]): Time expressions.
+        base_time (datetime): Reference time.
+
+    Returns:
+        np.ndarray: datetime64[ns] values, NaT where an expression is empty or unparseable.
+    """
+    exprs = list(exprs)
+    resolved = {expr: resolve_time_expr(expr, base_time) for expr in set(exprs)}
+    return np.array([resolved[expr] or np.datetime64("NaT") for expr in exprs], dtype="datetime64[ns]")
+
+
+def time_resolution_stats():
+    """
+    Reports how often the resolution cache saved a parse.
+
+    Returns:
+        dict: 'hits', 'misses' and 'size' of the resolution cache.
+    """
+    info = _resolve_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
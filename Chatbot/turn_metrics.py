@@ -0,0 +1,293 @@
+"""
+Per-stage timing and memory counters for chatbot turns.
+
+A turn is wrapped in `start_turn()`; code on the hot path marks its stages with
+`span("stage")`, which records wall time and the change in resident memory into
+the turn running on the current thread (and does nothing outside a turn). When
+the turn ends it is added to the shared counters, which feed the exit report of
+`run_chatbot`, the server's `GET /metrics` and, when enabled with
+`configure_turn_log()`, one JSON log line per turn.
+
+With `tracemalloc` tracing (`PYTHONTRACEMALLOC=1`) each span also records the
+peak Python allocation during the stage. The tracer is process-wide, so those
+numbers are only meaningful when one turn runs at a time (the CLI, `--profile`).
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+# Stages in the order a turn runs through them; other names are accepted too.
+STAGES = ("ingest", "fast_path", "llm_wait", "llm_cache", "llm", "llm_parse",
+          "time_parse", "select", "filter", "summary", "users", "spikes", "describe", "page", "export")
+
+logger = logging.getLogger("Chatbot.turns")
+
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_statm = {"pid": None, "fd": None}
+
+
+def rss_bytes():
+    """
+    Returns the current resident set size of this process.
+
+    Reads `/proc/self/statm` on Linux through a descriptor kept open per process
+    (a span reads it twice) and falls back to the peak RSS on other Unix systems,
+    psutil where `resource` is missing (Windows), or 0 without either.
+    """
+    try:
+        if _statm["pid"] != os.getpid():
+            _statm["fd"], _statm["pid"] = os.open("/proc/self/statm", os.O_RDONLY), os.getpid()
+        return int(os.pread(_statm["fd"], 128, 0).split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return 0
+        return psutil.Process().memory_info().rss
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def new_turn_metrics(window=10_000):
+    """
+    Creates the shared per-stage counters of a chatbot or server.
+
+    Args:
+        window (int): Number of recent samples kept per stage for percentiles.
+
+    Returns:
+        dict: Counters updated by `record_turn()`; safe to share between threads.
+    """
+    return {
+        "lock": threading.Lock(),
+        "window": window,
+        "turns": 0,
+        "turn_ms": deque(maxlen=window),
+        "stages": {},
+        "rss_bytes": rss_bytes(),
+        "peak_rss_bytes": rss_bytes(),
+    }
+
+
+@contextmanager
+def start_turn(metrics, **fields):
+    """
+    Collects the spans of one turn and records them in `metrics` when it ends.
+
+    Args:
+        metrics (Optional[dict]): Counters from `new_turn_metrics()`; None only
+            collects the turn (e.g. for a caller that logs it itself).
+        **fields: Extra values for the turn's log line, e.g. 'session'.
+
+    Yields:
+        dict: The turn: 'spans' maps each stage to its 'ms', 'rss_delta' and
+            (with tracemalloc) 'alloc_peak' in bytes; add 'fields' as needed.
+    """
+    turn = {"spans": {}, "fields": dict(fields), "start": time.perf_counter()}
+    token = _current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        _current_turn.reset(token)
+        turn["ms"] = (time.perf_counter() - turn["start"]) * 1000
+        if metrics is not None:
+            record_turn(metrics, turn)
+
+
+@contextmanager
+def span(stage):
+    """
+    Times one stage of the turn running on this thread.
+
+    Repeated spans of the same stage within a turn are added up. Outside
+    `start_turn()` this is a no-op, so library code can be marked unconditionally.
+
+    Args:
+        stage (str): Stage name, normally one of `STAGES`.
+    """
+    turn = _current_turn.get()
+    if turn is None:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        alloc_base = tracemalloc.get_traced_memory()[0]
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        entry = turn["spans"].setdefault(stage, {"ms": 0.0, "rss_delta": 0, "alloc_peak": None})
+        entry["ms"] += elapsed
+        entry["rss_delta"] += rss_bytes() - rss_before
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1] - alloc_base
+            entry["alloc_peak"] = max(entry["alloc_peak"] or 0, peak)
+
+
+def record_turn(metrics, turn):
+    """
+    Adds a finished turn to the shared counters and writes its log line.
+
+    Args:
+        metrics (dict): Counters from `new_turn_metrics()`.
+        turn (dict): Turn from `start_turn()`.
+    """
+    rss = rss_bytes()
+    with metrics["lock"]:
+        metrics["turns"] += 1
+        metrics["turn_ms"].append(turn["ms"])
+        metrics["rss_bytes"] = rss
+        metrics["peak_rss_bytes"] = max(metrics["peak_rss_bytes"], rss)
+        for stage, entry in turn["spans"].items():
+            stats = metrics["stages"].get(stage)
+            if stats is None:
+                stats = metrics["stages"][stage] = {"count": 0, "seconds": 0.0, "rss_delta": 0,
+                                                    "ms": deque(maxlen=metrics["window"])}
+            stats["count"] += 1
+            stats["seconds"] += entry["ms"] / 1000
+            stats["rss_delta"] += entry["rss_delta"]
+            stats["ms"].append(entry["ms"])
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "event": "turn",
+            **turn["fields"],
+            "ms": round(turn["ms"], 3),
+            "rss_mb": round(rss / 2**20, 1),
+            "stages": {stage: {key: round(value, 3) if key == "ms" else value
+                               for key, value in entry.items() if value is not None}
+                       for stage, entry in turn["spans"].items()},
+        }, default=str))
+
+
+def _stage_order(stage):
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)
+
+
+def metrics_report(metrics):
+    """
+    Summarizes the per-stage counters.
+
+    Args:
+        metrics (dict): Counters from `new_turn_metrics()`.
+
+    Returns:
+        dict: 'turns', 'turn_ms_p50' / 'turn_ms_p95', 'rss_mb', 'peak_rss_mb' and
+            'stages', mapping each stage (in turn order) to its 'count', total
+            'seconds', 'ms_p50' / 'ms_p95' over recent turns and 'rss_delta_mb'.
+    """
+    with metrics["lock"]:
+        turn_ms = np.array(metrics["turn_ms"], dtype=float)
+        stages = {stage: {**stats, "ms": np.array(stats["ms"], dtype=float)}
+                  for stage, stats in metrics["stages"].items()}
+        turns, rss, peak = metrics["turns"], metrics["rss_bytes"], metrics["peak_rss_bytes"]
+
+    return {
+        "turns": turns,
+        "turn_ms_p50": float(np.percentile(turn_ms, 50)) if len(turn_ms) else 0.0,
+        "turn_ms_p95": float(np.percentile(turn_ms, 95)) if len(turn_ms) else 0.0,
+        "rss_mb": rss / 2**20,
+        "peak_rss_mb": peak / 2**20,
+        "stages": {
+            stage: {
+                "count": stats["count"],
+                "seconds": stats["seconds"],
+                "ms_p50": float(np.percentile(stats["ms"], 50)),
+                "ms_p95": float(np.percentile(stats["ms"], 95)),
+                "rss_delta_mb": stats["rss_delta"] / 2**20,
+            }
+            for stage, stats in sorted(stages.items(), key=lambda item: _stage_order(item[0]))
+        },
+    }
+
+
+def format_metrics_report(report):
+    """Formats `metrics_report()` as a table, one stage per line."""
+    lines = [f"Turns: {report['turns']}, p50 {report['turn_ms_p50']:.1f} ms, p95 {report['turn_ms_p95']:.1f} ms, "
+             f"RSS {report['rss_mb']:.0f} MB (peak {report['peak_rss_mb']:.0f} MB)",
+             f"{'stage':<12}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'RSS +MB':>10}"]
+    for stage, stats in report["stages"].items():
+        lines.append(f"{stage:<12}{stats['count']:>7}{stats['seconds']:>10.3f}{stats['ms_p50']:>10.2f}"
+                     f"{stats['ms_p95']:>10.2f}{stats['rss_delta_mb']:>10.1f}")
+    return "\n".join(lines)
+
+
+def prometheus_text(metrics, gauges=None, counters=None):
+    """
+    Renders the counters in the Prometheus text exposition format.
+
+    Stage latencies are exported as summaries (`chatbot_stage_seconds`) with
+    p50/p95 quantiles over recent turns.
+
+    Args:
+        metrics (dict): Counters from `new_turn_metrics()`.
+        gauges (Optional[dict]): Extra gauges by metric name, e.g. sessions or rows.
+        counters (Optional[dict]): Extra counters by metric name, ending in '_total'.
+
+    Returns:
+        str: The metrics page.
+    """
+    report = metrics_report(metrics)
+    lines = [
+        "# HELP chatbot_turns_total Chatbot turns completed.",
+        "# TYPE chatbot_turns_total counter",
+        f"chatbot_turns_total {report['turns']}",
+        "# HELP chatbot_stage_seconds Wall time per turn stage.",
+        "# TYPE chatbot_stage_seconds summary",
+    ]
+    for stage, stats in report["stages"].items():
+        lines += [
+            f'chatbot_stage_seconds{{stage="{stage}",quantile="0.5"}} {stats["ms_p50"] / 1000:.6f}',
+            f'chatbot_stage_seconds{{stage="{stage}",quantile="0.95"}} {stats["ms_p95"] / 1000:.6f}',
+            f'chatbot_stage_seconds_sum{{stage="{stage}"}} {stats["seconds"]:.6f}',
+            f'chatbot_stage_seconds_count{{stage="{stage}"}} {stats["count"]}',
+        ]
+    lines += [
+        "# HELP chatbot_stage_rss_delta_bytes Change in resident memory during each stage, summed over turns.",
+        # Memory is also freed during stages, so the sum can go down
+        "# TYPE chatbot_stage_rss_delta_bytes gauge",
+    ]
+    lines += [f'chatbot_stage_rss_delta_bytes{{stage="{stage}"}} {stats["rss_delta_mb"] * 2**20:.0f}'
+              for stage, stats in report["stages"].items()]
+    lines += [
+        "# HELP process_resident_memory_bytes Resident memory after the last turn.",
+        "# TYPE process_resident_memory_bytes gauge",
+        f"process_resident_memory_bytes {report['rss_mb'] * 2**20:.0f}",
+    ]
+    for name, value in (gauges or {}).items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    for name, value in (counters or {}).items():
+        lines += [f"# TYPE {name} counter", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def configure_turn_log(path):
+    """
+    Writes one JSON line per turn to `path` ('-' for stderr).
+
+    Args:
+        path (str): Log file, appended to.
+    """
+    handler = logging.StreamHandler() if path == "-" else logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
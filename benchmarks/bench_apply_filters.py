@@ -0,0 +1,72 @@
+"""
+Compares the indexed `apply_filters` against the original full-scan version.
+
+Usage:
+    python -m benchmarks.bench_apply_filters --rows 1000000 10000000 50000000
+"""
+import argparse
+import time
+import dateparser
+import pandas as pd
+from Chatbot.chatbot import apply_filters, parse_expr
+from Chatbot.store import build_message_store
+from benchmarks.synthetic import make_messages
+
+QUERIES = {
+    "no filters": {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None},
+    "category": {"category": "cashout issues", "source": None, "start_time_expr": None, "end_time_expr": None},
+    "source + last week": {"category": None, "source": "telegram", "start_time_expr": "7 days ago", "end_time_expr": "now"},
+    "category + source + last day": {"category": "game issues", "source": "livechat", "start_time_expr": "1 day ago", "end_time_expr": "now"},
+}
+
+
+def scan_apply_filters(df, filters, current_time):
+    """The original implementation: copy, lowercase and scan on every call."""
+    filtered = df.copy()
+    if filters.get("category"):
+        filtered = filtered[filtered["category"].str.lower() == filters["category"].lower()]
+    if filters.get("source"):
+        filtered = filtered[filtered["source"].str.lower() == filters["source"].lower()]
+    start_time = parse_expr(filters["start_time_expr"], current_time)
+    end_time = parse_expr(filters["end_time_expr"], current_time) or dateparser.parse("now")
+    if start_time:
+        filtered = filtered[filtered['timestamp'] >= pd.to_datetime(start_time)]
+    if end_time:
+        filtered = filtered[filtered['timestamp'] <= pd.to_datetime(end_time)]
+    return filtered
+
+
+def best_of(fn, repeat):
+    """Returns (best wall time in seconds, last result) over `repeat` runs."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(num_rows, repeat):
+    df = make_messages(num_rows)
+    current_time = df["timestamp"].max()
+
+    build_time, store = best_of(lambda: build_message_store(df), 1)
+    print(f"\n=== {num_rows:,} rows (store built in {build_time:.2f}s) ===")
+    print(f"{'query':<28}{'matches':>12}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}")
+
+    for name, filters in QUERIES.items():
+        scan_time, expected = best_of(lambda: scan_apply_filters(df, filters, current_time), repeat)
+        indexed_time, result = best_of(lambda: apply_filters(df, filters, current_time, store=store), repeat)
+        assert len(result) == len(expected), f"{name}: {len(result)} != {len(expected)}"
+        print(f"{name:<28}{len(result):>12,}{scan_time * 1000:>12.1f}{indexed_time * 1000:>12.1f}"
+              f"{scan_time / indexed_time:>9.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.repeat)
@@ -0,0 +1,96 @@
+"""
+Measures wall time and peak memory of the clustering stages on synthetic embeddings.
+
+Usage:
+    python -m benchmarks.bench_clustering --rows 100000 1000000 5000000
+    python -m benchmarks.bench_clustering --rows 100000 --full-kmeans --dtype float16
+
+Embeddings are written to a memory-mapped file first (5M × 384 float32 is about
+7.7 GB on disk). Every stage then runs in a fresh process, so the reported peak
+RSS belongs to that stage alone.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Categorization.cluster_model import SEARCH_BACKENDS, assign_clusters
+from Categorization.clustering import fit_kmeans, fit_minibatch_kmeans, k_sweep
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def write_embeddings(path, num_rows, dim=DIM, n_clusters=10, dtype="float32", chunk_size=100_000, seed=0):
+    """Writes unit-length vectors around `n_clusters` random centers to a raw file, chunk by chunk."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    data = np.memmap(path, dtype=dtype, mode="w+", shape=(num_rows, dim))
+    for start in range(0, num_rows, chunk_size):
+        n = min(chunk_size, num_rows - start)
+        chunk = centers[rng.integers(0, n_clusters, n)] + rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+        data[start:start + n] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    data.flush()
+
+
+def _run_stage(stage, path, num_rows, dim, dtype, n_clusters):
+    """Runs one stage in the current (fresh) process and returns (seconds, peak RSS in MB)."""
+    embeddings = np.memmap(path, dtype=dtype, mode="r", shape=(num_rows, dim))
+    centroids = np.random.default_rng(0).normal(size=(n_clusters, dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    if stage == "kmeans":
+        fit_kmeans(embeddings, n_clusters)
+    elif stage == "minibatch":
+        fit_minibatch_kmeans(embeddings, n_clusters)
+    elif stage == "sweep":
+        k_sweep(embeddings, range(5, 31, 5), workers=os.cpu_count() or 1)
+    else:
+        assign_clusters(embeddings, centroids, backend=stage.split(":", 1)[1])
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def available_backends():
+    backends = ["numpy"]
+    for name in ("faiss", "hnswlib"):
+        try:
+            __import__(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    return [b for b in backends if b in SEARCH_BACKENDS]
+
+
+def run(num_rows, dim, dtype, n_clusters, full_kmeans, sweep):
+    stages = (["kmeans"] if full_kmeans else []) + ["minibatch"] + (["sweep"] if sweep else [])
+    stages += [f"assign:{backend}" for backend in available_backends()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.bin")
+        write_embeddings(path, num_rows, dim, n_clusters, dtype)
+        size_mb = num_rows * dim * np.dtype(dtype).itemsize / 2**20
+
+        print(f"\n=== {num_rows:,} × {dim} {dtype} ({size_mb:,.0f} MB on disk) ===")
+        print(f"{'stage':<18}{'wall s':>10}{'peak RSS MB':>14}")
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, peak = pool.submit(_run_stage, stage, path, num_rows, dim, dtype, n_clusters).result()
+            print(f"{stage:<18}{elapsed:>10.2f}{peak:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--dim", type=int, default=DIM)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--clusters", type=int, default=10)
+    parser.add_argument("--full-kmeans", action="store_true", help="also time in-memory KMeans (the old pipeline)")
+    parser.add_argument("--sweep", action="store_true", help="also time a parallel K sweep over 5..30")
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.dim, args.dtype, args.clusters, args.full_kmeans, args.sweep)
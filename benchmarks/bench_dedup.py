@@ -0,0 +1,82 @@
+"""
+Measures message deduplication and what it saves in the clustering stage.
+
+Usage:
+    python -m benchmarks.bench_dedup --rows 100000 1000000 --templated 0.6
+    python -m benchmarks.bench_dedup --input LLM-DataScientist-Task_Data.csv
+
+Synthetic corpora mix free-form messages with templated ones (bot phrases that
+differ only in a ticket number, amount or name, and "hi"/"ok"-style one-liners)
+in the proportion `--templated`. For each corpus the dedup time and ratio are
+reported, then KMeans is fitted on synthetic embeddings once per row and once per
+group representative weighted by group size; embedding time scales with the
+number of rows encoded, so "encode" shows the fraction of it that remains.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from Categorization.clustering import fit_minibatch_kmeans
+from Categorization.dedup import dedup_report, deduplicate
+from benchmarks.bench_clustering import DIM
+
+TEMPLATES = [
+    "Your withdrawal request #{n} has been approved, {name}",
+    "Deposit of ${n} received. Thank you, {name}!",
+    "Hi {name}, ticket {n} was closed. Reply to reopen it.",
+    "hi", "Hi", "ok", "OK!", "thanks", "Thanks!!",
+]
+NAMES = ["John", "Maria", "Anna", "Li", "Omar", "Eva", "Sam"]
+WORDS = ("deposit withdraw game crash login account bonus spin verify card bank limit "
+         "refund slow stuck money balance jackpot support password").split()
+
+
+def synthetic_messages(num_rows, templated, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(num_rows):
+        if rng.random() < templated:
+            template = TEMPLATES[rng.integers(len(TEMPLATES))]
+            texts.append(template.format(n=rng.integers(1, 100_000), name=NAMES[rng.integers(len(NAMES))]))
+        else:
+            texts.append(" ".join(WORDS[i] for i in rng.integers(0, len(WORDS), rng.integers(4, 12))))
+    return texts
+
+
+def run(name, texts, n_clusters):
+    start = time.perf_counter()
+    result = deduplicate(texts)
+    dedup_time = time.perf_counter() - start
+    print(f"\n=== {name} ===")
+    print(dedup_report(result["stats"]))
+
+    # Embeddings stand in for the encoder: one vector per group, copied to its rows
+    rng = np.random.default_rng(0)
+    unique = rng.normal(size=(len(result["sizes"]), DIM)).astype(np.float32)
+    unique /= np.linalg.norm(unique, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    fit_minibatch_kmeans(unique[result["group"]], n_clusters)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    fit_minibatch_kmeans(unique, n_clusters, sample_weight=result["sizes"])
+    weighted_time = time.perf_counter() - start
+
+    print(f"{'dedup s':>10}{'fit all s':>12}{'fit reps s':>12}{'encode':>10}")
+    print(f"{dedup_time:>10.2f}{full_time:>12.2f}{weighted_time:>12.2f}"
+          f"{result['stats']['groups'] / len(texts):>10.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--templated", type=float, default=0.6, help="share of templated messages")
+    parser.add_argument("--input", help="also deduplicate the message column of this CSV")
+    parser.add_argument("--clusters", type=int, default=10)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(f"{num_rows:,} synthetic messages, {args.templated:.0%} templated",
+            synthetic_messages(num_rows, args.templated), args.clusters)
+    if args.input:
+        run(args.input, pd.read_csv(args.input)["message"].astype(str).tolist(), args.clusters)
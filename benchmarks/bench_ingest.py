@@ -0,0 +1,86 @@
+"""
+Measures streaming ingestion into a live environment against rebuilding it.
+
+Usage:
+    python -m benchmarks.bench_ingest --rows 1000000 --rate 2000 --seconds 10 --interval 0.5
+
+A writer thread appends JSONL messages stamped with the wall clock to a spool
+file at `--rate` messages per second; the main thread tails it every `--interval`
+seconds like `python -m Chatbot.server --spool` does. The report shows sustained
+ingest rate, per-batch append cost and event-time lag (message timestamp to
+queryable), next to the cost of reloading the whole dataset for each batch.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+from Chatbot.chatbot import build_environment
+from Chatbot.ingest import ingest_report, ingest_spool, new_ingest_stats, open_spool
+from benchmarks.synthetic import CATEGORIES, SOURCES, make_messages
+
+FAKE_LLM = {"name": "fake", "client": None, "complete": None}
+
+
+def write_spool(path, rate, seconds, stop):
+    """Appends `rate` messages per second to `path` in 10 ms ticks."""
+    written, start = 0, time.perf_counter()
+    with open(path, "a", buffering=1) as f:
+        while not stop.is_set() and time.perf_counter() - start < seconds:
+            due = int((time.perf_counter() - start) * rate)
+            now = pd.Timestamp.now(tz="UTC").isoformat()
+            f.write("".join(json.dumps({
+                "id_user": i, "timestamp": now, "source": SOURCES[i % len(SOURCES)],
+                "message": f"live message {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+            }) + "\n" for i in range(written, due)))
+            written = due
+            time.sleep(0.01)
+    return written
+
+
+def run(num_rows, rate, seconds, interval):
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    df = make_messages(num_rows, start=str(now - pd.Timedelta(days=90)), end=str(now))
+    start = time.perf_counter()
+    env = build_environment(df, FAKE_LLM)
+    rebuild_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spool.jsonl")
+        open(path, "w").close()
+        tailer = open_spool(path)
+        stats = new_ingest_stats()
+        stop = threading.Event()
+        writer = threading.Thread(target=write_spool, args=(path, rate, seconds, stop))
+        writer.start()
+
+        deadline = time.perf_counter() + seconds + interval
+        while time.perf_counter() < deadline:
+            env = ingest_spool(env, tailer, stats)
+            time.sleep(interval)
+        stop.set()
+        writer.join()
+        env = ingest_spool(env, tailer, stats)
+
+    report = ingest_report(stats)
+    print(f"\n=== {num_rows:,} rows + {report['rows']:,} streamed at {rate:,}/s, polled every {interval:g}s ===")
+    print(f"full rebuild of the environment: {rebuild_time * 1000:,.0f} ms")
+    print(f"append per batch: p50 {report['batch_ms_p50']:.1f} ms, p95 {report['batch_ms_p95']:.1f} ms "
+          f"over {report['batches']} batches ({report['rebuilds']} with late rows)")
+    print(f"ingest throughput while busy: {report['rows_per_second']:,.0f} rows/s")
+    print(f"event-time lag: p50 {report['lag_seconds_p50']:.2f} s, p95 {report['lag_seconds_p95']:.2f} s")
+    assert len(env["df"]) == num_rows + report["rows"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--rate", type=int, default=2000, help="messages written per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between spool polls")
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.rate, args.seconds, args.interval)
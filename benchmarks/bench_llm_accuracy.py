@@ -0,0 +1,258 @@
+"""
+Replays the filter-extraction cases from Chatbot/eval_cases.py concurrently
+against a backend and reports per-field accuracy, latency, tokens and throughput.
+
+Single queries are sent with an empty filter context; the multi-turn
+conversations send each follow-up with the context built by the turns before it
+and score the context it leaves. A reply that cannot be parsed is asked again
+(up to `--max-retries` times), as a user would, and the report counts the parse
+failures and extra calls this costs.
+
+Usage:
+    python -m benchmarks.bench_llm_accuracy --backend stub --llm-delay 0.5 --concurrency 8
+    python -m benchmarks.bench_llm_accuracy --backend stub --malformed-rate 0.2 --no-structured
+    python -m benchmarks.bench_llm_accuracy --backend env --output results/gpt-4o.json --baseline results/previous.json
+
+Backends:
+    fixture  recorded replies from Chatbot/fixtures, in-process (no network)
+    stub     the same replies over HTTP from `Chatbot.stub_llm_server`, with `--llm-delay`;
+             `--malformed-rate` mangles that share of the replies to requests sent
+             without a response schema (`--no-structured`)
+    env      whatever `load_backend_from_env()` selects (live OpenAI, record, ...)
+
+The environment is built from synthetic messages with the real category and
+source names, and the response cache is off so every case reaches the backend.
+Results are written as JSON; `--baseline` prints the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import openai
+from Chatbot.chatbot import build_environment, new_filter_context, query_LLM_for_filters, update_filter_context
+from Chatbot.eval_cases import CONVERSATION_CASES, all_cases, score_context, score_reply
+from Chatbot.llm_backends import load_backend_from_env, make_fixture_backend, make_openai_backend
+from Chatbot.stub_llm_server import start_stub_server
+from benchmarks.synthetic import make_messages
+
+FIELDS = ["category", "source", "start", "end", "reset"]
+
+
+def count_tokens(backend):
+    """Wraps a backend so the usage it reports is summed into the returned totals dict."""
+    totals = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "reported": 0}
+    lock = threading.Lock()
+
+    def complete(messages, **options):
+        reply = backend["complete"](messages, **options)
+        with lock:
+            totals["requests"] += 1
+            if reply.get("usage"):
+                totals["reported"] += 1
+                totals["prompt_tokens"] += reply["usage"]["prompt_tokens"]
+                totals["completion_tokens"] += reply["usage"]["completion_tokens"]
+        return reply
+
+    return {**backend, "complete": complete}, totals
+
+
+def run_turn(env, query, current_filter, max_retries):
+    """
+    Extracts filters for one query, asking again while the reply cannot be parsed.
+
+    Returns:
+        tuple: (result, error, seconds, calls)
+    """
+    start = time.perf_counter()
+    result, error, calls = None, None, 0
+    while result is None and error is None and calls <= max_retries:
+        calls += 1
+        try:
+            result = query_LLM_for_filters(query, env, current_filter)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return result, error, time.perf_counter() - start, calls
+
+
+def run_case(env, case, max_retries):
+    return (case, *run_turn(env, case["query"], new_filter_context(), max_retries))
+
+
+def run_conversation(env, conversation, max_retries):
+    """Plays a conversation's turns in order; each run holds the filter context after its turn."""
+    context, runs = new_filter_context(), []
+    for turn in conversation:
+        result, error, seconds, calls = run_turn(env, turn["query"], context, max_retries)
+        if isinstance(result, dict):
+            context = update_filter_context(context, result)
+        runs.append((turn, context if isinstance(result, dict) else None, error, seconds, calls))
+    return runs
+
+
+def replay(env, cases, conversations, concurrency, repeat, max_retries):
+    """
+    Runs every case and conversation `repeat` times with `concurrency` requests in flight.
+
+    Conversations are played turn by turn, each on one worker.
+
+    Returns:
+        tuple: (list of (case, result, error, seconds, calls), list of conversation turns
+            as (turn, context, error, seconds, calls), wall-clock seconds)
+    """
+    jobs = [(run_case, case) for _ in range(repeat) for case in cases]
+    jobs += [(run_conversation, conversation) for _ in range(repeat) for conversation in conversations]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda job: job[0](env, job[1], max_retries), jobs))
+    runs = results[:len(jobs) - len(conversations) * repeat]
+    turns = [turn for conversation in results[len(runs):] for turn in conversation]
+    return runs, turns, time.perf_counter() - start
+
+
+def summarize_runs(runs, turns, elapsed, current_time, tokens):
+    """Aggregates replayed cases and conversation turns into the JSON report."""
+    correct = {field: [] for field in FIELDS}
+    failures = []
+    for case, result, error, _, _ in runs:
+        for field, (ok, actual) in score_reply(case, result, current_time).items():
+            correct[field].append(ok)
+            if not ok:
+                failures.append({"query": case["query"], "field": field, "actual": actual,
+                                 "expected": case[f"expected_{field}"], "error": error})
+    context_correct = []
+    for turn, context, error, _, _ in turns:
+        scores = score_context(turn, context)
+        context_correct.append(all(ok for ok, _ in scores.values()))
+        failures.extend({"query": turn["query"], "field": f"context.{field}", "actual": actual,
+                         "expected": turn["expected"][field], "error": error}
+                        for field, (ok, actual) in scores.items() if not ok)
+
+    queries = [(result, error, seconds, calls) for _, result, error, seconds, calls in runs]
+    queries += [(context, error, seconds, calls) for _, context, error, seconds, calls in turns]
+    latencies = np.array([seconds for _, _, seconds, _ in queries]) * 1000
+    calls = sum(n for *_, n in queries)
+    # Calls before the last one of a query failed to parse, and so did the last one of an unparsed query
+    parse_failures = sum(n - (error is None and isinstance(result, dict)) - (error is not None)
+                         for result, error, _, n in queries)
+    scored = [ok for oks in correct.values() for ok in oks]
+    return {
+        "requests": len(queries),
+        "calls": calls,
+        "calls_per_query": calls / len(queries),
+        "errors": sum(error is not None for _, error, _, _ in queries),
+        "unparsed": sum(error is None and not isinstance(result, dict) for result, error, _, _ in queries),
+        "parse_failures": parse_failures,
+        "parse_failure_rate": parse_failures / calls if calls else 0.0,
+        "retry_rate": sum(n > 1 for *_, n in queries) / len(queries),
+        "accuracy": {field: float(np.mean(oks)) for field, oks in correct.items() if oks},
+        "overall_accuracy": float(np.mean(scored)) if scored else None,
+        "conversation_turns": len(turns),
+        "context_accuracy": float(np.mean(context_correct)) if context_correct else None,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "max": float(latencies.max()),
+        },
+        "throughput_rps": len(runs) / elapsed,
+        "tokens": {
+            "prompt": tokens["prompt_tokens"],
+            "completion": tokens["completion_tokens"],
+            "per_request": (tokens["prompt_tokens"] + tokens["completion_tokens"]) / tokens["reported"]
+            if tokens["reported"] else None,
+        },
+        "failures": failures,
+    }
+
+
+def print_report(report, baseline=None):
+    def delta(value, path, fmt):
+        old = baseline
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+        return f" ({value - old:+{fmt}})" if old is not None and value is not None else ""
+
+    print(f"\n=== {report['backend']}: {report['requests']} requests, concurrency {report['concurrency']} ===")
+    for field, value in report["accuracy"].items():
+        print(f"  {field:<10}{value:>8.1%}{delta(value, ['accuracy', field], '.1%')}")
+    print(f"  {'overall':<10}{report['overall_accuracy']:>8.1%}{delta(report['overall_accuracy'], ['overall_accuracy'], '.1%')}")
+    if report["context_accuracy"] is not None:
+        print(f"  {'context':<10}{report['context_accuracy']:>8.1%}"
+              f"{delta(report['context_accuracy'], ['context_accuracy'], '.1%')}"
+              f"  ({report['conversation_turns']} conversation turns)")
+    latency = report["latency_ms"]
+    print(f"latency: p50 {latency['p50']:.0f} ms{delta(latency['p50'], ['latency_ms', 'p50'], '.0f')}, "
+          f"p95 {latency['p95']:.0f} ms{delta(latency['p95'], ['latency_ms', 'p95'], '.0f')}")
+    print(f"throughput: {report['throughput_rps']:.1f} requests/s{delta(report['throughput_rps'], ['throughput_rps'], '.1f')}")
+    per_request = report["tokens"]["per_request"]
+    print(f"tokens per request: {per_request:.0f}{delta(per_request, ['tokens', 'per_request'], '.0f')}"
+          if per_request is not None else "tokens per request: not reported by this backend")
+    print(f"calls per query: {report['calls_per_query']:.2f}{delta(report['calls_per_query'], ['calls_per_query'], '.2f')}, "
+          f"parse failures: {report['parse_failure_rate']:.1%} of calls"
+          f"{delta(report['parse_failure_rate'], ['parse_failure_rate'], '.1%')}, "
+          f"retried: {report['retry_rate']:.1%} of queries{delta(report['retry_rate'], ['retry_rate'], '.1%')}")
+    print(f"errors: {report['errors']}, unparsed replies: {report['unparsed']}")
+    for failure in report["failures"][:10]:
+        print(f"  ✗ {failure['query']!r} {failure['field']}: expected {failure['expected']!r}, "
+              f"got {failure['actual']!r}" + (f" [{failure['error']}]" if failure["error"] else ""))
+
+
+def load_backend(args):
+    """Returns (backend, cleanup) for `--backend`."""
+    if args.backend == "fixture":
+        return make_fixture_backend(), lambda: None
+    if args.backend == "stub":
+        stub = start_stub_server(make_fixture_backend(), delay=args.llm_delay, malformed_rate=args.malformed_rate)
+        client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{stub.server_port}/v1", max_retries=0)
+        return make_openai_backend(client, structured=args.structured), stub.shutdown
+    return load_backend_from_env(), lambda: None
+
+
+def main(args):
+    backend, cleanup = load_backend(args)
+    backend, tokens = count_tokens(backend)
+    env = build_environment(make_messages(args.rows), backend)
+    cases = all_cases(env["current_time"].to_pydatetime())
+    try:
+        runs, turns, elapsed = replay(env, cases, CONVERSATION_CASES, args.concurrency, args.repeat,
+                                      args.max_retries)
+    finally:
+        cleanup()
+
+    report = {
+        "backend": backend["name"],
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "structured": bool(backend.get("structured")),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **summarize_runs(runs, turns, elapsed, env["current_time"].to_pydatetime(), tokens),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fixture", "stub", "env"], default="stub")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="simulated latency of the stub backend in seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="times each case is replayed")
+    parser.add_argument("--structured", action=argparse.BooleanOptionalAction, default=True,
+                        help="send the reply's JSON schema to the stub backend")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="share of stub replies mangled when no schema is sent")
+    parser.add_argument("--max-retries", type=int, default=1, help="times an unparsed reply is asked again")
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic messages in the environment")
+    parser.add_argument("--output", default="llm_accuracy.json")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    main(parser.parse_args())
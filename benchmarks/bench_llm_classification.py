@@ -0,0 +1,76 @@
+"""
+Times LLM classification of a message corpus one message per request against
+batched, concurrent requests, through the local stub server.
+
+Usage:
+    PYTHONPATH=Categorization python -m benchmarks.bench_llm_classification --messages 2000 --llm-delay 0.3 --per-message 0.01 --rate-limit 8
+
+The stub answers each request after `--llm-delay` seconds plus `--per-message`
+seconds per message in it (output tokens grow with the batch), and rejects
+requests above `--rate-limit` concurrent ones with 429. Labels come from keywords,
+so only throughput, request count and back-off are meaningful.
+"""
+import argparse
+import json
+import re
+import time
+import openai
+import pandas as pd
+from llm_classification import classify_messages
+from Chatbot.llm_backends import make_openai_backend
+from Chatbot.stub_llm_server import start_stub_server
+from benchmarks.synthetic import CATEGORIES
+
+CONFIGS = [(1, 1), (1, 8), (50, 1), (50, 8), (50, 32)]
+
+
+def keyword_backend(per_message):
+    def complete(messages):
+        lines = messages[-1]["content"].splitlines()
+        time.sleep(per_message * len(lines))
+        labels = {}
+        for line in lines:
+            number, text = re.match(r"(\d+)\. (.*)", line).groups()
+            labels[number] = next((c for c in CATEGORIES if c.split()[0] in text.lower()), "not actionable")
+        return {"content": json.dumps(labels), "usage": None}
+
+    return {"name": "keywords", "client": None, "complete": complete}
+
+
+def run(texts, args):
+    stub = start_stub_server(keyword_backend(args.per_message), delay=args.llm_delay, max_in_flight=args.rate_limit)
+    client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{stub.server_port}/v1", max_retries=0)
+    backend = make_openai_backend(client)
+
+    print(f"\n=== {len(texts):,} messages ({len(set(texts)):,} unique), {args.llm_delay:g}s + "
+          f"{args.per_message:g}s/message per request, 429 above {args.rate_limit} in flight ===")
+    print(f"{'batch':>6}{'in flight':>11}{'requests':>10}{'429s':>7}{'seconds':>10}{'messages/s':>12}")
+    try:
+        for batch_size, max_in_flight in CONFIGS:
+            if batch_size == 1 and len(texts) > args.serial_limit:
+                sample = texts[:args.serial_limit]
+            else:
+                sample = texts
+            labels, stats = classify_messages(sample, backend, CATEGORIES, batch_size=batch_size,
+                                              max_in_flight=max_in_flight)
+            assert stats["unlabeled"] == 0
+            print(f"{batch_size:>6}{max_in_flight:>11}{stats['requests']:>10,}{stats['throttled']:>7,}"
+                  f"{stats['seconds']:>10.1f}{len(sample) / stats['seconds']:>12,.0f}"
+                  + (f"  (first {len(sample):,} messages)" if len(sample) < len(texts) else ""))
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="LLM-DataScientist-Task_Data.csv")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="fixed seconds per request")
+    parser.add_argument("--per-message", type=float, default=0.01, help="extra seconds per message in a request")
+    parser.add_argument("--rate-limit", type=int, default=8, help="concurrent requests the stub accepts")
+    parser.add_argument("--serial-limit", type=int, default=200,
+                        help="one-message-per-request runs only classify this many messages")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.input)["message"].astype(str).tolist()[:args.messages]
+    run(texts, args)
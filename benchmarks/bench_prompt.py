@@ -0,0 +1,78 @@
+"""
+Compares the prompt sent per filter-extraction request with the whole vocabulary
+rebuilt into it every turn against the static prefix plus per-request retrieval.
+
+Usage:
+    python -m benchmarks.bench_prompt --categories 10 100 1000 5000
+
+"full" is the previous behaviour: every category listed (as a Python list) and
+the exact current time in a system prompt rebuilt on every call, so no two
+requests share a prefix once new data arrives. "static" is `Chatbot.prompt`:
+tokens are estimated at four characters per token, "shared" is the part of
+the request identical across queries that providers can serve from their prefix
+cache.
+"""
+import argparse
+import time
+import pandas as pd
+from Chatbot.eval_cases import FILTER_CASES
+from Chatbot.prompt import build_prompt, prompt_messages
+from benchmarks.synthetic import CATEGORIES, SOURCES
+
+QUERIES = [case["query"] for case in FILTER_CASES]
+
+
+def vocabulary(num_categories):
+    words = ["payout", "login", "kyc", "promo", "jackpot", "verification", "limit", "refund"]
+    extra = [f"{words[i % len(words)]} {i} issues" for i in range(num_categories)]
+    return (CATEGORIES + extra)[:num_categories]
+
+
+def full_prompt(categories, instructions, query, current_time):
+    """The single system prompt previously rebuilt on every call."""
+    return [
+        {"role": "system", "content": (
+            "You are a data assistant extracting structured filters from user queries about categorized customer support messages.\n\n"
+            f"Valid categories (exact match only): {categories}\n"
+            f"Valid sources: {SOURCES}\n"
+            f"The current datetime is {current_time.isoformat()}.\n\n"
+            + instructions
+        )},
+        {"role": "user", "content": query},
+    ]
+
+
+def measure(build, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        messages = [build(query, pd.Timestamp("2025-01-30") + pd.Timedelta(seconds=i)) for query in QUERIES]
+    per_request = (time.perf_counter() - start) / (repeat * len(QUERIES))
+    tokens = sum(len(m["content"]) for ms in messages for m in ms) / 4 / len(messages)
+    return per_request, tokens, messages
+
+
+def run(num_categories, repeat):
+    categories = vocabulary(num_categories)
+    instructions = build_prompt(CATEGORIES, SOURCES)["prefix"].split("\n\n", 2)[2]
+    full_time, full_tokens, _ = measure(lambda q, t: full_prompt(categories, instructions, q, t), repeat)
+
+    start = time.perf_counter()
+    prompt = build_prompt(categories, SOURCES)
+    build_time = time.perf_counter() - start
+    static_time, static_tokens, _ = measure(lambda q, t: prompt_messages(prompt, q, t), repeat)
+    shared = len(prompt["prefix"]) / 4
+
+    print(f"{num_categories:>10,}{full_tokens:>12,.0f}{static_tokens:>14,.0f}{shared:>10,.0f}"
+          f"{full_time * 1e6:>12,.0f}{static_time * 1e6:>14,.0f}{build_time * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'categories':>10}{'full tok':>12}{'static tok':>14}{'shared':>10}"
+          f"{'full µs':>12}{'static µs':>14}{'build ms':>12}")
+    for num_categories in args.categories:
+        run(num_categories, args.repeat)
@@ -0,0 +1,57 @@
+"""
+Measures first-page latency and export memory for large results.
+
+Compares reading the first page of a result with `fetch_page` against
+materializing the whole result with `apply_filters` and taking its head, then
+streams the widest result to a JSONL file and reports the resident memory it
+added (run each size in a fresh process for clean RSS numbers).
+
+Usage:
+    python -m benchmarks.bench_results --rows 1000000 10000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from Chatbot.chatbot import apply_filters, build_environment, resolve_filters
+from Chatbot.results import PAGE_SIZE, export_results, fetch_page, new_cursor
+from Chatbot.turn_metrics import rss_bytes
+from benchmarks.bench_apply_filters import QUERIES, best_of
+from benchmarks.synthetic import make_messages
+
+
+def run(num_rows, repeat):
+    df = make_messages(num_rows)
+    env = build_environment(df, {"name": "none", "client": None, "complete": None})
+    current_time = env["current_time"]
+
+    print(f"\n=== {num_rows:,} rows, first page of {PAGE_SIZE} ===")
+    print(f"{'query':<28}{'matches':>12}{'apply ms':>12}{'page ms':>12}{'speedup':>10}")
+    for name, filters in QUERIES.items():
+        query = resolve_filters(filters, current_time)
+        apply_time, filtered = best_of(lambda: apply_filters(df, filters, current_time, store=env["store"]), repeat)
+        page_time, (page, _, info) = best_of(lambda: fetch_page(env, query, new_cursor()), repeat)
+        assert page["message"].tolist() == filtered["message"].head(PAGE_SIZE).tolist()
+        print(f"{name:<28}{info['total']:>12,}{apply_time * 1000:>12.2f}{page_time * 1000:>12.3f}"
+              f"{apply_time / page_time:>9.1f}x")
+
+    query = resolve_filters(QUERIES["no filters"], current_time)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "results.jsonl")
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        rows = export_results(env, query, path)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+    print(f"export: {rows:,} rows, {size / 2**20:,.0f} MB in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s), RSS {(rss_bytes() - rss_before) / 2**20:+.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.repeat)
@@ -0,0 +1,84 @@
+"""
+Times a turn's summary and spike detection from raw rows against the rollup.
+
+Usage:
+    python -m benchmarks.bench_rollup --rows 1000000 10000000
+
+"rows" filters and copies the matching rows, then summarizes them and counts
+them per day, as every turn did before the rollup. "rollup" answers the same
+from the hourly counts and daily user sketches. The last column is the
+relative error of the estimated unique-user count. Below `ROLLUP_MIN_ROWS` the
+chatbot does not build a rollup, so the benchmark builds one itself and calls the
+rollup summary directly.
+"""
+import argparse
+import time
+from Chatbot.chatbot import apply_filters, build_environment, resolve_filters
+from Chatbot.rollup import ROLLUP_MIN_ROWS, build_rollup, rollup_day_counts
+from Chatbot.stats import detect_spikes, summarize_filtered_data, summarize_with_rollup
+from Chatbot.store import select_rows
+from benchmarks.bench_apply_filters import best_of
+from benchmarks.synthetic import make_messages
+
+QUERIES = {
+    "all messages": {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None},
+    "last 30 days": {"category": None, "source": None, "start_time_expr": "30 days ago", "end_time_expr": "now"},
+    "category": {"category": "cashout issues", "source": None, "start_time_expr": None, "end_time_expr": None},
+    "category + source + 2 weeks": {"category": "game issues", "source": "telegram",
+                                     "start_time_expr": "14 days ago", "end_time_expr": "now"},
+}
+FAKE_LLM = {"name": "fake", "client": None, "complete": None}
+
+
+def from_rows(env, filters):
+    filtered = apply_filters(env["df"], filters, env["current_time"], store=env["store"])
+    summary = summarize_filtered_data(filtered)
+    if summary["category"] is not None:
+        detect_spikes(filtered, summary["category"], env["df"], daily_counts=env["daily_counts"])
+    return summary
+
+
+def from_rollup(env, filters):
+    """The rollup path of `summarize_filters()`, taken whatever the result size."""
+    query = resolve_filters(filters, env["current_time"])
+    rows = select_rows(env["store"], **query)
+    summary = summarize_with_rollup(env["df"], env["store"], env["rollup"], rows, query["category"], query["source"])
+    if summary["category"] is not None:
+        day_counts = rollup_day_counts(env["rollup"], env["store"], rows, query["category"], query["source"])
+        detect_spikes(None, summary["category"], env["df"], daily_counts=env["daily_counts"], day_counts=day_counts)
+    return summary
+
+
+def run(num_rows, repeat):
+    df = make_messages(num_rows, num_users=num_rows // 5)
+    exact = build_environment(df, FAKE_LLM)
+    start = time.perf_counter()
+    env = build_environment(df, FAKE_LLM, estimate_users=True)
+    forced = env["rollup"] is None
+    if forced:
+        env["rollup"] = build_rollup(env["store"], df["id_user"])
+    build_time = time.perf_counter() - start
+    rollup_mb = (env["rollup"]["hour_counts"].nbytes + env["rollup"]["day_cells"].nbytes
+                 + env["rollup"]["day_sketches"].nbytes) / 2**20
+    note = f", built although below ROLLUP_MIN_ROWS={ROLLUP_MIN_ROWS:,}" if forced else ""
+
+    print(f"\n=== {num_rows:,} rows (environment with rollup built in {build_time:.1f}s, "
+          f"rollup {rollup_mb:.1f} MiB{note}) ===")
+    print(f"{'query':<30}{'rows':>12}{'rows ms':>10}{'rollup ms':>11}{'users err':>11}")
+    for name, filters in QUERIES.items():
+        rows_time, expected = best_of(lambda: from_rows(exact, filters), repeat)
+        rollup_time, actual = best_of(lambda: from_rollup(env, filters), repeat)
+        assert actual["num_messages"] == expected["num_messages"] and actual["category"] == expected["category"]
+        error = actual["num_users"] / max(expected["num_users"], 1) - 1
+        print(f"{name:<30}{expected['num_messages']:>12,}{rows_time * 1000:>10.1f}{rollup_time * 1000:>11.1f}"
+              f"{error:>+11.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.repeat)
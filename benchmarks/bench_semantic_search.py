@@ -0,0 +1,83 @@
+"""
+Times semantic search against an exact scan on synthetic embeddings.
+
+Usage:
+    python -m benchmarks.bench_semantic_search --rows 100000 1000000 --backend hnswlib
+
+Messages get random 384-d vectors around one of NUM_TOPICS topic centers, so no
+model download is needed; query encoding (a few ms with MiniLM on CPU) is not included.
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from Chatbot.chatbot import apply_filters
+from Chatbot.semantic_index import BACKENDS, build_semantic_index
+from Chatbot.store import build_message_store
+from benchmarks.bench_apply_filters import best_of
+from benchmarks.synthetic import CATEGORIES, make_messages
+
+DIM = 384
+NUM_TOPICS = 2000
+
+QUERIES = {
+    "no filters": {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None},
+    "source + last week": {"category": None, "source": "telegram", "start_time_expr": "7 days ago", "end_time_expr": "now"},
+    "category + source": {"category": "cashout issues", "source": "telegram", "start_time_expr": None, "end_time_expr": None},
+    "category + last day": {"category": "game issues", "source": None, "start_time_expr": "1 day ago", "end_time_expr": "now"},
+}
+
+
+def make_encoder(dim=DIM, seed=0):
+    """Returns a deterministic encoder for 'msg <id> <category>' texts: category + topic + noise."""
+    rng = np.random.default_rng(seed)
+    category_centers = rng.normal(size=(len(CATEGORIES), dim)).astype(np.float32)
+    topic_centers = rng.normal(scale=0.7, size=(NUM_TOPICS, dim)).astype(np.float32)
+    category_code = {name: code for code, name in enumerate(CATEGORIES)}
+
+    def encode(texts):
+        ids = np.array([int(t.split(" ", 2)[1]) for t in texts])
+        codes = np.array([category_code.get(t.split(" ", 2)[2], 0) for t in texts])
+        noise = np.random.default_rng(int(ids[0])).normal(scale=0.4, size=(len(texts), dim)).astype(np.float32)
+        return category_centers[codes] + topic_centers[ids % NUM_TOPICS] + noise
+    return encode
+
+
+def run(num_rows, backend, top_k, repeat):
+    df = make_messages(num_rows)
+    # Many rows repeat an earlier message, as template replies do
+    message_ids = np.random.default_rng(1).integers(0, max(1, num_rows // 2), num_rows)
+    df["message"] = [f"msg {i} {c}" for i, c in zip(message_ids.tolist(), df["category"].tolist())]
+    store = build_message_store(df)
+    current_time = df["timestamp"].max()
+    encode = make_encoder()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = build_semantic_index(df, tmp, backend=backend, encode=encode)
+        build_time = time.perf_counter() - start
+        exact = {**index, "backend": "numpy"}
+        query = df["message"].iloc[0]
+
+        print(f"\n=== {num_rows:,} rows, {index['num_messages']:,} distinct messages "
+              f"({backend} index built in {build_time:.1f}s) ===")
+        print(f"{'filters':<22}{'results':>9}{'exact ms':>11}{backend + ' ms':>14}{'recall':>9}")
+        for name, filters in QUERIES.items():
+            filters = {**filters, "semantic_query": query}
+            exact_time, expected = best_of(lambda: apply_filters(df, filters, current_time, store, exact), repeat)
+            ann_time, result = best_of(lambda: apply_filters(df, filters, current_time, store, index), repeat)
+            expected_messages = set(expected["message"].iloc[:top_k])
+            recall = len(expected_messages & set(result["message"])) / max(len(expected_messages), 1)
+            print(f"{name:<22}{len(result):>9,}{exact_time * 1000:>11.1f}{ann_time * 1000:>14.1f}{recall:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--backend", choices=BACKENDS, default="hnswlib")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.backend, args.top_k, args.repeat)
@@ -0,0 +1,67 @@
+"""
+Times the filtered-result summary computed in-process against the sharded worker pool.
+
+Usage:
+    python -m benchmarks.bench_summary --rows 10000000 --workers 1 2 4 8
+
+Each query is filtered once; only the summary (message and unique-user counts,
+time range, single category) is timed. Sharded results are checked against the
+in-process ones.
+"""
+import argparse
+import time
+from Chatbot.chatbot import apply_filters
+from Chatbot.sharded_stats import start_summary_pool, stop_summary_pool
+from Chatbot.store import build_message_store
+from Chatbot.stats import summarize_filtered_data
+from benchmarks.bench_apply_filters import best_of
+from benchmarks.synthetic import make_messages
+
+QUERIES = {
+    "all messages": {"category": None, "source": None, "start_time_expr": None, "end_time_expr": None},
+    "last 30 days": {"category": None, "source": None, "start_time_expr": "30 days ago", "end_time_expr": "now"},
+    "one category": {"category": "cashout issues", "source": None, "start_time_expr": None, "end_time_expr": None},
+}
+KEYS = ["num_messages", "num_users", "start_time", "end_time", "category"]
+
+
+def run(num_rows, worker_counts, repeat):
+    df = make_messages(num_rows)
+    store = build_message_store(df)
+    current_time = df["timestamp"].max()
+    results = {name: apply_filters(df, filters, current_time, store) for name, filters in QUERIES.items()}
+
+    timings, expected = {}, {}
+    for name, filtered in results.items():
+        timings[name, "in-process"], summary = best_of(lambda: summarize_filtered_data(filtered), repeat)
+        expected[name] = [summary[k] for k in KEYS]
+
+    for workers in worker_counts:
+        start = time.perf_counter()
+        pool = start_summary_pool(df, workers)
+        list(pool["executor"].map(abs, range(workers)))  # wait for the workers to start
+        startup = time.perf_counter() - start
+        try:
+            for name, filtered in results.items():
+                timings[name, workers], summary = best_of(lambda: summarize_filtered_data(filtered, pool=pool), repeat)
+                assert [summary[k] for k in KEYS] == expected[name], name
+        finally:
+            stop_summary_pool(pool)
+        print(f"{workers} workers started in {startup:.1f}s")
+
+    columns = ["in-process"] + list(worker_counts)
+    print(f"\n=== {num_rows:,} rows (ms per summary) ===")
+    print(f"{'query':<16}{'rows':>12}" + "".join(f"{str(c) + (' workers' if c != 'in-process' else ''):>14}" for c in columns))
+    for name, filtered in results.items():
+        print(f"{name:<16}{len(filtered):>12,}" + "".join(f"{timings[name, c] * 1000:>14.0f}" for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.workers, args.repeat)
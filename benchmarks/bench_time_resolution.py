@@ -0,0 +1,68 @@
+"""
+Compares time-expression resolution against calling dateparser on every turn.
+
+Usage:
+    python -m benchmarks.bench_time_resolution --turns 2000
+
+The expressions are the ones in the recorded LLM replies plus the fast path's
+phrasings, replayed in random order as a stream of chatbot turns.
+"""
+import argparse
+import json
+import random
+import time
+import dateparser
+import pandas as pd
+from Chatbot import time_resolution
+from Chatbot.llm_backends import DEFAULT_FIXTURE_PATH, load_fixture
+from Chatbot.time_resolution import resolve_time_expr, resolve_time_exprs
+
+EXTRA_EXPRESSIONS = ["1 hour ago", "3 days ago", "Monday", "Friday", "30 days ago", "2 weeks ago", "January 15"]
+
+
+def fixture_expressions(path=DEFAULT_FIXTURE_PATH):
+    """Collects the distinct start/end expressions from the recorded replies."""
+    expressions = set()
+    for reply in load_fixture(path).values():
+        try:
+            filters = json.loads(reply)
+        except ValueError:
+            continue
+        expressions.update(e for e in (filters.get("start_time_expr"), filters.get("end_time_expr")) if e)
+    return sorted(expressions)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    expressions = sorted(set(fixture_expressions()) | set(EXTRA_EXPRESSIONS))
+    turns = [random.Random(0).choice(expressions) for _ in range(args.turns)]
+    base_time = pd.Timestamp("2025-01-30 15:42:17").to_pydatetime()
+    settings = {'RELATIVE_BASE': base_time, 'RETURN_AS_TIMEZONE_AWARE': False}
+
+    dateparser.parse("now", settings=settings)  # warm up dateparser's language data
+    baseline = timed(lambda: [dateparser.parse(e, settings=settings) for e in turns])
+
+    time_resolution._resolve_cached.cache_clear()
+    fast_only = timed(lambda: [time_resolution._resolve_fast(e.lower(), base_time) for e in turns])
+    first_pass = timed(lambda: [resolve_time_expr(e, base_time) for e in turns])
+    warm = timed(lambda: [resolve_time_expr(e, base_time) for e in turns])
+    time_resolution._resolve_cached.cache_clear()
+    batch = timed(lambda: resolve_time_exprs(turns, base_time))
+
+    fallback = [e for e in expressions if time_resolution._resolve_fast(e.lower(), base_time) is None]
+    print(f"{len(turns)} turns over {len(expressions)} distinct expressions "
+          f"({len(fallback)} need dateparser: {fallback})")
+    print(f"{'method':<28}{'total ms':>10}{'us/turn':>10}{'speedup':>10}")
+    for name, seconds in [("dateparser every turn", baseline), ("compiled fast path only", fast_only),
+                          ("memoized, cold cache", first_pass), ("memoized, warm cache", warm),
+                          ("batch, cold cache", batch)]:
+        print(f"{name:<28}{seconds * 1000:>10.1f}{seconds / len(turns) * 1e6:>10.1f}{baseline / seconds:>9.0f}x")
@@ -0,0 +1,71 @@
+"""
+Breaks the time of a scripted chatbot session down by stage on synthetic data.
+
+Usage:
+    python -m benchmarks.bench_turn_stages --rows 100000 1000000 --llm-delay 0.2
+
+The evaluation queries (see Chatbot/eval_cases.py) are replayed through
+`run_turn`, the server's turn function, so every query goes through the same
+stages as a live session, with the fixture backend standing in for the LLM
+(`--llm-delay` seconds per request). `--llm-share` sends that share of queries
+to the LLM even when the fast path could answer them. The per-stage table is
+what `GET /metrics` and the chatbot's exit report show; comparing two runs
+attributes a regression to a stage. The last line is the cost of one span, so
+the instrumentation's own overhead per turn can be read off.
+"""
+import argparse
+import time
+from Chatbot.chatbot import build_environment, new_filter_context
+from Chatbot.eval_cases import all_cases
+from Chatbot.llm_backends import make_fixture_backend
+from Chatbot.server import new_server_state, run_turn
+from Chatbot.turn_metrics import format_metrics_report, metrics_report, new_turn_metrics, span, start_turn
+from benchmarks.synthetic import make_messages
+
+
+def delayed(backend, delay):
+    def complete(messages):
+        time.sleep(delay)
+        return backend["complete"](messages)
+
+    return {**backend, "complete": complete}
+
+
+def run(num_rows, args):
+    env = build_environment(make_messages(num_rows), delayed(make_fixture_backend(), args.llm_delay))
+    queries = [case["query"] for case in all_cases(env["current_time"])]
+
+    fast = new_server_state(env)
+    slow = new_server_state(env, min_confidence=1.1)
+    current_filter = new_filter_context()
+    for i in range(args.repeat):
+        for j, query in enumerate(queries):
+            state = slow if (i * len(queries) + j) % round(1 / args.llm_share) == 0 else fast
+            current_filter, _ = run_turn(state, current_filter, query)
+    fast["executor"].shutdown()
+    slow["executor"].shutdown()
+
+    print(f"\n=== {num_rows:,} rows, {len(queries) * args.repeat} turns ===")
+    print(format_metrics_report(metrics_report(env["turn_metrics"])))
+
+
+def span_overhead(n=100_000):
+    with start_turn(new_turn_metrics()):
+        start = time.perf_counter()
+        for _ in range(n):
+            with span("overhead"):
+                pass
+    return (time.perf_counter() - start) / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="times the query script is replayed")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="seconds per LLM request")
+    parser.add_argument("--llm-share", type=float, default=0.25, help="share of queries sent to the LLM")
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args)
+    print(f"\nOne span costs {span_overhead() * 1e6:.1f} µs")
@@ -0,0 +1,84 @@
+"""
+Compares fitting UMAP on every embedding with fitting it on a stratified sample
+and projecting the rest in parallel batches.
+
+Usage:
+    python -m benchmarks.bench_umap --rows 20000 100000 1000000 --sample-size 20000 --workers 4
+
+Embeddings are synthetic unit vectors around `--clusters` centers, memory-mapped
+from a temporary file like in `bench_clustering`. Each stage runs in a fresh
+process and reports wall time and peak RSS; the full fit is skipped above
+`--full-limit` rows. "kept" is the share of each point's 15 nearest sample
+neighbours (in embedding space) that are also among its 15 nearest in the
+projection, a rough check that the sampled fit preserves local structure.
+Requires umap-learn.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Categorization.projection import fit_reducer, stratified_sample, transform_rows
+from benchmarks.bench_clustering import DIM, write_embeddings
+
+
+def neighbours_kept(embeddings, coords, k=15, queries=1_000, seed=0):
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(coords), size=min(queries, len(coords)), replace=False)
+    kept = []
+    for i in picked:
+        high = np.argsort(-(embeddings @ embeddings[i]))[1:k + 1]
+        low = np.argsort(((coords - coords[i]) ** 2).sum(axis=1))[1:k + 1]
+        kept.append(len(np.intersect1d(high, low)) / k)
+    return float(np.mean(kept))
+
+
+def _run_stage(stage, path, num_rows, args):
+    embeddings = np.memmap(path, dtype=np.float32, mode="r", shape=(num_rows, DIM))
+    start = time.perf_counter()
+    if stage == "full":
+        reducer = fit_reducer(np.asarray(embeddings), 2)
+        coords = reducer.embedding_
+        check = np.arange(num_rows)
+    else:
+        labels = np.random.default_rng(0).integers(0, args.clusters, num_rows)
+        sample = stratified_sample(labels, args.sample_size)
+        reducer = fit_reducer(np.asarray(embeddings[sample]), 2)
+        coords = transform_rows(reducer, embeddings, np.arange(num_rows), args.batch_size, args.workers)
+        check = sample
+    elapsed = time.perf_counter() - start
+    # Neighbourhoods are compared on the sample, where exact search is affordable
+    check = check[:args.sample_size]
+    kept = neighbours_kept(np.asarray(embeddings[check]), np.asarray(coords)[check])
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, kept
+
+
+def run(num_rows, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.f32")
+        write_embeddings(path, num_rows, n_clusters=args.clusters)
+        print(f"\n=== {num_rows:,} rows ===")
+        print(f"{'stage':<10}{'seconds':>10}{'peak MB':>10}{'kept':>8}")
+        for stage in ("full", "sampled"):
+            if stage == "full" and num_rows > args.full_limit:
+                print(f"{stage:<10}{'skipped':>10}")
+                continue
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, peak, kept = pool.submit(_run_stage, stage, path, num_rows, args).result()
+            print(f"{stage:<10}{elapsed:>10.1f}{peak:>10.0f}{kept:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--clusters", type=int, default=10)
+    parser.add_argument("--sample-size", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--full-limit", type=int, default=200_000, help="largest row count fitted in full")
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args)
@@ -0,0 +1,79 @@
+"""
+Compares per-user questions answered from the per-user index with pandas scans.
+
+Times one user's messages ("show everything user 4844 sent"), the top 10 senders
+for a category over the last week and over all time, the extra cost of the index
+at load, and appending a batch of messages with `extend_message_store`.
+
+Usage:
+    python -m benchmarks.bench_user_index --rows 1000000 10000000 --users 200000
+"""
+import argparse
+import pandas as pd
+from Chatbot.store import build_message_store, extend_message_store, select_rows, top_users
+from benchmarks.bench_apply_filters import best_of
+from benchmarks.synthetic import make_messages
+
+
+def scan_top_users(df, n, category=None, start_time=None):
+    """Reference: filter with boolean masks, then count per user."""
+    mask = pd.Series(True, index=df.index)
+    if category:
+        mask &= df["category"] == category
+    if start_time is not None:
+        mask &= df["timestamp"] >= start_time
+    counts = df.loc[mask, "id_user"].value_counts()
+    return counts.sort_index().sort_values(ascending=False, kind="stable").head(n)
+
+
+def run(num_rows, num_users, repeat, batch_rows):
+    df = make_messages(num_rows, num_users=num_users)
+    build_time, store = best_of(lambda: build_message_store(df), 1)
+    user = int(df["id_user"].iloc[num_rows // 2])
+    week = df["timestamp"].max() - pd.Timedelta(days=7)
+
+    print(f"\n=== {num_rows:,} rows, {df['id_user'].nunique():,} users (store built in {build_time:.2f}s) ===")
+    print(f"{'question':<34}{'scan ms':>12}{'index ms':>12}{'speedup':>10}")
+    cases = {
+        "one user's messages": (
+            lambda: df[df["id_user"] == user],
+            lambda: df.iloc[select_rows(store, user=user)],
+        ),
+        "top 10, category, last week": (
+            lambda: scan_top_users(df, 10, "withdrawal issue", week),
+            lambda: top_users(store, 10, "withdrawal issue", start_time=week),
+        ),
+        "top 10, category, all time": (
+            lambda: scan_top_users(df, 10, "withdrawal issue"),
+            lambda: top_users(store, 10, "withdrawal issue"),
+        ),
+        "top 10, everything": (
+            lambda: scan_top_users(df, 10),
+            lambda: top_users(store, 10),
+        ),
+    }
+    for name, (scan, indexed) in cases.items():
+        scan_time, expected = best_of(scan, repeat)
+        indexed_time, result = best_of(indexed, repeat)
+        if isinstance(result, dict):
+            assert [count for _, count in result["top"]] == expected.tolist(), name
+        else:
+            assert len(result) == len(expected), name
+        print(f"{name:<34}{scan_time * 1000:>12.2f}{indexed_time * 1000:>12.2f}{scan_time / indexed_time:>9.0f}x")
+
+    batch = make_messages(batch_rows, seed=1, start=str(df["timestamp"].max()), end="2025-01-31",
+                          num_users=num_users * 2)
+    extend_time, _ = best_of(lambda: extend_message_store(store, batch), repeat)
+    print(f"append {batch_rows:,} messages: {extend_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--users", type=int, default=200_000, help="distinct users in the synthetic data")
+    parser.add_argument("--batch-rows", type=int, default=1_000, help="messages per appended batch")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        run(num_rows, args.users, args.repeat, args.batch_rows)
@@ -0,0 +1,101 @@
+"""
+Drives N simulated analyst sessions against the asyncio chatbot server and
+reports per-turn latency percentiles.
+
+The LLM is replaced by the local stub server replaying Chatbot/fixtures with a
+configurable delay, so the run is offline and repeatable.
+
+Usage:
+    python -m benchmarks.load_test_server --sessions 50 --turns 10 --llm-delay 0.5 --max-in-flight 8
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+import openai
+from Chatbot.chatbot import build_environment
+from Chatbot.llm_backends import DEFAULT_FIXTURE_PATH, make_fixture_backend, make_openai_backend
+from Chatbot.server import new_server_state, start_server
+from Chatbot.stub_llm_server import start_stub_server
+from benchmarks.synthetic import make_messages
+
+
+async def post_json(reader, writer, path, payload):
+    """Sends one keep-alive POST request and returns (status, decoded JSON body)."""
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, json.loads(await reader.readexactly(int(headers["content-length"])))
+
+
+async def run_session(port, session_id, queries, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            status, _ = await post_json(reader, writer, "/query", {"session_id": session_id, "query": query})
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load_test(args):
+    with open(DEFAULT_FIXTURE_PATH, encoding="utf-8") as f:
+        all_queries = list(json.load(f))
+
+    stub = start_stub_server(make_fixture_backend(), delay=args.llm_delay)
+    client = openai.OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{stub.server_port}/v1", max_retries=0)
+    env = build_environment(make_messages(args.rows), make_openai_backend(client))
+
+    state = new_server_state(
+        env,
+        max_in_flight=args.max_in_flight,
+        max_workers=max(args.sessions, 4),
+        min_confidence=1.1 if args.force_llm else 0.9,
+    )
+    server = await start_server(state, port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(port, f"session-{i}",
+                    [all_queries[(i + t) % len(all_queries)] for t in range(args.turns)],
+                    latencies, errors)
+        for i in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    server.close()
+    await server.wait_closed()
+    stub.shutdown()
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"sessions={args.sessions} turns/session={args.turns} rows={args.rows:,} "
+          f"llm_delay={args.llm_delay}s max_in_flight={args.max_in_flight} force_llm={args.force_llm}")
+    print(f"turns:      {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} turns/s), errors: {len(errors)}")
+    print(f"latency ms: p50={np.percentile(latencies_ms, 50):.1f} p99={np.percentile(latencies_ms, 99):.1f} "
+          f"max={latencies_ms.max():.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic dataset size")
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="simulated LLM latency in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--force-llm", action="store_true", help="send every query to the LLM, bypassing the fast path")
+    asyncio.run(run_load_test(parser.parse_args()))
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    "not actionable", "time delays", "cashout issues", "deposit issues", "general inquiry",
+    "freespin issues", "withdrawal issue", "account issues", "bonus issue", "game issues",
+]
+SOURCES = ["livechat", "telegram"]
+
+
+def make_messages(num_rows, seed=0, start="2024-11-01", end="2025-01-30", num_users=None):
+    """
+    Generates a synthetic, timestamp-sorted message dataset shaped like
+    `merged_messages_with_categories.csv`.
+
+    Args:
+        num_rows (int): Number of messages to generate.
+        seed (int): Random seed for reproducible data.
+        start (str): Earliest timestamp.
+        end (str): Latest timestamp.
+        num_users (Optional[int]): Number of distinct users, defaults to ~90% of rows
+            as in the sample data.
+
+    Returns:
+        pd.DataFrame: Columns 'id_user', 'timestamp', 'source', 'message', 'cluster', 'category'.
+    """
+    rng = np.random.default_rng(seed)
+    num_users = num_users or max(1, int(num_rows * 0.9))
+
+    seconds = rng.integers(pd.Timestamp(start).value // 10**9, pd.Timestamp(end).value // 10**9, num_rows)
+    timestamps = np.sort(seconds) * 10**9
+    clusters = rng.integers(0, len(CATEGORIES), num_rows)
+    sources = rng.choice(len(SOURCES), num_rows, p=[0.9, 0.1])
+
+    return pd.DataFrame({
+        "id_user": rng.integers(0, num_users, num_rows),
+        "timestamp": pd.to_datetime(timestamps),
+        "source": np.asarray(SOURCES, dtype=object)[sources],
+        "message": pd.Categorical.from_codes(clusters, [f"sample message {i}" for i in range(len(CATEGORIES))]),
+        "cluster": clusters,
+        "category": np.asarray(CATEGORIES, dtype=object)[clusters],
+    })